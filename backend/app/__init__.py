@@ -1,14 +1,35 @@
 """Application factory for the ChatYourNotes backend."""
 
+from typing import Any, Dict
+
 from flask import Flask
 from flask_cors import CORS
+from sqlalchemy import text
 
 from .config import Settings
 from .api import api_bp
 from .error_handlers import register_error_handlers
+from .instrumentation import register_instrumentation
 from .extensions import db
+from .schema import prepare_database
+from .services.answer_cache import AnswerCache
+from .services import gemini
+from .services.chunker import Chunker
+from .services.components import FAILED, READY, Components
+from .services.document_list_cache import DocumentListCache
+from .services.index_service import (
+    IndexServiceClient,
+    RemoteEmbeddingService,
+    RemoteReranker,
+    RemoteVectorStore,
+    build_local_index,
+)
+from .services.job_queue import IngestionJobQueue
+from .services.llm_client import LLMClient, set_client
 from .services.pipeline_service import PipelineService
-from .services.vector_store import VectorStore
+from .services.upload_stream import StreamingUploadRequest
+from .services.qa_pipeline import QAPipeline
+from .services.reranker import ContextSelector
 
 
 def create_app() -> Flask:
@@ -17,22 +38,103 @@ def create_app() -> Flask:
     settings.ensure_directories()
 
     app = Flask(__name__)
+    app.request_class = StreamingUploadRequest
     app.config.update(settings.to_flask_config())
     app.config["APP_SETTINGS"] = settings
 
     CORS(app, resources={r"/api/*": {"origins": settings.cors_origins}})
     register_error_handlers(app)
+    register_instrumentation(app, settings)
 
     db.init_app(app)
 
     with app.app_context():
-        db.create_all()
+        prepare_database()
+
+    if settings.uses_index_service:
+        client = IndexServiceClient(settings.index_service_socket, settings.index_service_connect_timeout)
+        embedder: Any = RemoteEmbeddingService(client, settings.embedding_model)
+        vector_store: Any = RemoteVectorStore(client)
+        reranker: Any = RemoteReranker(client, settings.rerank_model) if settings.rerank_enabled else None
+        local_index = None
+    else:
+        local_index = build_local_index(settings)
+        embedder, vector_store, reranker = local_index.embedder, local_index.vector_store, local_index.reranker
+
+    def build_chunker() -> Chunker:
+        # Reading the model's input limit loads the model, so wait for the first document.
+        return Chunker(
+            min(settings.chunk_tokens, embedder.max_input_tokens),
+            settings.chunk_overlap_tokens,
+            count_tokens=embedder.count_tokens,
+        )
+
+    pipeline_service = PipelineService(settings, vector_store=vector_store, chunker=build_chunker)
 
-    vector_store = VectorStore(settings)
-    pipeline_service = PipelineService(settings, vector_store=vector_store)
+    llm_client = LLMClient.from_settings(settings)
+    set_client(llm_client)
 
+    answer_cache = None
+    if settings.answer_cache_enabled:
+        answer_cache = AnswerCache(
+            max_entries=settings.answer_cache_size,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+            similarity_threshold=settings.answer_cache_similarity,
+        )
+    context_selector = ContextSelector(
+        reranker,
+        candidates=settings.rerank_candidates,
+        token_budget=settings.context_token_budget,
+        dedup_threshold=settings.context_dedup_threshold,
+    )
+    qa_pipeline = QAPipeline(settings, vector_store, answer_cache=answer_cache, context_selector=context_selector)
+    pipeline_service.subscribe(qa_pipeline.invalidate_document)
+    if local_index is None:
+        # Other workers write to the shared index too; drop answers built on what they changed.
+        vector_store.subscribe(qa_pipeline.invalidate_document, answer_cache.clear if answer_cache else None)
+    elif answer_cache is not None:
+        # Without the index service, other workers or a bulk import may write to the same index files.
+        vector_store.watch_other_writers(answer_cache.clear)
+
+    app.config["EMBEDDING_SERVICE"] = embedder
     app.config["VECTOR_STORE"] = vector_store
     app.config["PIPELINE_SERVICE"] = pipeline_service
+    app.config["QA_PIPELINE"] = qa_pipeline
+    app.config["LLM_CLIENT"] = llm_client
+    app.config["DOCUMENT_LIST_CACHE"] = DocumentListCache(settings.document_list_cache_size)
+
+    def database_status() -> Dict[str, object]:
+        try:
+            with app.app_context():
+                db.session.execute(text("SELECT 1"))
+                db.session.remove()
+        except Exception as exc:
+            return {"state": FAILED, "error": f"{type(exc).__name__}: {exc}"}
+        return {"state": READY}
+
+    components = Components()
+    components.register("database", database_status, lambda: None)
+    if local_index is not None:
+        local_index.register_components(components)
+    else:
+        components.register("index_service", vector_store.status, vector_store.warm_up)
+    if settings.llm_backend == "gemini":
+        components.register("gemini_sdk", gemini.status, gemini.warm_up, required=False)
+    app.config["COMPONENTS"] = components
+
+    job_queue = IngestionJobQueue(
+        app,
+        pipeline_service,
+        max_workers=settings.ingest_workers,
+        max_pending=settings.ingest_queue_size,
+        summary_workers=settings.summary_jobs,
+        heartbeat_seconds=settings.job_heartbeat_seconds,
+        stale_seconds=settings.job_stale_seconds,
+    )
+    job_queue.resume_pending()
+    app.config["JOB_QUEUE"] = job_queue
 
     app.register_blueprint(api_bp, url_prefix="/api")
+    if settings.warm_up:
+        components.start_warm_up()
     return app
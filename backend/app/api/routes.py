@@ -1,14 +1,30 @@
 """Route registration for the public API."""
 
+import base64
+import binascii
+import json
+from datetime import datetime
 from http import HTTPStatus
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, stream_with_context, url_for
+from werkzeug.datastructures import FileStorage
 
 from ..config import Settings
-from ..services import document_store
+from ..models import DOCUMENT_FIELDS, IngestionJob
+from ..services import document_store, job_store
+from ..services.document_list_cache import DocumentListCache
+from ..services.file_handler import FileHandler
+from ..services.job_queue import IngestionJobQueue, QueueFullError
 from ..services.pipeline_service import PipelineService
-from ..services.qa_service import answer_question
+from ..services.qa_pipeline import NoContextError, QABatchItem, QAPipeline
+from ..services.upload_stream import UploadTooLarge
+
+
+QARequest = Tuple[str, Optional[List[str]], int]
+Problem = Tuple[str, HTTPStatus]
+ListRequest = Tuple[int, Optional[str], Optional[document_store.DocumentCursor], Tuple[str, ...]]
+ErrorResponse = Tuple[Response, HTTPStatus]
 
 
 def _get_settings() -> Settings:
@@ -25,32 +41,315 @@ def _get_pipeline() -> PipelineService:
     return pipeline
 
 
+def _get_qa_pipeline() -> QAPipeline:
+    qa_pipeline = current_app.config.get("QA_PIPELINE")
+    if not qa_pipeline:
+        raise RuntimeError("QA pipeline is not initialized")
+    return qa_pipeline
+
+
+def _get_job_queue() -> IngestionJobQueue:
+    job_queue = current_app.config.get("JOB_QUEUE")
+    if not job_queue:
+        raise RuntimeError("Job queue is not initialized")
+    return job_queue
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _error(message: str, status: HTTPStatus) -> ErrorResponse:
+    return jsonify({"error": message}), status
+
+
+def _parse_top_k(value: Any, default: int) -> Tuple[int, Optional[str]]:
+    try:
+        top_k = int(value or default)
+    except (TypeError, ValueError):
+        return 0, "top_k must be an integer"
+    if top_k <= 0:
+        return 0, "top_k must be greater than zero"
+    return top_k, None
+
+
+def _encode_cursor(uploaded_at: datetime, row_id: int) -> str:
+    raw = json.dumps([uploaded_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> document_store.DocumentCursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        uploaded_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(uploaded_at), int(row_id)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise ValueError("cursor is invalid") from exc
+
+
+def _parse_list_request() -> Tuple[Optional[ListRequest], Optional[ErrorResponse]]:
+    """Validate ``limit``, ``cursor`` and ``fields`` of a document list request."""
+    settings = _get_settings()
+    try:
+        limit = int(request.args.get("limit") or settings.documents_page_size)
+    except ValueError:
+        return None, _error("limit must be an integer", HTTPStatus.BAD_REQUEST)
+    if not 0 < limit <= settings.documents_page_max:
+        return None, _error(f"limit must be between 1 and {settings.documents_page_max}", HTTPStatus.BAD_REQUEST)
+
+    cursor = request.args.get("cursor") or None
+    after = None
+    if cursor is not None:
+        try:
+            after = _decode_cursor(cursor)
+        except ValueError as exc:
+            return None, _error(str(exc), HTTPStatus.BAD_REQUEST)
+
+    requested = {name.strip() for name in (request.args.get("fields") or "").split(",") if name.strip()}
+    unknown = requested - set(DOCUMENT_FIELDS)
+    if unknown:
+        return None, _error(f"Unknown fields: {', '.join(sorted(unknown))}", HTTPStatus.BAD_REQUEST)
+    fields = tuple(name for name in DOCUMENT_FIELDS if name in requested)
+    return (limit, cursor, after, fields), None
+
+
+def parse_qa_payload(payload: Dict[str, Any], settings: Settings) -> Tuple[Optional[QARequest], Optional[Problem]]:
+    """Validate a decoded QA payload, returning the parameters or an error message and status.
+
+    Looks the document up, so it needs an application context. Shared with
+    the asynchronous server so both answer invalid requests the same way.
+    """
+    question = (payload.get("question") or "").strip()
+    document_id = payload.get("document_id")
+    top_k, message = _parse_top_k(payload.get("top_k"), settings.top_k)
+    if message:
+        return None, (message, HTTPStatus.BAD_REQUEST)
+
+    if not question:
+        return None, ("Question is required", HTTPStatus.BAD_REQUEST)
+
+    if document_id:
+        doc = document_store.get_by_document_id(document_id)
+        if not doc:
+            return None, ("Document not found", HTTPStatus.NOT_FOUND)
+
+    document_filter = [document_id] if document_id else None
+    return (question, document_filter, top_k), None
+
+
+def _parse_qa_request() -> Tuple[Optional[QARequest], Optional[ErrorResponse]]:
+    """Validate a QA payload, returning the parameters or an error response."""
+    payload: Dict[str, Any] = request.get_json(silent=True) or {}
+    parsed, problem = parse_qa_payload(payload, _get_settings())
+    if problem:
+        return None, _error(*problem)
+    return parsed, None
+
+
+def _parse_batch_request() -> Tuple[Optional[List[QABatchItem]], Optional[ErrorResponse]]:
+    """Validate a batch QA payload.
+
+    ``questions`` holds strings or ``{"question", "document_id", "top_k"}``
+    objects; top-level ``document_id`` and ``top_k`` are the defaults.
+    """
+    payload: Dict[str, Any] = request.get_json(silent=True) or {}
+    settings = _get_settings()
+    questions = payload.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return None, _error("questions must be a non-empty list", HTTPStatus.BAD_REQUEST)
+    if len(questions) > settings.qa_batch_max_questions:
+        return None, _error(
+            f"At most {settings.qa_batch_max_questions} questions are allowed per batch", HTTPStatus.BAD_REQUEST
+        )
+    default_top_k, message = _parse_top_k(payload.get("top_k"), settings.top_k)
+    if message:
+        return None, _error(message, HTTPStatus.BAD_REQUEST)
+    default_document = payload.get("document_id")
+    if default_document is not None and not isinstance(default_document, str):
+        return None, _error("document_id must be a string", HTTPStatus.BAD_REQUEST)
+
+    items: List[QABatchItem] = []
+    for index, entry in enumerate(questions):
+        if isinstance(entry, str):
+            entry = {"question": entry}
+        if not isinstance(entry, dict):
+            return None, _error(f"questions[{index}] must be a string or an object", HTTPStatus.BAD_REQUEST)
+        question = entry.get("question")
+        if question is not None and not isinstance(question, str):
+            return None, _error(f"questions[{index}].question must be a string", HTTPStatus.BAD_REQUEST)
+        question = (question or "").strip()
+        if not question:
+            return None, _error(f"questions[{index}] is missing a question", HTTPStatus.BAD_REQUEST)
+        top_k, message = _parse_top_k(entry.get("top_k"), default_top_k)
+        if message:
+            return None, _error(message, HTTPStatus.BAD_REQUEST)
+        document_id = entry.get("document_id", default_document)
+        if document_id is not None and not isinstance(document_id, str):
+            return None, _error(f"questions[{index}].document_id must be a string", HTTPStatus.BAD_REQUEST)
+        items.append(QABatchItem(question, [document_id] if document_id else None, top_k))
+
+    document_ids = {item.document_ids[0] for item in items if item.document_ids}
+    for document_id in document_ids:
+        if not document_store.get_by_document_id(document_id):
+            return None, _error(f"Document not found: {document_id}", HTTPStatus.NOT_FOUND)
+    return items, None
+
+
+def enqueue_upload(file: FileStorage, replaces: Optional[str]) -> Tuple[Optional[IngestionJob], Optional[Problem]]:
+    """Queue an uploaded PDF for ingestion, or return why it was refused.
+
+    Needs an application context; shared with the asynchronous server.
+    """
+    if replaces and not document_store.get_by_document_id(replaces):
+        return None, ("Document not found", HTTPStatus.NOT_FOUND)
+    try:
+        return _get_job_queue().enqueue(file, replaces=replaces), None
+    except UploadTooLarge as exc:
+        return None, (str(exc), HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    except ValueError as exc:
+        return None, (str(exc), HTTPStatus.BAD_REQUEST)
+    except QueueFullError as exc:
+        return None, (str(exc), HTTPStatus.SERVICE_UNAVAILABLE)
+    except Exception as exc:  # noqa: BLE001
+        return None, (f"Failed to queue document: {exc}", HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
 def register_routes(bp: Blueprint) -> None:
     """Attach all API routes to the given blueprint."""
 
     @bp.get("/health")
+    @bp.get("/health/live")
     def health() -> Any:
         return jsonify({"status": "ok"}), HTTPStatus.OK
 
+    @bp.get("/health/ready")
+    def readiness() -> Any:
+        components = current_app.config.get("COMPONENTS")
+        if components is None:
+            return jsonify({"status": "ready", "components": {}}), HTTPStatus.OK
+        ready, statuses = components.report()
+        status = HTTPStatus.OK if ready else HTTPStatus.SERVICE_UNAVAILABLE
+        payload = {"status": "ready" if ready else "not_ready", "warming_up": components.warming, "components": statuses}
+        return jsonify(payload), status
+
+    @bp.get("/stats")
+    def stats() -> Any:
+        embedder = current_app.config.get("EMBEDDING_SERVICE")
+        qa_pipeline = _get_qa_pipeline()
+        answer_cache = qa_pipeline.answer_cache
+        context_selector = qa_pipeline.context_selector
+        document_list_cache = current_app.config.get("DOCUMENT_LIST_CACHE")
+        llm_client = current_app.config.get("LLM_CLIENT")
+        return jsonify(
+            {
+                "document_list_cache": document_list_cache.stats() if document_list_cache else None,
+                "embedding_cache": embedder.cache_stats() if embedder else None,
+                "embedding_scheduler": embedder.scheduler_stats() if embedder else None,
+                "answer_cache": answer_cache.stats() if answer_cache else None,
+                "context": context_selector.stats() if context_selector else None,
+                "llm": llm_client.stats() if llm_client else None,
+            }
+        ), HTTPStatus.OK
+
     @bp.get("/documents")
     def list_documents() -> Any:
-        documents = [document.to_dict() for document in document_store.list_documents()]
-        return jsonify({"items": documents, "count": len(documents)}), HTTPStatus.OK
+        """List documents newest first, one keyset page at a time.
+
+        ``limit`` sets the page size, ``cursor`` is the ``next_cursor`` of the
+        previous page and ``fields`` a comma-separated projection. Responses
+        carry an ETag derived from the collection version; pages are served
+        from an in-process cache until a document is created, changed or
+        deleted.
+        """
+        parsed, error = _parse_list_request()
+        if error:
+            return error
+        limit, cursor, after, fields = parsed
+
+        version = document_store.get_documents_version()
+        etag = f"documents-{version}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            cache: Optional[DocumentListCache] = current_app.config.get("DOCUMENT_LIST_CACHE")
+            key = (limit, cursor, fields)
+            body = cache.get(version, key) if cache else None
+            if body is None:
+                documents = document_store.list_documents_page(limit + 1, after, fields or None)
+                page = documents[:limit]
+                next_cursor = None
+                if len(documents) > limit:
+                    next_cursor = _encode_cursor(page[-1].uploaded_at, page[-1].id)
+                items = [document.to_dict(fields or None) for document in page]
+                payload = {
+                    "items": items,
+                    "count": len(items),
+                    "total": document_store.count_documents(),
+                    "next_cursor": next_cursor,
+                }
+                body = current_app.json.dumps(payload).encode()
+                if cache:
+                    cache.put(version, key, body)
+            response = current_app.response_class(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
 
     @bp.post("/documents")
     def upload_document() -> Any:
         if "file" not in request.files:
             return jsonify({"error": "file field is required"}), HTTPStatus.BAD_REQUEST
-        file = request.files["file"]
+        job, problem = enqueue_upload(request.files["file"], request.form.get("document_id") or None)
+        if problem:
+            return _error(*problem)
 
-        try:
-            document = _get_pipeline().ingest(file)
-        except ValueError as exc:
-            return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
-        except Exception as exc:  # noqa: BLE001
-            return jsonify({"error": f"Failed to process document: {exc}"}), HTTPStatus.INTERNAL_SERVER_ERROR
+        response = jsonify(job.to_dict())
+        response.headers["Location"] = url_for("api.get_job", job_id=job.job_id)
+        return response, HTTPStatus.ACCEPTED
 
-        return jsonify(document.to_dict()), HTTPStatus.CREATED
+    @bp.get("/jobs/<string:job_id>")
+    def get_job(job_id: str) -> Any:
+        job = job_store.get_by_job_id(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), HTTPStatus.NOT_FOUND
+        payload = job.to_dict()
+        if job.status == job_store.STATUS_SUCCEEDED:
+            document = document_store.get_by_document_id(job.document_id)
+            payload["document"] = document.to_dict() if document else None
+        return jsonify(payload), HTTPStatus.OK
+
+    @bp.get("/documents/<string:document_id>/text")
+    def get_document_text(document_id: str) -> Any:
+        """Serve the stored text, or the byte range ``[start, end)`` given by the query string.
+
+        Without ``start``/``end`` the whole file is sent and standard
+        ``Range`` headers are honoured. Chunk matches carry ``byte_start`` and
+        ``byte_end`` for this endpoint.
+        """
+        settings = _get_settings()
+        document = document_store.get_by_document_id(document_id)
+        if not document:
+            return _error("Document not found", HTTPStatus.NOT_FOUND)
+        path = settings.ocr_dir / document.text_path
+        if not path.exists():
+            return _error("Document text not found", HTTPStatus.NOT_FOUND)
+
+        if "start" not in request.args and "end" not in request.args:
+            return send_file(path, mimetype="text/plain; charset=utf-8", conditional=True)
+
+        size = path.stat().st_size
+        try:
+            start = int(request.args.get("start", 0))
+            end = int(request.args.get("end", size))
+        except ValueError:
+            return _error("start and end must be integers", HTTPStatus.BAD_REQUEST)
+        if start < 0 or end < start:
+            return _error("start and end must be byte offsets with 0 <= start <= end", HTTPStatus.BAD_REQUEST)
+        end = min(end, size)
+        data = FileHandler(settings).read_text_range(document.text_path, start, end)
+        response = Response(data, mimetype="text/plain; charset=utf-8")
+        response.headers["X-Total-Length"] = str(size)
+        return response, HTTPStatus.OK
 
     @bp.delete("/documents/<string:document_id>")
     def delete_document(document_id: str) -> Any:
@@ -61,39 +360,78 @@ def register_routes(bp: Blueprint) -> None:
 
     @bp.post("/qa")
     def ask_question() -> Any:
-        payload: Dict[str, Any] = request.get_json(silent=True) or {}
-        question = (payload.get("question") or "").strip()
-        document_id = payload.get("document_id")
+        parsed, error = _parse_qa_request()
+        if error:
+            return error
+        question, document_filter, top_k = parsed
+
         try:
-            top_k = int(payload.get("top_k") or _get_settings().top_k)
-        except (TypeError, ValueError):
-            return jsonify({"error": "top_k must be an integer"}), HTTPStatus.BAD_REQUEST
-        if top_k <= 0:
-            return jsonify({"error": "top_k must be greater than zero"}), HTTPStatus.BAD_REQUEST
+            result = _get_qa_pipeline().ask(question, document_ids=document_filter, top_k=top_k)
+        except NoContextError as exc:
+            return jsonify({"error": str(exc)}), HTTPStatus.NOT_FOUND
+        except Exception as exc:  # noqa: BLE001
+            return jsonify({"error": f"Failed to generate answer: {exc}"}), HTTPStatus.INTERNAL_SERVER_ERROR
 
-        if not question:
-            return jsonify({"error": "Question is required"}), HTTPStatus.BAD_REQUEST
+        return jsonify(result.to_dict()), HTTPStatus.OK
 
-        vector_store = current_app.config.get("VECTOR_STORE")
-        if not vector_store:
-            return jsonify({"error": "Vector store is not initialized"}), HTTPStatus.INTERNAL_SERVER_ERROR
+    @bp.post("/qa/stream")
+    def stream_question() -> Any:
+        parsed, error = _parse_qa_request()
+        if error:
+            return error
+        question, document_filter, top_k = parsed
 
-        if document_id:
-            doc = document_store.get_by_document_id(document_id)
-            if not doc:
-                return jsonify({"error": "Document not found"}), HTTPStatus.NOT_FOUND
+        try:
+            qa_stream = _get_qa_pipeline().stream(question, document_ids=document_filter, top_k=top_k)
+        except NoContextError as exc:
+            return jsonify({"error": str(exc)}), HTTPStatus.NOT_FOUND
+        except Exception as exc:  # noqa: BLE001
+            return jsonify({"error": f"Failed to retrieve context: {exc}"}), HTTPStatus.INTERNAL_SERVER_ERROR
 
-        document_filter = [document_id] if document_id else None
-        matches = vector_store.similarity_search(question, k=top_k, document_ids=document_filter)
-        contexts = [match["content"] for match in matches]
+        def events() -> Iterator[str]:
+            yield format_sse("matches", {"matches": qa_stream.matches, "cache": qa_stream.cache})
+            parts = []
+            try:
+                for token in qa_stream.tokens:
+                    parts.append(token)
+                    yield format_sse("token", {"text": token})
+            except Exception as exc:  # noqa: BLE001
+                yield format_sse("error", {"error": f"Failed to generate answer: {exc}"})
+                return
+            yield format_sse("done", {"answer": "".join(parts)})
 
-        if not contexts:
-            return jsonify({"error": "No relevant context found"}), HTTPStatus.NOT_FOUND
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-        settings = _get_settings()
-        try:
-            answer = answer_question(question, contexts, model_name=settings.gemini_model)
-        except Exception as exc:  # noqa: BLE001
-            return jsonify({"error": f"Failed to generate answer: {exc}"}), HTTPStatus.INTERNAL_SERVER_ERROR
+    @bp.post("/qa/batch")
+    def ask_batch() -> Any:
+        items, error = _parse_batch_request()
+        if error:
+            return error
+        qa_pipeline = _get_qa_pipeline()
+
+        def events() -> Iterator[str]:
+            failed = 0
+            for index, outcome in qa_pipeline.ask_many(items):
+                question = items[index].question
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    status = HTTPStatus.INTERNAL_SERVER_ERROR
+                    if isinstance(outcome, NoContextError):
+                        status = HTTPStatus.NOT_FOUND
+                    yield format_sse(
+                        "error",
+                        {"index": index, "question": question, "error": str(outcome), "status": int(status)},
+                    )
+                else:
+                    yield format_sse("result", {"index": index, "question": question, **outcome.to_dict()})
+            yield format_sse("done", {"count": len(items), "failed": failed})
 
-        return jsonify({"answer": answer, "matches": matches}), HTTPStatus.OK
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
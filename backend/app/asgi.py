@@ -0,0 +1,401 @@
+"""ASGI application: asynchronous question answering and uploads, Flask for the rest.
+
+``POST /api/qa``, ``POST /api/qa/stream`` and ``POST /api/documents`` are
+served on the event loop. While an answer is being generated the request
+holds no thread, only a coroutine awaiting the LLM client, so concurrent
+sessions are bounded by ``LLM_MAX_IN_FLIGHT`` and ``WEB_LIMIT_CONCURRENCY`` rather
+than by a thread pool. Retrieval and database lookups run on a pool of
+``CPU_THREADS`` threads. Every other request goes to the Flask app on a pool
+of ``WSGI_THREADS`` threads, with its usual routing and error handlers.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from . import create_app
+from .api.routes import enqueue_upload, format_sse, parse_qa_payload
+from .config import Settings
+from .services.qa_pipeline import NoContextError, QAPipeline
+from .services.telemetry import HTTP_REQUEST_SECONDS, current_trace, end_trace, run_in_executor, start_trace
+from .services.upload_stream import InvalidUpload, PdfUploadStream, UploadTooLarge
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+Headers = List[Tuple[bytes, bytes]]
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+]
+# Flask's defaults for form fields held in memory and for the number of parts.
+MAX_FORM_MEMORY = 500_000
+MAX_FORM_PARTS = 1000
+
+
+class HTTPError(Exception):
+    """Stop handling a native request and answer with ``{"error": message}``."""
+
+    def __init__(self, message: str, status: HTTPStatus):
+        super().__init__(message)
+        self.status = status
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its request body was read."""
+
+
+# The undecorated body of WsgiToAsgiInstance.run_wsgi_app.
+_RUN_WSGI_APP = WsgiToAsgiInstance.__dict__["run_wsgi_app"].func
+
+
+class _ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs WSGI apps thread-sensitively, i.e. one request at a time on
+    # a single thread; Flask is thread-safe, so use a pool instead.
+    def __init__(self, wsgi_application: Any, executor: ThreadPoolExecutor):
+        super().__init__(wsgi_application)
+        self._executor = executor
+
+    async def run_wsgi_app(self, body: Any) -> None:
+        run = sync_to_async(_RUN_WSGI_APP, thread_sensitive=False, executor=self._executor)
+        await run(self, body)
+
+
+class _ThreadPoolWsgi(WsgiToAsgi):
+    def __init__(self, wsgi_application: Any, executor: ThreadPoolExecutor):
+        super().__init__(wsgi_application)
+        self._executor = executor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await _ThreadPoolWsgiInstance(self.wsgi_application, self._executor)(scope, receive, send)
+
+
+class AsyncApi:
+    """ASGI callable serving the I/O-bound routes natively and delegating the rest to Flask."""
+
+    def __init__(self, flask_app: Flask):
+        self._flask = flask_app
+        self._settings: Settings = flask_app.config["APP_SETTINGS"]
+        self._cpu = ThreadPoolExecutor(max_workers=max(1, self._settings.cpu_threads), thread_name_prefix="asgi-cpu")
+        self._wsgi_pool = ThreadPoolExecutor(
+            max_workers=max(1, self._settings.wsgi_threads), thread_name_prefix="asgi-wsgi"
+        )
+        self._wsgi = _ThreadPoolWsgi(flask_app, self._wsgi_pool)
+        self._routes: Dict[Tuple[str, str], Callable[[Scope, Receive, Send], Awaitable[None]]] = {
+            ("POST", "/api/qa"): self._ask,
+            ("POST", "/api/qa/stream"): self._stream,
+            ("POST", "/api/documents"): self._upload,
+        }
+
+    @property
+    def flask_app(self) -> Flask:
+        return self._flask
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        handler = self._routes.get((scope.get("method", ""), scope.get("path", ""))) if scope["type"] == "http" else None
+        if handler is None:
+            await self._wsgi(scope, receive, send)
+            return
+
+        token = start_trace()
+        started = time.perf_counter()
+        responder = _Responder(send, self._flask, self._cors_headers(scope))
+        try:
+            await handler(scope, receive, responder)
+        except HTTPError as exc:
+            await responder.error(str(exc), exc.status)
+        except ClientDisconnected:
+            pass
+        except Exception:  # noqa: BLE001
+            logger.exception("Unexpected server error")
+            await responder.error("Internal server error", HTTPStatus.INTERNAL_SERVER_ERROR)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                endpoint=scope["path"],
+                status=str(responder.status or HTTPStatus.INTERNAL_SERVER_ERROR.value),
+            )
+            end_trace(token)
+
+    async def _ask(self, scope: Scope, receive: Receive, responder: "_Responder") -> None:
+        question, document_filter, top_k = await self._qa_request(scope, receive)
+        try:
+            result = await self._qa_pipeline.ask_async(question, document_filter, top_k, executor=self._cpu)
+        except NoContextError as exc:
+            raise HTTPError(str(exc), HTTPStatus.NOT_FOUND) from exc
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPError(f"Failed to generate answer: {exc}", HTTPStatus.INTERNAL_SERVER_ERROR) from exc
+        await responder.json(result.to_dict(), HTTPStatus.OK)
+
+    async def _stream(self, scope: Scope, receive: Receive, responder: "_Responder") -> None:
+        question, document_filter, top_k = await self._qa_request(scope, receive)
+        try:
+            qa_stream = await self._qa_pipeline.stream_async(question, document_filter, top_k, executor=self._cpu)
+        except NoContextError as exc:
+            raise HTTPError(str(exc), HTTPStatus.NOT_FOUND) from exc
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPError(f"Failed to retrieve context: {exc}", HTTPStatus.INTERNAL_SERVER_ERROR) from exc
+
+        async def events() -> None:
+            await responder.start(HTTPStatus.OK, SSE_HEADERS)
+            await responder.chunk(format_sse("matches", {"matches": qa_stream.matches, "cache": qa_stream.cache}))
+            parts = []
+            try:
+                async for token in qa_stream.tokens:
+                    parts.append(token)
+                    await responder.chunk(format_sse("token", {"text": token}))
+            except Exception as exc:  # noqa: BLE001
+                await responder.chunk(format_sse("error", {"error": f"Failed to generate answer: {exc}"}))
+            else:
+                await responder.chunk(format_sse("done", {"answer": "".join(parts)}))
+            finally:
+                # Release the LLM slot now rather than whenever the generator is collected.
+                await qa_stream.tokens.aclose()
+            await responder.end()
+
+        # Stop generating, and paying for, tokens nobody will read.
+        producer = asyncio.ensure_future(events())
+        watcher = asyncio.ensure_future(_wait_for_disconnect(receive))
+        done, pending = await asyncio.wait({producer, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if producer in done:
+            producer.result()
+
+    async def _upload(self, scope: Scope, receive: Receive, responder: "_Responder") -> None:
+        upload, replaces = await self._receive_upload(scope, receive)
+        try:
+            job, problem = await run_in_executor(self._cpu, self._in_app_context, enqueue_upload, upload, replaces)
+        finally:
+            upload.stream.close()
+        if problem:
+            raise HTTPError(*problem)
+        location = self._flask.url_map.bind("").build("api.get_job", {"job_id": job.job_id})
+        await responder.json(job.to_dict(), HTTPStatus.ACCEPTED, [(b"location", location.encode())])
+
+    async def _qa_request(self, scope: Scope, receive: Receive) -> Tuple[str, Optional[List[str]], int]:
+        body = await _read_body(receive, self._flask.config.get("MAX_CONTENT_LENGTH"))
+        payload: Dict[str, Any] = {}
+        if _is_json(_header(scope, b"content-type")):
+            try:
+                decoded = json.loads(body or b"null")
+            except ValueError:
+                decoded = None
+            payload = decoded if isinstance(decoded, dict) else {}
+        parsed, problem = await run_in_executor(
+            self._cpu, self._in_app_context, parse_qa_payload, payload, self._settings
+        )
+        if problem:
+            raise HTTPError(*problem)
+        return parsed
+
+    async def _receive_upload(self, scope: Scope, receive: Receive) -> Tuple[FileStorage, Optional[str]]:
+        """Stream the multipart body into the PDF folder, validating the file as it arrives."""
+        content_length = _header(scope, b"content-length")
+        max_length = self._flask.config.get("MAX_CONTENT_LENGTH")
+        if content_length and max_length and content_length.isdigit() and int(content_length) > max_length:
+            raise HTTPError(RequestEntityTooLarge.description, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        mimetype, options = parse_options_header(_header(scope, b"content-type"))
+        boundary = options.get("boundary", "").encode()
+        if mimetype != "multipart/form-data" or not boundary:
+            raise HTTPError("file field is required", HTTPStatus.BAD_REQUEST)
+
+        decoder = MultipartDecoder(boundary, MAX_FORM_MEMORY, max_parts=MAX_FORM_PARTS)
+        upload: Optional[FileStorage] = None
+        fields: Dict[str, bytearray] = {}
+        target: Optional[Any] = None
+        received = 0
+        try:
+            more_body = True
+            while True:
+                event = decoder.next_event()
+                if isinstance(event, NeedData):
+                    if not more_body:
+                        raise HTTPError("file field is required", HTTPStatus.BAD_REQUEST)
+                    message = await receive()
+                    if message["type"] == "http.disconnect":
+                        raise ClientDisconnected()
+                    chunk = message.get("body", b"")
+                    received += len(chunk)
+                    if max_length and received > max_length:
+                        raise HTTPError(RequestEntityTooLarge.description, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                    more_body = message.get("more_body", False)
+                    if chunk:
+                        decoder.receive_data(chunk)
+                    if not more_body:
+                        decoder.receive_data(None)
+                elif isinstance(event, File):
+                    target = None
+                    if event.name == "file" and upload is None:
+                        if not event.filename or not event.filename.lower().endswith(".pdf"):
+                            raise HTTPError("Only PDF files are supported", HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+                        stream = PdfUploadStream(self._settings.pdf_dir, self._settings.max_upload_bytes)
+                        upload = FileStorage(stream=stream, filename=event.filename, name=event.name)
+                        target = stream
+                elif isinstance(event, Field):
+                    target = fields.setdefault(event.name, bytearray())
+                elif isinstance(event, Data):
+                    if isinstance(target, PdfUploadStream):
+                        # A slow disk must not stall every other request on the loop.
+                        await run_in_executor(self._cpu, target.write, event.data)
+                    elif target is not None:
+                        target.extend(event.data)
+                        if len(target) > MAX_FORM_MEMORY:
+                            raise RequestEntityTooLarge()
+                elif isinstance(event, Epilogue):
+                    break
+        except UploadTooLarge as exc:
+            _discard(upload)
+            raise HTTPError(str(exc), HTTPStatus.REQUEST_ENTITY_TOO_LARGE) from exc
+        except RequestEntityTooLarge as exc:
+            _discard(upload)
+            raise HTTPError(exc.description, HTTPStatus.REQUEST_ENTITY_TOO_LARGE) from exc
+        except InvalidUpload as exc:
+            _discard(upload)
+            raise HTTPError(str(exc), HTTPStatus.UNSUPPORTED_MEDIA_TYPE) from exc
+        except ValueError as exc:
+            # The decoder rejects malformed bodies with ValueError.
+            _discard(upload)
+            raise HTTPError(str(exc), HTTPStatus.BAD_REQUEST) from exc
+        except BaseException:
+            _discard(upload)
+            raise
+
+        if upload is None:
+            raise HTTPError("file field is required", HTTPStatus.BAD_REQUEST)
+        replaces = fields.get("document_id", bytearray()).decode("utf-8", "replace").strip() or None
+        return upload, replaces
+
+    @property
+    def _qa_pipeline(self) -> QAPipeline:
+        qa_pipeline = self._flask.config.get("QA_PIPELINE")
+        if not qa_pipeline:
+            raise RuntimeError("QA pipeline is not initialized")
+        return qa_pipeline
+
+    def _in_app_context(self, function: Callable[..., Any], *args: Any) -> Any:
+        with self._flask.app_context():
+            return function(*args)
+
+    def _cors_headers(self, scope: Scope) -> Headers:
+        origin = _header(scope, b"origin")
+        if not origin:
+            return []
+        if "*" in self._settings.cors_origins:
+            return [(b"access-control-allow-origin", b"*")]
+        if origin in self._settings.cors_origins:
+            return [(b"access-control-allow-origin", origin.encode()), (b"vary", b"Origin")]
+        return []
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def close(self) -> None:
+        self._cpu.shutdown(wait=False)
+        self._wsgi_pool.shutdown(wait=False)
+
+
+class _Responder:
+    """Sends one response, adding CORS and ``Server-Timing`` headers to its start."""
+
+    def __init__(self, send: Send, flask_app: Flask, extra_headers: Headers):
+        self._send = send
+        self._flask = flask_app
+        self._extra_headers = extra_headers
+        self.status: Optional[int] = None
+
+    async def start(self, status: HTTPStatus, headers: Iterable[Tuple[bytes, bytes]]) -> None:
+        self.status = int(status)
+        all_headers = list(headers) + self._extra_headers
+        trace = current_trace()
+        if trace is not None:
+            all_headers.append((b"server-timing", trace.server_timing().encode()))
+        await self._send({"type": "http.response.start", "status": self.status, "headers": all_headers})
+
+    async def chunk(self, text: str) -> None:
+        await self._send({"type": "http.response.body", "body": text.encode(), "more_body": True})
+
+    async def end(self) -> None:
+        await self._send({"type": "http.response.body", "body": b""})
+
+    async def json(self, payload: Dict[str, Any], status: HTTPStatus, headers: Headers = ()) -> None:
+        body = (self._flask.json.dumps(payload) + "\n").encode()
+        await self.start(
+            status,
+            [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+        )
+        await self._send({"type": "http.response.body", "body": body})
+
+    async def error(self, message: str, status: HTTPStatus) -> None:
+        if self.status is not None:
+            # Headers are out; all that is left is to end the body.
+            return
+        await self.json({"error": message}, status)
+
+
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope.get("headers", ()):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _is_json(content_type: str) -> bool:
+    mimetype, _ = parse_options_header(content_type)
+    return mimetype == "application/json" or (mimetype.startswith("application/") and mimetype.endswith("+json"))
+
+
+async def _read_body(receive: Receive, max_length: Optional[int]) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected()
+        body += message.get("body", b"")
+        if max_length and len(body) > max_length:
+            raise HTTPError(RequestEntityTooLarge.description, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+async def _wait_for_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def _discard(upload: Optional[FileStorage]) -> None:
+    if upload is not None:
+        upload.stream.close()
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None) -> AsyncApi:
+    """Build the ASGI app; ``uvicorn --factory app.asgi:create_asgi_app`` calls this per worker."""
+    return AsyncApi(flask_app or create_app())
@@ -21,17 +21,85 @@ class Settings:
     summary_dir: Path = field(init=False)
     vector_store_dir: Path = field(init=False)
     metadata_dir: Path = field(init=False)
+    embedding_cache_dir: Path = field(init=False)
+    summary_cache_dir: Path = field(init=False)
+    profile_dir: Path = field(init=False)
+    metrics_dir: Path = field(init=False)
     cors_origins: Tuple[str, ...] = field(default_factory=lambda: _parse_origins(os.getenv("CORS_ORIGINS", "*")))
     debug: bool = os.getenv("FLASK_DEBUG", "false").lower() == "true"
     chunk_size: int = int(os.getenv("CHUNK_SIZE", "1200"))
     chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "200"))
+    chunk_tokens: int = int(os.getenv("CHUNK_TOKENS", "224"))
+    chunk_overlap_tokens: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
     top_k: int = int(os.getenv("TOP_K", "3"))
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+    retrieval_candidates_factor: int = int(os.getenv("RETRIEVAL_CANDIDATES_FACTOR", "4"))
+    retrieval_rrf_k: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "20"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+    context_dedup_threshold: float = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    vector_dtype: str = os.getenv("VECTOR_DTYPE", "float32").lower()
+    vector_exact_max_rows: int = int(os.getenv("VECTOR_EXACT_MAX_ROWS", "50000"))
+    vector_ivf_nprobe: int = int(os.getenv("VECTOR_IVF_NPROBE", "8"))
+    documents_page_size: int = int(os.getenv("DOCUMENTS_PAGE_SIZE", "100"))
+    documents_page_max: int = int(os.getenv("DOCUMENTS_PAGE_MAX", "500"))
+    document_list_cache_size: int = int(os.getenv("DOCUMENT_LIST_CACHE_SIZE", "256"))
+    qa_batch_concurrency: int = int(os.getenv("QA_BATCH_CONCURRENCY", "8"))
+    qa_batch_max_questions: int = int(os.getenv("QA_BATCH_MAX_QUESTIONS", "500"))
     mysql_user: str = os.getenv("MYSQL_USER", "chat_user")
     mysql_password: str = os.getenv("MYSQL_PASSWORD", "chat_password")
     mysql_host: str = os.getenv("MYSQL_HOST", "db")
     mysql_port: int = int(os.getenv("MYSQL_PORT", "3306"))
     mysql_database: str = os.getenv("MYSQL_DATABASE", "chatyournotes")
+    database_url: str = os.getenv("DATABASE_URL", "")
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    llm_backend: str = os.getenv("LLM_BACKEND", "gemini")
+    llm_max_in_flight: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    llm_requests_per_minute: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "600"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    llm_hedge_after_ms: float = float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+    max_upload_bytes: int = int(float(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024)
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "2"))
+    ingest_queue_size: int = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+    job_heartbeat_seconds: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+    job_stale_seconds: float = float(os.getenv("JOB_STALE_SECONDS", "60"))
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_memory_entries: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "20000"))
+    embedding_cache_max_rows: int = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "500000"))
+    embedding_max_batch_size: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+    embedding_max_wait_ms: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+    warm_up: bool = os.getenv("WARM_UP", "true").lower() == "true"
+    host: str = os.getenv("HOST", "0.0.0.0")
+    port: int = int(os.getenv("PORT", "8000"))
+    web_workers: int = int(os.getenv("WEB_WORKERS", "1"))
+    # Not WEB_CONCURRENCY: uvicorn and gunicorn read that one as the number of worker processes.
+    web_limit_concurrency: int = int(os.getenv("WEB_LIMIT_CONCURRENCY", "512"))
+    wsgi_threads: int = int(os.getenv("WSGI_THREADS", "32"))
+    cpu_threads: int = int(os.getenv("CPU_THREADS", str(min(8, os.cpu_count() or 1))))
+    # "auto" shares one index service between workers when WEB_WORKERS > 1; "on" always does,
+    # "external" connects to one started separately and "off" keeps everything in-process.
+    index_service: str = os.getenv("INDEX_SERVICE", "auto").lower()
+    index_service_socket: Path = field(init=False)
+    index_service_connect_timeout: float = float(os.getenv("INDEX_SERVICE_CONNECT_TIMEOUT", "30"))
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    profile_slow_ms: float = float(os.getenv("PROFILE_SLOW_MS", "0"))
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+    profile_keep: int = int(os.getenv("PROFILE_KEEP", "50"))
+    answer_cache_enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    answer_cache_size: int = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    answer_cache_ttl_seconds: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    answer_cache_similarity: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97"))
+    summary_jobs: int = int(os.getenv("SUMMARY_JOBS", "2"))
+    summary_workers: int = int(os.getenv("SUMMARY_WORKERS", "4"))
+    summary_group_chars: int = int(os.getenv("SUMMARY_GROUP_CHARS", "12000"))
+    ocr_workers: int = int(os.getenv("OCR_WORKERS", "0"))
+    ocr_pages_per_task: int = int(os.getenv("OCR_PAGES_PER_TASK", "4"))
 
     def __post_init__(self) -> None:
         base_data = Path(os.getenv("DATA_DIR", self._root / "data"))
@@ -41,6 +109,11 @@ class Settings:
         self.summary_dir = base_data / "summaries"
         self.vector_store_dir = base_data / "vector_store"
         self.metadata_dir = base_data / "metadata"
+        self.embedding_cache_dir = base_data / "embedding_cache"
+        self.summary_cache_dir = base_data / "summary_cache"
+        self.profile_dir = base_data / "profiles"
+        self.metrics_dir = base_data / "run" / "metrics"
+        self.index_service_socket = Path(os.getenv("INDEX_SERVICE_SOCKET", base_data / "run" / "index.sock"))
 
     def ensure_directories(self) -> None:
         """Ensure the data folder hierarchy exists."""
@@ -51,6 +124,8 @@ class Settings:
             self.summary_dir,
             self.vector_store_dir,
             self.metadata_dir,
+            self.embedding_cache_dir,
+            self.summary_cache_dir,
         ):
             path.mkdir(parents=True, exist_ok=True)
 
@@ -61,11 +136,22 @@ class Settings:
             "ENV": "development" if self.debug else "production",
             "SQLALCHEMY_DATABASE_URI": self.database_uri,
             "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+            # Headroom for the multipart framing and form fields around the PDF itself.
+            "MAX_CONTENT_LENGTH": self.max_upload_bytes + 64 * 1024,
         }
 
+    @property
+    def uses_index_service(self) -> bool:
+        """Whether web workers reach the models and indexes through the shared index service."""
+        if self.index_service == "auto":
+            return self.web_workers > 1
+        return self.index_service in ("on", "external")
+
     @property
     def database_uri(self) -> str:
-        """Construct the SQLAlchemy URI for the MySQL database."""
+        """Construct the SQLAlchemy URI for the MySQL database, unless ``DATABASE_URL`` overrides it."""
+        if self.database_url:
+            return self.database_url
         return (
             f"mysql+pymysql://{self.mysql_user}:{self.mysql_password}"
             f"@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}"
@@ -1,6 +1,7 @@
 """Centralized error handlers for predictable API responses."""
 
 from flask import Flask, jsonify
+from werkzeug.exceptions import HTTPException
 
 
 def register_error_handlers(app: Flask) -> None:
@@ -10,6 +11,11 @@ def register_error_handlers(app: Flask) -> None:
     def handle_not_found(_: Exception):
         return jsonify({"error": "Resource not found"}), 404
 
+    @app.errorhandler(413)
+    @app.errorhandler(415)
+    def handle_rejected_upload(error: HTTPException):
+        return jsonify({"error": error.description}), error.code
+
     @app.errorhandler(500)
     def handle_server_error(error: Exception):
         app.logger.exception("Unexpected server error", exc_info=error)
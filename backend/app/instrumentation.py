@@ -0,0 +1,225 @@
+"""Request timing, Prometheus metrics and sampled profiling of slow requests."""
+
+import cProfile
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from flask import Flask, Response, g, request
+
+from .config import Settings
+from .services.components import READY
+from .services.telemetry import (
+    HTTP_REQUEST_SECONDS,
+    REGISTRY,
+    Family,
+    WorkerMetrics,
+    current_trace,
+    end_trace,
+    start_trace,
+)
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class SlowRequestProfiler:
+    """Profile a sample of requests and keep the profiles of those that turn out slow.
+
+    Only one profiler can be active in a process, so a sampled request that
+    arrives while another is being profiled is simply not profiled. At most
+    ``keep`` ``.prof`` files are kept in ``directory``; the oldest go first.
+    """
+
+    def __init__(self, directory: Path, slow_ms: float, sample_rate: float, keep: int):
+        self._directory = directory
+        self._slow_seconds = slow_ms / 1000
+        self._sample_rate = sample_rate
+        self._keep = max(1, keep)
+        self._busy = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if random.random() >= self._sample_rate or not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except (RuntimeError, ValueError):
+            # Another profiler (a debugger or coverage tool) owns the hook.
+            self._busy.release()
+            return None
+        return profiler
+
+    def finish(self, profiler: cProfile.Profile, seconds: float, label: str) -> Optional[Path]:
+        profiler.disable()
+        self._busy.release()
+        if seconds < self._slow_seconds:
+            return None
+        self._directory.mkdir(parents=True, exist_ok=True)
+        slug = "".join(char if char.isalnum() else "_" for char in label).strip("_") or "request"
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        path = self._directory / f"{stamp}-{int(seconds * 1000)}ms-{slug}-{uuid4().hex[:8]}.prof"
+        profiler.dump_stats(str(path))
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        profiles = sorted(self._directory.glob("*.prof"), key=lambda path: path.stat().st_mtime)
+        for path in profiles[: max(0, len(profiles) - self._keep)]:
+            path.unlink(missing_ok=True)
+
+
+def register_instrumentation(app: Flask, settings: Settings) -> None:
+    """Time every request, add ``Server-Timing`` headers and serve ``/metrics``.
+
+    The recorded duration ends when the response headers are ready, so
+    streamed answers count their time to first byte; their generation
+    stages still land in the stage histogram as they finish.
+    """
+    profiler = None
+    if settings.profile_slow_ms > 0 and settings.profile_sample_rate > 0:
+        profiler = SlowRequestProfiler(
+            settings.profile_dir,
+            settings.profile_slow_ms,
+            settings.profile_sample_rate,
+            settings.profile_keep,
+        )
+
+    @app.before_request
+    def start_request_trace() -> None:
+        g.trace_token = start_trace()
+        g.request_started = time.perf_counter()
+        g.profile = profiler.start() if profiler else None
+
+    @app.after_request
+    def finish_request_trace(response: Response) -> Response:
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(seconds, method=request.method, endpoint=endpoint, status=str(response.status_code))
+
+        trace = current_trace()
+        if trace is not None:
+            response.headers["Server-Timing"] = trace.server_timing()
+
+        profile = g.pop("profile", None)
+        if profile is not None and profiler is not None:
+            path = profiler.finish(profile, seconds, f"{request.method} {request.path}")
+            if path:
+                app.logger.warning(
+                    "Slow request %s %s took %.0f ms; profile saved to %s",
+                    request.method,
+                    request.path,
+                    seconds * 1000,
+                    path,
+                )
+        return response
+
+    @app.teardown_request
+    def end_request_trace(_: Optional[BaseException]) -> None:
+        profile = g.pop("profile", None)
+        if profile is not None and profiler is not None:
+            # The request failed before a response was made; discard its profile.
+            profiler.finish(profile, 0.0, "")
+        token = g.pop("trace_token", None)
+        if token is not None:
+            end_trace(token)
+
+    if settings.metrics_enabled:
+        REGISTRY.clear_collectors()
+        REGISTRY.add_collector(lambda: collect_app_stats(app))
+        render = REGISTRY.render
+        if settings.web_workers > 1 or settings.uses_index_service:
+            worker_metrics = WorkerMetrics(settings.metrics_dir)
+            worker_metrics.start()
+            render = worker_metrics.render
+
+        @app.get("/metrics")
+        def metrics() -> Response:
+            return Response(render(), mimetype=METRICS_CONTENT_TYPE)
+
+
+def collect_app_stats(app: Flask) -> Iterable[Family]:
+    """Report the counters services already keep as Prometheus families."""
+    config = app.config
+    embedder = config.get("EMBEDDING_SERVICE")
+    cache_stats = embedder.cache_stats() if embedder else None
+    if cache_stats:
+        yield (
+            "chatyournotes_embedding_cache_lookups_total",
+            "counter",
+            "Embedding cache lookups, by result.",
+            [({"result": "hit"}, cache_stats["hits"]), ({"result": "miss"}, cache_stats["misses"])],
+        )
+    if embedder:
+        scheduler = embedder.scheduler_stats()
+        yield (
+            "chatyournotes_embedding_batches_total",
+            "counter",
+            "Model encode calls made by the embedding scheduler.",
+            [({}, scheduler["batches"])],
+        )
+        yield (
+            "chatyournotes_embedded_texts_total",
+            "counter",
+            "Texts encoded by the embedding model.",
+            [({}, scheduler["encoded_texts"])],
+        )
+
+    qa_pipeline = config.get("QA_PIPELINE")
+    answer_cache = qa_pipeline.answer_cache if qa_pipeline else None
+    if answer_cache:
+        stats = answer_cache.stats()
+        yield (
+            "chatyournotes_answer_cache_lookups_total",
+            "counter",
+            "Answer cache lookups, by result.",
+            [
+                ({"result": "exact_hit"}, stats["exact_hits"]),
+                ({"result": "semantic_hit"}, stats["semantic_hits"]),
+                ({"result": "miss"}, stats["misses"]),
+            ],
+        )
+    document_list_cache = config.get("DOCUMENT_LIST_CACHE")
+    if document_list_cache:
+        stats = document_list_cache.stats()
+        yield (
+            "chatyournotes_document_list_cache_lookups_total",
+            "counter",
+            "Document list cache lookups, by result.",
+            [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])],
+        )
+
+    llm_client = config.get("LLM_CLIENT")
+    if llm_client:
+        models = llm_client.stats()["models"]
+        for name, key, documentation in (
+            ("chatyournotes_llm_calls_total", "calls", "LLM calls, by model."),
+            ("chatyournotes_llm_failures_total", "failures", "LLM calls that failed after retries, by model."),
+            ("chatyournotes_llm_retries_total", "retries", "LLM call retries, by model."),
+        ):
+            yield name, "counter", documentation, [({"model": model}, stats[key]) for model, stats in models.items()]
+        yield (
+            "chatyournotes_llm_tokens_total",
+            "counter",
+            "LLM tokens, by model and direction.",
+            [
+                ({"model": model, "direction": direction}, stats[f"{direction}_tokens"])
+                for model, stats in models.items()
+                for direction in ("prompt", "output")
+            ],
+        )
+
+    components = config.get("COMPONENTS")
+    if components:
+        _, report = components.report()
+        yield (
+            "chatyournotes_component_ready",
+            "gauge",
+            "Whether each component is loaded and ready (1) or not (0).",
+            [({"component": name}, 1 if status["state"] == READY else 0) for name, status in report.items()],
+        )
@@ -1,33 +1,100 @@
 """Database models for the ChatYourNotes backend."""
 
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional, Sequence
 
 from .extensions import db
 
+SUMMARY_PENDING = "pending"
+SUMMARY_READY = "ready"
+SUMMARY_FAILED = "failed"
+
+DOCUMENT_FIELDS = (
+    "document_id",
+    "content_hash",
+    "original_filename",
+    "stored_pdf",
+    "text_path",
+    "summary_path",
+    "summary_preview",
+    "summary_status",
+    "chunk_count",
+    "page_count",
+    "stage_timings",
+    "uploaded_at",
+)
+
 
 class Document(db.Model):
     __tablename__ = "documents"
+    # Matches the newest-first keyset order of the document list.
+    __table_args__ = (db.Index("ix_documents_uploaded_at_id", "uploaded_at", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     document_id = db.Column(db.String(64), unique=True, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
     original_filename = db.Column(db.String(255), nullable=False)
     stored_pdf = db.Column(db.String(255), nullable=False)
     text_path = db.Column(db.String(255), nullable=False)
-    summary_path = db.Column(db.String(255), nullable=False)
+    summary_path = db.Column(db.String(255), nullable=True)
     summary_preview = db.Column(db.Text, nullable=True)
+    summary_status = db.Column(db.String(16), nullable=False, default=SUMMARY_PENDING, index=True)
     chunk_count = db.Column(db.Integer, nullable=False, default=0)
+    page_count = db.Column(db.Integer, nullable=False, default=0)
+    stage_timings = db.Column(db.JSON, nullable=True)
+    # Heartbeat of the process generating the summary; a stale one may be taken over.
+    summary_claimed_at = db.Column(db.DateTime, nullable=True)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    def to_dict(self, fields: Optional[Sequence[str]] = None) -> Dict[str, object]:
+        """Serialize the document metadata for API responses, limited to ``fields`` if given."""
+        data: Dict[str, object] = {}
+        for name in fields or DOCUMENT_FIELDS:
+            value = getattr(self, name)
+            if name == "stage_timings":
+                value = value or {}
+            elif name == "uploaded_at":
+                value = value.isoformat()
+            data[name] = value
+        return data
+
+
+class CollectionVersion(db.Model):
+    """Counter bumped in the same transaction as every write to a collection."""
+
+    __tablename__ = "collection_versions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IngestionJob(db.Model):
+    __tablename__ = "ingestion_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(64), unique=True, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="queued", index=True)
+    stage = db.Column(db.String(32), nullable=True)
+    document_id = db.Column(db.String(64), nullable=False)
+    upload_id = db.Column(db.String(64), nullable=False)
+    is_revision = db.Column(db.Boolean, nullable=False, default=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    stored_pdf = db.Column(db.String(255), nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
     def to_dict(self) -> Dict[str, object]:
-        """Serialize the document metadata for API responses."""
+        """Serialize the job state for API responses."""
         return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
             "document_id": self.document_id,
+            "is_revision": self.is_revision,
             "original_filename": self.original_filename,
-            "stored_pdf": self.stored_pdf,
-            "text_path": self.text_path,
-            "summary_path": self.summary_path,
-            "summary_preview": self.summary_preview,
-            "chunk_count": self.chunk_count,
-            "uploaded_at": self.uploaded_at.isoformat(),
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
         }
@@ -0,0 +1,125 @@
+"""Bring tables created by an older release up to the current models.
+
+``db.create_all`` only creates missing tables. For tables that already
+exist, :func:`upgrade_schema` adds missing columns, drops ``NOT NULL`` where a
+model column has become nullable and creates missing indexes. Every step
+checks the live schema first, so running it on each start is a no-op once
+the database is current. :func:`prepare_database` runs every start-up step
+that the web app and the bulk ingestion command share.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import Column, MetaData, Table, inspect
+from sqlalchemy.engine import Connection, Engine
+
+from .extensions import db
+from .models import SUMMARY_READY
+from .services import document_store
+
+logger = logging.getLogger(__name__)
+
+# Values for existing rows when a NOT NULL column is added, where the model
+# default would be wrong for them: documents from before background
+# summaries always had their summary written during ingestion.
+BACKFILL: Dict[Tuple[str, str], Any] = {("documents", "summary_status"): SUMMARY_READY}
+
+
+def prepare_database() -> None:
+    """Create, upgrade and seed the database for the current app context."""
+    db.create_all()
+    # create_all skips tables that already exist, so add columns and indexes introduced since.
+    upgrade_schema(db.engine, db.metadata)
+    document_store.ensure_documents_version()
+
+
+def upgrade_schema(engine: Engine, metadata: MetaData) -> None:
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            _add_missing_columns(connection, table, {column["name"] for column in inspector.get_columns(table.name)})
+            inspector = inspect(connection)
+            relaxed = _relaxed_columns(table, inspector.get_columns(table.name))
+            if relaxed:
+                _drop_not_null(connection, table, relaxed)
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
+def _add_missing_columns(connection: Connection, table: Table, present: set) -> None:
+    dialect = connection.dialect
+    for column in table.columns:
+        if column.name in present:
+            continue
+        ddl = f"ALTER TABLE {_quote(connection, table.name)} ADD COLUMN {_quote(connection, column.name)} "
+        ddl += column.type.compile(dialect=dialect)
+        if not column.nullable:
+            value = BACKFILL.get((table.name, column.name), _scalar_default(column))
+            if value is None:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+            ddl += f" NOT NULL DEFAULT {_literal(connection, column, value)}"
+        logger.info("Adding column %s.%s", table.name, column.name)
+        connection.exec_driver_sql(ddl)
+
+
+def _relaxed_columns(table: Table, reflected: List[Dict[str, Any]]) -> List[Column]:
+    not_null = {column["name"] for column in reflected if not column["nullable"]}
+    return [column for column in table.columns if column.nullable and not column.primary_key and column.name in not_null]
+
+
+def _drop_not_null(connection: Connection, table: Table, columns: List[Column]) -> None:
+    dialect = connection.dialect
+    names = ", ".join(column.name for column in columns)
+    logger.info("Allowing NULL in %s: %s", table.name, names)
+    if dialect.name == "sqlite":
+        _rebuild_sqlite_table(connection, table)
+        return
+    for column in columns:
+        if dialect.name == "mysql":
+            ddl = (
+                f"ALTER TABLE {_quote(connection, table.name)} MODIFY {_quote(connection, column.name)} "
+                f"{column.type.compile(dialect=dialect)} NULL"
+            )
+        else:
+            ddl = (
+                f"ALTER TABLE {_quote(connection, table.name)} ALTER COLUMN {_quote(connection, column.name)} "
+                "DROP NOT NULL"
+            )
+        connection.exec_driver_sql(ddl)
+
+
+def _rebuild_sqlite_table(connection: Connection, table: Table) -> None:
+    """SQLite cannot change a column's constraints, so copy the rows into a freshly created table."""
+    old_name = f"_{table.name}_old"
+    inspector = inspect(connection)
+    for index in inspector.get_indexes(table.name):
+        connection.exec_driver_sql(f"DROP INDEX {_quote(connection, index['name'])}")
+    connection.exec_driver_sql(f"ALTER TABLE {_quote(connection, table.name)} RENAME TO {_quote(connection, old_name)}")
+    table.create(connection)
+    columns = ", ".join(_quote(connection, column.name) for column in table.columns)
+    connection.exec_driver_sql(
+        f"INSERT INTO {_quote(connection, table.name)} ({columns}) SELECT {columns} FROM {_quote(connection, old_name)}"
+    )
+    connection.exec_driver_sql(f"DROP TABLE {_quote(connection, old_name)}")
+
+
+def _scalar_default(column: Column) -> Any:
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    return default.arg
+
+
+def _literal(connection: Connection, column: Column, value: Any) -> str:
+    processor = column.type.literal_processor(connection.dialect)
+    return processor(value) if processor else repr(value)
+
+
+def _quote(connection: Connection, name: str) -> str:
+    return connection.dialect.identifier_preparer.quote(name)
@@ -0,0 +1,180 @@
+"""In-process cache of generated answers for repeated questions."""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DocumentFilter = Optional[Tuple[str, ...]]
+ExactKey = Tuple[str, DocumentFilter, int]
+ChunkSetKey = Tuple[DocumentFilter, int, FrozenSet[str]]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    matches: List[Dict[str, Any]]
+    question_embedding: Optional[np.ndarray]
+    chunk_ids: FrozenSet[str]
+    document_ids: FrozenSet[str]
+    retrieval_seconds: float
+    generation_seconds: float
+    expires_at: float
+
+
+class AnswerCache:
+    """LRU cache with TTL for answers, matched exactly or by question similarity.
+
+    Exact hits match the normalized question, document filter and ``top_k``.
+    Semantic hits additionally require the same retrieved chunk set and a
+    question embedding whose cosine similarity reaches ``similarity_threshold``.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0, similarity_threshold: float = 0.97):
+        self._max_entries = max(max_entries, 1)
+        self._ttl = ttl_seconds
+        self._threshold = similarity_threshold
+        self._entries: "OrderedDict[ExactKey, CachedAnswer]" = OrderedDict()
+        self._by_chunk_set: Dict[ChunkSetKey, List[ExactKey]] = {}
+        self._lock = threading.Lock()
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        normalized = unicodedata.normalize("NFKC", question).casefold()
+        return _WHITESPACE.sub(" ", normalized).strip().rstrip("?？!！.。 ")
+
+    @staticmethod
+    def make_filter(document_ids: Optional[Sequence[str]]) -> DocumentFilter:
+        return tuple(sorted(set(document_ids))) if document_ids else None
+
+    def get_exact(self, question: str, document_filter: DocumentFilter, top_k: int) -> Optional[CachedAnswer]:
+        key = (self.normalize_question(question), document_filter, top_k)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self._exact_hits += 1
+            self._saved_seconds += entry.retrieval_seconds + entry.generation_seconds
+            return entry
+
+    def get_semantic(
+        self,
+        question_embedding: np.ndarray,
+        chunk_ids: FrozenSet[str],
+        document_filter: DocumentFilter,
+        top_k: int,
+    ) -> Optional[CachedAnswer]:
+        """Find an answer for a similar question that retrieved the same chunks."""
+        best: Optional[CachedAnswer] = None
+        with self._lock:
+            if self._threshold > 0:
+                best_score = self._threshold
+                for key in list(self._by_chunk_set.get((document_filter, top_k, chunk_ids), ())):
+                    entry = self._live_entry(key)
+                    if entry is None or entry.question_embedding is None:
+                        continue
+                    score = float(np.dot(entry.question_embedding, question_embedding))
+                    if score >= best_score:
+                        best, best_score = entry, score
+            if best is None:
+                self._misses += 1
+                return None
+            self._semantic_hits += 1
+            self._saved_seconds += best.generation_seconds
+            return best
+
+    def put(
+        self,
+        question: str,
+        document_filter: DocumentFilter,
+        top_k: int,
+        *,
+        answer: str,
+        matches: List[Dict[str, Any]],
+        question_embedding: Optional[np.ndarray],
+        retrieval_seconds: float,
+        generation_seconds: float,
+    ) -> None:
+        key = (self.normalize_question(question), document_filter, top_k)
+        chunk_ids = frozenset(str(match.get("id")) for match in matches)
+        entry = CachedAnswer(
+            answer=answer,
+            matches=matches,
+            question_embedding=question_embedding,
+            chunk_ids=chunk_ids,
+            document_ids=frozenset(str(match.get("document_id")) for match in matches),
+            retrieval_seconds=retrieval_seconds,
+            generation_seconds=generation_seconds,
+            expires_at=time.monotonic() + self._ttl,
+        )
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_chunk_set.setdefault((document_filter, top_k, chunk_ids), []).append(key)
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_document(self, document_id: str) -> int:
+        """Drop answers that used the document or could now retrieve it."""
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if key[1] is None or document_id in key[1] or document_id in entry.document_ids
+            ]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_chunk_set.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            hits = self._exact_hits + self._semantic_hits
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "saved_seconds": round(self._saved_seconds, 3),
+            }
+
+    def _live_entry(self, key: ExactKey) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: ExactKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        group_key = (key[1], key[2], entry.chunk_ids)
+        group = self._by_chunk_set.get(group_key)
+        if group is not None:
+            if key in group:
+                group.remove(key)
+            if not group:
+                del self._by_chunk_set[group_key]
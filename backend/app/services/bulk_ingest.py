@@ -0,0 +1,303 @@
+"""Offline ingestion of whole PDF folders with a process pool and batched indexing."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .chunker import Chunker, TokenCounter
+from .document_store import list_content_hashes
+from .file_handler import COPY_BUFFER_SIZE
+from .ocr_service import ExtractionStats, OCRReader
+from .pipeline_service import ExtractedPdf, PipelineService
+
+logger = logging.getLogger(__name__)
+
+STATUS_INDEXED = "indexed"
+STATUS_DUPLICATE = "duplicate"
+STATUS_FAILED = "failed"
+
+ProgressCallback = Callable[["BulkIngestStats"], None]
+
+
+def discover_pdfs(source: Path) -> List[Path]:
+    """List the PDFs under a directory, or the paths named in a manifest file.
+
+    A manifest holds one path per line, relative to the manifest's folder;
+    blank lines and lines starting with ``#`` are ignored.
+    """
+    if source.is_dir():
+        return sorted(path for path in source.rglob("*") if path.is_file() and path.suffix.lower() == ".pdf")
+    paths = []
+    for line in source.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            paths.append((source.parent / line).resolve())
+    return paths
+
+
+@dataclass
+class BulkIngestStats:
+    files: int = 0
+    indexed: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    skipped: int = 0
+    pages: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "indexed": self.indexed,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "pages_per_second": round(self.pages_per_second, 2),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+        }
+
+
+class IngestCheckpoint:
+    """Append-only JSON lines log of finished files, so an interrupted run can resume.
+
+    Files are recorded only once their outcome is durable: indexed files
+    after their batch is committed, duplicates and failures right away.
+    Failed files are retried by the next run.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._finished: Set[str] = set()
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write.
+                    continue
+                if entry.get("status") in (STATUS_INDEXED, STATUS_DUPLICATE):
+                    self._finished.add(entry["source"])
+                else:
+                    self._finished.discard(entry["source"])
+        self._handle = path.open("a", encoding="utf-8")
+
+    def is_finished(self, source: Path) -> bool:
+        return str(source) in self._finished
+
+    def record(self, entries: Iterable[Dict[str, object]]) -> None:
+        for entry in entries:
+            self._handle.write(json.dumps(entry) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+# Worker process state, set up once per process by ``_init_worker``.
+_worker_chunker: Optional[Chunker] = None
+_worker_reader: Optional[OCRReader] = None
+_worker_known: Set[str] = set()
+
+
+def _init_worker(max_tokens: int, overlap_tokens: int, tokenizer: Optional[str], known_hashes: Set[str]) -> None:
+    global _worker_chunker, _worker_reader, _worker_known
+    count_tokens: Optional[TokenCounter] = None
+    if tokenizer:
+        # Only the tokenizer is needed to size chunks; the embedding model stays in the parent.
+        from transformers import AutoTokenizer
+
+        model_tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+
+        def count_tokens(texts: List[str]) -> List[int]:
+            if not texts:
+                return []
+            encoded = model_tokenizer(texts, add_special_tokens=False, verbose=False)
+            return [len(ids) for ids in encoded["input_ids"]]
+
+    _worker_chunker = Chunker(max_tokens, overlap_tokens, count_tokens=count_tokens)
+    _worker_reader = OCRReader()
+    _worker_known = set(known_hashes)
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(COPY_BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract(source: str) -> Tuple[str, Optional[ExtractedPdf]]:
+    """Hash, extract and chunk one PDF; returns ``None`` for content that is already indexed."""
+    assert _worker_chunker is not None and _worker_reader is not None
+    path = Path(source)
+    content_hash = _hash_file(path)
+    if content_hash in _worker_known:
+        return content_hash, None
+
+    stats = ExtractionStats()
+    began = time.perf_counter()
+    pages = _worker_reader.extract_pages(path, stats=stats)
+    extracting = time.perf_counter() - began
+    began = time.perf_counter()
+    chunks = list(_worker_chunker.chunks(pages))
+    chunking = time.perf_counter() - began
+    return content_hash, ExtractedPdf(
+        source=path,
+        content_hash=content_hash,
+        pages=pages,
+        chunks=chunks,
+        page_count=stats.page_count,
+        stage_timings={"extracting": round(extracting, 4), "chunking": round(chunking, 4)},
+    )
+
+
+class BulkIngestor:
+    """Ingest many local PDFs through :class:`PipelineService` as fast as the machine allows.
+
+    Extraction and chunking run in ``workers`` spawned processes (inline when
+    ``workers`` is 0). Extracted files are grouped until they hold
+    ``batch_chunks`` chunks, and each group is indexed with
+    :meth:`PipelineService.index_extracted`: one embedding call, one vector
+    store write and one database transaction. Content already in the
+    database or seen earlier in the run is skipped. Must run inside a Flask
+    application context.
+    """
+
+    def __init__(
+        self,
+        pipeline: PipelineService,
+        *,
+        max_tokens: int,
+        overlap_tokens: int,
+        tokenizer: Optional[str] = None,
+        workers: int = 0,
+        batch_chunks: int = 2048,
+        checkpoint: Optional[IngestCheckpoint] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ):
+        self._pipeline = pipeline
+        self._worker_args = (max_tokens, overlap_tokens, tokenizer)
+        self._workers = max(workers, 0)
+        self._batch_chunks = max(batch_chunks, 1)
+        self._checkpoint = checkpoint
+        self._on_progress = on_progress or (lambda _stats: None)
+
+    def run(self, paths: Iterable[Path]) -> BulkIngestStats:
+        stats = BulkIngestStats()
+        started = time.perf_counter()
+        todo: List[Path] = []
+        for path in paths:
+            stats.files += 1
+            if self._checkpoint and self._checkpoint.is_finished(path):
+                stats.skipped += 1
+            else:
+                todo.append(path)
+
+        seen = list_content_hashes()
+        pending: List[ExtractedPdf] = []
+        pending_chunks = 0
+        for path, outcome in self._extracted(todo, seen):
+            if isinstance(outcome, BaseException):
+                logger.warning("Could not extract %s: %s", path, outcome)
+                stats.failed += 1
+                self._record([{"source": str(path), "status": STATUS_FAILED, "error": str(outcome)}])
+                continue
+            content_hash, extracted = outcome
+            if extracted is None or content_hash in seen:
+                stats.duplicates += 1
+                self._record([{"source": str(path), "status": STATUS_DUPLICATE, "content_hash": content_hash}])
+                continue
+            seen.add(content_hash)
+            pending.append(extracted)
+            pending_chunks += max(len(extracted.chunks), 1)
+            if pending_chunks >= self._batch_chunks:
+                self._flush(pending, stats, started)
+                pending, pending_chunks = [], 0
+        self._flush(pending, stats, started)
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def _extracted(self, paths: List[Path], known: Set[str]):
+        """Yield ``(path, (hash, extracted) or exception)`` as files finish, keeping the pool busy."""
+        if self._workers == 0:
+            _init_worker(*self._worker_args, known)
+            for path in paths:
+                try:
+                    yield path, _extract(str(path))
+                except Exception as exc:  # noqa: BLE001
+                    yield path, exc
+            return
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(*self._worker_args, known),
+        ) as pool:
+            queue = list(reversed(paths))
+            in_flight: Dict[Future, Path] = {}
+            try:
+                while queue or in_flight:
+                    while queue and len(in_flight) < self._workers * 2:
+                        path = queue.pop()
+                        in_flight[pool.submit(_extract, str(path))] = path
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path = in_flight.pop(future)
+                        error = future.exception()
+                        yield path, error if error is not None else future.result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def _flush(self, batch: List[ExtractedPdf], stats: BulkIngestStats, started: float) -> None:
+        if not batch:
+            return
+        try:
+            documents = self._pipeline.index_extracted(batch)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Indexing a batch of %s files failed", len(batch))
+            stats.failed += len(batch)
+            self._record(
+                [{"source": str(item.source), "status": STATUS_FAILED, "error": str(exc)} for item in batch]
+            )
+            return
+        stats.indexed += len(batch)
+        stats.pages += sum(item.page_count for item in batch)
+        stats.chunks += sum(document.chunk_count for document in documents)
+        self._record(
+            [
+                {"source": str(item.source), "status": STATUS_INDEXED, "document_id": document.document_id}
+                for item, document in zip(batch, documents)
+            ]
+        )
+        stats.elapsed = time.perf_counter() - started
+        self._on_progress(stats)
+
+    def _record(self, entries: List[Dict[str, object]]) -> None:
+        if self._checkpoint:
+            self._checkpoint.record(entries)
@@ -1,8 +1,36 @@
-"""Utilities for splitting text into overlapping chunks."""
+"""Utilities for splitting text into chunks for embedding."""
 
 from __future__ import annotations
 
-from typing import List
+import hashlib
+import re
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .ocr_service import PAGE_SEPARATOR
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+# Roughly one WordPiece token per short ASCII word piece, digit group, CJK
+# character or punctuation mark.
+_TOKEN_ESTIMATE = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|\S")
+# A sentence ends at terminal punctuation followed by whitespace and a
+# non-lowercase character ("U.S. airworthiness" and "91.205" stay intact);
+# CJK full stops need no whitespace.
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[^\sa-z])|(?<=[。！？])[」』\"')\]]*\s*")
+_HEADING = re.compile(
+    r"(?:(?i:part|subpart|section|chapter|appendix|article)\s+\S.{0,150}"
+    r"|§\s*\d.{0,150}"
+    r"|\d+(?:\.\d+)*\.?\s+[A-Z][^.]{0,80}"
+    r"|[A-Z][A-Z0-9 ,;:'&()/\-]{3,80}"
+    r"|第.{1,8}[章節节條条款].{0,40})"
+)
+_WORD = re.compile(r"\S+\s*")
+
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    """Approximate WordPiece token counts when no tokenizer is available."""
+    return [len(_TOKEN_ESTIMATE.findall(text)) for text in texts]
 
 
 def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
@@ -27,3 +55,261 @@ def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
             break
         start = max(0, end - overlap)
     return chunks
+
+
+class Chunk(NamedTuple):
+    """Chunk text with where it came from.
+
+    Pages are 1-based PDF page numbers. Offsets index the stored text file
+    (pages joined as in ``OCRReader.extract_text``), in characters and in
+    UTF-8 bytes; ends are exclusive.
+    """
+
+    text: str
+    page_start: int
+    page_end: int
+    char_start: int
+    char_end: int
+    byte_start: int
+    byte_end: int
+
+    def provenance(self) -> Dict[str, int]:
+        return {
+            "page_start": self.page_start,
+            "page_end": self.page_end,
+            "char_start": self.char_start,
+            "char_end": self.char_end,
+            "byte_start": self.byte_start,
+            "byte_end": self.byte_end,
+        }
+
+
+class _Segment(NamedTuple):
+    start: int
+    end: int
+    byte_start: int
+    byte_end: int
+    page: int
+    tokens: int
+    heading: bool
+
+
+class _ByteCursor:
+    """Map ascending character positions of one page to UTF-8 byte offsets in linear time."""
+
+    def __init__(self, text: str, byte_base: int):
+        self._text = text
+        self._char = 0
+        self._byte = byte_base
+
+    def offset(self, position: int) -> int:
+        if position > self._char:
+            self._byte += len(self._text[self._char : position].encode("utf-8"))
+            self._char = position
+        return self._byte
+
+
+class _TextWindow:
+    """The part of the joined document text that buffered segments still refer to."""
+
+    def __init__(self) -> None:
+        self._pieces: Deque[Tuple[int, str]] = deque()
+
+    def append(self, base: int, text: str) -> None:
+        self._pieces.append((base, text))
+
+    def slice(self, start: int, end: int) -> str:
+        parts = []
+        for base, text in self._pieces:
+            if base >= end:
+                break
+            if base + len(text) > start:
+                parts.append(text[max(start - base, 0) : end - base])
+        return "".join(parts)
+
+    def release(self, start: int) -> None:
+        while len(self._pieces) > 1 and self._pieces[0][0] + len(self._pieces[0][1]) <= start:
+            self._pieces.popleft()
+
+
+class Chunker:
+    """Split page text into chunks of at most ``max_tokens`` model tokens.
+
+    Chunks break at sentence boundaries, and a heading line starts a new
+    chunk once the current one holds at least a quarter of the budget. Up to
+    ``overlap_tokens`` of trailing whole sentences are repeated at the start
+    of the next chunk within a section. Each chunk is an exact slice of the
+    pages joined as in ``OCRReader.extract_text``. Tokens are counted once per
+    sentence, in one ``count_tokens`` call per page, so the work is linear in
+    the text length.
+    """
+
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0, count_tokens: Optional[TokenCounter] = None):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self._max_tokens = max_tokens
+        self._overlap_tokens = overlap_tokens
+        self._min_tokens = max_tokens // 4
+        self._count_tokens = count_tokens or estimate_tokens
+
+    @property
+    def max_tokens(self) -> int:
+        return self._max_tokens
+
+    def chunks(self, pages: Iterable[str]) -> Iterator[Chunk]:
+        """Yield chunks of ``pages``, one entry per PDF page, as soon as each one is complete."""
+        window = _TextWindow()
+        buffer: List[_Segment] = []
+        tokens = 0
+        for segment in self._segments(pages, window):
+            if buffer and segment.heading and not buffer[-1].heading and tokens >= self._min_tokens:
+                yield self._text(window, buffer)
+                buffer, tokens = [], 0
+            elif buffer and tokens + segment.tokens > self._max_tokens:
+                # Headings at the end of a full chunk belong with the text that follows them.
+                split = len(buffer)
+                while split and buffer[split - 1].heading:
+                    split -= 1
+                if split:
+                    yield self._text(window, buffer[:split])
+                    carried = buffer[split:] or self._overlap(buffer, segment)
+                else:
+                    yield self._text(window, buffer)
+                    carried = []
+                buffer = carried
+                tokens = sum(part.tokens for part in buffer)
+                while buffer and tokens + segment.tokens > self._max_tokens:
+                    tokens -= buffer.pop(0).tokens
+            buffer.append(segment)
+            tokens += segment.tokens
+            window.release(buffer[0].start)
+        if buffer:
+            yield self._text(window, buffer)
+
+    def _overlap(self, buffer: List[_Segment], following: _Segment) -> List[_Segment]:
+        if following.heading or not self._overlap_tokens:
+            return []
+        carried: List[_Segment] = []
+        total = 0
+        for segment in reversed(buffer[1:]):
+            if segment.heading or total + segment.tokens > self._overlap_tokens:
+                break
+            carried.append(segment)
+            total += segment.tokens
+        carried.reverse()
+        return carried
+
+    @staticmethod
+    def _text(window: _TextWindow, buffer: List[_Segment]) -> Chunk:
+        first, last = buffer[0], buffer[-1]
+        return Chunk(
+            window.slice(first.start, last.end),
+            page_start=first.page,
+            page_end=last.page,
+            char_start=first.start,
+            char_end=last.end,
+            byte_start=first.byte_start,
+            byte_end=last.byte_end,
+        )
+
+    def _segments(self, pages: Iterable[str], window: _TextWindow) -> Iterator[_Segment]:
+        offset = 0
+        byte_offset = 0
+        first = True
+        for number, page in enumerate(pages, start=1):
+            page = page.strip()
+            if not page:
+                continue
+            if not first:
+                window.append(offset, PAGE_SEPARATOR)
+                offset += len(PAGE_SEPARATOR)
+                byte_offset += len(PAGE_SEPARATOR.encode("utf-8"))
+            first = False
+            window.append(offset, page)
+
+            cursor = _ByteCursor(page, byte_offset)
+            spans = list(self._page_spans(page))
+            counts = self._count_tokens([page[start:end] for start, end, _ in spans])
+            for (start, end, heading), count in zip(spans, counts):
+                if count > self._max_tokens and not heading:
+                    pieces = self._split_long(page, start, end)
+                else:
+                    pieces = iter([(start, end, count)])
+                for piece_start, piece_end, piece_tokens in pieces:
+                    yield _Segment(
+                        offset + piece_start,
+                        offset + piece_end,
+                        cursor.offset(piece_start),
+                        cursor.offset(piece_end),
+                        number,
+                        piece_tokens,
+                        heading,
+                    )
+            offset += len(page)
+            byte_offset = cursor.offset(len(page))
+
+    def _page_spans(self, page: str) -> Iterator[Tuple[int, int, bool]]:
+        """Yield ``(start, end, is_heading)`` for each sentence and heading line of a page."""
+        paragraph_start: Optional[int] = None
+        paragraph_end = 0
+        position = 0
+        for line in page.split("\n"):
+            line_start = position
+            position += len(line) + 1
+            stripped = line.strip()
+            if not stripped:
+                if paragraph_start is not None:
+                    yield from self._sentences(page, paragraph_start, paragraph_end)
+                    paragraph_start = None
+                continue
+            content_start = line_start + len(line) - len(line.lstrip())
+            content_end = line_start + len(line.rstrip())
+            if _HEADING.fullmatch(stripped):
+                if paragraph_start is not None:
+                    yield from self._sentences(page, paragraph_start, paragraph_end)
+                    paragraph_start = None
+                yield content_start, content_end, True
+                continue
+            if paragraph_start is None:
+                paragraph_start = content_start
+            paragraph_end = content_end
+        if paragraph_start is not None:
+            yield from self._sentences(page, paragraph_start, paragraph_end)
+
+    @staticmethod
+    def _sentences(page: str, start: int, end: int) -> Iterator[Tuple[int, int, bool]]:
+        paragraph = page[start:end]
+        sentence_start = 0
+        for match in _SENTENCE_END.finditer(paragraph):
+            sentence_end = match.start() + len(match.group().rstrip())
+            if sentence_end > sentence_start:
+                yield start + sentence_start, start + sentence_end, False
+            sentence_start = match.end()
+        if sentence_start < len(paragraph):
+            yield start + sentence_start, end, False
+
+    def _split_long(self, page: str, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+        """Break a sentence longer than the budget into ``(start, end, tokens)`` word runs."""
+        words = [(start + match.start(), start + match.end()) for match in _WORD.finditer(page, start, end)]
+        counts = self._count_tokens([page[word_start:word_end] for word_start, word_end in words])
+        piece_start = None
+        piece_end = 0
+        piece_tokens = 0
+        for (word_start, word_end), count in zip(words, counts):
+            if piece_start is not None and piece_tokens + count > self._max_tokens:
+                yield piece_start, piece_end, piece_tokens
+                piece_start = None
+                piece_tokens = 0
+            if piece_start is None:
+                piece_start = word_start
+            piece_end = word_start + len(page[word_start:word_end].rstrip())
+            piece_tokens += count
+        if piece_start is not None:
+            yield piece_start, piece_end, piece_tokens
+
+
+def hash_text(text: str) -> str:
+    """Stable content hash used to detect unchanged chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
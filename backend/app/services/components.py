@@ -0,0 +1,124 @@
+"""Lazily initialized components, their warm-up and their readiness."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+StatusFn = Callable[[], Dict[str, object]]
+
+
+class Lazy(Generic[T]):
+    """Build a value on first use, exactly once, from whichever thread asks first.
+
+    Concurrent callers block on the same lock until the factory returns, so
+    an expensive object such as a model is never loaded twice. A failed
+    load is remembered for :meth:`status` and retried by the next caller.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._state = IDLE
+        self._error: Optional[str] = None
+        self._load_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        if self._state == READY:
+            return self._value  # type: ignore[return-value]
+        with self._lock:
+            if self._state == READY:
+                return self._value  # type: ignore[return-value]
+            self._state = LOADING
+            started = time.perf_counter()
+            try:
+                value = self._factory()
+            except Exception as exc:
+                self._state = FAILED
+                self._error = f"{type(exc).__name__}: {exc}"
+                raise
+            self._value = value
+            self._load_seconds = time.perf_counter() - started
+            self._error = None
+            self._state = READY
+            return value
+
+    def peek(self) -> Optional[T]:
+        """Return the value if it has been built, without building it."""
+        return self._value if self._state == READY else None
+
+    @property
+    def ready(self) -> bool:
+        return self._state == READY
+
+    def status(self) -> Dict[str, object]:
+        status: Dict[str, object] = {"state": self._state}
+        if self._load_seconds is not None:
+            status["load_seconds"] = round(self._load_seconds, 3)
+        if self._error:
+            status["error"] = self._error
+        return status
+
+
+class Components:
+    """Registry of the application's lazily loaded components.
+
+    Each component reports its state through a status callable and can be
+    warmed up, which loads it ahead of the first request that needs it.
+    Readiness counts a component that has never been loaded as ready only
+    while no warm-up was started, since it then loads on first use.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[StatusFn, Callable[[], None], bool]] = {}
+        self._warm_up: Optional[threading.Thread] = None
+
+    def register(self, name: str, status: StatusFn, warm_up: Callable[[], None], required: bool = True) -> None:
+        self._entries[name] = (status, warm_up, required)
+
+    def warm_up(self) -> None:
+        """Load every component in registration order, logging failures instead of raising."""
+        for name, (_, warm_up, _) in list(self._entries.items()):
+            try:
+                warm_up()
+            except Exception:
+                logger.exception("Warm-up of %s failed", name)
+
+    def start_warm_up(self) -> threading.Thread:
+        """Warm up on a daemon thread so the server accepts requests meanwhile."""
+        if self._warm_up is None:
+            self._warm_up = threading.Thread(target=self.warm_up, name="component-warm-up", daemon=True)
+            self._warm_up.start()
+        return self._warm_up
+
+    @property
+    def warming(self) -> bool:
+        return self._warm_up is not None and self._warm_up.is_alive()
+
+    def report(self) -> Tuple[bool, Dict[str, Dict[str, object]]]:
+        """Return overall readiness and the status of every component."""
+        warm_up_started = self._warm_up is not None
+        ready = True
+        components: Dict[str, Dict[str, object]] = {}
+        for name, (status_fn, _, required) in self._entries.items():
+            status = dict(status_fn())
+            status["required"] = required
+            components[name] = status
+            if not required:
+                continue
+            state = status.get("state")
+            if state == FAILED or (state != READY and (warm_up_started or state == LOADING)):
+                ready = False
+        return ready, components
@@ -0,0 +1,62 @@
+"""In-process cache of serialized document list pages."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class DocumentListCache:
+    """LRU cache of response bodies that are valid for one collection version.
+
+    Entries are stored together with the collection version they were built
+    from. Seeing a newer version drops every entry, so a page is rebuilt
+    from the database only after the collection changed.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self._max_entries = max(max_entries, 1)
+        self._version: Optional[int] = None
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, version: int, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            self._sync(version)
+            body = self._entries.get(key)
+            if body is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return body
+
+    def put(self, version: int, key: Hashable, body: bytes) -> None:
+        with self._lock:
+            self._sync(version)
+            if version != self._version:
+                # Built from a version that has already been superseded.
+                return
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _sync(self, version: int) -> None:
+        if self._version is None or version > self._version:
+            self._version = version
+            self._entries.clear()
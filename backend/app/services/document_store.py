@@ -2,10 +2,19 @@
 
 from __future__ import annotations
 
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import load_only
 
 from ..extensions import db
-from ..models import Document
+from ..models import SUMMARY_PENDING, CollectionVersion, Document
+
+DOCUMENTS_COLLECTION = "documents"
+
+# ``(uploaded_at, id)`` of the last document on the previous page.
+DocumentCursor = Tuple[datetime, int]
 
 
 def create_document(
@@ -14,36 +23,157 @@ def create_document(
     original_filename: str,
     stored_pdf: str,
     text_path: str,
-    summary_path: str,
-    summary_preview: str,
     chunk_count: int,
+    summary_path: Optional[str] = None,
+    summary_preview: Optional[str] = None,
+    summary_status: str = SUMMARY_PENDING,
+    page_count: int = 0,
+    content_hash: Optional[str] = None,
+    stage_timings: Optional[Dict[str, float]] = None,
 ) -> Document:
     document = Document(
         document_id=document_id,
+        content_hash=content_hash,
         original_filename=original_filename,
         stored_pdf=stored_pdf,
         text_path=text_path,
         summary_path=summary_path,
         summary_preview=summary_preview,
+        summary_status=summary_status,
         chunk_count=chunk_count,
+        page_count=page_count,
+        stage_timings=stage_timings,
     )
     db.session.add(document)
+    _bump_version()
     db.session.commit()
     return document
 
 
-def list_documents() -> List[Document]:
-    return Document.query.order_by(Document.uploaded_at.desc()).all()
+def create_documents(rows: List[Dict[str, object]]) -> List[Document]:
+    """Insert many documents in one transaction; each row holds the :func:`create_document` fields."""
+    documents = [Document(**row) for row in rows]
+    db.session.add_all(documents)
+    _bump_version()
+    db.session.commit()
+    return documents
+
+
+def update_document(document: Document, **fields: object) -> Document:
+    for name, value in fields.items():
+        setattr(document, name, value)
+    _bump_version()
+    db.session.commit()
+    return document
+
+
+def list_documents_page(
+    limit: int,
+    after: Optional[DocumentCursor] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Document]:
+    """Return up to ``limit`` documents, newest first, following the cursor ``after``.
+
+    With ``fields``, only those columns (plus the cursor columns) are loaded.
+    """
+    query = Document.query
+    if fields:
+        columns = {*fields, "id", "uploaded_at"}
+        query = query.options(load_only(*(getattr(Document, name) for name in columns)))
+    if after is not None:
+        uploaded_at, row_id = after
+        query = query.filter(
+            or_(
+                Document.uploaded_at < uploaded_at,
+                and_(Document.uploaded_at == uploaded_at, Document.id < row_id),
+            )
+        )
+    return query.order_by(Document.uploaded_at.desc(), Document.id.desc()).limit(limit).all()
+
+
+def count_documents() -> int:
+    return db.session.query(func.count(Document.id)).scalar() or 0
+
+
+def get_documents_version() -> int:
+    """Current version of the document collection; it changes whenever a document does."""
+    version = db.session.execute(
+        select(CollectionVersion.version).where(CollectionVersion.name == DOCUMENTS_COLLECTION)
+    ).scalar()
+    return version or 0
+
+
+def ensure_documents_version() -> None:
+    """Create the version row up front so concurrent first writers only ever update it."""
+    if db.session.get(CollectionVersion, DOCUMENTS_COLLECTION) is None:
+        db.session.add(CollectionVersion(name=DOCUMENTS_COLLECTION, version=0))
+        db.session.commit()
 
 
 def get_by_document_id(document_id: str) -> Optional[Document]:
     return Document.query.filter_by(document_id=document_id).first()
 
 
+def list_pending_summaries(stale_before: Optional[datetime] = None) -> List[Document]:
+    """Documents awaiting a summary; with ``stale_before``, only those nobody is working on."""
+    query = Document.query.filter_by(summary_status=SUMMARY_PENDING)
+    if stale_before is not None:
+        query = query.filter(_summary_unclaimed(stale_before))
+    return query.order_by(Document.uploaded_at.asc()).all()
+
+
+def claim_summary(document_id: str, stale_before: datetime) -> bool:
+    """Atomically take a pending summary unless another process holds a fresh claim on it."""
+    updated = Document.query.filter(
+        Document.document_id == document_id,
+        Document.summary_status == SUMMARY_PENDING,
+        _summary_unclaimed(stale_before),
+    ).update({"summary_claimed_at": datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return updated == 1
+
+
+def heartbeat_summaries(document_ids: Iterable[str]) -> None:
+    document_ids = list(document_ids)
+    if not document_ids:
+        return
+    Document.query.filter(
+        Document.document_id.in_(document_ids),
+        Document.summary_status == SUMMARY_PENDING,
+        Document.summary_claimed_at.is_not(None),
+    ).update({"summary_claimed_at": datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+
+def _summary_unclaimed(stale_before: datetime):
+    return or_(Document.summary_claimed_at.is_(None), Document.summary_claimed_at < stale_before)
+
+
+def get_by_content_hash(content_hash: str) -> Optional[Document]:
+    return Document.query.filter_by(content_hash=content_hash).order_by(Document.uploaded_at.desc()).first()
+
+
+def list_content_hashes() -> Set[str]:
+    rows = db.session.query(Document.content_hash).filter(Document.content_hash.isnot(None)).all()
+    return {content_hash for (content_hash,) in rows}
+
+
 def delete_by_document_id(document_id: str) -> bool:
     document = get_by_document_id(document_id)
     if not document:
         return False
     db.session.delete(document)
+    _bump_version()
     db.session.commit()
     return True
+
+
+def _bump_version() -> None:
+    """Increment the collection version inside the caller's transaction."""
+    result = db.session.execute(
+        update(CollectionVersion)
+        .where(CollectionVersion.name == DOCUMENTS_COLLECTION)
+        .values(version=CollectionVersion.version + 1)
+    )
+    if not result.rowcount:
+        db.session.add(CollectionVersion(name=DOCUMENTS_COLLECTION, version=1))
@@ -0,0 +1,157 @@
+"""Persistent cache of text embeddings keyed by model name and text hash."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Set, Tuple
+
+import numpy as np
+
+CacheKey = Tuple[str, str]
+
+# After pruning, the table is cut to this share of ``max_rows`` so the next
+# pruning pass is many writes away.
+PRUNE_TO = 0.9
+
+
+class EmbeddingCache:
+    """Store float32 vectors in SQLite with a size-bounded in-memory LRU in front.
+
+    Every query and every re-chunked revision adds rows, so the table keeps at
+    most ``max_rows`` vectors (0 means unbounded). Each row records when it was
+    last used; reads only note the keys and the timestamps are written with
+    the next ``put_many``, which also drops the least recently used rows once
+    the table is over the limit.
+    """
+
+    def __init__(self, path: Path, max_memory_entries: int = 20000, max_rows: int = 0):
+        self._path = path
+        self._max_memory_entries = max(max_memory_entries, 0)
+        self._max_rows = max(max_rows, 0)
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._touched: Set[CacheKey] = set()
+        self._pruned = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (model, text_hash)"
+            ") WITHOUT ROWID"
+        )
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(embeddings)")}
+        if "last_used" not in columns:
+            self._connection.execute("ALTER TABLE embeddings ADD COLUMN last_used INTEGER NOT NULL DEFAULT 0")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._connection.commit()
+        # An upper bound on the row count; it is only counted exactly when it passes max_rows.
+        self._rows = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, text_hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the hashes that are present."""
+        found: Dict[str, np.ndarray] = {}
+        wanted = list(dict.fromkeys(text_hashes))
+        with self._lock:
+            on_disk = []
+            for text_hash in wanted:
+                vector = self._memory.get((model, text_hash))
+                if vector is None:
+                    on_disk.append(text_hash)
+                    continue
+                self._memory.move_to_end((model, text_hash))
+                found[text_hash] = vector
+                self._touched.add((model, text_hash))
+
+            for start in range(0, len(on_disk), 500):
+                batch = on_disk[start : start + 500]
+                placeholders = ",".join("?" for _ in batch)
+                rows = self._connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *batch),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[text_hash] = vector
+                    self._remember((model, text_hash), vector)
+                    self._touched.add((model, text_hash))
+
+            self._hits += len(found)
+            self._misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, model: str, vectors: Mapping[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+        rows = []
+        now = int(time.time())
+        with self._lock:
+            for text_hash, vector in vectors.items():
+                stored = np.ascontiguousarray(vector, dtype=np.float32)
+                rows.append((model, text_hash, stored.tobytes(), now))
+                self._remember((model, text_hash), stored)
+                self._touched.discard((model, text_hash))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            if self._touched:
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, touched_model, text_hash) for touched_model, text_hash in self._touched],
+                )
+                self._touched.clear()
+            self._rows += len(rows)
+            if self._max_rows and self._rows > self._max_rows:
+                self._prune()
+            self._connection.commit()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_memory_entries": self._max_memory_entries,
+                "max_rows": self._max_rows,
+                "pruned": self._pruned,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _prune(self) -> None:
+        """Delete the least recently used rows once the table is over ``max_rows``."""
+        self._rows = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._rows <= self._max_rows:
+            return
+        excess = self._rows - max(int(self._max_rows * PRUNE_TO), 1)
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE (model, text_hash) IN ("
+            " SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?"
+            ")",
+            (excess,),
+        )
+        self._rows -= excess
+        self._pruned += excess
+
+    def _remember(self, key: CacheKey, vector: np.ndarray) -> None:
+        if not self._max_memory_entries:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,165 @@
+"""Micro-batching scheduler that shares one embedding model between callers."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+
+PRIORITY_QUERY = 0
+PRIORITY_BULK = 1
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+
+class _Request:
+    """One caller's texts; completes once all of its pieces are encoded."""
+
+    def __init__(self, size: int):
+        self.future: Future = Future()
+        self._rows: List[Optional[np.ndarray]] = [None] * size
+        self._remaining = size
+        self._lock = threading.Lock()
+
+    def fill(self, offset: int, vectors: np.ndarray) -> None:
+        with self._lock:
+            for position, vector in enumerate(vectors):
+                self._rows[offset + position] = vector
+            self._remaining -= len(vectors)
+            done = self._remaining == 0
+        if done and not self.future.done():
+            self.future.set_result(np.stack(self._rows))
+
+    def fail(self, error: BaseException) -> None:
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+@dataclass(order=True)
+class _Piece:
+    priority: int
+    sequence: int
+    texts: List[str] = field(compare=False)
+    request: _Request = field(compare=False)
+    offset: int = field(compare=False)
+
+
+class EmbeddingScheduler:
+    """Gather concurrent encode requests into batches for a single model.
+
+    Requests are split into pieces of at most ``max_batch_size`` texts and
+    queued by priority, so an interactive query waits for at most one bulk
+    batch. After the first piece arrives the worker waits up to
+    ``max_wait_ms`` for more pieces before encoding a partial batch.
+    """
+
+    def __init__(self, encode: EncodeFn, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        self._encode = encode
+        self._max_batch_size = max_batch_size
+        self._max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self._queue: List[_Piece] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self._batches = 0
+        self._encoded = 0
+
+    def submit(self, texts: List[str], priority: int = PRIORITY_BULK) -> Future:
+        request = _Request(len(texts))
+        if not texts:
+            request.future.set_result(np.empty((0, 0), dtype=np.float32))
+            return request.future
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Embedding scheduler is closed")
+            for offset in range(0, len(texts), self._max_batch_size):
+                piece = _Piece(
+                    priority=priority,
+                    sequence=next(self._sequence),
+                    texts=texts[offset : offset + self._max_batch_size],
+                    request=request,
+                    offset=offset,
+                )
+                heapq.heappush(self._queue, piece)
+            self._ensure_worker()
+            self._condition.notify()
+        return request.future
+
+    def encode(self, texts: List[str], priority: int = PRIORITY_BULK) -> np.ndarray:
+        return self.submit(texts, priority).result()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "batches": self._batches,
+                "encoded_texts": self._encoded,
+                "mean_batch_size": round(self._encoded / self._batches, 2) if self._batches else 0.0,
+                "queued_pieces": len(self._queue),
+            }
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[_Piece]:
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            if not self._queue:
+                return []
+            deadline = time.monotonic() + self._max_wait
+            while self._queued_texts() < self._max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch: List[_Piece] = []
+            size = 0
+            while self._queue and size + len(self._queue[0].texts) <= self._max_batch_size:
+                piece = heapq.heappop(self._queue)
+                batch.append(piece)
+                size += len(piece.texts)
+            if not batch:
+                batch.append(heapq.heappop(self._queue))
+            return batch
+
+    def _queued_texts(self) -> int:
+        return sum(len(piece.texts) for piece in self._queue)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            texts = [text for piece in batch for text in piece.texts]
+            try:
+                vectors = self._encode(texts)
+            except BaseException as exc:  # noqa: BLE001
+                for piece in batch:
+                    piece.request.fail(exc)
+                continue
+            with self._condition:
+                self._batches += 1
+                self._encoded += len(texts)
+            start = 0
+            for piece in batch:
+                piece.request.fill(piece.offset, vectors[start : start + len(piece.texts)])
+                start += len(piece.texts)
@@ -3,22 +3,127 @@
 from __future__ import annotations
 
 import os
-from typing import Iterable, List
+from functools import partial
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from .chunker import hash_text
+from .components import Lazy
+from .embedding_cache import EmbeddingCache
+from .embedding_scheduler import PRIORITY_BULK, PRIORITY_QUERY, EmbeddingScheduler
+from .telemetry import span
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _load_model(model_name: str) -> "SentenceTransformer":
+    # Importing sentence-transformers pulls in torch, which dominates startup time.
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
 
 
 class EmbeddingService:
-    """Wrap a sentence-transformers model for embedding generation."""
+    """Wrap a sentence-transformers model for embedding generation.
+
+    Embeddings are returned as contiguous, L2-normalized float32 arrays. When
+    a cache is given, texts are looked up by ``(model name, text hash)`` and
+    only the misses are encoded. All encoding goes through a shared
+    micro-batching scheduler that serves queries ahead of bulk ingestion.
+    The model itself is loaded on first use, or ahead of it by :meth:`warm_up`.
+    """
+
+    def __init__(
+        self,
+        model_name: str | None = None,
+        cache: Optional[EmbeddingCache] = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self._model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL)
+        self._model: Lazy["SentenceTransformer"] = Lazy(partial(_load_model, self._model_name))
+        self._cache = cache
+        self._scheduler = EmbeddingScheduler(self._encode, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        return self._model.get()
+
+    @property
+    def max_input_tokens(self) -> int:
+        """Tokens of text the model embeds before truncating, excluding special tokens."""
+        return int(self.model.max_seq_length) - 2
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count model tokens for each text with the model's own tokenizer."""
+        if not texts:
+            return []
+        encoded = self.model.tokenizer(texts, add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def embed_documents(self, texts: Iterable[str]) -> np.ndarray:
+        """Return a ``(len(texts), dim)`` float32 matrix."""
+        return self._embed_cached(list(texts), PRIORITY_BULK)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed_cached([text], PRIORITY_QUERY)[0]
+
+    def embed_queries(self, texts: Iterable[str]) -> np.ndarray:
+        """Embed many queries together at query priority, as a ``(n, dim)`` matrix."""
+        return self._embed_cached(list(texts), PRIORITY_QUERY)
+
+    def cache_stats(self) -> Optional[Dict[str, object]]:
+        return self._cache.stats() if self._cache else None
+
+    def scheduler_stats(self) -> Dict[str, object]:
+        return self._scheduler.stats()
+
+    def model_status(self) -> Dict[str, object]:
+        return self._model.status()
+
+    def warm_up(self) -> None:
+        """Load the model and run one encode so the first query pays no setup cost."""
+        self._encode(["warm up"])
+
+    def close(self) -> None:
+        self._scheduler.close()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
 
-    def __init__(self, model_name: str | None = None):
-        resolved = model_name or os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-        self._model = SentenceTransformer(resolved)
+    def _embed_cached(self, texts: List[str], priority: int) -> np.ndarray:
+        with span("embed.query" if priority == PRIORITY_QUERY else "embed.documents"):
+            return self._lookup_or_encode(texts, priority)
 
-    def embed_documents(self, texts: Iterable[str]) -> List[List[float]]:
-        embeddings = self._model.encode(list(texts), show_progress_bar=False, convert_to_numpy=True)
-        return embeddings.tolist()
+    def _lookup_or_encode(self, texts: List[str], priority: int) -> np.ndarray:
+        if not self._cache:
+            return self._scheduler.encode(texts, priority)
 
-    def embed_query(self, text: str) -> List[float]:
-        embedding = self._model.encode(text, show_progress_bar=False, convert_to_numpy=True)
-        return embedding.tolist()
+        hashes = [hash_text(text) for text in texts]
+        cached = self._cache.get_many(self._model_name, hashes)
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+        if missing:
+            encoded = self._scheduler.encode(list(missing.values()), priority)
+            fresh = dict(zip(missing.keys(), encoded))
+            self._cache.put_many(self._model_name, fresh)
+            cached.update(fresh)
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([cached[text_hash] for text_hash in hashes])
@@ -2,14 +2,25 @@
 
 from __future__ import annotations
 
+import hashlib
 from pathlib import Path
-from typing import Tuple
+from typing import BinaryIO, NamedTuple
 from uuid import uuid4
 
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 from ..config import Settings
+from .upload_stream import PdfUploadStream
+
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class SavedFile(NamedTuple):
+    stored_name: str
+    path: Path
+    content_hash: str
 
 
 class FileHandler:
@@ -21,19 +32,65 @@ class FileHandler:
     def generate_document_id(self) -> str:
         return uuid4().hex
 
-    def save_pdf(self, file: FileStorage, document_id: str) -> Tuple[str, Path]:
+    def save_pdf(self, file: FileStorage, document_id: str) -> SavedFile:
+        """Store the upload in the PDF folder, checking the PDF header and size limit.
+
+        Uploads that were streamed into the PDF folder while the request was
+        parsed are renamed into place; anything else is copied through the
+        same checks block by block. Raises :class:`InvalidUpload` for files
+        that are not PDFs or are too large.
+        """
         filename = secure_filename(file.filename or f"document-{document_id}.pdf")
         stored_name = f"{document_id}_{filename}" if filename else f"{document_id}.pdf"
         target = self._settings.pdf_dir / stored_name
-        file.save(target)
-        return stored_name, target
+        if isinstance(file.stream, PdfUploadStream):
+            return SavedFile(stored_name, target, file.stream.commit(target))
+
+        stream = PdfUploadStream(self._settings.pdf_dir, self._settings.max_upload_bytes)
+        try:
+            while True:
+                block = file.stream.read(COPY_BUFFER_SIZE)
+                if not block:
+                    break
+                stream.write(block)
+            return SavedFile(stored_name, target, stream.commit(target))
+        finally:
+            stream.close()
+
+    def import_pdf(self, source: Path, document_id: str) -> SavedFile:
+        """Copy a PDF from the local filesystem into the PDF folder, like :meth:`save_pdf`."""
+        filename = secure_filename(source.name)
+        stored_name = f"{document_id}_{filename}" if filename else f"{document_id}.pdf"
+        target = self._settings.pdf_dir / stored_name
+        with source.open("rb") as stream:
+            return SavedFile(stored_name, target, self._copy_hashed(stream, target))
 
     def save_text(self, document_id: str, text: str) -> Path:
         target = self._settings.ocr_dir / f"{document_id}.txt"
-        target.write_text(text, encoding="utf-8")
+        # Written without newline translation so chunk byte offsets stay valid.
+        target.write_text(text, encoding="utf-8", newline="")
         return target
 
+    def read_text_range(self, text_name: str, start: int, end: int) -> bytes:
+        """Read bytes ``[start, end)`` of a stored text file with a single seek."""
+        with (self._settings.ocr_dir / text_name).open("rb") as handle:
+            handle.seek(start)
+            return handle.read(max(end - start, 0))
+
     def save_summary(self, document_id: str, summary: str) -> Path:
         target = self._settings.summary_dir / f"{document_id}.txt"
         target.write_text(summary, encoding="utf-8")
         return target
+
+    @staticmethod
+    def _copy_hashed(stream: BinaryIO, target: Path) -> str:
+        """Copy ``stream`` to ``target``, hashing the bytes as they stream through."""
+        digest = hashlib.sha256()
+        with target.open("wb") as handle:
+            while True:
+                block = stream.read(COPY_BUFFER_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                handle.write(block)
+        return digest.hexdigest()
@@ -0,0 +1,95 @@
+"""Shared, lazily imported access to the Gemini SDK."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator
+
+from .components import Lazy
+from .llm_client import LLMBackend, LLMResponse
+
+
+def _import_sdk() -> Any:
+    import google.generativeai
+
+    return google.generativeai
+
+
+_sdk: Lazy[Any] = Lazy(_import_sdk)
+
+
+def sdk() -> Any:
+    """Return the ``google.generativeai`` module, importing it on first use."""
+    return _sdk.get()
+
+
+def configure() -> Any:
+    """Return the ``google.generativeai`` module configured with ``GEMINI_API_KEY``."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise EnvironmentError("GEMINI_API_KEY environment variable must be set")
+    genai = sdk()
+    genai.configure(api_key=api_key)
+    return genai
+
+
+def status() -> Dict[str, object]:
+    return _sdk.status()
+
+
+def warm_up() -> None:
+    _sdk.get()
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini text generation with one configured ``GenerativeModel`` per model name."""
+
+    def __init__(self) -> None:
+        self._configured: Lazy[Any] = Lazy(configure)
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, model: str, timeout: float) -> LLMResponse:
+        response = self._model(model).generate_content(prompt, request_options={"timeout": timeout})
+        return _response(response)
+
+    def stream(self, prompt: str, model: str, timeout: float) -> Iterator[LLMResponse]:
+        for chunk in self._model(model).generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+            yield _response(chunk)
+
+    async def agenerate(self, prompt: str, model: str, timeout: float) -> LLMResponse:
+        client = await self._amodel(model)
+        response = await client.generate_content_async(prompt, request_options={"timeout": timeout})
+        return _response(response)
+
+    async def astream(self, prompt: str, model: str, timeout: float) -> AsyncIterator[LLMResponse]:
+        client = await self._amodel(model)
+        response = await client.generate_content_async(prompt, stream=True, request_options={"timeout": timeout})
+        async for chunk in response:
+            yield _response(chunk)
+
+    async def _amodel(self, name: str) -> Any:
+        client = self._models.get(name)
+        if client is None:
+            # The first call imports and configures the SDK; keep that off the event loop.
+            client = await asyncio.to_thread(self._model, name)
+        return client
+
+    def _model(self, name: str) -> Any:
+        client = self._models.get(name)
+        if client is None:
+            genai = self._configured.get()
+            with self._lock:
+                client = self._models.setdefault(name, genai.GenerativeModel(name))
+        return client
+
+
+def _response(response: Any) -> LLMResponse:
+    usage = getattr(response, "usage_metadata", None)
+    return LLMResponse(
+        getattr(response, "text", "") or "",
+        getattr(usage, "prompt_token_count", None) or None,
+        getattr(usage, "candidates_token_count", None) or None,
+    )
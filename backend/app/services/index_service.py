@@ -0,0 +1,555 @@
+"""Shared embedding and index service for running several web worker processes.
+
+One process owns the embedding model, the re-ranker and the vector and
+keyword indexes. Web workers reach it over a Unix socket through
+:class:`RemoteVectorStore`, :class:`RemoteEmbeddingService` and
+:class:`RemoteReranker`, which stand in for the local classes, so each added
+worker costs no model weights and never opens the index files. Each
+connection is served on its own thread: query embeddings from every worker
+meet in the service's embedding scheduler and are encoded in shared
+batches, while writes to the index take one lock and so run one at a time.
+
+Run it on its own with ``python -m app.services.index_service``; ``main.py``
+starts it automatically when ``WEB_WORKERS`` is above 1.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import signal
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+import numpy as np
+
+from ..config import Settings
+from .components import FAILED, LOADING, READY, Components
+from .embedding_cache import EmbeddingCache
+from .embedding_service import EmbeddingService
+from .reranker import CrossEncoderReranker
+from .telemetry import WorkerMetrics, span
+from .vector_store import ChunkInput, VectorStore
+
+logger = logging.getLogger(__name__)
+
+# How long a worker's change watcher waits on the service before asking again.
+WATCH_SECONDS = 30.0
+CHANGE_LOG_SIZE = 4096
+
+ChangeListener = Callable[[str], None]
+
+
+class IndexServiceError(RuntimeError):
+    """The index service could not be reached or failed in a way that cannot be re-raised here."""
+
+
+@dataclass
+class LocalIndex:
+    """The models and indexes a process owns: every web worker, or the one index service."""
+
+    embedder: EmbeddingService
+    vector_store: VectorStore
+    reranker: Optional[CrossEncoderReranker]
+
+    def register_components(self, components: Components) -> None:
+        components.register("embedding_model", self.embedder.model_status, self.embedder.warm_up)
+        components.register("vector_backend", self.vector_store.backend.status, self.vector_store.backend.warm_up)
+        components.register(
+            "keyword_index", self.vector_store.keyword_index_status, self.vector_store.warm_up_keyword_index
+        )
+        if self.reranker is not None:
+            components.register("reranker", self.reranker.status, self.reranker.warm_up, required=False)
+
+    def close(self) -> None:
+        self.embedder.close()
+        self.vector_store.close()
+
+
+def build_local_index(settings: Settings) -> LocalIndex:
+    embedding_cache = None
+    if settings.embedding_cache_enabled:
+        embedding_cache = EmbeddingCache(
+            settings.embedding_cache_dir / "embeddings.sqlite3",
+            max_memory_entries=settings.embedding_cache_memory_entries,
+            max_rows=settings.embedding_cache_max_rows,
+        )
+    embedder = EmbeddingService(
+        settings.embedding_model,
+        cache=embedding_cache,
+        max_batch_size=settings.embedding_max_batch_size,
+        max_wait_ms=settings.embedding_max_wait_ms,
+    )
+    reranker = None
+    if settings.rerank_enabled:
+        reranker = CrossEncoderReranker(settings.rerank_model, batch_size=settings.rerank_batch_size)
+    return LocalIndex(embedder, VectorStore(settings, embedder=embedder), reranker)
+
+
+class IndexServer:
+    """Serve a :class:`LocalIndex` to other processes over a Unix socket.
+
+    Requests are ``(method, args)`` tuples answered with ``("ok", result)``
+    or ``("error", exception)``. Every write appends the ids of the
+    documents it touched to a bounded change log, which workers follow with
+    ``wait_for_changes`` to drop answers they cached for those documents.
+    """
+
+    def __init__(self, index: LocalIndex, address: Path, components: Optional[Components] = None):
+        self._index = index
+        self._address = address
+        self._components = components or Components()
+        self._write_lock = threading.Lock()
+        self._changes = threading.Condition()
+        self._instance = uuid4().hex
+        self._sequence = 0
+        self._change_log: Deque[Tuple[int, str]] = deque(maxlen=CHANGE_LOG_SIZE)
+        self._listener: Optional[Listener] = None
+        self._closed = threading.Event()
+        vector_store, embedder = index.vector_store, index.embedder
+        self._methods: Dict[str, Callable[..., Any]] = {
+            "ping": lambda: True,
+            "status": self._components.report,
+            "warm_up": self._components.warm_up,
+            "wait_for_changes": self._wait_for_changes,
+            "embed_query": vector_store.embed_query,
+            "embed_queries": vector_store.embed_queries,
+            "embed_documents": vector_store.embed_documents,
+            "similarity_search": vector_store.similarity_search,
+            "similarity_search_many": vector_store.similarity_search_many,
+            "add_documents": self._add_documents,
+            "sync_document": self._sync_document,
+            "document_chunks": vector_store.document_chunks,
+            "delete_document": self._delete_document,
+            "count_tokens": embedder.count_tokens,
+            "max_input_tokens": lambda: embedder.max_input_tokens,
+            "embedding_stats": lambda: {"cache": embedder.cache_stats(), "scheduler": embedder.scheduler_stats()},
+            "embedding_model_status": embedder.model_status,
+        }
+        if index.reranker is not None:
+            self._methods["rerank"] = index.reranker.score
+            self._methods["reranker_status"] = index.reranker.status
+
+    @property
+    def address(self) -> Path:
+        return self._address
+
+    def listen(self) -> None:
+        """Bind the socket; callers may connect from here on, before :meth:`serve_forever` runs."""
+        self._address.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self._address.exists():
+            try:
+                Client(str(self._address), family="AF_UNIX").close()
+            except OSError:
+                self._address.unlink()  # left behind by a service that did not exit cleanly
+            else:
+                raise IndexServiceError(f"An index service is already listening on {self._address}")
+        self._listener = Listener(str(self._address), family="AF_UNIX", backlog=128)
+        # The protocol unpickles requests, so only this user may connect.
+        os.chmod(self._address, 0o600)
+
+    def serve_forever(self) -> None:
+        if self._listener is None:
+            self.listen()
+        listener = self._listener
+        assert listener is not None
+        try:
+            while not self._closed.is_set():
+                try:
+                    connection = listener.accept()
+                except OSError:
+                    if self._closed.is_set():
+                        break
+                    raise
+                threading.Thread(
+                    target=self._serve_connection, args=(connection,), name="index-service-conn", daemon=True
+                ).start()
+        finally:
+            listener.close()
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._changes:
+            self._changes.notify_all()
+        if self._listener is not None:
+            # Closing the socket does not interrupt accept(); a last connection does.
+            try:
+                Client(str(self._address), family="AF_UNIX").close()
+            except OSError:
+                pass
+
+    def _serve_connection(self, connection: Connection) -> None:
+        with connection:
+            while True:
+                try:
+                    method, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    handler = self._methods.get(method)
+                    if handler is None:
+                        raise IndexServiceError(f"Unknown index service method: {method}")
+                    reply: Tuple[str, Any] = ("ok", handler(*args))
+                except Exception as exc:  # noqa: BLE001
+                    reply = ("error", _portable(exc))
+                try:
+                    connection.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _add_documents(
+        self, documents: Sequence[Tuple[str, List[ChunkInput]]], embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        with self._write_lock:
+            self._index.vector_store.add_documents(documents, embeddings)
+        self._record([document_id for document_id, _ in documents])
+
+    def _sync_document(self, document_id: str, chunks: List[ChunkInput]) -> int:
+        with self._write_lock:
+            reembedded = self._index.vector_store.sync_document(document_id, chunks)
+        self._record([document_id])
+        return reembedded
+
+    def _delete_document(self, document_id: str) -> None:
+        with self._write_lock:
+            self._index.vector_store.delete_document(document_id)
+        self._record([document_id])
+
+    def _record(self, document_ids: Iterable[str]) -> None:
+        with self._changes:
+            for document_id in document_ids:
+                self._sequence += 1
+                self._change_log.append((self._sequence, document_id))
+            self._changes.notify_all()
+
+    def _wait_for_changes(
+        self, instance: Optional[str], seen: int, timeout: float
+    ) -> Tuple[str, int, Optional[List[str]]]:
+        """Return the documents written after ``seen``, waiting up to ``timeout`` for one.
+
+        ``None`` instead of a list means the caller cannot know what changed,
+        because the log was trimmed or the service restarted since ``seen``;
+        an unknown ``instance`` with ``seen`` below zero just starts following.
+        """
+        if instance != self._instance:
+            with self._changes:
+                return self._instance, self._sequence, None if seen >= 0 else []
+        with self._changes:
+            self._changes.wait_for(lambda: self._sequence > seen or self._closed.is_set(), timeout)
+            if self._sequence == seen:
+                return self._instance, seen, []
+            if not self._change_log or self._change_log[0][0] > seen + 1:
+                return self._instance, self._sequence, None
+            changed = list(dict.fromkeys(document_id for number, document_id in self._change_log if number > seen))
+            return self._instance, self._sequence, changed
+
+
+def _portable(exc: Exception) -> Exception:
+    """Return ``exc`` if it survives pickling, else an :class:`IndexServiceError` describing it."""
+    try:
+        pickle.loads(pickle.dumps(exc))
+    except Exception:  # noqa: BLE001
+        return IndexServiceError(f"{type(exc).__name__}: {exc}")
+    return exc
+
+
+class IndexServiceClient:
+    """Call the index service, keeping one idle connection per caller that has finished with it.
+
+    Connecting waits up to ``connect_timeout`` seconds for the service to
+    bind its socket, so workers may start before it does. Errors raised by
+    the service are re-raised here with their original type.
+    """
+
+    def __init__(self, address: Path, connect_timeout: float = 30.0):
+        self._address = str(address)
+        self._connect_timeout = connect_timeout
+        self._idle: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def call(self, method: str, *args: Any) -> Any:
+        with span(f"index_service.{method}"):
+            return self.request(method, *args)
+
+    def request(self, method: str, *args: Any) -> Any:
+        """Like :meth:`call`, without recording a span."""
+        connection = self._checkout()
+        try:
+            connection.send((method, args))
+            status, value = connection.recv()
+        except (EOFError, OSError) as exc:
+            connection.close()
+            raise IndexServiceError(f"Lost the connection to the index service at {self._address}") from exc
+        except BaseException:
+            # Interrupted mid-exchange; the reply may still be on its way.
+            connection.close()
+            raise
+        with self._lock:
+            self._idle.append(connection)
+        if status == "error":
+            raise value
+        return value
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _checkout(self) -> Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        deadline = time.monotonic() + self._connect_timeout
+        while True:
+            try:
+                return Client(self._address, family="AF_UNIX")
+            except (FileNotFoundError, ConnectionRefusedError) as exc:
+                if time.monotonic() >= deadline:
+                    raise IndexServiceError(f"No index service is listening on {self._address}") from exc
+                time.sleep(0.1)
+
+
+class RemoteVectorStore:
+    """The :class:`VectorStore` interface, served by the index service.
+
+    :meth:`subscribe` follows the service's change log on a background
+    thread, so a worker hears about documents that other workers wrote.
+    """
+
+    def __init__(self, client: IndexServiceClient):
+        self._client = client
+        self._listeners: List[Tuple[ChangeListener, Optional[Callable[[], None]]]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    def add_document(
+        self, document_id: str, chunks: Iterable[ChunkInput], embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        self.add_documents([(document_id, chunks)], embeddings)
+
+    def add_documents(
+        self, documents: Sequence[Tuple[str, Iterable[ChunkInput]]], embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        if documents:
+            self._client.call(
+                "add_documents", [(document_id, list(chunks)) for document_id, chunks in documents], embeddings
+            )
+
+    def sync_document(self, document_id: str, chunks: Iterable[ChunkInput]) -> int:
+        return self._client.call("sync_document", document_id, list(chunks))
+
+    def document_chunks(self, document_id: str) -> List[ChunkInput]:
+        return self._client.call("document_chunks", document_id)
+
+    def delete_document(self, document_id: str) -> None:
+        self._client.call("delete_document", document_id)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self._client.call("embed_query", query)
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        return self._client.call("embed_documents", list(texts))
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        return self._client.call("embed_queries", list(queries))
+
+    def similarity_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        document_ids: Optional[Sequence[str]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        mode: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        return self._client.call(
+            "similarity_search", query, k, _as_list(document_ids), query_embedding, mode
+        )
+
+    def similarity_search_many(
+        self,
+        queries: Sequence[str],
+        k: Optional[int] = None,
+        document_ids: Optional[Sequence[str]] = None,
+        query_embeddings: Optional[np.ndarray] = None,
+        mode: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        return self._client.call(
+            "similarity_search_many", list(queries), k, _as_list(document_ids), query_embeddings, mode
+        )
+
+    def subscribe(self, listener: ChangeListener, reset: Optional[Callable[[], None]] = None) -> None:
+        """Call ``listener(document_id)`` after any worker writes a document.
+
+        ``reset`` is called instead when the changes cannot be known, such
+        as after the service restarts.
+        """
+        self._listeners.append((listener, reset))
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="index-service-watch", daemon=True)
+            self._watcher.start()
+
+    def status(self) -> Dict[str, object]:
+        """Report the service as one component, ready when everything it loads is."""
+        try:
+            ready, components = self._client.request("status")
+        except (IndexServiceError, OSError) as exc:
+            return {"state": FAILED, "error": f"{type(exc).__name__}: {exc}"}
+        if ready:
+            state = READY
+        elif any(status["required"] and status["state"] == FAILED for status in components.values()):
+            state = FAILED
+        else:
+            state = LOADING
+        return {"state": state, "components": components}
+
+    def warm_up(self) -> None:
+        self._client.request("warm_up")
+
+    def close(self) -> None:
+        self._closed.set()
+        self._client.close()
+
+    def _watch(self) -> None:
+        instance: Optional[str] = None
+        seen = -1
+        while not self._closed.is_set():
+            try:
+                instance, sequence, changed = self._client.request("wait_for_changes", instance, seen, WATCH_SECONDS)
+            except IndexServiceError:
+                if self._closed.is_set():
+                    return
+                logger.warning("Index service unavailable; retrying its change log shortly")
+                time.sleep(1.0)
+                continue
+            if seen >= 0:
+                self._notify(changed)
+            seen = sequence
+
+    def _notify(self, changed: Optional[List[str]]) -> None:
+        for listener, reset in self._listeners:
+            try:
+                if changed is None:
+                    if reset is not None:
+                        reset()
+                else:
+                    for document_id in changed:
+                        listener(document_id)
+            except Exception:  # noqa: BLE001
+                logger.exception("Index change listener failed")
+
+
+class RemoteEmbeddingService:
+    """The parts of :class:`EmbeddingService` a web worker uses: token counts, limits and statistics."""
+
+    def __init__(self, client: IndexServiceClient, model_name: str):
+        self._client = client
+        self._model_name = model_name
+        self._max_input_tokens: Optional[int] = None
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def max_input_tokens(self) -> int:
+        if self._max_input_tokens is None:
+            self._max_input_tokens = int(self._client.call("max_input_tokens"))
+        return self._max_input_tokens
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        return self._client.call("count_tokens", list(texts))
+
+    def cache_stats(self) -> Optional[Dict[str, object]]:
+        return self._stats()["cache"]
+
+    def scheduler_stats(self) -> Dict[str, object]:
+        return self._stats()["scheduler"]
+
+    def model_status(self) -> Dict[str, object]:
+        return self._client.request("embedding_model_status")
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _stats(self) -> Dict[str, Any]:
+        try:
+            return self._client.request("embedding_stats")
+        except IndexServiceError:
+            return {"cache": None, "scheduler": {}}
+
+
+class RemoteReranker:
+    """A :class:`CrossEncoderReranker` whose model lives in the index service."""
+
+    def __init__(self, client: IndexServiceClient, model_name: str):
+        self._client = client
+        self._model_name = model_name
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    def score(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        if not pairs:
+            return np.empty(0, dtype=np.float32)
+        return self._client.call("rerank", [tuple(pair) for pair in pairs])
+
+    def status(self) -> Dict[str, object]:
+        return self._client.request("reranker_status")
+
+    def warm_up(self) -> None:
+        self.score([("warm up", "warm up")])
+
+
+def _as_list(values: Optional[Sequence[str]]) -> Optional[List[str]]:
+    return None if values is None else list(values)
+
+
+def run(settings: Optional[Settings] = None) -> None:
+    """Serve the index until SIGTERM or SIGINT; the entry point of the service process."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    settings = settings or Settings()
+    settings.ensure_directories()
+    index = build_local_index(settings)
+    components = Components()
+    index.register_components(components)
+    server = IndexServer(index, settings.index_service_socket, components)
+    metrics = None
+    if settings.metrics_enabled:
+        # Web workers merge this file into their /metrics, so the service's own stages show up there too.
+        metrics = WorkerMetrics(settings.metrics_dir, worker="index-service")
+        metrics.start()
+
+    def stop(signum: int, _frame: Any) -> None:
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    server.listen()
+    if settings.warm_up:
+        components.start_warm_up()
+    logger.info("Index service listening on %s", server.address)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.close()
+        index.close()
+        if metrics is not None:
+            metrics.close()
+
+
+if __name__ == "__main__":
+    run()
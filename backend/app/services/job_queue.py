@@ -0,0 +1,183 @@
+"""Background execution of document ingestion jobs."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from flask import Flask
+
+from ..extensions import db
+from ..models import SUMMARY_PENDING, IngestionJob
+from . import job_store
+from .document_store import claim_summary, heartbeat_summaries
+from .pipeline_service import PipelineService
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the ingestion backlog has reached its configured limit."""
+
+
+class IngestionJobQueue:
+    """Run pipeline jobs on a bounded worker pool, tracking state in the database.
+
+    A job succeeds once its document is indexed and searchable. Summaries are
+    generated afterwards on a separate pool so slow LLM calls do not hold up
+    indexing of the next upload.
+
+    Several processes may share the database. Each one refreshes a heartbeat
+    on the jobs and summaries it holds every ``heartbeat_seconds``, and only
+    takes over work whose heartbeat is older than ``stale_seconds``, so a
+    starting worker never picks up what a live sibling is still running.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        pipeline: PipelineService,
+        max_workers: int,
+        max_pending: int,
+        summary_workers: int = 2,
+        heartbeat_seconds: float = 10.0,
+        stale_seconds: float = 60.0,
+    ):
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        self._app = app
+        self._pipeline = pipeline
+        self._max_pending = max(max_pending, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._summary_executor = ThreadPoolExecutor(
+            max_workers=max(summary_workers, 1),
+            thread_name_prefix="summary-job",
+        )
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._summaries: Dict[str, Future] = {}
+        # Slots taken by uploads that are being staged but not yet submitted.
+        self._reserved = 0
+        self._heartbeat_seconds = heartbeat_seconds
+        self._stale_after = timedelta(seconds=max(stale_seconds, heartbeat_seconds))
+        self._stopped = threading.Event()
+        self._maintainer: Optional[threading.Thread] = None
+
+    def enqueue(self, file, replaces: Optional[str] = None) -> IngestionJob:
+        """Save the upload, persist a queued job and schedule it."""
+        with self._lock:
+            if len(self._futures) + self._reserved >= self._max_pending:
+                raise QueueFullError("Ingestion queue is full, retry later")
+            self._reserved += 1
+
+        try:
+            upload = self._pipeline.stage_upload(file, replaces=replaces)
+            job = job_store.create_job(upload)
+        except BaseException:
+            with self._lock:
+                self._reserved -= 1
+            raise
+        self._submit(job.job_id, reserved=True)
+        return job
+
+    def resume_pending(self) -> int:
+        """Take over abandoned jobs and summaries now, then keep heartbeats and sweeps going.
+
+        Returns the number of jobs taken over by this first sweep.
+        """
+        resumed = self._sweep()
+        if self._maintainer is None:
+            self._maintainer = threading.Thread(target=self._maintain, name="ingest-heartbeat", daemon=True)
+            self._maintainer.start()
+        return resumed
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._futures) + self._reserved
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+        self._summary_executor.shutdown(wait=wait)
+
+    def _maintain(self) -> None:
+        while not self._stopped.wait(self._heartbeat_seconds):
+            try:
+                with self._lock:
+                    job_ids, document_ids = list(self._futures), list(self._summaries)
+                with self._app.app_context():
+                    job_store.heartbeat(job_ids)
+                    heartbeat_summaries(document_ids)
+                self._sweep()
+            except Exception:  # noqa: BLE001
+                logger.exception("Ingestion heartbeat failed")
+
+    def _sweep(self) -> int:
+        """Schedule jobs and summaries whose owner stopped sending heartbeats."""
+        stale_before = datetime.utcnow() - self._stale_after
+        with self._app.app_context():
+            job_ids = job_store.requeue_stale(stale_before)
+            document_ids = self._pipeline.pending_summaries(stale_before)
+        for job_id in job_ids:
+            self._submit(job_id)
+        for document_id in document_ids:
+            self._submit_summary(document_id)
+        return len(job_ids)
+
+    def _submit(self, job_id: str, reserved: bool = False) -> None:
+        with self._lock:
+            if reserved:
+                self._reserved -= 1
+            if job_id in self._futures:
+                return
+            future = self._executor.submit(self._run, job_id)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _future, key=job_id: self._forget(key))
+
+    def _forget(self, job_id: str) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _submit_summary(self, document_id: str) -> None:
+        with self._lock:
+            if document_id in self._summaries:
+                return
+            future = self._summary_executor.submit(self._summarize, document_id)
+            self._summaries[document_id] = future
+        future.add_done_callback(lambda _future, key=document_id: self._forget_summary(key))
+
+    def _forget_summary(self, document_id: str) -> None:
+        with self._lock:
+            self._summaries.pop(document_id, None)
+
+    def _summarize(self, document_id: str) -> None:
+        with self._app.app_context():
+            if not claim_summary(document_id, datetime.utcnow() - self._stale_after):
+                return
+            try:
+                self._pipeline.summarize(document_id)
+            except Exception:  # noqa: BLE001
+                logger.exception("Summary job for %s failed", document_id)
+                db.session.rollback()
+
+    def _run(self, job_id: str) -> None:
+        with self._app.app_context():
+            if not job_store.claim(job_id):
+                return
+            job = job_store.get_by_job_id(job_id)
+            if job is None:
+                return
+            upload = self._pipeline.staged_from_job(job)
+            try:
+                document = self._pipeline.process(upload, on_stage=lambda stage: job_store.set_stage(job_id, stage))
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Ingestion job %s failed", job_id)
+                db.session.rollback()
+                job_store.mark_failed(job_id, str(exc))
+                return
+            job_store.mark_succeeded(job_id, document.document_id)
+            if document.summary_status == SUMMARY_PENDING:
+                self._submit_summary(document.document_id)
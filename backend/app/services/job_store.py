@@ -0,0 +1,110 @@
+"""Persist ingestion job state in the relational database."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, List, Optional
+from uuid import uuid4
+
+from ..extensions import db
+from ..models import IngestionJob
+
+if TYPE_CHECKING:
+    from .pipeline_service import StagedUpload
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+
+def create_job(upload: StagedUpload) -> IngestionJob:
+    job = IngestionJob(
+        job_id=uuid4().hex,
+        status=STATUS_QUEUED,
+        document_id=upload.document_id,
+        upload_id=upload.upload_id,
+        is_revision=upload.is_revision,
+        content_hash=upload.content_hash,
+        original_filename=upload.original_filename,
+        stored_pdf=upload.stored_pdf,
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def get_by_job_id(job_id: str) -> Optional[IngestionJob]:
+    return IngestionJob.query.filter_by(job_id=job_id).first()
+
+
+def claim(job_id: str) -> bool:
+    """Atomically move a queued job to running; False when another worker owns it."""
+    updated = (
+        IngestionJob.query.filter_by(job_id=job_id, status=STATUS_QUEUED)
+        .update({"status": STATUS_RUNNING, "updated_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.session.commit()
+    return updated == 1
+
+
+def heartbeat(job_ids: Iterable[str]) -> None:
+    """Mark unfinished jobs as still owned by the calling process."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    IngestionJob.query.filter(
+        IngestionJob.job_id.in_(job_ids),
+        IngestionJob.status.in_((STATUS_QUEUED, STATUS_RUNNING)),
+    ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+
+def requeue_stale(stale_before: datetime) -> List[str]:
+    """Take over unfinished jobs whose owner stopped sending heartbeats before ``stale_before``.
+
+    Each job is requeued with its own conditional update, so when several
+    processes sweep at once every job is taken over by exactly one of them.
+    Returns the ids taken over by this caller.
+    """
+    candidates = [
+        job.job_id
+        for job in IngestionJob.query.filter(
+            IngestionJob.status.in_((STATUS_QUEUED, STATUS_RUNNING)),
+            IngestionJob.updated_at < stale_before,
+        ).all()
+    ]
+    taken = []
+    for job_id in candidates:
+        updated = IngestionJob.query.filter(
+            IngestionJob.job_id == job_id,
+            IngestionJob.status.in_((STATUS_QUEUED, STATUS_RUNNING)),
+            IngestionJob.updated_at < stale_before,
+        ).update({"status": STATUS_QUEUED, "stage": None, "updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if updated == 1:
+            taken.append(job_id)
+    return taken
+
+
+def set_stage(job_id: str, stage: str) -> None:
+    IngestionJob.query.filter_by(job_id=job_id).update(
+        {"stage": stage, "updated_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def mark_succeeded(job_id: str, document_id: str) -> None:
+    IngestionJob.query.filter_by(job_id=job_id).update(
+        {"status": STATUS_SUCCEEDED, "stage": None, "error": None, "document_id": document_id},
+        synchronize_session=False,
+    )
+    db.session.commit()
+
+
+def mark_failed(job_id: str, error: str) -> None:
+    IngestionJob.query.filter_by(job_id=job_id).update(
+        {"status": STATUS_FAILED, "error": error},
+        synchronize_session=False,
+    )
+    db.session.commit()
@@ -0,0 +1,250 @@
+"""Inverted keyword index with BM25 scoring over document chunks."""
+
+from __future__ import annotations
+
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Keeps section numbers such as "91.205", "25-1309" or "121/135" together as one term.
+_TERM = re.compile(r"[0-9a-z]+(?:[.\-/§][0-9a-z]+)*")
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms.
+
+    Compound terms are kept whole and also indexed by their parts, so
+    "91.205" matches both "91.205" and "205". CJK runs are indexed as
+    character bigrams.
+    """
+    normalized = unicodedata.normalize("NFKC", text).casefold()
+    terms: List[str] = []
+    for match in _TERM.finditer(normalized):
+        term = match.group()
+        terms.append(term)
+        if not term.isalnum():
+            terms.extend(part for part in re.split(r"[.\-/§]", term) if part)
+    for match in _CJK_RUN.finditer(normalized):
+        run = match.group()
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[index : index + 2] for index in range(len(run) - 1))
+    return terms
+
+
+class KeywordIndex:
+    """BM25 over chunk texts, held in memory and persisted to SQLite.
+
+    The index is updated incrementally per chunk, so adding or removing a
+    document never rebuilds the whole index. Every write also bumps a
+    version stored next to the chunks; when another process has written
+    since, the next search or write reloads the index from SQLite first and
+    calls ``on_reload``.
+    """
+
+    def __init__(
+        self, path: Path, k1: float = 1.5, b: float = 0.75, on_reload: Optional[Callable[[], None]] = None
+    ):
+        self._k1 = k1
+        self._b = b
+        self._on_reload = on_reload
+        self._version = 0
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lengths: Dict[str, int] = {}
+        self._chunk_terms: Dict[str, Dict[str, int]] = {}
+        self._chunk_document: Dict[str, str] = {}
+        self._document_chunks: Dict[str, Set[str]] = defaultdict(set)
+        self._total_length = 0
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " chunk_id TEXT PRIMARY KEY,"
+            " document_id TEXT NOT NULL,"
+            " terms TEXT NOT NULL"
+            ")"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document_id)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+        self._connection.commit()
+        self._version = self._stored_version()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def upsert_chunks(self, document_id: str, chunk_ids: Sequence[str], texts: Sequence[str]) -> None:
+        self.upsert_many((document_id, chunk_id, text) for chunk_id, text in zip(chunk_ids, texts))
+
+    def upsert_many(self, chunks: Iterable[Tuple[str, str, str]]) -> None:
+        """Index ``(document_id, chunk_id, text)`` triples in a single transaction."""
+        rows = []
+        with self._write():
+            for document_id, chunk_id, text in chunks:
+                counts = Counter(tokenize(text))
+                self._remove_chunk(chunk_id)
+                self._add_chunk(chunk_id, document_id, counts)
+                rows.append((chunk_id, document_id, self._encode_terms(counts)))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, document_id, terms) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def delete_chunks(self, chunk_ids: Iterable[str]) -> None:
+        ids = list(chunk_ids)
+        with self._write():
+            for chunk_id in ids:
+                self._remove_chunk(chunk_id)
+            self._connection.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def delete_document(self, document_id: str) -> None:
+        with self._write():
+            for chunk_id in list(self._document_chunks.get(document_id, ())):
+                self._remove_chunk(chunk_id)
+            self._document_chunks.pop(document_id, None)
+            self._connection.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+
+    def refresh(self) -> bool:
+        """Reload the index if another process wrote to it; returns whether it did."""
+        with self._lock:
+            if self._stored_version() == self._version:
+                return False
+            self._reload()
+        if self._on_reload:
+            self._on_reload()
+        return True
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return up to ``k`` ``(chunk_id, bm25_score)`` pairs, best first."""
+        terms = set(tokenize(query))
+        allowed = set(document_ids) if document_ids else None
+        self.refresh()
+        with self._lock:
+            count = len(self._lengths)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    if allowed is not None and self._chunk_document[chunk_id] not in allowed:
+                        continue
+                    norm = self._k1 * (1 - self._b + self._b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] += idf * frequency * (self._k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def read_version(path: Path) -> int:
+        """The stored version of the index at ``path``, without loading it."""
+        try:
+            with closing(sqlite3.connect(str(path))) as connection:
+                row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.Error:
+            return 0
+        return row[0] if row else 0
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """Apply a change in one transaction that also bumps the version.
+
+        The transaction takes SQLite's write lock before the version is
+        checked, so no other process can write between the reload and the
+        change.
+        """
+        reloaded = False
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                if self._stored_version() != self._version:
+                    self._reload()
+                    reloaded = True
+                yield
+                self._connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+                self._version = self._stored_version()
+            except BaseException:
+                self._connection.rollback()
+                self._reload()
+                raise
+            self._connection.commit()
+        if reloaded and self._on_reload:
+            self._on_reload()
+
+    def _stored_version(self) -> int:
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def _reload(self) -> None:
+        self._postings = defaultdict(dict)
+        self._lengths = {}
+        self._chunk_terms = {}
+        self._chunk_document = {}
+        self._document_chunks = defaultdict(set)
+        self._total_length = 0
+        self._version = self._stored_version()
+        self._load()
+
+    def _load(self) -> None:
+        for chunk_id, document_id, encoded in self._connection.execute(
+            "SELECT chunk_id, document_id, terms FROM chunks"
+        ):
+            self._add_chunk(chunk_id, document_id, self._decode_terms(encoded))
+
+    def _add_chunk(self, chunk_id: str, document_id: str, counts: Dict[str, int]) -> None:
+        for term, frequency in counts.items():
+            self._postings[term][chunk_id] = frequency
+        length = sum(counts.values())
+        self._lengths[chunk_id] = length
+        self._total_length += length
+        self._chunk_terms[chunk_id] = dict(counts)
+        self._chunk_document[chunk_id] = document_id
+        self._document_chunks[document_id].add(chunk_id)
+
+    def _remove_chunk(self, chunk_id: str) -> None:
+        counts = self._chunk_terms.pop(chunk_id, None)
+        if counts is None:
+            return
+        for term in counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id, 0)
+        document_id = self._chunk_document.pop(chunk_id)
+        self._document_chunks[document_id].discard(chunk_id)
+
+    @staticmethod
+    def _encode_terms(counts: Dict[str, int]) -> str:
+        return "\n".join(f"{term}\t{frequency}" for term, frequency in counts.items())
+
+    @staticmethod
+    def _decode_terms(encoded: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for line in encoded.splitlines():
+            term, _, frequency = line.rpartition("\t")
+            counts[term] = int(frequency)
+        return counts
@@ -0,0 +1,654 @@
+"""Shared client for LLM calls: concurrency limits, rate limiting, retries, hedging and metrics."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..config import Settings
+from .components import Lazy
+
+# Statuses worth another attempt: timeouts, rate limits and transient server errors.
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+LATENCY_WINDOW = 2048
+
+
+@dataclass
+class LLMResponse:
+    """Generated text, with token counts when the provider reports them.
+
+    Streaming backends yield one response per piece; usually only the last
+    piece carries the counts.
+    """
+
+    text: str
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class LLMError(RuntimeError):
+    """A failed LLM call, with the provider's HTTP status when known."""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a call that raised ``error`` may succeed when repeated."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # google.api_core errors carry the HTTP status as ``code``, as does LLMError.
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS
+
+
+class LLMBackend(ABC):
+    """One provider's text generation API."""
+
+    @abstractmethod
+    def generate(self, prompt: str, model: str, timeout: float) -> LLMResponse:
+        """Return the complete response to ``prompt``."""
+
+    @abstractmethod
+    def stream(self, prompt: str, model: str, timeout: float) -> Iterator[LLMResponse]:
+        """Yield the response to ``prompt`` piece by piece."""
+
+    async def agenerate(self, prompt: str, model: str, timeout: float) -> LLMResponse:
+        """Awaitable :meth:`generate`; runs it in a worker thread unless overridden."""
+        return await asyncio.to_thread(self.generate, prompt, model, timeout)
+
+    async def astream(self, prompt: str, model: str, timeout: float) -> AsyncIterator[LLMResponse]:
+        """Asynchronous :meth:`stream`; pulls each piece in a worker thread unless overridden."""
+        pieces = iter(self.stream(prompt, model, timeout))
+        while True:
+            piece = await asyncio.to_thread(next, pieces, None)
+            if piece is None:
+                return
+            yield piece
+
+
+class FakeLLMBackend(LLMBackend):
+    """Offline backend for tests and local development.
+
+    ``reply`` maps a prompt to the response text; by default the leading
+    sentences of the text after the prompt's last ``":\\n"`` are returned.
+    Each call sleeps for ``latency`` seconds, or for the value returned when
+    ``latency`` is a callable, and raises the next exception from
+    ``failures`` while any are left. Prompts are recorded in ``calls``.
+    """
+
+    _SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+
+    def __init__(
+        self,
+        reply: Optional[Callable[[str], str]] = None,
+        latency: Union[float, Callable[[], float]] = 0.0,
+        failures: Iterable[BaseException] = (),
+        stream_pieces: int = 4,
+    ):
+        self._reply = reply or self._leading_sentences
+        self._latency = latency
+        self._failures: Deque[BaseException] = deque(failures)
+        self._stream_pieces = max(1, stream_pieces)
+        self._lock = threading.Lock()
+        self.calls: List[str] = []
+
+    def generate(self, prompt: str, model: str, timeout: float) -> LLMResponse:
+        failure, delay = self._begin(prompt, timeout)
+        time.sleep(delay)
+        return self._complete(prompt, failure)
+
+    def stream(self, prompt: str, model: str, timeout: float) -> Iterator[LLMResponse]:
+        failure, delay = self._begin(prompt, timeout)
+        time.sleep(delay)
+        yield from self._pieces(self._complete(prompt, failure), prompt)
+
+    async def agenerate(self, prompt: str, model: str, timeout: float) -> LLMResponse:
+        failure, delay = self._begin(prompt, timeout)
+        await asyncio.sleep(delay)
+        return self._complete(prompt, failure)
+
+    async def astream(self, prompt: str, model: str, timeout: float) -> AsyncIterator[LLMResponse]:
+        failure, delay = self._begin(prompt, timeout)
+        await asyncio.sleep(delay)
+        for piece in self._pieces(self._complete(prompt, failure), prompt):
+            yield piece
+
+    def _begin(self, prompt: str, timeout: float) -> Tuple[Optional[BaseException], float]:
+        """Record the call; return the failure to raise and how long to wait before answering."""
+        with self._lock:
+            self.calls.append(prompt)
+            failure = self._failures.popleft() if self._failures else None
+        latency = self._latency() if callable(self._latency) else self._latency
+        if latency > timeout:
+            return TimeoutError(f"Fake LLM call exceeded {timeout}s"), timeout
+        return failure, latency
+
+    def _complete(self, prompt: str, failure: Optional[BaseException]) -> LLMResponse:
+        if failure is not None:
+            raise failure
+        text = self._reply(prompt)
+        return LLMResponse(text, len(prompt.split()), len(text.split()))
+
+    def _pieces(self, response: LLMResponse, prompt: str) -> List[LLMResponse]:
+        text = response.text
+        size = max(1, -(-len(text) // self._stream_pieces))
+        pieces = [LLMResponse(text[start : start + size]) for start in range(0, len(text), size)] or [LLMResponse("")]
+        pieces[-1] = LLMResponse(pieces[-1].text, response.prompt_tokens, response.output_tokens)
+        return pieces
+
+    @classmethod
+    def _leading_sentences(cls, prompt: str, count: int = 3) -> str:
+        _, _, body = prompt.rpartition(":\n")
+        sentences = [part.strip() for part in cls._SENTENCE_END.split(body.strip()) if part.strip()]
+        return " ".join(sentences[:count])
+
+
+class TokenBucket:
+    """Admit ``rate`` calls per second on average, with bursts of up to ``burst`` calls.
+
+    Callers reserve a token and then sleep outside the lock until it is
+    due, so waiters are served in arrival order without busy polling.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = rate
+        self._burst = max(1.0, burst)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, blocking until it is available; return the seconds waited."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+    def try_acquire(self) -> bool:
+        """Take one token only if it is available right away."""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class CallSlots:
+    """A counting semaphore that threads and coroutines can wait on together.
+
+    Slots are handed to waiters in arrival order. A coroutine waits on a
+    future of its own event loop, so it never blocks a thread while queued.
+    """
+
+    def __init__(self, size: int):
+        self._free = size
+        self._waiters: Deque[Union[threading.Event, "asyncio.Future[None]"]] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True) -> bool:
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return True
+            if not blocking:
+                return False
+            event = threading.Event()
+            self._waiters.append(event)
+        # release() passes its slot straight to us before setting the event.
+        event.wait()
+        return True
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            waiter: "asyncio.Future[None]" = loop.create_future()
+            self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over as we were cancelled; pass it on.
+            self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                if not waiter.get_loop().is_closed():
+                    waiter.get_loop().call_soon_threadsafe(_hand_over, waiter)
+                    return
+            self._free += 1
+
+
+def _hand_over(waiter: "asyncio.Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class _ModelMetrics:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+
+class LLMMetrics:
+    """Per-model call counts, token totals and latency percentiles over recent calls."""
+
+    def __init__(self) -> None:
+        self._models: Dict[str, _ModelMetrics] = defaultdict(_ModelMetrics)
+        self._lock = threading.Lock()
+        self._throttled_seconds = 0.0
+
+    def record_call(self, model: str, seconds: float, response: Optional[LLMResponse]) -> None:
+        with self._lock:
+            entry = self._models[model]
+            entry.calls += 1
+            entry.latencies.append(seconds)
+            if response is not None:
+                entry.prompt_tokens += response.prompt_tokens or 0
+                entry.output_tokens += response.output_tokens or 0
+
+    def record_failure(self, model: str) -> None:
+        with self._lock:
+            self._models[model].failures += 1
+
+    def record_retry(self, model: str) -> None:
+        with self._lock:
+            self._models[model].retries += 1
+
+    def record_hedge(self, model: str, won: bool) -> None:
+        with self._lock:
+            entry = self._models[model]
+            entry.hedges += 1
+            entry.hedge_wins += int(won)
+
+    def record_throttle(self, seconds: float) -> None:
+        with self._lock:
+            self._throttled_seconds += seconds
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            models: Dict[str, object] = {}
+            for model, entry in self._models.items():
+                latencies = sorted(entry.latencies)
+                models[model] = {
+                    "calls": entry.calls,
+                    "failures": entry.failures,
+                    "retries": entry.retries,
+                    "hedges": entry.hedges,
+                    "hedge_wins": entry.hedge_wins,
+                    "prompt_tokens": entry.prompt_tokens,
+                    "output_tokens": entry.output_tokens,
+                    "latency_ms": {
+                        f"p{percentile}": _percentile_ms(latencies, percentile) for percentile in (50, 95, 99)
+                    },
+                }
+            return {"models": models, "throttled_seconds": round(self._throttled_seconds, 3)}
+
+
+def _percentile_ms(ordered: List[float], percentile: int) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+class LLMClient:
+    """Route every LLM call of the process through shared limits.
+
+    At most ``max_in_flight`` calls run at once and, when
+    ``requests_per_minute`` is set, new calls start no faster than a token
+    bucket allows. Calls failing with a retryable error are repeated up to
+    ``max_retries`` times after a full-jitter exponential backoff. With
+    ``hedge_after`` set, a non-streaming call still running after that many
+    seconds is duplicated if a slot and a token are free right away, and
+    the first response wins. Streams are retried only until their first
+    piece arrived and are never hedged.
+
+    :meth:`agenerate` and :meth:`astream` do the same for coroutines,
+    waiting without holding a thread and sharing the same slots, so sync
+    and async callers together stay within ``max_in_flight``.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        *,
+        max_in_flight: int = 8,
+        requests_per_minute: float = 0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        timeout: float = 60.0,
+        hedge_after: Optional[float] = None,
+    ):
+        self._backend = backend
+        self._max_in_flight = max(1, max_in_flight)
+        self._slots = CallSlots(self._max_in_flight)
+        self._bucket = TokenBucket(requests_per_minute / 60, self._max_in_flight) if requests_per_minute > 0 else None
+        self._max_retries = max(0, max_retries)
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._timeout = timeout
+        self._hedge_after = hedge_after if hedge_after and hedge_after > 0 else None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.metrics = LLMMetrics()
+
+    @classmethod
+    def from_settings(cls, settings: Settings, backend: Optional[LLMBackend] = None) -> "LLMClient":
+        if backend is None:
+            if settings.llm_backend == "fake":
+                backend = FakeLLMBackend()
+            else:
+                from .gemini import GeminiBackend
+
+                backend = GeminiBackend()
+        return cls(
+            backend,
+            max_in_flight=settings.llm_max_in_flight,
+            requests_per_minute=settings.llm_requests_per_minute,
+            max_retries=settings.llm_max_retries,
+            timeout=settings.llm_timeout_seconds,
+            hedge_after=settings.llm_hedge_after_ms / 1000,
+        )
+
+    @property
+    def backend(self) -> LLMBackend:
+        return self._backend
+
+    def generate(self, prompt: str, model: str) -> str:
+        """Return the response text; matches the ``(prompt, model)`` generator signature."""
+        return self._with_retries(model, lambda: self._hedged(prompt, model)).text
+
+    def stream(self, prompt: str, model: str) -> Iterator[str]:
+        """Yield response text pieces while holding one in-flight slot."""
+        attempt = 0
+        while True:
+            with self._slot():
+                started = time.perf_counter()
+                try:
+                    pieces = iter(self._backend.stream(prompt, model, self._timeout))
+                    first = next(pieces, None)
+                except Exception as exc:
+                    if not self._should_retry(model, exc, attempt):
+                        raise
+                else:
+                    usage = first
+                    try:
+                        if first is not None:
+                            yield first.text
+                        for piece in pieces:
+                            usage = piece
+                            yield piece.text
+                    except Exception:
+                        self.metrics.record_failure(model)
+                        raise
+                    self.metrics.record_call(model, time.perf_counter() - started, usage)
+                    return
+            self._backoff(attempt)
+            attempt += 1
+
+    async def agenerate(self, prompt: str, model: str) -> str:
+        """Awaitable :meth:`generate`."""
+        return (await self._awith_retries(model, lambda: self._ahedged(prompt, model))).text
+
+    async def astream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        """Asynchronous :meth:`stream`."""
+        attempt = 0
+        while True:
+            async with self._aslot():
+                started = time.perf_counter()
+                pieces = self._backend.astream(prompt, model, self._timeout).__aiter__()
+                try:
+                    first = await pieces.__anext__()
+                except StopAsyncIteration:
+                    first = None
+                except Exception as exc:
+                    if not self._should_retry(model, exc, attempt):
+                        raise
+                else:
+                    usage = first
+                    try:
+                        if first is not None:
+                            yield first.text
+                            async for piece in pieces:
+                                usage = piece
+                                yield piece.text
+                    except Exception:
+                        self.metrics.record_failure(model)
+                        raise
+                    self.metrics.record_call(model, time.perf_counter() - started, usage)
+                    return
+            await asyncio.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    def stats(self) -> Dict[str, object]:
+        stats = self.metrics.stats()
+        stats["max_in_flight"] = self._max_in_flight
+        return stats
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _with_retries(self, model: str, call: Callable[[], LLMResponse]) -> LLMResponse:
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except Exception as exc:
+                if not self._should_retry(model, exc, attempt):
+                    raise
+            self._backoff(attempt)
+            attempt += 1
+
+    def _should_retry(self, model: str, error: Exception, attempt: int) -> bool:
+        if attempt >= self._max_retries or not is_retryable(error):
+            self.metrics.record_failure(model)
+            return False
+        self.metrics.record_retry(model)
+        return True
+
+    def _backoff(self, attempt: int) -> None:
+        time.sleep(self._backoff_delay(attempt))
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self._backoff_max, self._backoff_base * 2**attempt))
+
+    def _hedged(self, prompt: str, model: str) -> LLMResponse:
+        if self._hedge_after is None:
+            return self._in_slot(prompt, model)
+
+        executor = self._pool()
+        primary = executor.submit(self._in_slot, prompt, model)
+        done, _ = wait([primary], timeout=self._hedge_after)
+        if done or not self._try_slot():
+            return primary.result()
+        backup = executor.submit(self._timed_releasing, prompt, model)
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    response = future.result()
+                except Exception as exc:
+                    error = exc
+                    continue
+                self.metrics.record_hedge(model, won=future is backup)
+                return response
+        self.metrics.record_hedge(model, won=False)
+        assert error is not None
+        raise error
+
+    def _in_slot(self, prompt: str, model: str) -> LLMResponse:
+        with self._slot():
+            return self._timed(prompt, model)
+
+    def _timed_releasing(self, prompt: str, model: str) -> LLMResponse:
+        try:
+            return self._timed(prompt, model)
+        finally:
+            self._slots.release()
+
+    def _timed(self, prompt: str, model: str) -> LLMResponse:
+        started = time.perf_counter()
+        response = self._backend.generate(prompt, model, self._timeout)
+        self.metrics.record_call(model, time.perf_counter() - started, response)
+        return response
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        self._slots.acquire()
+        try:
+            if self._bucket is not None:
+                waited = self._bucket.acquire()
+                if waited:
+                    self.metrics.record_throttle(waited)
+            yield
+        finally:
+            self._slots.release()
+
+    def _try_slot(self) -> bool:
+        if not self._slots.acquire(blocking=False):
+            return False
+        if self._bucket is not None and not self._bucket.try_acquire():
+            self._slots.release()
+            return False
+        return True
+
+    async def _awith_retries(self, model: str, call: Callable[[], Awaitable[LLMResponse]]) -> LLMResponse:
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as exc:
+                if not self._should_retry(model, exc, attempt):
+                    raise
+            await asyncio.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    async def _ahedged(self, prompt: str, model: str) -> LLMResponse:
+        if self._hedge_after is None:
+            return await self._ain_slot(prompt, model)
+
+        primary = asyncio.ensure_future(self._ain_slot(prompt, model))
+        done, _ = await asyncio.wait([primary], timeout=self._hedge_after)
+        if done or not self._try_slot():
+            return await primary
+        backup = asyncio.ensure_future(self._atimed_releasing(prompt, model))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    if future.exception() is not None:
+                        error = future.exception()
+                        continue
+                    self.metrics.record_hedge(model, won=future is backup)
+                    return future.result()
+        finally:
+            # Unlike threads, the losing call can be cancelled, which frees its slot at once.
+            for future in pending:
+                future.cancel()
+        self.metrics.record_hedge(model, won=False)
+        assert error is not None
+        raise error
+
+    async def _ain_slot(self, prompt: str, model: str) -> LLMResponse:
+        async with self._aslot():
+            return await self._atimed(prompt, model)
+
+    async def _atimed_releasing(self, prompt: str, model: str) -> LLMResponse:
+        try:
+            return await self._atimed(prompt, model)
+        finally:
+            self._slots.release()
+
+    async def _atimed(self, prompt: str, model: str) -> LLMResponse:
+        started = time.perf_counter()
+        response = await self._backend.agenerate(prompt, model, self._timeout)
+        self.metrics.record_call(model, time.perf_counter() - started, response)
+        return response
+
+    @asynccontextmanager
+    async def _aslot(self) -> AsyncIterator[None]:
+        await self._slots.acquire_async()
+        try:
+            if self._bucket is not None:
+                waited = self._bucket.reserve()
+                if waited:
+                    await asyncio.sleep(waited)
+                    self.metrics.record_throttle(waited)
+            yield
+        finally:
+            self._slots.release()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # Room for every primary call plus one hedge each.
+                self._executor = ThreadPoolExecutor(max_workers=2 * self._max_in_flight, thread_name_prefix="llm")
+            return self._executor
+
+
+def _client_from_environment() -> LLMClient:
+    return LLMClient.from_settings(Settings())
+
+
+_shared: Lazy[LLMClient] = Lazy(_client_from_environment)
+
+
+def get_client() -> LLMClient:
+    """The process-wide client, built from the environment on first use."""
+    return _shared.get()
+
+
+def set_client(client: LLMClient) -> None:
+    """Replace the process-wide client, e.g. with one configured by the app factory."""
+    global _shared
+    _shared = Lazy(lambda: client)
@@ -0,0 +1,623 @@
+"""Local vector index in memory-mapped files, shareable across worker processes."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vector_backend import DocumentWrite, Hit, StoredChunk, VectorBackend
+
+DTYPES = {"float32": np.float32, "int8": np.int8}
+_LOOKUP_BATCH = 500
+
+
+@dataclass
+class _IVF:
+    centroids: np.ndarray
+    order: np.ndarray
+    offsets: np.ndarray
+    covered_rows: int
+
+
+@dataclass
+class _Snapshot:
+    """Committed index state as seen by this process."""
+
+    version: int = -1
+    layout: int = 0
+    rows: int = 0
+    dim: int = 0
+    vectors: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+    ranges: Optional[Dict[str, Tuple[int, int]]] = None
+    live: Optional[np.ndarray] = None
+    live_count: int = 0
+    ivf: Optional[_IVF] = None
+
+
+class MmapVectorBackend(VectorBackend):
+    """Chunk vectors in append-only memory-mapped files, one row range per document.
+
+    Vectors are stored as float32, or as int8 with a float32 scale per row,
+    in flat files that every process maps read-only; gunicorn workers thus
+    share a single copy through the page cache. Chunk text, metadata and
+    each document's row range live in SQLite, whose write lock also
+    serializes writers across processes. Rewriting a document appends a new
+    range and leaves the old rows dead until they are compacted away.
+
+    Compaction and IVF builds write new files under a generation number
+    drawn from a counter in SQLite, so concurrent builders never share file
+    names, and the files they supersede are only unlinked after the commit
+    that stops referencing them.
+
+    Up to ``exact_max_rows`` live rows, queries are exact batched dot
+    products. Larger corpora are searched through an IVF index (k-means
+    lists, ``nprobe`` lists per query) plus an exact scan of the rows added
+    since the index was built. Filtering by document narrows the scan to the
+    documents' row ranges.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        dtype: str = "float32",
+        exact_max_rows: int = 50000,
+        nprobe: int = 8,
+        block_rows: int = 8192,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        directory.mkdir(parents=True, exist_ok=True)
+        self._directory = directory
+        self._dtype = np.dtype(DTYPES[dtype])
+        self._exact_max_rows = exact_max_rows
+        self._nprobe = nprobe
+        self._block_rows = block_rows
+        self._dtype_name = dtype
+        self._lock = threading.RLock()
+        self._state = _Snapshot()
+
+        self._connection = sqlite3.connect(
+            str(directory / "index.sqlite3"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id TEXT PRIMARY KEY, start INTEGER NOT NULL, stop INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                document_id TEXT NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document_id);
+            """
+        )
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            meta = self._read_meta()
+            if "dtype" not in meta:
+                self._set_meta(
+                    dtype=self._dtype.itemsize,
+                    version=0,
+                    layout=0,
+                    rows=0,
+                    dim=0,
+                    generation=0,
+                    vectors_generation=0,
+                    ivf_generation=0,
+                )
+            self._connection.execute("COMMIT")
+            if meta.get("dtype", self._dtype.itemsize) != self._dtype.itemsize:
+                raise ValueError(f"Index in {directory} was built with a different vector dtype")
+        self._refresh()
+
+    def get_document(self, document_id: str) -> List[StoredChunk]:
+        for _ in range(3):
+            with self._lock:
+                # One read transaction keeps the row numbers and the mapped files consistent.
+                self._connection.execute("BEGIN")
+                try:
+                    state = self._refresh()
+                    rows = self._connection.execute(
+                        "SELECT chunk_id, content, metadata, row FROM chunks WHERE document_id = ? ORDER BY row",
+                        (document_id,),
+                    ).fetchall()
+                    if not rows:
+                        return []
+                    vectors = self._dequantize(state, np.array([row for _, _, _, row in rows]))
+                    break
+                except FileNotFoundError:
+                    # A compaction committed after this snapshot and removed the files it names.
+                    continue
+                finally:
+                    self._connection.execute("COMMIT")
+        else:
+            raise RuntimeError("The vector index was compacted repeatedly during the read")
+        return [
+            StoredChunk(chunk_id, content, json.loads(metadata), vector)
+            for (chunk_id, content, metadata, _), vector in zip(rows, vectors)
+        ]
+
+    def write_document(self, document_id: str, write: DocumentWrite) -> None:
+        self.write_documents({document_id: write})
+
+    def write_documents(self, writes: Mapping[str, DocumentWrite]) -> None:
+        """Append the rows of every document with one file write and one transaction."""
+        for write in writes.values():
+            if len(write.embeddings) != len(write.ids):
+                raise ValueError("Every chunk needs an embedding")
+        filled = [(document_id, write) for document_id, write in writes.items() if write.ids]
+        embeddings = (
+            np.concatenate([np.asarray(write.embeddings, dtype=np.float32) for _, write in filled]) if filled else None
+        )
+
+        def apply(meta: Dict[str, int]) -> None:
+            removed = [(document_id,) for document_id in writes]
+            self._connection.executemany("DELETE FROM chunks WHERE document_id = ?", removed)
+            self._connection.executemany("DELETE FROM documents WHERE document_id = ?", removed)
+            if embeddings is None:
+                return
+            start = self._append(meta, embeddings)
+            chunk_rows = []
+            document_rows = []
+            for document_id, write in filled:
+                document_rows.append((document_id, start, start + len(write.ids)))
+                for chunk_id, content, metadata in zip(write.ids, write.documents, write.metadatas):
+                    chunk_rows.append((start, chunk_id, document_id, content, json.dumps(metadata)))
+                    start += 1
+            self._connection.executemany(
+                "INSERT INTO chunks (row, chunk_id, document_id, content, metadata) VALUES (?, ?, ?, ?, ?)",
+                chunk_rows,
+            )
+            self._connection.executemany(
+                "INSERT INTO documents (document_id, start, stop) VALUES (?, ?, ?)", document_rows
+            )
+
+        self._write(apply)
+        self._maintain()
+
+    def delete_document(self, document_id: str) -> None:
+        def apply(meta: Dict[str, int]) -> None:
+            self._connection.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self._connection.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+
+        self._write(apply)
+        self._maintain()
+
+    def get_chunks(self, ids: Sequence[str]) -> Dict[str, Hit]:
+        found: Dict[str, Hit] = {}
+        ids = list(ids)
+        with self._lock:
+            for start in range(0, len(ids), _LOOKUP_BATCH):
+                batch = ids[start : start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for chunk_id, content, metadata in self._connection.execute(
+                    f"SELECT chunk_id, content, metadata FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                ):
+                    found[chunk_id] = Hit(chunk_id, content, json.loads(metadata), None)
+        return found
+
+    def query(
+        self,
+        embeddings: np.ndarray,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> List[List[Hit]]:
+        queries = np.asarray(embeddings, dtype=np.float32)
+        for _ in range(3):
+            state = self._refresh()
+            if not state.live_count or queries.size == 0:
+                return [[] for _ in range(len(queries))]
+            results = self._search(state, queries.reshape(len(queries), state.dim), k, document_ids)
+            hits = self._hits(state, results)
+            if hits is not None:
+                return hits
+        raise RuntimeError("The vector index was compacted repeatedly during the query")
+
+    def count(self) -> int:
+        return self._refresh().live_count
+
+    def close(self) -> None:
+        with self._lock:
+            self._state = _Snapshot()
+            self._connection.close()
+
+    # Search
+
+    def _search(
+        self,
+        state: _Snapshot,
+        queries: np.ndarray,
+        k: int,
+        document_ids: Optional[Sequence[str]],
+    ) -> List[List[Tuple[int, float]]]:
+        if document_ids:
+            spans = self._merge_spans(state.ranges.get(document_id) for document_id in document_ids)
+            if sum(stop - start for start, stop in spans) <= self._exact_max_rows or state.ivf is None:
+                results = self._exact(state, queries, k, spans, mask=None)
+            else:
+                allowed = np.zeros(state.rows, dtype=bool)
+                for start, stop in spans:
+                    allowed[start:stop] = True
+                results = [self._ivf_search(state, query, k, allowed) for query in queries]
+        elif state.ivf is None or state.live_count <= self._exact_max_rows:
+            results = self._exact(state, queries, k, [(0, state.rows)], mask=state.live)
+        else:
+            results = [self._ivf_search(state, query, k, state.live) for query in queries]
+        return results
+
+    def _exact(
+        self,
+        state: _Snapshot,
+        queries: np.ndarray,
+        k: int,
+        spans: List[Tuple[int, int]],
+        mask: Optional[np.ndarray],
+    ) -> List[List[Tuple[int, float]]]:
+        """Batched brute-force top-k over ``spans``, one matrix product per block of rows."""
+        count = len(queries)
+        best_scores = np.full((count, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((count, 0), dtype=np.int64)
+        for span_start, span_stop in spans:
+            for start in range(span_start, span_stop, self._block_rows):
+                stop = min(start + self._block_rows, span_stop)
+                scores = self._scores(state, np.arange(start, stop), queries, contiguous=True)
+                if mask is not None:
+                    scores[:, ~mask[start:stop]] = -np.inf
+                rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, rows], axis=1)
+                if best_scores.shape[1] > k:
+                    keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return [self._ranked(rows, scores, k) for rows, scores in zip(best_rows, best_scores)]
+
+    def _ivf_search(
+        self,
+        state: _Snapshot,
+        query: np.ndarray,
+        k: int,
+        allowed: np.ndarray,
+    ) -> List[Tuple[int, float]]:
+        ivf = state.ivf
+        assert ivf is not None
+        probes = min(self._nprobe, len(ivf.centroids))
+        lists = np.argpartition(-(ivf.centroids @ query), probes - 1)[:probes]
+        candidates = [ivf.order[ivf.offsets[index] : ivf.offsets[index + 1]] for index in lists]
+        candidates.append(np.arange(ivf.covered_rows, state.rows))
+        rows = np.concatenate(candidates)
+        rows = np.sort(rows[allowed[rows]])
+        if not len(rows):
+            return []
+        scores = self._scores(state, rows, query.reshape(1, -1), contiguous=False)[0]
+        return self._ranked(rows, scores, k)
+
+    def _scores(self, state: _Snapshot, rows: np.ndarray, queries: np.ndarray, contiguous: bool) -> np.ndarray:
+        vectors = state.vectors
+        assert vectors is not None
+        block = vectors[rows[0] : rows[-1] + 1] if contiguous else vectors[rows]
+        scores = queries @ block.astype(np.float32, copy=False).T
+        if state.scales is not None:
+            scales = state.scales[rows[0] : rows[-1] + 1] if contiguous else state.scales[rows]
+            scores *= scales
+        return scores
+
+    @staticmethod
+    def _ranked(rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        order = np.argsort(-scores)[:k]
+        return [(int(rows[index]), float(scores[index])) for index in order if np.isfinite(scores[index])]
+
+    def _hits(self, state: _Snapshot, results: List[List[Tuple[int, float]]]) -> Optional[List[List[Hit]]]:
+        """Resolve rows to chunks, or return ``None`` if a compaction renumbered the rows meanwhile."""
+        wanted = sorted({row for ranked in results for row, _ in ranked})
+        by_row: Dict[int, Tuple[str, str, Dict[str, Any]]] = {}
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                if self._read_meta()["layout"] != state.layout:
+                    return None
+                for start in range(0, len(wanted), _LOOKUP_BATCH):
+                    batch = wanted[start : start + _LOOKUP_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    for row, chunk_id, content, metadata in self._connection.execute(
+                        f"SELECT row, chunk_id, content, metadata FROM chunks WHERE row IN ({placeholders})", batch
+                    ):
+                        by_row[row] = (chunk_id, content, json.loads(metadata))
+            finally:
+                self._connection.execute("COMMIT")
+        return [
+            [
+                Hit(*by_row[row], similarity=min(max(score, 0.0), 1.0))
+                for row, score in ranked
+                if row in by_row
+            ]
+            for ranked in results
+        ]
+
+    @staticmethod
+    def _merge_spans(ranges) -> List[Tuple[int, int]]:
+        spans: List[Tuple[int, int]] = []
+        for start, stop in sorted(span for span in ranges if span):
+            if spans and start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(stop, spans[-1][1]))
+            else:
+                spans.append((start, stop))
+        return spans
+
+    # Storage
+
+    def _dequantize(self, state: _Snapshot, rows: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(state.vectors[rows], dtype=np.float32)
+        if state.scales is not None:
+            vectors *= state.scales[rows][:, None]
+        return vectors
+
+    def _quantize(self, embeddings: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self._dtype != np.int8:
+            return embeddings, None
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _append(self, meta: Dict[str, int], embeddings: np.ndarray) -> int:
+        """Append rows after the committed ones, dropping any torn tail from a failed write."""
+        dim = meta["dim"] or embeddings.shape[1]
+        if embeddings.shape[1] != dim:
+            raise ValueError(f"Expected {dim}-dimensional embeddings, got {embeddings.shape[1]}")
+        start = meta["rows"]
+        data, scales = self._quantize(embeddings)
+        generation = meta.get("vectors_generation", 0)
+        self._append_file(self._vectors_file(generation), start * dim * self._dtype.itemsize, data)
+        if scales is not None:
+            self._append_file(self._scales_file(generation), start * 4, scales)
+        meta["rows"] = start + len(embeddings)
+        meta["dim"] = dim
+        return start
+
+    @staticmethod
+    def _append_file(path: Path, offset: int, data: np.ndarray) -> None:
+        with path.open("r+b" if path.exists() else "wb") as handle:
+            handle.truncate(offset)
+            handle.seek(offset)
+            handle.write(np.ascontiguousarray(data).tobytes())
+
+    def _write(self, apply) -> None:
+        """Run ``apply`` in a write transaction; it may return files that are obsolete once committed."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._read_meta()
+                obsolete = apply(meta)
+                meta["version"] += 1
+                self._set_meta(**meta)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        # Processes that still map these files keep reading them until they refresh.
+        self._unlink(obsolete or ())
+        self._refresh()
+
+    def _next_generation(self) -> int:
+        """Reserve a file generation number that no other writer, in any process, will get."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._read_meta()
+                generation = self._allocate_generation(meta)
+                self._set_meta(generation=generation)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return generation
+
+    @staticmethod
+    def _allocate_generation(meta: Dict[str, int]) -> int:
+        # Indexes from before the counter named IVF files after a version, so start past it.
+        generation = max(meta.get("generation", 0), meta["version"]) + 1
+        meta["generation"] = generation
+        return generation
+
+    def _maintain(self) -> None:
+        """Compact once dead rows outnumber live ones, and keep the IVF index current."""
+        state = self._refresh()
+        dead = state.rows - state.live_count
+        if dead > max(state.live_count, 1024):
+            self._compact()
+            state = self._refresh()
+        if state.live_count <= self._exact_max_rows:
+            return
+        if state.ivf is None or state.rows - state.ivf.covered_rows > state.ivf.covered_rows // 5:
+            self._build_ivf(state)
+
+    def _compact(self) -> None:
+        written: List[Path] = []
+
+        def apply(meta: Dict[str, int]) -> Optional[List[Path]]:
+            state = self._load(meta)
+            if state.rows - state.live_count <= max(state.live_count, 1024):
+                return None  # another writer compacted first
+            spans = sorted(state.ranges.items(), key=lambda item: item[1][0])
+            dim = meta["dim"]
+            previous = meta.get("vectors_generation", 0)
+            generation = self._allocate_generation(meta)
+            vectors_path, scales_path = self._vectors_file(generation), self._scales_file(generation)
+            written.extend((vectors_path, scales_path))
+            self._connection.execute("UPDATE chunks SET row = -row - 1")
+            position = 0
+            with vectors_path.open("wb") as vectors_out, scales_path.open("wb") as scales_out:
+                for document_id, (start, stop) in spans:
+                    vectors_out.write(np.ascontiguousarray(state.vectors[start:stop]).tobytes())
+                    if state.scales is not None:
+                        scales_out.write(np.ascontiguousarray(state.scales[start:stop]).tobytes())
+                    self._connection.execute(
+                        "UPDATE chunks SET row = ? + (-row - 1) - ? WHERE document_id = ?",
+                        (position, start, document_id),
+                    )
+                    self._connection.execute(
+                        "UPDATE documents SET start = ?, stop = ? WHERE document_id = ?",
+                        (position, position + stop - start, document_id),
+                    )
+                    position += stop - start
+            if state.scales is None:
+                scales_path.unlink()
+            obsolete = [self._vectors_file(previous), self._scales_file(previous)]
+            obsolete.extend(self._ivf_files(meta.get("ivf_generation", 0)))
+            meta.update(
+                rows=position, dim=dim, layout=meta["layout"] + 1, vectors_generation=generation, ivf_generation=0
+            )
+            return obsolete
+
+        try:
+            self._write(apply)
+        except BaseException:
+            self._unlink(written)
+            raise
+
+    def _build_ivf(self, state: _Snapshot) -> None:
+        """Cluster all current rows with spherical k-means and store the inverted lists."""
+        rows = state.rows
+        lists = max(16, int(np.sqrt(rows)))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, size=min(rows, lists * 64), replace=False))
+        points = self._dequantize(state, sample)
+        centroids = points[rng.choice(len(points), size=lists, replace=False)]
+        for _ in range(10):
+            assignment = np.argmax(points @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, points)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        assignment = np.empty(rows, dtype=np.int64)
+        for start in range(0, rows, self._block_rows):
+            stop = min(start + self._block_rows, rows)
+            block = self._dequantize(state, np.arange(start, stop))
+            assignment[start:stop] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(lists + 1))
+
+        generation = self._next_generation()
+        written = self._ivf_files(generation)
+        try:
+            for name, array in (("centroids", centroids.astype(np.float32)), ("order", order), ("offsets", offsets)):
+                np.save(self._ivf_file(generation, name), array)
+        except BaseException:
+            self._unlink(written)
+            raise
+
+        def apply(meta: Dict[str, int]) -> List[Path]:
+            if meta["layout"] != state.layout:
+                # Rows were renumbered while we were building; the lists are useless now.
+                return written
+            if meta.get("ivf_generation", 0) and meta.get("ivf_rows", 0) >= rows:
+                # Another builder already committed lists covering at least as many rows.
+                return written
+            previous = meta.get("ivf_generation", 0)
+            meta.update(ivf_generation=generation, ivf_rows=rows)
+            return self._ivf_files(previous)
+
+        try:
+            self._write(apply)
+        except BaseException:
+            self._unlink(written)
+            raise
+
+    def _vectors_file(self, generation: int) -> Path:
+        suffix = f"-{generation}" if generation else ""
+        return self._directory / f"vectors{suffix}.{self._dtype_name}"
+
+    def _scales_file(self, generation: int) -> Path:
+        suffix = f"-{generation}" if generation else ""
+        return self._directory / f"scales{suffix}.float32"
+
+    def _ivf_file(self, generation: int, name: str) -> Path:
+        return self._directory / f"ivf-{generation}.{name}.npy"
+
+    def _ivf_files(self, generation: int) -> List[Path]:
+        if not generation:
+            return []
+        return [self._ivf_file(generation, name) for name in ("centroids", "order", "offsets")]
+
+    @staticmethod
+    def _unlink(paths: Iterable[Path]) -> None:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    # Process-local state
+
+    def _refresh(self) -> _Snapshot:
+        """Re-map the files when another write (from any process) committed since the last look."""
+        with self._lock:
+            if self._connection.in_transaction:
+                return self._refresh_in_transaction()
+            for _ in range(2):
+                try:
+                    return self._refresh_snapshot()
+                except FileNotFoundError:
+                    # The files were superseded and removed after our snapshot; a new one names their successors.
+                    continue
+            return self._refresh_snapshot()
+
+    def _refresh_snapshot(self) -> _Snapshot:
+        # Meta, row ranges and file names must all come from the same commit.
+        self._connection.execute("BEGIN")
+        try:
+            return self._refresh_in_transaction()
+        finally:
+            self._connection.execute("COMMIT")
+
+    def _refresh_in_transaction(self) -> _Snapshot:
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        version = row[0] if row else 0
+        if version != self._state.version:
+            self._state = self._load(self._read_meta())
+        return self._state
+
+    def _load(self, meta: Dict[str, int]) -> _Snapshot:
+        rows, dim = meta["rows"], meta["dim"]
+        state = _Snapshot(version=meta["version"], layout=meta["layout"], rows=rows, dim=dim, ranges={})
+        if rows and dim:
+            generation = meta.get("vectors_generation", 0)
+            state.vectors = np.memmap(self._vectors_file(generation), dtype=self._dtype, mode="r", shape=(rows, dim))
+            if self._dtype == np.int8:
+                state.scales = np.memmap(self._scales_file(generation), dtype=np.float32, mode="r", shape=(rows,))
+        state.live = np.zeros(rows, dtype=bool)
+        for document_id, start, stop in self._connection.execute("SELECT document_id, start, stop FROM documents"):
+            state.ranges[document_id] = (start, stop)
+            state.live[start:stop] = True
+        state.live_count = int(state.live.sum())
+        generation = meta.get("ivf_generation", 0)
+        if generation:
+            state.ivf = _IVF(
+                centroids=np.load(self._ivf_file(generation, "centroids"), mmap_mode="r"),
+                order=np.load(self._ivf_file(generation, "order"), mmap_mode="r"),
+                offsets=np.load(self._ivf_file(generation, "offsets")),
+                covered_rows=meta["ivf_rows"],
+            )
+        return state
+
+    def _read_meta(self) -> Dict[str, int]:
+        return dict(self._connection.execute("SELECT key, value FROM meta").fetchall())
+
+    def _set_meta(self, **values: int) -> None:
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", list(values.items())
+        )
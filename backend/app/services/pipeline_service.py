@@ -2,76 +2,368 @@
 
 from __future__ import annotations
 
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 from werkzeug.datastructures import FileStorage
 
 from ..config import Settings
-from ..models import Document
-from .chunker import split_text
-from .document_store import create_document, delete_by_document_id, get_by_document_id
+from ..extensions import db
+from ..models import SUMMARY_FAILED, SUMMARY_PENDING, SUMMARY_READY, Document, IngestionJob
+from .chunker import Chunk, Chunker
+from .components import Lazy
+from .document_store import (
+    create_document,
+    create_documents,
+    delete_by_document_id,
+    get_by_content_hash,
+    get_by_document_id,
+    list_pending_summaries,
+    update_document,
+)
 from .file_handler import FileHandler
-from .ocr_service import OCRReader
-from .summarizer import generate_summary
-from .vector_store import VectorStore
+from .ocr_service import PAGE_SEPARATOR, ExtractionStats, OCRReader
+from .summarizer import SummaryCache, generate_summary
+from .telemetry import span
+from .vector_store import ChunkInput, VectorStore
+
+logger = logging.getLogger(__name__)
+
+StageCallback = Callable[[str], None]
+ChangeListener = Callable[[str], None]
+
+
+@dataclass(frozen=True)
+class StagedUpload:
+    """A validated upload persisted to disk and waiting to be processed.
+
+    ``upload_id`` names the artifacts written for this upload. It equals
+    ``document_id`` for new documents and differs when the upload is a
+    revision of an existing document.
+    """
+
+    document_id: str
+    upload_id: str
+    original_filename: str
+    stored_pdf: str
+    pdf_path: Path
+    content_hash: str
+    is_revision: bool = False
+
+
+@dataclass(frozen=True)
+class ExtractedPdf:
+    """A PDF on the local filesystem whose pages were extracted and chunked outside the service."""
+
+    source: Path
+    content_hash: str
+    pages: List[str]
+    chunks: List[Chunk]
+    page_count: int
+    stage_timings: Dict[str, float]
 
 
 class PipelineService:
     """Run the document processing pipeline defined in the flowchart."""
 
-    def __init__(self, settings: Settings, vector_store: Optional[VectorStore] = None):
+    def __init__(
+        self,
+        settings: Settings,
+        vector_store: Optional[VectorStore] = None,
+        chunker: Union[Chunker, Callable[[], Chunker], None] = None,
+    ):
         self._settings = settings
         self._file_handler = FileHandler(settings)
-        self._ocr_reader = OCRReader()
+        self._ocr_reader = OCRReader(
+            workers=settings.ocr_workers,
+            pages_per_task=settings.ocr_pages_per_task,
+        )
         self._vector_store = vector_store or VectorStore(settings)
+        if chunker is None:
+            chunker = Chunker(settings.chunk_tokens, settings.chunk_overlap_tokens)
+        # A factory defers building the chunker, e.g. until the tokenizer it counts with is loaded.
+        self._chunker_source: Lazy[Chunker] = Lazy(chunker if callable(chunker) else lambda: chunker)
+        self._summary_cache = SummaryCache(settings.summary_cache_dir)
+        self._change_listeners: List[ChangeListener] = []
+
+    @property
+    def _chunker(self) -> Chunker:
+        return self._chunker_source.get()
+
+    def subscribe(self, listener: ChangeListener) -> None:
+        """Register a callback invoked with the document id after it is indexed or removed."""
+        self._change_listeners.append(listener)
 
-    def ingest(self, file: FileStorage) -> Document:
+    def ingest(self, file: FileStorage, replaces: Optional[str] = None) -> Document:
+        """Run every stage, including the summary, in the calling thread."""
+        document = self.process(self.stage_upload(file, replaces=replaces))
+        if document.summary_status == SUMMARY_PENDING:
+            document = self.summarize(document.document_id) or document
+        return document
+
+    def stage_upload(self, file: FileStorage, replaces: Optional[str] = None) -> StagedUpload:
+        """Validate the upload and save the PDF so it can be processed later.
+
+        ``replaces`` names an existing document that this upload is a new revision of.
+        """
         if not file or not file.filename:
             raise ValueError("A PDF file is required")
 
         if not file.filename.lower().endswith(".pdf"):
             raise ValueError("Only PDF files are supported")
 
-        document_id = self._file_handler.generate_document_id()
-        stored_pdf_name, pdf_path = self._file_handler.save_pdf(file, document_id)
+        upload_id = self._file_handler.generate_document_id()
+        saved = self._file_handler.save_pdf(file, upload_id)
+        return StagedUpload(
+            document_id=replaces or upload_id,
+            upload_id=upload_id,
+            original_filename=file.filename,
+            stored_pdf=saved.stored_name,
+            pdf_path=saved.path,
+            content_hash=saved.content_hash,
+            is_revision=bool(replaces),
+        )
+
+    def staged_from_job(self, job: IngestionJob) -> StagedUpload:
+        """Rebuild a staged upload from persisted job metadata."""
+        return StagedUpload(
+            document_id=job.document_id,
+            upload_id=job.upload_id,
+            original_filename=job.original_filename,
+            stored_pdf=job.stored_pdf,
+            pdf_path=self._settings.pdf_dir / job.stored_pdf,
+            content_hash=job.content_hash,
+            is_revision=job.is_revision,
+        )
+
+    def process(self, upload: StagedUpload, on_stage: Optional[StageCallback] = None) -> Document:
+        """Extract, chunk and index a staged upload and commit its document row.
+
+        The document is searchable when this returns; its summary is left
+        pending for :meth:`summarize`. Identical content is not processed
+        twice: the matching document is returned and the freshly saved PDF is
+        discarded. Revisions keep their document id and only re-embed chunks
+        whose text changed.
+        """
+        report = on_stage or (lambda _stage: None)
+        document_id = upload.document_id
+        pdf_path = upload.pdf_path
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"Stored PDF is missing: {upload.stored_pdf}")
 
+        existing = None
+        if upload.is_revision:
+            existing = get_by_document_id(document_id)
+            if existing is None:
+                self._safe_unlink(pdf_path)
+                raise ValueError("The document to revise no longer exists")
+
+        duplicate = self._find_duplicate(upload, existing)
+        if duplicate is not None:
+            report("deduplicating")
+            self._safe_unlink(pdf_path)
+            logger.info("Upload %s matches document %s, reusing it", upload.upload_id, duplicate.document_id)
+            return duplicate
+
+        timings: Dict[str, float] = {}
         text_path = None
-        summary_path = None
+        indexed = False
+        previous_chunks: List[ChunkInput] = []
         try:
-            extracted_text = self._ocr_reader.extract_text(pdf_path)
-            text_path = self._file_handler.save_text(document_id, extracted_text)
+            # Pages are chunked as they are parsed, and a new document's chunks are embedded in
+            # batches meanwhile, so the encoder runs while the OCR workers read later pages.
+            with self._stage("extracting", timings, report):
+                extraction_stats = ExtractionStats()
+                pages: List[str] = []
+                chunks: List[ChunkInput] = []
+                vectors: List[np.ndarray] = []
+                embedded = 0
+                page_stream = self._ocr_reader.iter_pages(pdf_path, stats=extraction_stats)
+                for chunk in self._chunker.chunks(self._recorded(page_stream, pages)):
+                    chunks.append(chunk)
+                    if existing is None and len(chunks) - embedded >= self._settings.embedding_max_batch_size:
+                        vectors.append(self._vector_store.embed_documents(self._texts(chunks[embedded:])))
+                        embedded = len(chunks)
+                pages.extend(page_stream)  # whatever the chunker did not ask for
+                if not any(pages):
+                    raise ValueError("No text could be extracted from the provided PDF")
+                logger.info("Extracted %s: %s", document_id, extraction_stats.to_dict())
+                extracted_text = PAGE_SEPARATOR.join(page for page in pages if page)
+                text_path = self._file_handler.save_text(upload.upload_id, extracted_text)
+                if not chunks:
+                    chunks = [extracted_text]
 
-            summary_text = generate_summary(extracted_text, model_name=self._settings.gemini_model)
-            summary_path = self._file_handler.save_summary(document_id, summary_text)
+            with self._stage("indexing", timings, report):
+                indexed = True
+                if existing is not None:
+                    previous_chunks = self._vector_store.document_chunks(document_id)
+                    reembedded = self._vector_store.sync_document(document_id, chunks)
+                    logger.info("Revision of %s re-embedded %s of %s chunks", document_id, reembedded, len(chunks))
+                else:
+                    if embedded < len(chunks):
+                        vectors.append(self._vector_store.embed_documents(self._texts(chunks[embedded:])))
+                    self._vector_store.add_document(document_id, chunks, np.concatenate(vectors))
 
-            chunks = split_text(
-                extracted_text,
-                chunk_size=self._settings.chunk_size,
-                overlap=self._settings.chunk_overlap,
-            )
-            if not chunks:
-                chunks = [extracted_text]
-            self._vector_store.add_document(document_id, chunks)
-
-            summary_preview = summary_text[:500]
-            document = create_document(
-                document_id=document_id,
-                original_filename=file.filename,
-                stored_pdf=stored_pdf_name,
-                text_path=text_path.name,
-                summary_path=summary_path.name,
-                summary_preview=summary_preview,
-                chunk_count=len(chunks),
-            )
-            return document
+            with self._stage("saving", timings, report):
+                fields = {
+                    "content_hash": upload.content_hash,
+                    "original_filename": upload.original_filename,
+                    "stored_pdf": upload.stored_pdf,
+                    "text_path": text_path.name,
+                    "summary_status": SUMMARY_PENDING,
+                    "chunk_count": len(chunks),
+                    "page_count": extraction_stats.page_count,
+                    "stage_timings": dict(timings),
+                }
+                if existing is None:
+                    document = create_document(document_id=document_id, **fields)
+                else:
+                    previous_pdf, previous_text, _ = self._artifact_paths(existing)
+                    document = update_document(existing, **fields)
+                    for path in (previous_pdf, previous_text):
+                        if path not in self._artifact_paths(document):
+                            self._safe_unlink(path)
         except Exception:
-            self._vector_store.delete_document(document_id)
-            for path in (pdf_path, text_path, summary_path):
+            # Only the index stage touches shared state; earlier failures just drop our own files.
+            if indexed:
+                self._restore_index(document_id, is_revision=existing is not None, previous_chunks=previous_chunks)
+            for path in (pdf_path, text_path):
                 if isinstance(path, Path):
                     self._safe_unlink(path)
             raise
 
+        self._notify(document_id)
+        return document
+
+    def _restore_index(self, document_id: str, is_revision: bool, previous_chunks: List[ChunkInput]) -> None:
+        """Put the index back the way it was before a failed :meth:`process`.
+
+        A revision gets its previous chunks back, which re-embeds only the ones
+        the failed revision had replaced.
+        """
+        try:
+            if not is_revision:
+                self._vector_store.delete_document(document_id)
+            elif previous_chunks:
+                self._vector_store.sync_document(document_id, previous_chunks)
+        except Exception:  # noqa: BLE001
+            logger.exception("Could not restore the index of document %s", document_id)
+
+    def index_extracted(self, extracted: Sequence[ExtractedPdf]) -> List[Document]:
+        """Store and index a batch of already extracted PDFs as new documents.
+
+        The chunks of the whole batch are embedded together and written with
+        one vector store call, and the document rows are inserted in one
+        transaction. On failure nothing of the batch is kept. Summaries are
+        left pending, like :meth:`process` does.
+        """
+        if not extracted:
+            return []
+        written: List[Path] = []
+        entries = []
+        indexed = False
+        try:
+            for item in extracted:
+                document_id = self._file_handler.generate_document_id()
+                saved = self._file_handler.import_pdf(item.source, document_id)
+                written.append(saved.path)
+                text = PAGE_SEPARATOR.join(page for page in item.pages if page)
+                text_path = self._file_handler.save_text(document_id, text)
+                written.append(text_path)
+                entries.append((document_id, item, saved, text_path, item.chunks or [text]))
+
+            started = time.perf_counter()
+            indexed = True
+            self._vector_store.add_documents([(document_id, chunks) for document_id, _, _, _, chunks in entries])
+            indexing = round(time.perf_counter() - started, 4)
+
+            documents = create_documents(
+                [
+                    {
+                        "document_id": document_id,
+                        "content_hash": saved.content_hash,
+                        "original_filename": item.source.name,
+                        "stored_pdf": saved.stored_name,
+                        "text_path": text_path.name,
+                        "summary_status": SUMMARY_PENDING,
+                        "chunk_count": len(chunks),
+                        "page_count": item.page_count,
+                        # Indexing ran once for the whole batch, so every document records the batch time.
+                        "stage_timings": {**item.stage_timings, "indexing": indexing},
+                    }
+                    for document_id, item, saved, text_path, chunks in entries
+                ]
+            )
+        except Exception:
+            # A failed commit leaves the session unusable for the next batch until it is rolled back.
+            db.session.rollback()
+            if indexed:
+                for document_id, *_ in entries:
+                    self._vector_store.delete_document(document_id)
+            for path in written:
+                self._safe_unlink(path)
+            raise
+
+        for document in documents:
+            self._notify(document.document_id)
+        return documents
+
+    def summarize(self, document_id: str, on_stage: Optional[StageCallback] = None) -> Optional[Document]:
+        """Generate the summary of an indexed document and record the outcome on its row.
+
+        A failure marks the summary as failed instead of undoing the ingest;
+        the document stays searchable.
+        """
+        report = on_stage or (lambda _stage: None)
+        document = get_by_document_id(document_id)
+        if document is None:
+            return None
+
+        timings: Dict[str, float] = dict(document.stage_timings or {})
+        summary_path = None
+        try:
+            with self._stage("summarizing", timings, report):
+                text_path = self._settings.ocr_dir / document.text_path
+                extracted_text = text_path.read_text(encoding="utf-8")
+                summary_text = generate_summary(
+                    extracted_text,
+                    model_name=self._settings.gemini_model,
+                    max_workers=self._settings.summary_workers,
+                    group_chars=self._settings.summary_group_chars,
+                    cache=self._summary_cache,
+                )
+                summary_path = self._file_handler.save_summary(text_path.stem, summary_text)
+        except Exception:  # noqa: BLE001
+            logger.exception("Summary generation failed for %s", document_id)
+            if isinstance(summary_path, Path):
+                self._safe_unlink(summary_path)
+            return update_document(
+                document, summary_status=SUMMARY_FAILED, summary_claimed_at=None, stage_timings=timings
+            )
+
+        previous_summary = document.summary_path
+        document = update_document(
+            document,
+            summary_path=summary_path.name,
+            summary_preview=summary_text[:500],
+            summary_status=SUMMARY_READY,
+            summary_claimed_at=None,
+            stage_timings=timings,
+        )
+        if previous_summary and previous_summary != summary_path.name:
+            self._safe_unlink(self._settings.summary_dir / previous_summary)
+        return document
+
+    def pending_summaries(self, stale_before: Optional[datetime] = None) -> List[str]:
+        """Document ids whose summary has not been generated yet; see :func:`list_pending_summaries`."""
+        return [document.document_id for document in list_pending_summaries(stale_before)]
+
     def remove(self, document_id: str) -> bool:
         document = get_by_document_id(document_id)
         if not document:
@@ -79,15 +371,55 @@ class PipelineService:
 
         self._vector_store.delete_document(document_id)
 
+        for path in self._artifact_paths(document):
+            self._safe_unlink(path)
+
+        removed = delete_by_document_id(document_id)
+        self._notify(document_id)
+        return removed
+
+    def _notify(self, document_id: str) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(document_id)
+            except Exception:  # noqa: BLE001
+                logger.exception("Document change listener failed for %s", document_id)
+
+    @staticmethod
+    def _find_duplicate(upload: StagedUpload, existing: Optional[Document]) -> Optional[Document]:
+        if existing is not None:
+            return existing if existing.content_hash == upload.content_hash else None
+        return get_by_content_hash(upload.content_hash)
+
+    def _artifact_paths(self, document: Document) -> Tuple[Path, ...]:
         paths = (
             self._settings.pdf_dir / document.stored_pdf,
             self._settings.ocr_dir / document.text_path,
-            self._settings.summary_dir / document.summary_path,
         )
-        for path in paths:
-            self._safe_unlink(path)
+        if document.summary_path:
+            paths += (self._settings.summary_dir / document.summary_path,)
+        return paths
+
+    @staticmethod
+    @contextmanager
+    def _stage(name: str, timings: Dict[str, float], report: StageCallback) -> Iterator[None]:
+        report(name)
+        started = time.perf_counter()
+        try:
+            with span(f"ingest.{name}"):
+                yield
+        finally:
+            timings[name] = round(time.perf_counter() - started, 4)
 
-        return delete_by_document_id(document_id)
+    @staticmethod
+    def _recorded(pages: Iterable[str], into: List[str]) -> Iterator[str]:
+        for page in pages:
+            into.append(page)
+            yield page
+
+    @staticmethod
+    def _texts(chunks: Sequence[ChunkInput]) -> List[str]:
+        return [chunk.text if isinstance(chunk, Chunk) else chunk for chunk in chunks]
 
     @staticmethod
     def _safe_unlink(path: Path) -> None:
@@ -0,0 +1,397 @@
+"""Retrieval and answer generation for a single question."""
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..config import Settings
+from .answer_cache import AnswerCache, DocumentFilter
+from .qa_service import (
+    TextStreamFn,
+    answer_question,
+    answer_question_async,
+    stream_answer,
+    stream_answer_async,
+)
+from .reranker import ContextSelector
+from .telemetry import run_in_executor
+from .vector_store import VectorStore
+
+
+class NoContextError(LookupError):
+    """Raised when retrieval finds nothing to answer from."""
+
+
+@dataclass
+class QAResult:
+    answer: str
+    matches: List[Dict[str, Any]]
+    cache: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"answer": self.answer, "matches": self.matches, "cache": self.cache}
+
+
+@dataclass
+class QAStream:
+    """Matches known up front plus an iterator over the answer text."""
+
+    matches: List[Dict[str, Any]]
+    tokens: Iterator[str]
+    cache: Optional[str] = None
+
+
+@dataclass
+class QAAsyncStream:
+    """:class:`QAStream` whose answer text is consumed with ``async for``."""
+
+    matches: List[Dict[str, Any]]
+    tokens: AsyncGenerator[str, None]
+    cache: Optional[str] = None
+
+
+@dataclass
+class QABatchItem:
+    question: str
+    document_ids: Optional[List[str]] = None
+    top_k: Optional[int] = None
+
+
+BatchOutcome = Tuple[int, Union[QAResult, Exception]]
+
+
+@dataclass
+class _Retrieval:
+    question: str
+    document_filter: DocumentFilter
+    top_k: int
+    matches: List[Dict[str, Any]]
+    query_embedding: Optional[np.ndarray] = None
+    retrieval_seconds: float = 0.0
+    cached: Optional[QAResult] = None
+
+    @property
+    def contexts(self) -> List[str]:
+        return [_cited(match) for match in self.matches]
+
+
+def _cited(match: Dict[str, Any]) -> str:
+    """Prefix a match with its page numbers so the model can cite them."""
+    first, last = match.get("page_start"), match.get("page_end")
+    if not first:
+        return match["content"]
+    pages = f"page {first}" if not last or last == first else f"pages {first}-{last}"
+    return f"[{pages}] {match['content']}"
+
+
+class QAPipeline:
+    """Retrieve context for a question and answer it, consulting the answer cache first."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        vector_store: VectorStore,
+        answer_cache: Optional[AnswerCache] = None,
+        generate_stream: Optional[TextStreamFn] = None,
+        context_selector: Optional[ContextSelector] = None,
+    ):
+        self._settings = settings
+        self._vector_store = vector_store
+        self._answer_cache = answer_cache
+        self._generate_stream = generate_stream
+        self._context_selector = context_selector
+
+    @property
+    def answer_cache(self) -> Optional[AnswerCache]:
+        return self._answer_cache
+
+    @property
+    def context_selector(self) -> Optional[ContextSelector]:
+        return self._context_selector
+
+    def ask(self, question: str, document_ids: Optional[Sequence[str]] = None, top_k: Optional[int] = None) -> QAResult:
+        retrieval = self._retrieve(question, document_ids, top_k)
+        if retrieval.cached:
+            return retrieval.cached
+        return self._generate(retrieval)
+
+    def stream(
+        self,
+        question: str,
+        document_ids: Optional[Sequence[str]] = None,
+        top_k: Optional[int] = None,
+    ) -> QAStream:
+        """Retrieve eagerly, then generate lazily as the returned tokens are consumed."""
+        retrieval = self._retrieve(question, document_ids, top_k)
+        if retrieval.cached:
+            cached = retrieval.cached
+            return QAStream(cached.matches, iter([cached.answer]), cache=cached.cache)
+        return QAStream(retrieval.matches, self._stream_tokens(retrieval))
+
+    async def ask_async(
+        self,
+        question: str,
+        document_ids: Optional[Sequence[str]] = None,
+        top_k: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> QAResult:
+        """Like :meth:`ask`, but awaits the LLM; retrieval is CPU work and runs on ``executor``."""
+        retrieval = await run_in_executor(executor, self._retrieve, question, document_ids, top_k)
+        if retrieval.cached:
+            return retrieval.cached
+        started = time.perf_counter()
+        answer = await answer_question_async(
+            retrieval.question, retrieval.contexts, model_name=self._settings.gemini_model
+        )
+        self._remember(retrieval, answer, time.perf_counter() - started)
+        return QAResult(answer, retrieval.matches)
+
+    async def stream_async(
+        self,
+        question: str,
+        document_ids: Optional[Sequence[str]] = None,
+        top_k: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> QAAsyncStream:
+        """Like :meth:`stream`, with retrieval on ``executor`` and the answer streamed asynchronously."""
+        retrieval = await run_in_executor(executor, self._retrieve, question, document_ids, top_k)
+        if retrieval.cached:
+            cached = retrieval.cached
+            return QAAsyncStream(cached.matches, _once(cached.answer), cache=cached.cache)
+        return QAAsyncStream(retrieval.matches, self._astream_tokens(retrieval))
+
+    def ask_many(self, items: Sequence[QABatchItem], max_workers: Optional[int] = None) -> Iterator[BatchOutcome]:
+        """Answer many questions, yielding ``(index, result or error)`` as each finishes.
+
+        Questions missing from the answer cache are embedded in one batch,
+        whatever their filters, and retrieved with one vector query per
+        distinct filter; answers are then generated by up to ``max_workers``
+        threads. Cached answers come first.
+        """
+        retrievals: Dict[int, _Retrieval] = {}
+        groups: Dict[Tuple[DocumentFilter, int], List[int]] = defaultdict(list)
+        for index, item in enumerate(items):
+            top_k = item.top_k or self._settings.top_k
+            document_filter = AnswerCache.make_filter(item.document_ids)
+            cached = self._cached_exact(item.question, document_filter, top_k)
+            if cached:
+                yield index, cached.cached
+            else:
+                groups[(document_filter, top_k)].append(index)
+
+        pending = [index for indexes in groups.values() for index in indexes]
+        embeddings: Dict[int, np.ndarray] = {}
+        embed_seconds = 0.0
+        if pending:
+            started = time.perf_counter()
+            try:
+                # One encoder call for every filter group; the groups only differ in what they search.
+                vectors = self._vector_store.embed_queries([items[index].question for index in pending])
+                embeddings = dict(zip(pending, vectors))
+            except Exception as exc:  # noqa: BLE001
+                for index in pending:
+                    yield index, exc
+                groups.clear()
+            embed_seconds = (time.perf_counter() - started) / len(pending)
+
+        for (document_filter, top_k), indexes in groups.items():
+            try:
+                retrievals.update(
+                    self._retrieve_group(items, indexes, document_filter, top_k, embeddings, embed_seconds)
+                )
+            except Exception as exc:  # noqa: BLE001
+                for index in indexes:
+                    yield index, exc
+
+        generate: Dict[int, _Retrieval] = {}
+        for index, retrieval in retrievals.items():
+            if retrieval.cached:
+                yield index, retrieval.cached
+            elif not retrieval.matches:
+                yield index, NoContextError("No relevant context found")
+            else:
+                generate[index] = retrieval
+        if not generate:
+            return
+
+        workers = max(1, min(max_workers or self._settings.qa_batch_concurrency, len(generate)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qa-batch") as pool:
+            futures = {pool.submit(self._generate, retrieval): index for index, retrieval in generate.items()}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        yield futures[future], future.result()
+                    except Exception as exc:  # noqa: BLE001
+                        yield futures[future], exc
+            finally:
+                # A consumer that stops early (e.g. a closed client) should not pay for the rest.
+                for future in futures:
+                    future.cancel()
+
+    def invalidate_document(self, document_id: str) -> None:
+        if self._answer_cache:
+            self._answer_cache.invalidate_document(document_id)
+
+    def _retrieve(self, question: str, document_ids: Optional[Sequence[str]], top_k: Optional[int]) -> _Retrieval:
+        top_k = top_k or self._settings.top_k
+        document_filter = AnswerCache.make_filter(document_ids)
+        cached = self._cached_exact(question, document_filter, top_k)
+        if cached:
+            return cached
+
+        started = time.perf_counter()
+        query_embedding = self._vector_store.embed_query(question)
+        matches = self._vector_store.similarity_search(
+            question,
+            k=self._fetch_count(top_k),
+            document_ids=document_ids,
+            query_embedding=query_embedding,
+        )
+        if self._context_selector:
+            matches = self._context_selector.select(question, matches, top_k)
+        retrieval = _Retrieval(
+            question,
+            document_filter,
+            top_k,
+            matches,
+            query_embedding=query_embedding,
+            retrieval_seconds=time.perf_counter() - started,
+        )
+        if not matches:
+            raise NoContextError("No relevant context found")
+        self._check_semantic(retrieval)
+        return retrieval
+
+    def _retrieve_group(
+        self,
+        items: Sequence[QABatchItem],
+        indexes: List[int],
+        document_filter: DocumentFilter,
+        top_k: int,
+        query_embeddings: Dict[int, np.ndarray],
+        embed_seconds: float,
+    ) -> Dict[int, _Retrieval]:
+        questions = [items[index].question for index in indexes]
+        embeddings = np.stack([query_embeddings[index] for index in indexes])
+        started = time.perf_counter()
+        rows = self._vector_store.similarity_search_many(
+            questions,
+            k=self._fetch_count(top_k),
+            document_ids=list(document_filter) if document_filter else None,
+            query_embeddings=embeddings,
+        )
+        if self._context_selector:
+            rows = self._context_selector.select_many(questions, rows, top_k)
+        # Retrieval ran as one batch; attribute its cost evenly for cache accounting.
+        seconds = (time.perf_counter() - started) / len(indexes) + embed_seconds
+
+        retrievals: Dict[int, _Retrieval] = {}
+        for index, question, embedding, matches in zip(indexes, questions, embeddings, rows):
+            retrieval = _Retrieval(
+                question,
+                document_filter,
+                top_k,
+                matches,
+                query_embedding=embedding,
+                retrieval_seconds=seconds,
+            )
+            if matches:
+                self._check_semantic(retrieval)
+            retrievals[index] = retrieval
+        return retrievals
+
+    def _fetch_count(self, top_k: int) -> int:
+        return self._context_selector.candidates(top_k) if self._context_selector else top_k
+
+    def _cached_exact(self, question: str, document_filter: DocumentFilter, top_k: int) -> Optional[_Retrieval]:
+        if not self._answer_cache:
+            return None
+        cached = self._answer_cache.get_exact(question, document_filter, top_k)
+        if not cached:
+            return None
+        result = QAResult(cached.answer, cached.matches, cache="exact")
+        return _Retrieval(question, document_filter, top_k, cached.matches, cached=result)
+
+    def _check_semantic(self, retrieval: _Retrieval) -> None:
+        if not self._answer_cache or retrieval.query_embedding is None:
+            return
+        chunk_ids = frozenset(str(match.get("id")) for match in retrieval.matches)
+        similar = self._answer_cache.get_semantic(
+            retrieval.query_embedding,
+            chunk_ids,
+            retrieval.document_filter,
+            retrieval.top_k,
+        )
+        if similar:
+            retrieval.cached = QAResult(similar.answer, retrieval.matches, cache="semantic")
+
+    def _generate(self, retrieval: _Retrieval) -> QAResult:
+        started = time.perf_counter()
+        answer = answer_question(retrieval.question, retrieval.contexts, model_name=self._settings.gemini_model)
+        self._remember(retrieval, answer, time.perf_counter() - started)
+        return QAResult(answer, retrieval.matches)
+
+    def _stream_tokens(self, retrieval: _Retrieval) -> Iterator[str]:
+        started = time.perf_counter()
+        parts: List[str] = []
+        for token in stream_answer(
+            retrieval.question,
+            retrieval.contexts,
+            model_name=self._settings.gemini_model,
+            generate=self._generate_stream,
+        ):
+            parts.append(token)
+            yield token
+        self._remember(retrieval, "".join(parts), time.perf_counter() - started)
+
+    async def _astream_tokens(self, retrieval: _Retrieval) -> AsyncGenerator[str, None]:
+        started = time.perf_counter()
+        parts: List[str] = []
+        generate = None
+        if self._generate_stream is not None:
+            sync_generate = self._generate_stream
+
+            def generate(prompt: str, model: str) -> AsyncGenerator[str, None]:
+                return _iterate_in_thread(iter(sync_generate(prompt, model)))
+
+        async for token in stream_answer_async(
+            retrieval.question,
+            retrieval.contexts,
+            model_name=self._settings.gemini_model,
+            generate=generate,
+        ):
+            parts.append(token)
+            yield token
+        self._remember(retrieval, "".join(parts), time.perf_counter() - started)
+
+    def _remember(self, retrieval: _Retrieval, answer: str, generation_seconds: float) -> None:
+        if not self._answer_cache:
+            return
+        self._answer_cache.put(
+            retrieval.question,
+            retrieval.document_filter,
+            retrieval.top_k,
+            answer=answer,
+            matches=retrieval.matches,
+            question_embedding=retrieval.query_embedding,
+            retrieval_seconds=retrieval.retrieval_seconds,
+            generation_seconds=generation_seconds,
+        )
+
+
+async def _once(text: str) -> AsyncGenerator[str, None]:
+    yield text
+
+
+async def _iterate_in_thread(pieces: Iterator[str]) -> AsyncGenerator[str, None]:
+    while True:
+        piece = await run_in_executor(None, next, pieces, None)
+        if piece is None:
+            return
+        yield piece
@@ -4,44 +4,161 @@ from __future__ import annotations
 
 import os
 import unicodedata
-from typing import List, Optional
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional
 
-import google.generativeai as genai
+from .llm_client import LLMClient, get_client
+from .telemetry import span
 
-
-def _configure() -> str:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GEMINI_API_KEY environment variable must be set")
-    genai.configure(api_key=api_key)
-    return os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+TextStreamFn = Callable[[str, str], Iterable[str]]
+AsyncTextStreamFn = Callable[[str, str], AsyncIterable[str]]
 
 
-def answer_question(question: str, contexts: List[str], model_name: Optional[str] = None) -> str:
+def build_prompt(question: str, contexts: List[str]) -> str:
     if not question.strip():
         raise ValueError("Question must not be empty")
     if not contexts:
         raise ValueError("No context provided for question answering")
 
-    if model_name:
-        _configure()
-        model = model_name
-    else:
-        model = _configure()
-    client = genai.GenerativeModel(model)
-
     context_block = "\n\n".join(contexts)
-    prompt = (
+    return (
         "You are an aviation regulatory assistant. Answer the question using only the provided context. "
         "If the answer is not present, respond that you cannot find the answer in the context.\n\n"
         f"Context:\n{context_block}\n\nQuestion: {question}\nAnswer:"
     )
 
-    response = client.generate_content(prompt)
 
-    answer = response.text or ""
+def _default_model() -> str:
+    return os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+
+def answer_question(
+    question: str,
+    contexts: List[str],
+    model_name: Optional[str] = None,
+    client: Optional[LLMClient] = None,
+) -> str:
+    prompt = build_prompt(question, contexts)
+    with span("llm.answer"):
+        answer = (client or get_client()).generate(prompt, model_name or _default_model())
+    return _clean_answer(answer)
+
+
+async def answer_question_async(
+    question: str,
+    contexts: List[str],
+    model_name: Optional[str] = None,
+    client: Optional[LLMClient] = None,
+) -> str:
+    """Awaitable :func:`answer_question` for the asynchronous server."""
+    prompt = build_prompt(question, contexts)
+    with span("llm.answer"):
+        answer = await (client or get_client()).agenerate(prompt, model_name or _default_model())
+    return _clean_answer(answer)
+
+
+def _clean_answer(answer: str) -> str:
     answer = unicodedata.normalize("NFKC", answer)
     answer = answer.strip()
     if not answer:
         raise ValueError("Answer generation returned empty text")
     return answer
+
+
+def stream_answer(
+    question: str,
+    contexts: List[str],
+    model_name: Optional[str] = None,
+    generate: Optional[TextStreamFn] = None,
+) -> Iterator[str]:
+    """Yield normalized answer text as it is generated.
+
+    The output concatenates to exactly what ``answer_question`` would return
+    for the same model text: NFKC-normalized and stripped. ``ValueError`` is
+    raised at the end when the model produced no visible text.
+    """
+    prompt = build_prompt(question, contexts)
+    normalizer = StreamNormalizer()
+    with span("llm.stream"):
+        for piece in (generate or get_client().stream)(prompt, model_name or _default_model()):
+            delta = normalizer.feed(piece)
+            if delta:
+                yield delta
+    delta = normalizer.finish()
+    if delta:
+        yield delta
+    if not normalizer.has_output:
+        raise ValueError("Answer generation returned empty text")
+
+
+async def stream_answer_async(
+    question: str,
+    contexts: List[str],
+    model_name: Optional[str] = None,
+    generate: Optional[AsyncTextStreamFn] = None,
+) -> AsyncIterator[str]:
+    """Asynchronous :func:`stream_answer`, with the same normalization and errors."""
+    prompt = build_prompt(question, contexts)
+    normalizer = StreamNormalizer()
+    with span("llm.stream"):
+        async for piece in (generate or get_client().astream)(prompt, model_name or _default_model()):
+            delta = normalizer.feed(piece)
+            if delta:
+                yield delta
+    delta = normalizer.finish()
+    if delta:
+        yield delta
+    if not normalizer.has_output:
+        raise ValueError("Answer generation returned empty text")
+
+
+class StreamNormalizer:
+    """Apply NFKC normalization and stripping to text that arrives in pieces.
+
+    Raw text is held back until a position where normalization cannot merge
+    characters across the cut, and trailing whitespace is held until more
+    visible text follows it.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+        self._held_whitespace = ""
+        self.has_output = False
+
+    def feed(self, piece: str) -> str:
+        self._pending += piece
+        cut = self._safe_cut(self._pending)
+        if cut <= 0:
+            return ""
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return self._emit(unicodedata.normalize("NFKC", ready))
+
+    def finish(self) -> str:
+        ready, self._pending = self._pending, ""
+        delta = self._emit(unicodedata.normalize("NFKC", ready))
+        self._held_whitespace = ""
+        return delta
+
+    def _emit(self, text: str) -> str:
+        if not self.has_output:
+            text = text.lstrip()
+            if not text:
+                return ""
+        stripped = text.rstrip()
+        if not stripped:
+            self._held_whitespace += text
+            return ""
+        delta = self._held_whitespace + stripped
+        self._held_whitespace = text[len(stripped):]
+        self.has_output = True
+        return delta
+
+    @staticmethod
+    def _safe_cut(text: str) -> int:
+        for index in range(len(text) - 1, 0, -1):
+            previous, current = text[index - 1], text[index]
+            if unicodedata.combining(current):
+                continue
+            joined = unicodedata.normalize("NFKC", previous + current)
+            if joined == unicodedata.normalize("NFKC", previous) + unicodedata.normalize("NFKC", current):
+                return index
+        return 0
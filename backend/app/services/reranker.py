@@ -0,0 +1,228 @@
+"""Cross-encoder re-ranking of retrieved chunks and packing of the answer context."""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .chunker import TokenCounter, estimate_tokens
+from .components import Lazy
+from .telemetry import span
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+_WORD = re.compile(r"\w+")
+
+Match = Dict[str, Any]
+
+
+def _load_cross_encoder(model_name: str, max_length: int) -> "CrossEncoder":
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+
+class CrossEncoderReranker:
+    """Score ``(question, passage)`` pairs with a small cross-encoder on the CPU.
+
+    Pairs are scored in batches of ``batch_size``. Calls are serialized so
+    concurrent questions take turns on the CPU instead of thrashing it.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = 32, max_length: int = 512):
+        self._model_name = model_name
+        self._batch_size = max(1, batch_size)
+        self._model: Lazy["CrossEncoder"] = Lazy(partial(_load_cross_encoder, model_name, max_length))
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    def score(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        if not pairs:
+            return np.empty(0, dtype=np.float32)
+        model = self._model.get()
+        with self._lock:
+            scores = model.predict(
+                [list(pair) for pair in pairs],
+                batch_size=self._batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+            )
+        return np.asarray(scores, dtype=np.float32).reshape(-1)
+
+    def status(self) -> Dict[str, object]:
+        return self._model.status()
+
+    def warm_up(self) -> None:
+        self.score([("warm up", "warm up")])
+
+
+class ContextSelector:
+    """Turn over-fetched retrieval candidates into a compact, non-redundant context.
+
+    Candidates are re-ranked by the cross-encoder when one is given, and
+    kept in retrieval order otherwise or when scoring fails. After a failure
+    re-ranking is skipped for ``retry_seconds``, doubling with each further
+    failure up to ``max_retry_seconds``, so a model that cannot load is not
+    retried on every question. Walking them best first, a chunk is dropped
+    when at least ``dedup_threshold`` of its word trigrams already appear in
+    a selected chunk, or when it does not fit in what is left of
+    ``token_budget``. At most ``top_k`` chunks are kept, and the best one is
+    kept even if it alone exceeds the budget.
+    """
+
+    def __init__(
+        self,
+        reranker: Optional[CrossEncoderReranker] = None,
+        *,
+        candidates: int = 20,
+        token_budget: int = 2000,
+        dedup_threshold: float = 0.8,
+        count_tokens: Optional[TokenCounter] = None,
+        retry_seconds: float = 30.0,
+        max_retry_seconds: float = 900.0,
+    ):
+        self._reranker = reranker
+        self._candidates = candidates
+        self._token_budget = token_budget
+        self._dedup_threshold = dedup_threshold
+        self._count_tokens = count_tokens or estimate_tokens
+        self._retry_seconds = retry_seconds
+        self._max_retry_seconds = max_retry_seconds
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "questions": 0,
+            "candidates": 0,
+            "selected": 0,
+            "duplicates_dropped": 0,
+            "over_budget_dropped": 0,
+            "context_tokens": 0,
+            "rerank_seconds": 0.0,
+            "rerank_failures": 0,
+            "rerank_skipped": 0,
+        }
+
+    @property
+    def reranker(self) -> Optional[CrossEncoderReranker]:
+        return self._reranker
+
+    def candidates(self, top_k: int) -> int:
+        """How many chunks to retrieve for a context of ``top_k`` chunks."""
+        return max(self._candidates, top_k)
+
+    def select(self, question: str, matches: List[Match], top_k: int) -> List[Match]:
+        return self.select_many([question], [matches], top_k)[0]
+
+    def select_many(self, questions: Sequence[str], rows: Sequence[List[Match]], top_k: int) -> List[List[Match]]:
+        """Select the context of several questions, scoring all their pairs in one batch."""
+        ranked = self._rerank(questions, rows)
+        return [self._pack(matches, top_k) for matches in ranked]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self._stats)
+        stats: Dict[str, object] = {key: int(value) for key, value in counters.items() if key != "rerank_seconds"}
+        stats["rerank_seconds"] = round(counters["rerank_seconds"], 3)
+        questions = counters["questions"]
+        stats["mean_context_tokens"] = round(counters["context_tokens"] / questions, 1) if questions else 0.0
+        stats["reranker"] = self._reranker.model_name if self._reranker else None
+        return stats
+
+    def _rerank(self, questions: Sequence[str], rows: Sequence[List[Match]]) -> List[List[Match]]:
+        if self._reranker is None or not any(rows):
+            return [list(matches) for matches in rows]
+        with self._lock:
+            if self._failures and time.monotonic() < self._retry_at:
+                self._stats["rerank_skipped"] += 1
+                return [list(matches) for matches in rows]
+        pairs = [(question, match["content"]) for question, matches in zip(questions, rows) for match in matches]
+        started = time.perf_counter()
+        try:
+            with span("rerank"):
+                scores = self._reranker.score(pairs)
+        except Exception:  # noqa: BLE001
+            # Retrieval order is still a usable ranking; answer with it rather than fail.
+            with self._lock:
+                self._stats["rerank_failures"] += 1
+                self._failures += 1
+                delay = min(self._retry_seconds * 2 ** (self._failures - 1), self._max_retry_seconds)
+                self._retry_at = time.monotonic() + delay
+                first = self._failures == 1
+            if first:
+                logger.warning("Re-ranking failed; keeping retrieval order for %.0f s", delay, exc_info=True)
+            else:
+                logger.debug("Re-ranking failed again; retrying in %.0f s", delay, exc_info=True)
+            return [list(matches) for matches in rows]
+        with self._lock:
+            self._stats["rerank_seconds"] += time.perf_counter() - started
+            recovered, self._failures = self._failures, 0
+        if recovered:
+            logger.info("Re-ranking works again after %s failures", recovered)
+
+        ranked: List[List[Match]] = []
+        offset = 0
+        for matches in rows:
+            row_scores = scores[offset : offset + len(matches)]
+            offset += len(matches)
+            order = np.argsort(-row_scores, kind="stable")
+            ranked.append([dict(matches[index], rerank_score=float(row_scores[index])) for index in order])
+        return ranked
+
+    def _pack(self, matches: List[Match], top_k: int) -> List[Match]:
+        token_counts = self._count_tokens([match["content"] for match in matches]) if matches else []
+        selected: List[Match] = []
+        selected_shingles: List[FrozenSet[Tuple[str, ...]]] = []
+        used = 0
+        duplicates = over_budget = 0
+        for match, tokens in zip(matches, token_counts):
+            if len(selected) >= top_k:
+                break
+            shingles = _shingles(match["content"])
+            if any(_containment(shingles, other) >= self._dedup_threshold for other in selected_shingles):
+                duplicates += 1
+                continue
+            if selected and used + tokens > self._token_budget:
+                over_budget += 1
+                continue
+            selected.append(match)
+            selected_shingles.append(shingles)
+            used += tokens
+
+        with self._lock:
+            self._stats["questions"] += 1
+            self._stats["candidates"] += len(matches)
+            self._stats["selected"] += len(selected)
+            self._stats["duplicates_dropped"] += duplicates
+            self._stats["over_budget_dropped"] += over_budget
+            self._stats["context_tokens"] += used
+        return selected
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[Tuple[str, ...]]:
+    words = _WORD.findall(text.casefold())
+    if len(words) < size:
+        return frozenset([tuple(words)]) if words else frozenset()
+    return frozenset(tuple(words[index : index + size]) for index in range(len(words) - size + 1))
+
+
+def _containment(candidate: FrozenSet[Tuple[str, ...]], selected: FrozenSet[Tuple[str, ...]]) -> float:
+    """Share of the smaller shingle set found in the other one."""
+    smaller, larger = (candidate, selected) if len(candidate) <= len(selected) else (selected, candidate)
+    if not smaller:
+        return 0.0
+    return len(smaller & larger) / len(smaller)
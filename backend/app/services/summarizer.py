@@ -3,40 +3,205 @@
 from __future__ import annotations
 
 import os
+import re
 import unicodedata
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+from uuid import uuid4
 
-import google.generativeai as genai
+from .chunker import hash_text, split_text
+from .llm_client import get_client
+from .telemetry import span
 
 GENERATION_PROMPT = (
     "Summarize the document content into a concise overview and list any key requirements."
 )
+PARTIAL_PROMPT = (
+    "You are an assistant that writes accurate summaries for aviation regulations. "
+    "This is one part of a longer document. Summarize this part and list every key requirement it states.\n\n"
+    "Document part:\n"
+)
+REDUCE_PROMPT = (
+    "You are an assistant that writes accurate summaries for aviation regulations. "
+    "The following are summaries of consecutive parts of one document. "
+    "Combine them into a concise overview of the whole document and list any key requirements.\n\n"
+    "Part summaries:\n"
+)
+
+# Pages and paragraphs are separated by a blank line in the stored text.
+BLOCK_SEPARATOR = "\n\n"
+# About one block in this many ends a group once the group is half full.
+GROUP_BOUNDARY_ODDS = 4
+
+SummaryModel = Callable[[str, str], str]
+
+
+def gemini_generate(prompt: str, model_name: str) -> str:
+    return get_client().generate(prompt, model_name)
+
+
+class ExtractiveSummaryModel:
+    """Offline stand-in for Gemini that keeps the leading sentences of its input."""
+
+    _SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+
+    def __init__(self, max_sentences: int = 3):
+        self._max_sentences = max_sentences
+        self.calls = 0
+
+    def __call__(self, prompt: str, model_name: str) -> str:
+        self.calls += 1
+        _, _, body = prompt.rpartition(":\n")
+        sentences = [part.strip() for part in self._SENTENCE_END.split(body.strip()) if part.strip()]
+        return " ".join(sentences[: self._max_sentences])
+
+
+class SummaryCache:
+    """Partial summaries stored on disk, keyed by model name and source text hash."""
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+        self._directory.mkdir(parents=True, exist_ok=True)
 
+    def get(self, model_name: str, text: str) -> Optional[str]:
+        path = self._path(model_name, text)
+        try:
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
 
-def configure_client() -> None:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GEMINI_API_KEY environment variable must be set")
+    def put(self, model_name: str, text: str, summary: str) -> None:
+        path = self._path(model_name, text)
+        staging = path.with_suffix(f".{uuid4().hex}.tmp")
+        staging.write_text(summary, encoding="utf-8")
+        staging.replace(path)
 
-    genai.configure(api_key=api_key)
+    def _path(self, model_name: str, text: str) -> Path:
+        return self._directory / f"{hash_text(model_name + chr(0) + text)}.txt"
 
 
-def generate_summary(text: str, model_name: Optional[str] = None) -> str:
-    configure_client()
+def _clean(text: str, what: str) -> str:
+    cleaned = unicodedata.normalize("NFKC", text or "").strip()
+    if not cleaned:
+        raise ValueError(f"{what} generation returned empty text")
+    return cleaned
 
+
+def generate_summary(
+    text: str,
+    model_name: Optional[str] = None,
+    *,
+    generate: Optional[SummaryModel] = None,
+    max_workers: int = 4,
+    group_chars: int = 12000,
+    cache: Optional[SummaryCache] = None,
+) -> str:
+    """Summarize ``text``, using map-reduce when it is longer than ``group_chars``.
+
+    Long texts are split into groups of whole pages and paragraphs that are
+    summarized concurrently by up to ``max_workers`` threads; the partial
+    summaries are then reduced, recursively if needed, into one summary.
+    Partial summaries are cached by their source text so a re-ingest only
+    pays for groups that changed.
+    """
     model = model_name or os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-    client = genai.GenerativeModel(model)
-    prompt = (
-        "You are an assistant that writes accurate summaries for aviation regulations. "
-        "Summarize the document content into a concise overview and list any key requirements.\n\n"
-        f"Document:\n{text}"
-    )
-
-    response = client.generate_content(prompt)
-
-    summary = response.text or ""
-    summary = unicodedata.normalize("NFKC", summary)
-    summary = summary.strip()
-    if not summary:
-        raise ValueError("Summary generation returned empty text")
+    generate = generate or gemini_generate
+    with span("summarize"):
+        return _summarize(text, model, generate, max_workers, group_chars, cache)
+
+
+def _summarize(
+    text: str,
+    model: str,
+    generate: SummaryModel,
+    max_workers: int,
+    group_chars: int,
+    cache: Optional[SummaryCache],
+) -> str:
+    if len(text) <= group_chars:
+        prompt = (
+            "You are an assistant that writes accurate summaries for aviation regulations. "
+            "Summarize the document content into a concise overview and list any key requirements.\n\n"
+            f"Document:\n{text}"
+        )
+        return _clean(generate(prompt, model), "Summary")
+
+    groups = _group_blocks(text, group_chars)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="summary") as pool:
+        partials = list(pool.map(lambda group: _summarize_part(group, model, generate, cache), groups))
+        return _reduce(partials, model, generate, group_chars, pool)
+
+
+def _group_blocks(text: str, group_chars: int) -> List[str]:
+    """Pack whole blocks into groups of at most ``group_chars`` characters.
+
+    Where a group ends is decided by the content of its last block, not by
+    a running offset, so an edit only regroups the blocks around it: the
+    groups after it end at the same blocks as before and hit the cache.
+    """
+    blocks: List[str] = []
+    for block in text.split(BLOCK_SEPARATOR):
+        block = block.strip()
+        if len(block) > group_chars:
+            blocks.extend(split_text(block, chunk_size=group_chars, overlap=0))
+        elif block:
+            blocks.append(block)
+
+    groups: List[str] = []
+    current: List[str] = []
+    size = 0
+    for block in blocks:
+        if current and size + len(BLOCK_SEPARATOR) + len(block) > group_chars:
+            groups.append(BLOCK_SEPARATOR.join(current))
+            current, size = [], 0
+        size += len(block) + (len(BLOCK_SEPARATOR) if current else 0)
+        current.append(block)
+        if size >= group_chars // 2 and int(hash_text(block)[:8], 16) % GROUP_BOUNDARY_ODDS == 0:
+            groups.append(BLOCK_SEPARATOR.join(current))
+            current, size = [], 0
+    if current:
+        groups.append(BLOCK_SEPARATOR.join(current))
+    return groups
+
+
+def _summarize_part(text: str, model: str, generate: SummaryModel, cache: Optional[SummaryCache]) -> str:
+    if cache:
+        cached = cache.get(model, text)
+        if cached:
+            return cached
+    summary = _clean(generate(PARTIAL_PROMPT + text, model), "Partial summary")
+    if cache:
+        cache.put(model, text, summary)
     return summary
+
+
+def _reduce(
+    partials: List[str],
+    model: str,
+    generate: SummaryModel,
+    group_chars: int,
+    pool: ThreadPoolExecutor,
+) -> str:
+    while True:
+        combined = "\n\n".join(partials)
+        if len(combined) <= group_chars or len(partials) == 1:
+            return _clean(generate(REDUCE_PROMPT + combined, model), "Summary")
+
+        batches: List[List[str]] = [[]]
+        size = 0
+        for partial in partials:
+            if batches[-1] and size + len(partial) > group_chars:
+                batches.append([])
+                size = 0
+            batches[-1].append(partial)
+            size += len(partial) + 2
+        if len(batches) == len(partials):
+            # Every partial fills a group on its own; reducing in pairs still makes progress.
+            batches = [partials[index : index + 2] for index in range(0, len(partials), 2)]
+        partials = list(
+            pool.map(
+                lambda batch: _clean(generate(REDUCE_PROMPT + "\n\n".join(batch), model), "Summary"),
+                batches,
+            )
+        )
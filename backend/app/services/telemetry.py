@@ -0,0 +1,371 @@
+"""Timed spans, counters and histograms rendered in the Prometheus text format."""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import bisect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from contextvars import ContextVar, Token, copy_context
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default buckets, extended for LLM calls and whole ingests.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+T = TypeVar("T")
+LabelValues = Tuple[str, ...]
+# (name, type, help, [(labels, value)]) as produced by a collector.
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._bounds = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts, then sum and count.
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self._bounds) + 1), [0.0, 0.0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return int(series[1][1]) if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._series.items())
+        lines = []
+        names = self.labelnames + ("le",)
+        for key, (counts, (total, count)) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self._bounds + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(names, key + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_number(count)}")
+        return lines
+
+
+class Registry:
+    """Metrics owned by the process plus collectors that report existing statistics on scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def clear_collectors(self) -> None:
+        with self._lock:
+            self._collectors.clear()
+
+    def render(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Render every metric; ``labels`` are added to each sample, e.g. to tell workers apart."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        families: Dict[str, Family] = {}
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                if name in families:
+                    families[name][3].extend(samples)
+                else:
+                    families[name] = (name, kind, documentation, list(samples))
+        for name, kind, documentation, samples in families.values():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(sample_labels), tuple(sample_labels.values()))} {_number(value)}")
+        if labels:
+            extra = _labels(tuple(labels), tuple(labels.values()))[1:-1]
+            lines = [line if line.startswith("#") else _add_labels(line, extra) for line in lines]
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+def _add_labels(sample: str, labels: str) -> str:
+    name, brace, rest = sample.partition("{")
+    if brace:
+        return f"{name}{{{labels},{rest}"
+    name, _, value = sample.partition(" ")
+    return f"{name}{{{labels}}} {value}"
+
+
+def merge_expositions(texts: Iterable[str]) -> str:
+    """Merge the rendered metrics of several processes, one ``HELP``/``TYPE`` header per family.
+
+    The samples of each process must already carry a label that tells them
+    apart, as :meth:`Registry.render` adds with ``labels``.
+    """
+    headers: Dict[str, List[str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for text in texts:
+        family = ""
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                family = line.split(" ", 3)[2]
+                headers.setdefault(family, []).append(line)
+            elif line.startswith("# TYPE "):
+                headers[family].append(line)
+            elif line:
+                samples.setdefault(family, []).append(line)
+    lines: List[str] = []
+    for family, family_headers in headers.items():
+        lines.extend(family_headers[:2])
+        lines.extend(samples.get(family, []))
+    return "\n".join(lines) + "\n"
+
+
+class WorkerMetrics:
+    """Share the metrics of every web worker, so any one of them can answer a scrape.
+
+    The workers of one server share a port and a scrape reaches only one
+    of them, but each keeps its own counters. Every process therefore writes
+    its metrics, labelled ``worker="<pid>"``, to a file in ``directory``
+    every ``interval`` seconds, and :meth:`render` merges its own fresh
+    metrics with the files of the others. Files older than ``max_age``
+    belong to workers that are gone and are left out. The index service
+    writes its file the same way, without serving ``/metrics`` itself.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        registry: Optional[Registry] = None,
+        worker: Optional[str] = None,
+        interval: float = 5.0,
+        max_age: float = 30.0,
+    ):
+        self._directory = directory
+        self._registry = registry or REGISTRY
+        self._worker = worker or str(os.getpid())
+        self._path = directory / f"{self._worker}.prom"
+        self._interval = interval
+        self._max_age = max_age
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="worker-metrics", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def render(self) -> str:
+        own = self._write()
+        texts = [own]
+        cutoff = time.time() - self._max_age
+        for path in sorted(self._directory.glob("*.prom")):
+            if path == self._path:
+                continue
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    texts.append(path.read_text(encoding="utf-8"))
+            except OSError:
+                continue  # the worker removed it on its way out
+        return merge_expositions(texts)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._path.unlink(missing_ok=True)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                self._write()
+            except OSError:
+                logger.warning("Could not write worker metrics to %s", self._path, exc_info=True)
+
+    def _write(self) -> str:
+        text = self._registry.render({"worker": self._worker})
+        staging = self._path.with_suffix(".tmp")
+        staging.write_text(text, encoding="utf-8")
+        staging.replace(self._path)
+        return text
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "chatyournotes_stage_duration_seconds", "Time spent in each instrumented stage.", ["stage"]
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "chatyournotes_http_request_duration_seconds",
+    "Time to produce an HTTP response, by endpoint and status.",
+    ["method", "endpoint", "status"],
+)
+CHUNKS = REGISTRY.counter("chatyournotes_chunks_total", "Chunks processed, by operation.", ["operation"])
+
+
+class RequestTrace:
+    """Spans recorded while serving one request, summed per stage for ``Server-Timing``."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._stages: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            total, count = self._stages.get(stage, (0.0, 0))
+            self._stages[stage] = (total + seconds, count + 1)
+
+    def stages(self) -> Dict[str, Tuple[float, int]]:
+        with self._lock:
+            return dict(self._stages)
+
+    def server_timing(self) -> str:
+        entries = [
+            f'{stage};dur={seconds * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+            for stage, (seconds, count) in self.stages().items()
+        ]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def start_trace() -> Token:
+    return _trace.set(RequestTrace())
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _trace.get()
+
+
+def end_trace(token: Token) -> None:
+    _trace.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the block into the stage histogram and the current request's trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add(stage, seconds)
+
+
+async def run_in_executor(executor: Optional[Executor], function: Callable[..., T], *args: Any) -> T:
+    """Await ``function(*args)`` on ``executor``, keeping the caller's trace for its spans."""
+    context = copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(context.run, function, *args))
@@ -0,0 +1,135 @@
+"""Stream uploaded PDFs straight to disk, validating them while the bytes arrive."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import BinaryIO, List, Optional
+from uuid import uuid4
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+PDF_MAGIC = b"%PDF-"
+# Readers accept the header anywhere in the first kilobyte.
+PDF_HEADER_WINDOW = 1024
+
+
+class InvalidUpload(ValueError):
+    """The uploaded file is not an acceptable PDF."""
+
+
+class UploadTooLarge(InvalidUpload):
+    """The uploaded file exceeds the configured size limit."""
+
+
+class PdfUploadStream:
+    """Writable file that lands in ``directory`` and checks a PDF as it is written.
+
+    Bytes go to a hidden part file next to their final location, so
+    :meth:`commit` is a rename rather than a copy. Every write updates the
+    SHA-256 digest and the size, rejects the upload as soon as it passes
+    ``max_bytes`` and, within the first kilobyte, verifies the PDF header.
+    Closing the stream without committing removes the part file.
+    """
+
+    def __init__(self, directory: Path, max_bytes: Optional[int] = None):
+        self._path = directory / f".upload-{uuid4().hex}.part"
+        self._file: BinaryIO = self._path.open("w+b")
+        self._max_bytes = max_bytes
+        self._digest = hashlib.sha256()
+        self._size = 0
+        self._head = b""
+        self._header_seen = False
+        self._committed = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def write(self, data: bytes) -> int:
+        self._size += len(data)
+        if self._max_bytes is not None and self._size > self._max_bytes:
+            raise UploadTooLarge(f"PDF files may be at most {self._max_bytes} bytes")
+        if not self._header_seen:
+            self._head += data[:PDF_HEADER_WINDOW]
+            if PDF_MAGIC in self._head[:PDF_HEADER_WINDOW]:
+                self._header_seen = True
+            elif len(self._head) >= PDF_HEADER_WINDOW:
+                raise InvalidUpload("Only PDF files are supported")
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def commit(self, target: Path) -> str:
+        """Move the finished upload to ``target`` and return its SHA-256 hex digest."""
+        if not self._header_seen:
+            raise InvalidUpload("Only PDF files are supported")
+        self._file.close()
+        os.replace(self._path, target)
+        self._committed = True
+        return self._digest.hexdigest()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if not self._committed:
+            self._path.unlink(missing_ok=True)
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+
+class _RequestUploadStream(PdfUploadStream):
+    # Werkzeug's form parser swallows ValueError, so rejections leave it as HTTP errors.
+    def write(self, data: bytes) -> int:
+        try:
+            return super().write(data)
+        except UploadTooLarge as exc:
+            raise RequestEntityTooLarge(str(exc)) from exc
+        except InvalidUpload as exc:
+            raise UnsupportedMediaType(str(exc)) from exc
+
+
+class StreamingUploadRequest(Request):
+    """Request that streams document uploads into the PDF folder instead of a temp file."""
+
+    UPLOAD_ENDPOINTS = frozenset({"api.upload_document"})
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Parts aborted mid-stream never reach request.files, so they are tracked for close().
+        self._upload_streams: List[PdfUploadStream] = []
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ):
+        settings = current_app.config.get("APP_SETTINGS")
+        if settings is None or self.endpoint not in self.UPLOAD_ENDPOINTS:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if not filename or not filename.lower().endswith(".pdf"):
+            raise UnsupportedMediaType("Only PDF files are supported")
+        stream = _RequestUploadStream(settings.pdf_dir, settings.max_upload_bytes)
+        self._upload_streams.append(stream)
+        return stream
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            for stream in self._upload_streams:
+                stream.close()
@@ -0,0 +1,257 @@
+"""Storage backends for chunk vectors behind :class:`VectorStore`."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .components import READY, Lazy
+
+
+class StoredChunk(NamedTuple):
+    id: str
+    content: str
+    metadata: Dict[str, Any]
+    embedding: Optional[np.ndarray]
+
+
+class Hit(NamedTuple):
+    id: str
+    content: str
+    metadata: Dict[str, Any]
+    similarity: Optional[float]
+
+
+@dataclass
+class DocumentWrite:
+    """The complete chunk set of one document after a write.
+
+    ``changed`` lists positions whose text or vector is new, ``shifted``
+    positions whose metadata alone changed; all other positions are already
+    stored as given. ``stale`` holds stored chunk ids that no longer exist.
+    Backends may use these hints to write less.
+    """
+
+    ids: List[str]
+    documents: List[str]
+    embeddings: np.ndarray
+    metadatas: List[Dict[str, Any]]
+    changed: Sequence[int]
+    shifted: Sequence[int] = ()
+    stale: Sequence[str] = field(default_factory=list)
+
+
+class VectorBackend(ABC):
+    """Persist normalized chunk vectors and answer cosine top-k queries."""
+
+    @abstractmethod
+    def get_document(self, document_id: str) -> List[StoredChunk]:
+        """Return the stored chunks of a document, with their vectors."""
+
+    @abstractmethod
+    def write_document(self, document_id: str, write: DocumentWrite) -> None:
+        """Make ``write`` the document's stored chunk set."""
+
+    def write_documents(self, writes: Mapping[str, DocumentWrite]) -> None:
+        """Apply the writes of many documents, as few storage calls as the backend allows."""
+        for document_id, write in writes.items():
+            self.write_document(document_id, write)
+
+    @abstractmethod
+    def delete_document(self, document_id: str) -> None:
+        """Remove every chunk of a document."""
+
+    @abstractmethod
+    def get_chunks(self, ids: Sequence[str]) -> Dict[str, Hit]:
+        """Look up chunks by id; unknown ids are left out."""
+
+    @abstractmethod
+    def query(
+        self,
+        embeddings: np.ndarray,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> List[List[Hit]]:
+        """Return the ``k`` most similar chunks for each row of ``embeddings``, best first."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks."""
+
+    def close(self) -> None:
+        """Release files and connections."""
+
+    def status(self) -> Dict[str, object]:
+        """Load state of the backend's storage, for the readiness endpoint."""
+        return {"state": READY}
+
+    def warm_up(self) -> None:
+        """Open storage that is otherwise opened on first use."""
+
+
+class ChromaBackend(VectorBackend):
+    """Chunks in a persistent Chroma collection using cosine distance.
+
+    The client is opened on first use, which keeps the chromadb import and
+    the collection load out of application startup.
+    """
+
+    def __init__(self, path: str, collection: str = "documents"):
+        self._path = path
+        self._collection_name = collection
+        self._opened: Lazy[Tuple[Any, Any]] = Lazy(self._open)
+
+    @property
+    def _client(self) -> Any:
+        return self._opened.get()[0]
+
+    @property
+    def _collection(self) -> Any:
+        return self._opened.get()[1]
+
+    def _open(self) -> Tuple[Any, Any]:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=self._path)
+        collection = client.get_or_create_collection(
+            name=self._collection_name,
+            metadata={"hnsw:space": "cosine"},
+        )
+        return client, collection
+
+    def status(self) -> Dict[str, object]:
+        return self._opened.status()
+
+    def warm_up(self) -> None:
+        self._opened.get()
+
+    def get_document(self, document_id: str) -> List[StoredChunk]:
+        stored = self._collection.get(
+            where={"document_id": document_id}, include=["documents", "metadatas", "embeddings"]
+        )
+        ids = list(stored.get("ids") or [])
+        contents = list(stored.get("documents") or [""] * len(ids))
+        metadatas = list(stored.get("metadatas") or [])
+        embeddings = stored.get("embeddings")
+        if embeddings is None:
+            embeddings = [None] * len(ids)
+        return [
+            StoredChunk(
+                chunk_id,
+                content or "",
+                dict(metadata or {}),
+                None if vector is None else np.asarray(vector, dtype=np.float32),
+            )
+            for chunk_id, content, metadata, vector in zip(ids, contents, metadatas, embeddings)
+        ]
+
+    def write_document(self, document_id: str, write: DocumentWrite) -> None:
+        self.write_documents({document_id: write})
+
+    def write_documents(self, writes: Mapping[str, DocumentWrite]) -> None:
+        ids: List[str] = []
+        documents: List[str] = []
+        embeddings: List[np.ndarray] = []
+        metadatas: List[Dict[str, Any]] = []
+        shifted_ids: List[str] = []
+        shifted_metadatas: List[Dict[str, Any]] = []
+        stale: List[str] = []
+        for write in writes.values():
+            changed = list(write.changed)
+            ids.extend(write.ids[index] for index in changed)
+            documents.extend(write.documents[index] for index in changed)
+            embeddings.append(np.asarray(write.embeddings, dtype=np.float32)[changed])
+            metadatas.extend(write.metadatas[index] for index in changed)
+            shifted_ids.extend(write.ids[index] for index in write.shifted)
+            shifted_metadatas.extend(write.metadatas[index] for index in write.shifted)
+            stale.extend(write.stale)
+
+        if ids:
+            self._upsert(ids=ids, documents=documents, embeddings=np.concatenate(embeddings), metadatas=metadatas)
+        if shifted_ids:
+            self._collection.update(ids=shifted_ids, metadatas=shifted_metadatas)
+        if stale:
+            self._collection.delete(ids=stale)
+
+    def delete_document(self, document_id: str) -> None:
+        self._collection.delete(where={"document_id": document_id})
+
+    def get_chunks(self, ids: Sequence[str]) -> Dict[str, Hit]:
+        if not ids:
+            return {}
+        results = self._collection.get(ids=list(ids), include=["documents", "metadatas"])
+        return {
+            chunk_id: Hit(chunk_id, content, dict(metadata or {}), None)
+            for chunk_id, content, metadata in zip(
+                results.get("ids") or [],
+                results.get("documents") or [],
+                results.get("metadatas") or [],
+            )
+        }
+
+    def query(
+        self,
+        embeddings: np.ndarray,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> List[List[Hit]]:
+        where = None
+        if document_ids:
+            where = {"document_id": {"$in": list(document_ids)}}
+        results = self._collection.query(query_embeddings=embeddings, n_results=k, where=where)
+
+        ids = results.get("ids") or []
+        documents = results.get("documents") or []
+        metadatas = results.get("metadatas") or []
+        distances = results.get("distances") or []
+
+        rows: List[List[Hit]] = []
+        for row in range(len(embeddings)):
+            ids_row = ids[row] if row < len(ids) else []
+            documents_row = documents[row] if row < len(documents) else []
+            metadatas_row = metadatas[row] if row < len(metadatas) else []
+            distances_row = distances[row] if row < len(distances) else []
+
+            hits: List[Hit] = []
+            for idx, chunk_id in enumerate(ids_row):
+                metadata = metadatas_row[idx] if idx < len(metadatas_row) else {}
+                distance = distances_row[idx] if idx < len(distances_row) else None
+                content = documents_row[idx] if idx < len(documents_row) else ""
+                hits.append(Hit(chunk_id, content, dict(metadata or {}), _distance_to_similarity(distance)))
+            rows.append(hits)
+        return rows
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def _upsert(
+        self,
+        ids: List[str],
+        documents: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict[str, Any]],
+    ) -> None:
+        """Write all rows in one call, splitting only where Chroma caps the batch size."""
+        batch_size = self._client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            stop = start + batch_size
+            self._collection.upsert(
+                ids=ids[start:stop],
+                documents=documents[start:stop],
+                embeddings=embeddings[start:stop],
+                metadatas=metadatas[start:stop],
+            )
+
+
+def _distance_to_similarity(distance: Optional[float]) -> Optional[float]:
+    if distance is None:
+        return None
+    similarity = 1.0 - distance
+    if similarity < 0:
+        return 0.0
+    if similarity > 1:
+        return 1.0
+    return similarity
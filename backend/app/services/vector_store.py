@@ -1,100 +1,449 @@
-"""Vector store backed by ChromaDB for semantic search."""
+"""Vector store for semantic search over a pluggable backend, fused with BM25 keyword search."""
 
 from __future__ import annotations
 
-import math
-from typing import Any, Dict, Iterable, List, Optional, Sequence
+import logging
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-import chromadb
+import numpy as np
 
 from ..config import Settings
+from .chunker import Chunk, hash_text
+from .components import Lazy
 from .embedding_service import EmbeddingService
+from .keyword_index import KeywordIndex
+from .telemetry import CHUNKS, span
+from .vector_backend import ChromaBackend, DocumentWrite, Hit, VectorBackend
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("vector", "keyword", "hybrid")
+VECTOR_BACKENDS = ("chroma", "mmap")
+PROVENANCE_KEYS = ("page_start", "page_end", "char_start", "char_end", "byte_start", "byte_end")
+
+# How often a watching store looks for writes by other processes.
+CHANGE_POLL_SECONDS = 1.0
+
+# Rows whose length is this close to 1 count as already normalized.
+UNIT_NORM_TOLERANCE = 1e-4
+
+# Plain strings are accepted for callers without page provenance.
+ChunkInput = Union[str, Chunk]
 
 
 class VectorStore:
     """Provide add/query operations for the document chunk vectors."""
 
-    def __init__(self, settings: Settings, embedder: Optional[EmbeddingService] = None):
+    def __init__(
+        self,
+        settings: Settings,
+        embedder: Optional[EmbeddingService] = None,
+        backend: Optional[VectorBackend] = None,
+    ):
         self._settings = settings
-        self._client = chromadb.PersistentClient(path=str(settings.vector_store_dir))
-        self._collection = self._client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"},
-        )
+        self._backend = backend or create_backend(settings)
         self._embedder = embedder or EmbeddingService()
+        self._keyword_path = settings.vector_store_dir / "keyword_index.sqlite3"
+        # Loading the index reads every chunk's terms, so it waits for the first search or write.
+        self._keyword_index = Lazy(partial(KeywordIndex, self._keyword_path, on_reload=self._changed_elsewhere))
+        self._change_resets: List[Callable[[], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    @property
+    def backend(self) -> VectorBackend:
+        return self._backend
+
+    @property
+    def _keywords(self) -> KeywordIndex:
+        return self._keyword_index.get()
+
+    def keyword_index_status(self) -> Dict[str, object]:
+        return self._keyword_index.status()
+
+    def warm_up_keyword_index(self) -> None:
+        self._keyword_index.get()
+
+    def watch_other_writers(self, reset: Callable[[], None]) -> None:
+        """Call ``reset`` after another process, such as a second web worker, writes to this index.
+
+        A background thread polls the keyword index's version every
+        ``CHANGE_POLL_SECONDS``. Which documents changed is not known here,
+        so whatever ``reset`` clears has to be rebuilt.
+        """
+        self._change_resets.append(reset)
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="vector-store-watch", daemon=True)
+            self._watcher.start()
+
+    def close(self) -> None:
+        self._closed.set()
+        keywords = self._keyword_index.peek()
+        if keywords is not None:
+            keywords.close()
+        self._backend.close()
+
+    def add_document(
+        self, document_id: str, chunks: Iterable[ChunkInput], embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        self.add_documents([(document_id, chunks)], embeddings)
+
+    def add_documents(
+        self, documents: Sequence[Tuple[str, Iterable[ChunkInput]]], embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """Index several new documents with one embedding call and one backend write.
+
+        ``embeddings`` may hold the vectors of all chunks in order, as
+        returned by :meth:`embed_documents`, when the caller embedded them
+        while the chunks were still being produced.
+        """
+        if not documents:
+            return
+        prepared = []
+        for document_id, chunks in documents:
+            items = list(chunks)
+            if not items:
+                raise ValueError("Cannot index document without chunks")
+            prepared.append((document_id, items, [self._chunk_text(item) for item in items]))
 
-    def add_document(self, document_id: str, chunks: Iterable[str]) -> None:
-        chunk_texts = list(chunks)
-        if not chunk_texts:
+        texts = [text for _, _, chunk_texts in prepared for text in chunk_texts]
+        if embeddings is None:
+            embeddings = self.embed_documents(texts)
+        else:
+            embeddings = self._normalize_rows(embeddings)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Got {len(embeddings)} embeddings for {len(texts)} chunks")
+        writes: Dict[str, DocumentWrite] = {}
+        offset = 0
+        for document_id, items, chunk_texts in prepared:
+            ids = [self._chunk_id(document_id, index) for index in range(len(chunk_texts))]
+            metadatas = [
+                self._chunk_metadata(document_id, idx, hash_text(text), items[idx])
+                for idx, text in enumerate(chunk_texts)
+            ]
+            writes[document_id] = DocumentWrite(
+                ids,
+                chunk_texts,
+                embeddings[offset : offset + len(ids)],
+                metadatas,
+                changed=range(len(ids)),
+            )
+            offset += len(ids)
+        with span("index.write"):
+            self._backend.write_documents(writes)
+            self._keywords.upsert_many(
+                (document_id, chunk_id, text)
+                for document_id, write in writes.items()
+                for chunk_id, text in zip(write.ids, write.documents)
+            )
+        CHUNKS.inc(offset, operation="indexed")
+
+    def sync_document(self, document_id: str, chunks: Iterable[ChunkInput]) -> int:
+        """Bring a document's chunks up to date, embedding only new chunk texts.
+
+        Chunks whose text hash is unchanged at the same position are left alone,
+        apart from a metadata update when their page or offsets moved; chunks
+        that moved position reuse their stored vector. Returns the number of
+        chunks that had to be embedded.
+        """
+        items = list(chunks)
+        if not items:
             raise ValueError("Cannot index document without chunks")
+        chunk_texts = [self._chunk_text(item) for item in items]
 
-        embeddings = [
-            self._normalize_vector(vector) for vector in self._embedder.embed_documents(chunk_texts)
+        stored = self._backend.get_document(document_id)
+        hash_by_index: Dict[int, str] = {}
+        metadata_by_index: Dict[int, Dict[str, Any]] = {}
+        vector_by_hash: Dict[str, np.ndarray] = {}
+        for _, _, metadata, vector in stored:
+            chunk_hash = metadata.get("chunk_hash")
+            if chunk_hash is None:
+                continue
+            index = int(metadata.get("chunk_index", -1))
+            hash_by_index[index] = chunk_hash
+            metadata_by_index[index] = metadata
+            if vector is not None:
+                vector_by_hash[chunk_hash] = vector
+
+        hashes = [hash_text(text) for text in chunk_texts]
+        metadatas = [
+            self._chunk_metadata(document_id, index, chunk_hash, item)
+            for index, (chunk_hash, item) in enumerate(zip(hashes, items))
+        ]
+        changed = [index for index, chunk_hash in enumerate(hashes) if hash_by_index.get(index) != chunk_hash]
+        shifted = [
+            index
+            for index, chunk_hash in enumerate(hashes)
+            if hash_by_index.get(index) == chunk_hash and metadata_by_index.get(index) != metadatas[index]
         ]
-        ids = [f"{document_id}_chunk_{index}" for index in range(len(chunk_texts))]
-        metadatas = [{"document_id": document_id, "chunk_index": idx} for idx in range(len(chunk_texts))]
-        self._collection.upsert(ids=ids, documents=chunk_texts, embeddings=embeddings, metadatas=metadatas)
+        missing = sorted({index for index, chunk_hash in enumerate(hashes) if chunk_hash not in vector_by_hash})
+        if missing:
+            fresh = self._normalize_rows(self._embedder.embed_documents([chunk_texts[index] for index in missing]))
+            for index, vector in zip(missing, fresh):
+                vector_by_hash[hashes[index]] = vector
+
+        ids = [self._chunk_id(document_id, index) for index in range(len(chunk_texts))]
+        keep = set(ids)
+        stale = [chunk.id for chunk in stored if chunk.id not in keep]
+        if changed or shifted or stale:
+            self._backend.write_document(
+                document_id,
+                DocumentWrite(
+                    ids,
+                    chunk_texts,
+                    np.stack([vector_by_hash[chunk_hash] for chunk_hash in hashes]),
+                    metadatas,
+                    changed=changed,
+                    shifted=shifted,
+                    stale=stale,
+                ),
+            )
+        if changed:
+            self._keywords.upsert_chunks(
+                document_id,
+                [ids[index] for index in changed],
+                [chunk_texts[index] for index in changed],
+            )
+        if stale:
+            self._keywords.delete_chunks(stale)
+        CHUNKS.inc(len(missing), operation="reembedded")
+        CHUNKS.inc(len(items) - len(missing), operation="reused")
+        return len(missing)
+
+    def document_chunks(self, document_id: str) -> List[ChunkInput]:
+        """Return a document's stored chunks in order, as they were given to :meth:`sync_document`."""
+        stored = sorted(
+            self._backend.get_document(document_id), key=lambda chunk: int(chunk.metadata.get("chunk_index", -1))
+        )
+        chunks: List[ChunkInput] = []
+        for chunk in stored:
+            if "page_start" in chunk.metadata:
+                chunks.append(Chunk(chunk.content, *(int(chunk.metadata[key]) for key in PROVENANCE_KEYS)))
+            else:
+                chunks.append(chunk.content)
+        return chunks
 
     def delete_document(self, document_id: str) -> None:
-        self._collection.delete(where={"document_id": document_id})
+        self._backend.delete_document(document_id)
+        self._keywords.delete_document(document_id)
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        """Return normalized vectors for chunk texts, as :meth:`add_documents` stores them."""
+        with span("index.embed"):
+            return self._normalize_rows(self._embedder.embed_documents(list(texts)))
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Return the normalized query vector used for similarity search."""
+        return self._normalize_rows(self._embedder.embed_query(query))
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """Return normalized query vectors for many queries, encoded as one batch."""
+        return self._normalize_rows(self._embedder.embed_queries(list(queries)))
 
     def similarity_search(
         self,
         query: str,
         k: Optional[int] = None,
         document_ids: Optional[Sequence[str]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        mode: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
+        """Return the ``k`` best chunks for ``query``.
+
+        ``mode`` is ``"vector"``, ``"keyword"`` or ``"hybrid"`` (defaults to
+        ``settings.retrieval_mode``). Hybrid over-fetches from both indexes and
+        merges them with reciprocal rank fusion, so exact identifiers such as
+        section numbers rank well even when their embedding is unremarkable.
+        """
+        query_embeddings = None
+        if query_embedding is not None:
+            query_embeddings = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        return self.similarity_search_many([query], k, document_ids, query_embeddings, mode)[0]
+
+    def similarity_search_many(
+        self,
+        queries: Sequence[str],
+        k: Optional[int] = None,
+        document_ids: Optional[Sequence[str]] = None,
+        query_embeddings: Optional[np.ndarray] = None,
+        mode: Optional[str] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for several queries sharing one filter with a single backend query.
+
+        Returns one match list per query, in order. Keyword and fusion steps
+        run per query on the in-memory index.
+        """
         top_k = k or 3
-        query_embedding = self._normalize_vector(self._embedder.embed_query(query))
-        where = None
-        if document_ids:
-            where = {"document_id": {"$in": list(document_ids)}}
-        results = self._collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where,
-        )
+        mode = mode or self._settings.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if not queries:
+            return []
+        with span(f"search.{mode}"):
+            return self._search(queries, top_k, document_ids, query_embeddings, mode)
 
-        matches: List[Dict[str, Any]] = []
-        ids = results.get("ids") or [[]]
-        documents = results.get("documents") or [[]]
-        metadatas = results.get("metadatas") or [[]]
-        distances = results.get("distances") or [[]]
-
-        ids_row = ids[0] if ids else []
-        documents_row = documents[0] if documents else []
-        metadatas_row = metadatas[0] if metadatas else []
-        distances_row = distances[0] if distances else []
-
-        for idx, chunk_text in enumerate(documents_row):
-            metadata = metadatas_row[idx] if idx < len(metadatas_row) else {}
-            distance_value = distances_row[idx] if idx < len(distances_row) else None
-            score = self._distance_to_similarity(distance_value)
-            matches.append(
-                {
-                    "id": ids_row[idx] if idx < len(ids_row) else None,
-                    "document_id": metadata.get("document_id"),
-                    "chunk_index": metadata.get("chunk_index"),
-                    "content": chunk_text,
-                    "score": score,
-                }
-            )
+    def _search(
+        self,
+        queries: Sequence[str],
+        top_k: int,
+        document_ids: Optional[Sequence[str]],
+        query_embeddings: Optional[np.ndarray],
+        mode: str,
+    ) -> List[List[Dict[str, Any]]]:
+        if mode == "keyword":
+            return [self._keyword_matches(query, top_k, document_ids) for query in queries]
+
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(queries)
+        if mode == "vector":
+            return self._vector_matches(query_embeddings, top_k, document_ids)
+
+        candidates = max(top_k * self._settings.retrieval_candidates_factor, top_k)
+        dense_rows = self._vector_matches(query_embeddings, candidates, document_ids)
+        return [
+            self._fuse(dense, self._keywords.search(query, candidates, document_ids), top_k)
+            for query, dense in zip(queries, dense_rows)
+        ]
+
+    def _vector_matches(
+        self,
+        query_embeddings: np.ndarray,
+        k: int,
+        document_ids: Optional[Sequence[str]],
+    ) -> List[List[Dict[str, Any]]]:
+        rows = self._backend.query(query_embeddings, k, document_ids)
+        return [[dict(self._match(hit), score=hit.similarity) for hit in hits] for hits in rows]
+
+    def _keyword_matches(self, query: str, k: int, document_ids: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+        ranked = self._keywords.search(query, k, document_ids)
+        found = self._fetch_chunks([chunk_id for chunk_id, _ in ranked])
+        matches = []
+        for chunk_id, keyword_score in ranked:
+            match = found.get(chunk_id)
+            if match is not None:
+                matches.append(dict(match, score=None, keyword_score=keyword_score))
         return matches
 
+    def _fuse(
+        self,
+        dense: List[Dict[str, Any]],
+        sparse: List[Tuple[str, float]],
+        k: int,
+    ) -> List[Dict[str, Any]]:
+        """Merge both rankings with reciprocal rank fusion, best ``k`` first."""
+        rrf_k = self._settings.retrieval_rrf_k
+        fused: Dict[str, float] = {}
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for rank, match in enumerate(dense):
+            by_id[match["id"]] = dict(match, keyword_score=None)
+            fused[match["id"]] = 1.0 / (rrf_k + rank + 1)
+        keyword_scores = dict(sparse)
+        for rank, (chunk_id, _) in enumerate(sparse):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+        best = sorted(fused, key=fused.__getitem__, reverse=True)[:k]
+        missing = [chunk_id for chunk_id in best if chunk_id not in by_id]
+        for chunk_id, match in self._fetch_chunks(missing).items():
+            by_id[chunk_id] = dict(match, score=None)
+
+        matches = []
+        for chunk_id in best:
+            match = by_id.get(chunk_id)
+            if match is None:
+                continue
+            match["keyword_score"] = keyword_scores.get(chunk_id)
+            match["fused_score"] = fused[chunk_id]
+            matches.append(match)
+        return matches
+
+    def _fetch_chunks(self, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not chunk_ids:
+            return {}
+        return {chunk_id: self._match(hit) for chunk_id, hit in self._backend.get_chunks(chunk_ids).items()}
+
+    @staticmethod
+    def _match(hit: Hit) -> Dict[str, Any]:
+        metadata = hit.metadata
+        match = {
+            "id": hit.id,
+            "document_id": metadata.get("document_id"),
+            "chunk_index": metadata.get("chunk_index"),
+            "content": hit.content,
+        }
+        for key in PROVENANCE_KEYS:
+            if key in metadata:
+                match[key] = metadata[key]
+        return match
+
+    @staticmethod
+    def _chunk_id(document_id: str, index: int) -> str:
+        return f"{document_id}_chunk_{index}"
+
+    def _watch(self) -> None:
+        seen = KeywordIndex.read_version(self._keyword_path)
+        while not self._closed.wait(CHANGE_POLL_SECONDS):
+            keywords = self._keyword_index.peek()
+            if keywords is not None:
+                # Our own writes keep a loaded index current; it reloads and reports only foreign ones.
+                keywords.refresh()
+                continue
+            # Nothing in this process has written without loading the index, so any change is foreign.
+            version = KeywordIndex.read_version(self._keyword_path)
+            if version != seen:
+                self._changed_elsewhere()
+            seen = version
+
+    def _changed_elsewhere(self) -> None:
+        for reset in self._change_resets:
+            try:
+                reset()
+            except Exception:  # noqa: BLE001
+                logger.exception("Index change listener failed")
+
+    @staticmethod
+    def _chunk_text(chunk: ChunkInput) -> str:
+        return chunk.text if isinstance(chunk, Chunk) else chunk
+
     @staticmethod
-    def _normalize_vector(vector: Sequence[float]) -> List[float]:
-        norm = math.sqrt(sum(component * component for component in vector))
-        if norm == 0:
-            return list(vector)
-        return [component / norm for component in vector]
+    def _chunk_metadata(
+        document_id: str,
+        index: int,
+        chunk_hash: str,
+        chunk: Optional[ChunkInput] = None,
+    ) -> Dict[str, Any]:
+        metadata: Dict[str, Any] = {"document_id": document_id, "chunk_index": index, "chunk_hash": chunk_hash}
+        if isinstance(chunk, Chunk):
+            metadata.update(chunk.provenance())
+        return metadata
 
     @staticmethod
-    def _distance_to_similarity(distance: Optional[float]) -> Optional[float]:
-        if distance is None:
-            return None
-        similarity = 1.0 - distance
-        if similarity < 0:
-            return 0.0
-        if similarity > 1:
-            return 1.0
-        return similarity
+    def _normalize_rows(vectors: Any) -> np.ndarray:
+        """L2-normalize a vector or each row of a matrix as contiguous float32.
+
+        Encoders already return unit-length float32 rows, which are passed
+        through as they are; anything else is scaled into a new array, so the
+        caller's vectors are never modified.
+        """
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        if np.all(np.abs(norms - 1.0) <= UNIT_NORM_TOLERANCE):
+            return matrix
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def create_backend(settings: Settings) -> VectorBackend:
+    """Build the vector backend selected by ``settings.vector_backend``."""
+    if settings.vector_backend == "chroma":
+        return ChromaBackend(str(settings.vector_store_dir))
+    if settings.vector_backend == "mmap":
+        from .mmap_vector_backend import MmapVectorBackend
+
+        return MmapVectorBackend(
+            settings.vector_store_dir / "mmap",
+            dtype=settings.vector_dtype,
+            exact_max_rows=settings.vector_exact_max_rows,
+            nprobe=settings.vector_ivf_nprobe,
+        )
+    raise ValueError(f"Unknown vector backend: {settings.vector_backend}")
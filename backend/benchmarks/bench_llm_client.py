@@ -0,0 +1,81 @@
+"""Measure how hedging changes LLM call latency percentiles against a heavy-tailed fake backend.
+
+Most simulated calls take ``--fast-ms``; a ``--slow-rate`` fraction stalls
+for ``--slow-ms``, as provider calls occasionally do. Run from the
+``backend`` folder::
+
+    python -m benchmarks.bench_llm_client --calls 400 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.services.llm_client import FakeLLMBackend, LLMClient
+
+
+def _run(args: argparse.Namespace, hedge_after: Optional[float]) -> Dict[str, float]:
+    rng = random.Random(0)
+
+    def latency() -> float:
+        base = args.fast_ms * rng.uniform(0.8, 1.2)
+        return (args.slow_ms if rng.random() < args.slow_rate else base) / 1000
+
+    client = LLMClient(
+        FakeLLMBackend(reply=lambda prompt: "answer", latency=latency),
+        max_in_flight=args.max_in_flight,
+        hedge_after=hedge_after,
+    )
+
+    def call(number: int) -> float:
+        started = time.perf_counter()
+        client.generate(f"prompt {number}", "model")
+        return time.perf_counter() - started
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies: List[float] = sorted(pool.map(call, range(args.calls)))
+    elapsed = time.perf_counter() - began
+    stats = client.stats()["models"]["model"]  # type: ignore[index]
+    client.close()
+
+    def percentile(value: float) -> float:
+        return latencies[min(len(latencies) - 1, int(value * (len(latencies) - 1)))] * 1000
+
+    return {
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "calls_per_s": args.calls / elapsed,
+        "hedges": stats["hedges"],
+        "backend_calls": stats["calls"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--fast-ms", type=float, default=40)
+    parser.add_argument("--slow-ms", type=float, default=800)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--hedge-after-ms", type=float, nargs="+", default=[80, 150])
+    args = parser.parse_args()
+
+    print(f"{'hedge after':<14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls/s':>10}{'hedges':>8}{'backend':>9}")
+    for hedge_after_ms in [None, *args.hedge_after_ms]:
+        row = _run(args, hedge_after_ms / 1000 if hedge_after_ms else None)
+        label = "off" if hedge_after_ms is None else f"{hedge_after_ms:.0f} ms"
+        print(
+            f"{label:<14}{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}"
+            f"{row['calls_per_s']:>10.1f}{row['hedges']:>8.0f}{row['backend_calls']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare list-based and vectorized embedding normalization for one large document.
+
+Run from the ``backend`` folder::
+
+    python -m benchmarks.bench_normalization --chunks 10000 --dim 384
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+from app.services.vector_store import VectorStore
+
+
+def _legacy_normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(component * component for component in vector))
+    if norm == 0:
+        return list(vector)
+    return [component / norm for component in vector]
+
+
+def _legacy_path(encoded: np.ndarray) -> object:
+    # Previous behaviour: ``.tolist()`` in EmbeddingService, then per-vector Python loops.
+    return [_legacy_normalize(vector) for vector in encoded.tolist()]
+
+
+def _vectorized_path(encoded: np.ndarray) -> object:
+    return VectorStore._normalize_rows(encoded)
+
+
+def _best_of(func: Callable[[np.ndarray], object], data: np.ndarray, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - began)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    encoded = rng.standard_normal((args.chunks, args.dim)).astype(np.float32)
+
+    legacy = _best_of(_legacy_path, encoded, args.repeat)
+    vectorized = _best_of(_vectorized_path, encoded, args.repeat)
+    print(f"chunks={args.chunks} dim={args.dim}")
+    print(f"python lists : {legacy * 1000:9.2f} ms")
+    print(f"numpy rows   : {vectorized * 1000:9.2f} ms")
+    print(f"speedup      : {legacy / vectorized:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
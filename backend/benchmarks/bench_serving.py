@@ -0,0 +1,183 @@
+"""Load-test ``/api/qa`` over HTTP: the asyncio routes against Flask on a thread pool.
+
+The corpus from :mod:`benchmarks.bench_suite` is ingested once, then served
+by uvicorn twice on a local port: first as the plain Flask app on a pool of
+``--threads`` threads (as a threaded WSGI server would run it), then as
+:class:`app.asgi.AsyncApi`. At each level, that many client sessions ask
+``--rounds`` questions one after another. A level is *sustained* when every
+request succeeds and p95 latency stays under ``--slo-ms``. The LLM is a fake
+backend with ``--llm-latency-ms`` of latency, so the numbers show how the
+server copes with slow upstream calls rather than generation speed.
+
+Run from the ``backend`` folder::
+
+    python -m benchmarks.bench_serving --sessions 16 64 256 512 --output serving.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import uvicorn
+
+from app.asgi import AsyncApi, _ThreadPoolWsgi
+
+from .bench_suite import Harness, _environment, _percentiles, run_ingest
+from .synthetic import Question, make_corpus, make_pdf, make_questions
+
+
+class _Server:
+    """Run an ASGI app under uvicorn on a background thread."""
+
+    def __init__(self, app: Any, port: int, limit_concurrency: Optional[int]):
+        config = uvicorn.Config(
+            app,
+            host="127.0.0.1",
+            port=port,
+            lifespan="off",
+            log_level="warning",
+            limit_concurrency=limit_concurrency,
+            backlog=4096,
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "_Server":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+async def _load(url: str, questions: List[Question], sessions: int, rounds: int, k: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def session(client: aiohttp.ClientSession, number: int) -> None:
+        for turn in range(rounds):
+            question = questions[(number * rounds + turn) % len(questions)]
+            started = time.perf_counter()
+            try:
+                async with client.post(url, json={"question": question.text, "top_k": k}) as response:
+                    await response.read()
+                    status = str(response.status)
+            except aiohttp.ClientError as exc:
+                status = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as client:
+        began = time.perf_counter()
+        await asyncio.gather(*(session(client, number) for number in range(sessions)))
+        elapsed = time.perf_counter() - began
+    return {
+        "sessions": sessions,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "latency_ms": _percentiles(latencies),
+        "status_codes": dict(sorted(statuses.items())),
+    }
+
+
+def run_mode(mode: str, harness: Harness, questions: List[Question], args: argparse.Namespace) -> Dict[str, Any]:
+    harness.settings.wsgi_threads = args.threads
+    harness.settings.cpu_threads = args.cpu_threads
+    pool: Optional[ThreadPoolExecutor] = None
+    if mode == "asgi":
+        app: Any = AsyncApi(harness.app)
+    else:
+        pool = ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix="bench-wsgi")
+        app = _ThreadPoolWsgi(harness.app, pool)
+
+    levels: Dict[str, Any] = {}
+    sustained = 0
+    try:
+        with _Server(app, args.port, args.web_limit_concurrency or None):
+            url = f"http://127.0.0.1:{args.port}/api/qa"
+            for sessions in args.sessions:
+                row = asyncio.run(_load(url, questions, sessions, args.rounds, args.k))
+                row["sustained"] = set(row["status_codes"]) == {"200"} and row["latency_ms"]["p95"] <= args.slo_ms
+                if row["sustained"]:
+                    sustained = max(sustained, sessions)
+                levels[f"s{sessions}"] = row
+                latency = row["latency_ms"]
+                print(
+                    f"{mode:5} sessions={sessions}: {row['requests_per_second']} req/s, p50 {latency['p50']} ms, "
+                    f"p95 {latency['p95']} ms, statuses {row['status_codes']}"
+                    + ("" if row["sustained"] else "  (not sustained)")
+                )
+    finally:
+        if isinstance(app, AsyncApi):
+            app.close()
+        if pool is not None:
+            pool.shutdown()
+    return {"levels": levels, "max_sustained_sessions": sustained}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--facts-per-page", type=int, default=2)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--rounds", type=int, default=3, help="questions asked by each session, one at a time")
+    parser.add_argument("--llm-latency-ms", type=float, default=1000)
+    parser.add_argument("--slo-ms", type=float, default=2500, help="p95 latency a level must stay under")
+    parser.add_argument("--threads", type=int, default=32, help="WSGI threads, as WSGI_THREADS")
+    parser.add_argument("--cpu-threads", type=int, default=4, help="as CPU_THREADS")
+    parser.add_argument("--web-limit-concurrency", type=int, default=1024, help="as WEB_LIMIT_CONCURRENCY")
+    parser.add_argument("--modes", nargs="+", choices=("flask", "asgi"), default=["flask", "asgi"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+    # Harness options this benchmark keeps fixed.
+    args.embedder, args.llm, args.rerank = "hashing", "fake", False
+    args.vector_backend, args.retrieval_mode = "mmap", "hybrid"
+    args.llm_max_in_flight = max(args.sessions) * 2
+
+    corpus = make_corpus(args.documents, args.pages, args.facts_per_page, seed=args.seed)
+    questions = make_questions(corpus, args.questions, seed=args.seed + 1)
+    pdfs = [(document.name, make_pdf(document.pages)) for document in corpus]
+
+    results: Dict[str, Any] = {}
+    with TemporaryDirectory() as temp_dir:
+        harness = Harness(args, Path(temp_dir))
+        try:
+            run_ingest(harness, pdfs, concurrency=4)
+            for mode in args.modes:
+                results[mode] = run_mode(mode, harness, questions, args)
+        finally:
+            harness.close()
+
+    for mode, row in results.items():
+        print(f"{mode}: sustains {row['max_sustained_sessions']} concurrent sessions")
+    if args.output:
+        payload = {
+            "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+            "environment": _environment(),
+            "modes": results,
+        }
+        args.output.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measure how long the API takes to answer its first request after a cold start.
+
+Every run starts a fresh interpreter against a throwaway data folder and a
+SQLite database, and reports the seconds spent importing ``app``, inside
+``create_app``, until ``/api/health/live`` answers and until
+``/api/health/ready`` reports ready. The modes are:
+
+* ``lazy``: no warm-up, every component loads on first use.
+* ``background``: warm-up runs on a thread while requests are served.
+* ``eager``: components load before the first request, as a server that
+  initializes everything in its factory would.
+
+Run from the ``backend`` folder::
+
+    python -m benchmarks.bench_startup --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Dict, List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, sys, time
+began = time.perf_counter()
+import app as package
+imported = time.perf_counter()
+flask_app = package.create_app()
+created = time.perf_counter()
+components = flask_app.config["COMPONENTS"]
+if sys.argv[1] == "eager":
+    components.warm_up()
+client = flask_app.test_client()
+live = client.get("/api/health/live")
+answered = time.perf_counter()
+while components.warming:
+    time.sleep(0.01)
+ready = client.get("/api/health/ready")
+settled = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - began,
+    "create_app_s": created - imported,
+    "first_response_s": answered - began,
+    "ready_s": settled - began,
+    "live_status": live.status_code,
+    "ready_status": ready.status_code,
+    "components": {name: status["state"] for name, status in ready.get_json()["components"].items()},
+}))
+"""
+
+
+def _run(mode: str) -> Dict[str, object]:
+    with TemporaryDirectory() as temp_dir:
+        env = dict(
+            os.environ,
+            DATA_DIR=temp_dir,
+            DATABASE_URL=f"sqlite:///{Path(temp_dir) / 'app.db'}",
+            WARM_UP="true" if mode == "background" else "false",
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE, mode],
+            cwd=BACKEND_ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["lazy", "background", "eager"])
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'import s':>10}{'create s':>10}{'first s':>9}{'ready s':>9}  components")
+    for mode in args.modes:
+        runs: List[Dict[str, object]] = [_run(mode) for _ in range(args.repeat)]
+
+        def median(key: str) -> float:
+            return statistics.median(float(run[key]) for run in runs)  # type: ignore[arg-type]
+
+        states = " ".join(f"{name}={state}" for name, state in runs[-1]["components"].items())  # type: ignore[union-attr]
+        print(
+            f"{mode:<12}{median('import_s'):>10.2f}{median('create_app_s'):>10.2f}"
+            f"{median('first_response_s'):>9.2f}{median('ready_s'):>9.2f}  {states}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Offline end-to-end benchmark of ingestion, retrieval and the ``/api/qa`` path.
+
+Synthetic regulation PDFs are ingested through :class:`PipelineService` and
+synthetic questions are then asked through the API at each concurrency
+level. By default the embedder is a hashing stub and the LLM a fake
+backend with a fixed latency, so the run needs no network, model weights
+or API key. Results are written as JSON; ``--compare`` checks them against
+an earlier run and exits non-zero when a metric regressed by more than
+``--tolerance``.
+
+Run from the ``backend`` folder::
+
+    python -m benchmarks.bench_suite --documents 40 --pages 8 --questions 200 --output bench.json
+    python -m benchmarks.bench_suite --documents 40 --pages 8 --questions 200 --compare bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, cast
+
+import numpy as np
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+from app.api import api_bp
+from app.config import Settings
+from app.extensions import db
+from app.services.chunker import Chunker
+from app.services.document_list_cache import DocumentListCache
+from app.services.embedding_service import EmbeddingService
+from app.services.llm_client import FakeLLMBackend, LLMClient, set_client
+from app.services.pipeline_service import PipelineService
+from app.services.qa_pipeline import QAPipeline
+from app.services.reranker import ContextSelector, CrossEncoderReranker
+from app.services.vector_store import VectorStore
+
+from .synthetic import HashingEmbedder, Question, make_corpus, make_pdf, make_questions
+
+# (path in the results, True when larger is better)
+TRACKED_METRICS: List[Tuple[str, bool]] = [
+    ("ingest.documents_per_second", True),
+    ("ingest.chunks_per_second", True),
+    ("retrieval.latency_ms.p95", False),
+    ("retrieval.recall_at_k", True),
+    ("retrieval.hit_at_k", True),
+]
+
+
+def _percentiles(seconds: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000, 2)
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "mean": round(statistics.fmean(ordered) * 1000, 2)}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _timed_map(function: Callable[[Any], Any], items: Sequence[Any], concurrency: int) -> Tuple[List[float], float]:
+    def run(item: Any) -> float:
+        started = time.perf_counter()
+        function(item)
+        return time.perf_counter() - started
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        latencies = list(pool.map(run, items))
+    return latencies, time.perf_counter() - began
+
+
+class Harness:
+    """A Flask app wired like ``create_app``, backed by a throwaway data folder and SQLite."""
+
+    def __init__(self, args: argparse.Namespace, data_dir: Path):
+        os.environ["DATA_DIR"] = str(data_dir)
+        settings = Settings()
+        settings.vector_backend = args.vector_backend
+        settings.retrieval_mode = args.retrieval_mode
+        settings.ensure_directories()
+        self.settings = settings
+
+        if args.embedder == "model":
+            embedder: Any = EmbeddingService(settings.embedding_model)
+            count_tokens = embedder.count_tokens
+        else:
+            embedder = HashingEmbedder()
+            count_tokens = None
+        self.embedder = embedder
+        self.vector_store = VectorStore(settings, embedder=cast(EmbeddingService, embedder))
+        chunker = Chunker(
+            min(settings.chunk_tokens, embedder.max_input_tokens),
+            settings.chunk_overlap_tokens,
+            count_tokens=count_tokens,
+        )
+        self.pipeline = PipelineService(settings, vector_store=self.vector_store, chunker=chunker)
+
+        if args.llm == "fake":
+            backend = FakeLLMBackend(latency=args.llm_latency_ms / 1000)
+            set_client(LLMClient(backend, max_in_flight=args.llm_max_in_flight))
+        else:
+            set_client(LLMClient.from_settings(settings))
+        reranker = CrossEncoderReranker(settings.rerank_model) if args.rerank else None
+        self.context_selector = ContextSelector(
+            reranker,
+            candidates=settings.rerank_candidates,
+            token_budget=settings.context_token_budget,
+        )
+        self.qa_pipeline = QAPipeline(settings, self.vector_store, context_selector=self.context_selector)
+
+        app = Flask(__name__)
+        app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{data_dir / 'bench.db'}",
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+            SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"timeout": 60}},
+            APP_SETTINGS=settings,
+            QA_PIPELINE=self.qa_pipeline,
+            PIPELINE_SERVICE=self.pipeline,
+            VECTOR_STORE=self.vector_store,
+            DOCUMENT_LIST_CACHE=DocumentListCache(),
+        )
+        db.init_app(app)
+        app.register_blueprint(api_bp, url_prefix="/api")
+        with app.app_context():
+            db.create_all()
+        self.app = app
+
+    def close(self) -> None:
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.vector_store.backend.close()
+
+
+def run_ingest(harness: Harness, pdfs: List[Tuple[str, bytes]], concurrency: int) -> Tuple[Dict[str, Any], List[str]]:
+    documents: List[Any] = []
+
+    def ingest(item: Tuple[str, bytes]) -> None:
+        name, content = item
+        with harness.app.app_context():
+            document = harness.pipeline.ingest(FileStorage(io.BytesIO(content), filename=name))
+            documents.append((document.document_id, document.chunk_count, dict(document.stage_timings or {})))
+
+    latencies, elapsed = _timed_map(ingest, pdfs, concurrency)
+    chunks = sum(count for _, count, _ in documents)
+    stages: Dict[str, float] = {}
+    for _, _, timings in documents:
+        for stage, seconds in timings.items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    result = {
+        "concurrency": concurrency,
+        "documents": len(documents),
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "documents_per_second": round(len(documents) / elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 1),
+        "latency_ms": _percentiles(latencies),
+        "stage_seconds": {stage: round(seconds, 3) for stage, seconds in sorted(stages.items())},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    return result, [document_id for document_id, _, _ in documents]
+
+
+def run_retrieval(harness: Harness, document_ids: List[str], questions: List[Question], k: int) -> Dict[str, Any]:
+    """Single-threaded search latency, recall@k against exact search and hit@k for the coded fact."""
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    for document_id in document_ids:
+        for chunk in harness.vector_store.backend.get_document(document_id):
+            if chunk.embedding is not None:
+                ids.append(chunk.id)
+                vectors.append(chunk.embedding)
+    matrix = np.vstack(vectors).astype(np.float32)
+
+    latencies: List[float] = []
+    recalls: List[float] = []
+    hits = 0
+    for question in questions:
+        query = harness.vector_store.embed_query(question.text)
+        exact = {ids[row] for row in np.argsort(-(matrix @ query))[:k]}
+        dense = harness.vector_store.similarity_search(question.text, k=k, query_embedding=query, mode="vector")
+        recalls.append(len(exact & {match["id"] for match in dense}) / min(k, len(ids)))
+
+        started = time.perf_counter()
+        matches = harness.vector_store.similarity_search(question.text, k=k, query_embedding=query)
+        latencies.append(time.perf_counter() - started)
+        hits += any(question.code in match["content"] for match in matches)
+    return {
+        "mode": harness.settings.retrieval_mode,
+        "k": k,
+        "stored_chunks": len(ids),
+        "latency_ms": _percentiles(latencies),
+        "recall_at_k": round(statistics.fmean(recalls), 4),
+        "hit_at_k": round(hits / len(questions), 4),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run_queries(harness: Harness, questions: List[Question], concurrency: int, k: int) -> Dict[str, Any]:
+    statuses: Dict[int, int] = {}
+    hits = 0
+
+    def ask(question: Question) -> None:
+        nonlocal hits
+        response = harness.app.test_client().post("/api/qa", json={"question": question.text, "top_k": k})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            hits += any(question.code in match["content"] for match in response.get_json()["matches"])
+
+    latencies, elapsed = _timed_map(ask, questions, concurrency)
+    return {
+        "concurrency": concurrency,
+        "requests": len(questions),
+        "requests_per_second": round(len(questions) / elapsed, 2),
+        "latency_ms": _percentiles(latencies),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "hit_at_k": round(hits / len(questions), 4),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def _lookup(results: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return float(value) if isinstance(value, (int, float)) else None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every tracked metric that got worse than ``baseline`` by more than ``tolerance``."""
+    metrics = list(TRACKED_METRICS)
+    for level in current.get("query", {}):
+        metrics += [(f"query.{level}.requests_per_second", True), (f"query.{level}.latency_ms.p95", False)]
+
+    regressions = []
+    print(f"{'metric':<40}{'baseline':>12}{'current':>12}{'change':>9}")
+    for path, higher_is_better in metrics:
+        old, new = _lookup(baseline, path), _lookup(current, path)
+        if old is None or new is None or old == 0:
+            continue
+        change = (new - old) / old
+        print(f"{path:<40}{old:>12.2f}{new:>12.2f}{change:>+9.1%}")
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{path}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--facts-per-page", type=int, default=2)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ingest-concurrency", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--embedder", choices=("hashing", "model"), default="hashing")
+    parser.add_argument("--llm", choices=("fake", "gemini"), default="fake")
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--llm-max-in-flight", type=int, default=64)
+    parser.add_argument("--rerank", action="store_true", help="re-rank with the cross-encoder model")
+    parser.add_argument("--vector-backend", choices=("chroma", "mmap"), default="mmap")
+    parser.add_argument("--retrieval-mode", choices=("vector", "keyword", "hybrid"), default="hybrid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="earlier results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.documents, args.pages, args.facts_per_page, seed=args.seed)
+    questions = make_questions(corpus, args.questions, seed=args.seed + 1)
+    pdfs = [(document.name, make_pdf(document.pages)) for document in corpus]
+
+    with TemporaryDirectory() as temp_dir:
+        harness = Harness(args, Path(temp_dir))
+        try:
+            ingest, document_ids = run_ingest(harness, pdfs, args.ingest_concurrency)
+            print(
+                f"ingest: {ingest['documents']} docs, {ingest['chunks']} chunks in {ingest['seconds']} s "
+                f"({ingest['documents_per_second']} docs/s), p95 {ingest['latency_ms']['p95']} ms"
+            )
+            retrieval = run_retrieval(harness, document_ids, questions, args.k)
+            print(
+                f"retrieval ({retrieval['mode']}): p50 {retrieval['latency_ms']['p50']} ms, "
+                f"p95 {retrieval['latency_ms']['p95']} ms, recall@{args.k} {retrieval['recall_at_k']}, "
+                f"hit@{args.k} {retrieval['hit_at_k']}"
+            )
+            query: Dict[str, Any] = {}
+            for level in args.concurrency:
+                row = run_queries(harness, questions, level, args.k)
+                query[f"c{level}"] = row
+                latency = row["latency_ms"]
+                print(
+                    f"/api/qa c={level}: {row['requests_per_second']} req/s, p50 {latency['p50']} ms, "
+                    f"p95 {latency['p95']} ms, p99 {latency['p99']} ms, statuses {row['status_codes']}"
+                )
+        finally:
+            harness.close()
+
+    results = {
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "environment": _environment(),
+        "ingest": ingest,
+        "retrieval": retrieval,
+        "query": query,
+        "context": harness.context_selector.stats(),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Compare the Chroma and memory-mapped vector backends on clustered random unit vectors.
+
+Run from the ``backend`` folder::
+
+    python -m benchmarks.bench_vector_backends --documents 200 --chunks-per-document 250 --dim 384
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.services.mmap_vector_backend import MmapVectorBackend
+from app.services.vector_backend import ChromaBackend, DocumentWrite, VectorBackend
+
+
+def _unit_rows(rng: np.random.Generator, count: int, dim: int) -> np.ndarray:
+    rows = rng.standard_normal((count, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def _write(document_id: str, vectors: np.ndarray) -> DocumentWrite:
+    ids = [f"{document_id}:{index}" for index in range(len(vectors))]
+    return DocumentWrite(
+        ids=ids,
+        documents=[f"chunk {chunk_id}" for chunk_id in ids],
+        embeddings=vectors,
+        metadatas=[{"document_id": document_id, "chunk_index": index} for index in range(len(vectors))],
+        changed=range(len(vectors)),
+    )
+
+
+def _disk_bytes(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def _run(
+    name: str,
+    factory: Callable[[Path], VectorBackend],
+    corpus: np.ndarray,
+    per_document: int,
+    queries: np.ndarray,
+    truth: List[set],
+    k: int,
+) -> Dict[str, float]:
+    with TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        backend = factory(directory)
+        began = time.perf_counter()
+        for number, start in enumerate(range(0, len(corpus), per_document)):
+            document_id = f"doc{number}"
+            backend.write_document(document_id, _write(document_id, corpus[start : start + per_document]))
+        ingest = time.perf_counter() - began
+
+        backend.query(queries[:1], k)
+        latencies = []
+        found = 0
+        for query, expected in zip(queries, truth):
+            began = time.perf_counter()
+            hits = backend.query(query.reshape(1, -1), k)[0]
+            latencies.append(time.perf_counter() - began)
+            found += len({hit.id for hit in hits} & expected)
+
+        began = time.perf_counter()
+        backend.query(queries, k)
+        batched = time.perf_counter() - began
+
+        filtered = []
+        for query in queries[:50]:
+            began = time.perf_counter()
+            backend.query(query.reshape(1, -1), k, document_ids=["doc0", "doc1"])
+            filtered.append(time.perf_counter() - began)
+
+        size = _disk_bytes(directory)
+        backend.close()
+
+    return {
+        "name": name,
+        "ingest_s": ingest,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "batch_qps": len(queries) / batched,
+        "filtered_p50_ms": float(np.percentile(filtered, 50)) * 1000,
+        "recall": found / (k * len(queries)),
+        "disk_mb": size / 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks-per-document", type=int, default=250)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--exact-max-rows", type=int, default=50_000)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Text embeddings cluster by topic; uniformly random vectors would be a worst case for IVF.
+    topics = _unit_rows(rng, args.topics, args.dim)
+    count = args.documents * args.chunks_per_document
+    corpus = topics[rng.integers(0, args.topics, size=count)] + 0.7 * _unit_rows(rng, count, args.dim)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    # Queries near stored chunks, as real questions land near the passages that answer them.
+    picks = rng.choice(len(corpus), size=args.queries, replace=False)
+    queries = corpus[picks] + 0.3 * _unit_rows(rng, args.queries, args.dim)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    ids = [
+        f"doc{number}:{index}" for number in range(args.documents) for index in range(args.chunks_per_document)
+    ]
+    truth = [
+        {ids[row] for row in np.argpartition(-(corpus @ query), args.k)[: args.k]} for query in queries
+    ]
+
+    backends: Dict[str, Callable[[Path], VectorBackend]] = {}
+    if not args.skip_chroma:
+        backends["chroma"] = lambda directory: ChromaBackend(str(directory))
+    for dtype in ("float32", "int8"):
+        backends[f"mmap-{dtype}"] = lambda directory, dtype=dtype: MmapVectorBackend(
+            directory, dtype=dtype, exact_max_rows=args.exact_max_rows, nprobe=args.nprobe
+        )
+
+    print(f"chunks={len(corpus)} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"{'backend':<14}{'ingest s':>10}{'p50 ms':>9}{'p95 ms':>9}{'batch q/s':>11}{'filter ms':>11}{'recall':>8}{'disk MB':>9}")
+    for name, factory in backends.items():
+        row = _run(name, factory, corpus, args.chunks_per_document, queries, truth, args.k)
+        print(
+            f"{name:<14}{row['ingest_s']:>10.2f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+            f"{row['batch_qps']:>11.0f}{row['filtered_p50_ms']:>11.2f}{row['recall']:>8.3f}{row['disk_mb']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Measure the memory each web worker adds, with and without the shared index service.
+
+Every worker is a fresh interpreter that runs ``create_app`` against a
+throwaway data folder and SQLite database, warms up its components and
+reports its peak RSS. In ``local`` mode each worker loads its own models and
+opens the index itself (``INDEX_SERVICE=off``); in ``shared`` mode one index
+service process owns them and the workers connect to it
+(``INDEX_SERVICE=external``). The total for ``n`` workers is then roughly
+``service + n * worker``. Component states are printed so a run without the
+model weights (for example offline) is recognizable.
+
+Run from the ``backend`` folder::
+
+    python -m benchmarks.bench_workers --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Dict, List, Optional
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, resource, sys
+import app as package
+flask_app = package.create_app()
+components = flask_app.config["COMPONENTS"]
+components.warm_up()
+_, report = components.report()
+states = {}
+for name, status in report.items():
+    states[name] = status["state"]
+    for inner, inner_status in status.get("components", {}).items():
+        states[f"{name}.{inner}"] = inner_status["state"]
+print(json.dumps({"peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "components": states}))
+"""
+
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) / 1024
+    return None
+
+
+def _worker(env: Dict[str, str]) -> Dict[str, object]:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_mode(mode: str, workers: int, base_env: Dict[str, str]) -> Dict[str, object]:
+    with TemporaryDirectory() as temp_dir:
+        env = dict(
+            base_env,
+            DATA_DIR=temp_dir,
+            DATABASE_URL=f"sqlite:///{Path(temp_dir) / 'app.db'}",
+            WARM_UP="false",
+            INDEX_SERVICE="external" if mode == "shared" else "off",
+        )
+        service = None
+        if mode == "shared":
+            service = subprocess.Popen(
+                [sys.executable, "-m", "app.services.index_service"],
+                cwd=BACKEND_ROOT,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        try:
+            runs: List[Dict[str, object]] = [_worker(env) for _ in range(workers)]
+            service_mb = _peak_rss_mb(service.pid) if service else None
+        finally:
+            if service is not None:
+                service.terminate()
+                service.wait(timeout=30)
+    worker_mb = statistics.median(float(run["peak_rss_mb"]) for run in runs)  # type: ignore[arg-type]
+    return {
+        "worker_peak_rss_mb": round(worker_mb, 1),
+        "service_peak_rss_mb": round(service_mb, 1) if service_mb is not None else None,
+        "total_mb": round(worker_mb * workers + (service_mb or 0.0), 1),
+        "components": runs[-1]["components"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=("local", "shared"), default=["local", "shared"])
+    parser.add_argument("--vector-backend", choices=("chroma", "mmap"), default="chroma")
+    args = parser.parse_args()
+
+    base_env = dict(os.environ, VECTOR_BACKEND=args.vector_backend, LLM_BACKEND="fake")
+    results = {}
+    for mode in args.modes:
+        started = time.perf_counter()
+        row = run_mode(mode, args.workers, base_env)
+        results[mode] = row
+        service = f", service {row['service_peak_rss_mb']} MB" if row["service_peak_rss_mb"] is not None else ""
+        states = " ".join(f"{name}={state}" for name, state in row["components"].items())  # type: ignore[union-attr]
+        print(
+            f"{mode:<7} worker {row['worker_peak_rss_mb']} MB{service}, "
+            f"{args.workers} workers {row['total_mb']} MB ({time.perf_counter() - started:.1f} s)  {states}"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Synthetic regulation PDFs, question sets and an offline embedder for benchmarks."""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+SUBJECTS = [
+    "operator", "pilot in command", "flight crew", "maintenance organization", "air carrier",
+    "cabin crew", "dispatcher", "certificate holder", "training organization", "inspector",
+]
+ACTIONS = [
+    "keep records of", "inspect", "report", "carry", "verify", "document", "replace", "calibrate",
+    "brief passengers on", "retain logs of",
+]
+OBJECTS = [
+    "fuel reserves", "emergency equipment", "position lights", "oxygen supply", "navigation equipment",
+    "de-icing procedures", "duty periods", "weight and balance", "airworthiness directives", "flight data",
+]
+UNITS = ["days", "hours", "flights", "months", "cycles"]
+FILLER = [
+    "This section applies to all operations conducted under this part.",
+    "The competent authority may approve an alternative means of compliance.",
+    "Records shall be made available to the authority upon request.",
+    "Deviations must be reported in accordance with the approved procedures.",
+    "The operator shall establish procedures to ensure continued compliance.",
+    "Definitions used in this chapter are listed in the general provisions.",
+]
+
+_WORD = re.compile(r"[0-9a-z]+(?:-[0-9a-z]+)*")
+
+
+@dataclass(frozen=True)
+class Fact:
+    code: str
+    subject: str
+    action: str
+    obj: str
+    sentence: str
+
+
+@dataclass
+class SyntheticDocument:
+    name: str
+    pages: List[str]
+    facts: List[Fact]
+
+
+@dataclass(frozen=True)
+class Question:
+    text: str
+    document: str
+    code: str
+
+
+def make_corpus(documents: int, pages: int, facts_per_page: int = 2, seed: int = 0) -> List[SyntheticDocument]:
+    """Build documents whose pages mix boilerplate with uniquely coded requirements."""
+    rng = random.Random(seed)
+    corpus = []
+    for number in range(documents):
+        facts: List[Fact] = []
+        page_texts: List[str] = []
+        for page in range(pages):
+            sentences = [f"Part {number + 1}, page {page + 1}."]
+            for _ in range(facts_per_page):
+                code = f"RQ-{number:04d}-{len(facts):03d}"
+                subject, action, obj = rng.choice(SUBJECTS), rng.choice(ACTIONS), rng.choice(OBJECTS)
+                sentence = (
+                    f"Requirement {code}: the {subject} shall {action} the {obj} "
+                    f"every {rng.randint(2, 90)} {rng.choice(UNITS)}."
+                )
+                facts.append(Fact(code, subject, action, obj, sentence))
+                sentences.append(sentence)
+                sentences.extend(rng.sample(FILLER, 2))
+            page_texts.append(" ".join(sentences))
+        corpus.append(SyntheticDocument(f"synthetic-{number:04d}.pdf", page_texts, facts))
+    return corpus
+
+
+def make_questions(corpus: List[SyntheticDocument], count: int, seed: int = 1) -> List[Question]:
+    rng = random.Random(seed)
+    facts = [(document.name, fact) for document in corpus for fact in document.facts]
+    picks = rng.sample(facts, min(count, len(facts)))
+    return [
+        Question(f"What must the {fact.subject} do about the {fact.obj} under requirement {fact.code}?", name, fact.code)
+        for name, fact in picks
+    ]
+
+
+def make_pdf(pages: Iterable[str], line_chars: int = 90) -> bytes:
+    """Render text pages into a minimal PDF with one Helvetica text object per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = _wrap(text, line_chars)
+        body = " ".join(f"({_escape(line)}) Tj T*" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 760 Td {body} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(output)
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines: List[str] = []
+    current = ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class HashingEmbedder:
+    """Offline stand-in for :class:`EmbeddingService` using hashed word and bigram features.
+
+    Vectors are deterministic, L2-normalized float32 rows, so lexical
+    overlap translates into cosine similarity without loading a model.
+    """
+
+    model_name = "hashing"
+    max_input_tokens = 510
+
+    def __init__(self, dim: int = 384):
+        self._dim = dim
+        self._buckets: Dict[str, int] = {}
+
+    def embed_documents(self, texts: Iterable[str]) -> np.ndarray:
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed([text])[0]
+
+    def embed_queries(self, texts: Iterable[str]) -> np.ndarray:
+        return self._embed(list(texts))
+
+    def close(self) -> None:
+        pass
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self._dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                bucket = self._buckets.get(feature)
+                if bucket is None:
+                    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                    bucket = self._buckets.setdefault(feature, int.from_bytes(digest, "little"))
+                matrix[row, bucket % self._dim] += 1.0 if (bucket >> 32) & 1 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
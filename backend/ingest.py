@@ -0,0 +1,95 @@
+"""Bulk-ingest a folder of PDFs, or the PDFs listed in a manifest, without the web server.
+
+Run from the ``backend`` folder::
+
+    python ingest.py /archive/pdfs --workers 8 --checkpoint data/ingest.checkpoint
+
+Re-running with the same checkpoint skips files that were already indexed.
+Summaries are left pending and are generated by the server's job queue when
+it next starts. With the Chroma backend, stop the server while ingesting:
+Chroma's files must not be written by two processes at once.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+from pathlib import Path
+
+from flask import Flask
+
+from app.config import Settings
+from app.extensions import db
+from app.schema import prepare_database
+from app.services.bulk_ingest import BulkIngestor, BulkIngestStats, IngestCheckpoint, discover_pdfs
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_service import EmbeddingService
+from app.services.pipeline_service import PipelineService
+from app.services.vector_store import VectorStore
+
+
+def _report(stats: BulkIngestStats) -> None:
+    print(
+        f"indexed={stats.indexed} duplicates={stats.duplicates} failed={stats.failed} "
+        f"pages={stats.pages} chunks={stats.chunks} "
+        f"pages/s={stats.pages_per_second:.1f} chunks/s={stats.chunks_per_second:.1f}",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", type=Path, help="folder to scan for PDFs, or a manifest file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction processes (0 = inline)")
+    parser.add_argument("--batch-chunks", type=int, default=2048, help="chunks embedded and written per batch")
+    parser.add_argument("--embed-batch-size", type=int, default=256, help="texts per model forward pass")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="progress log used to resume a run")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    settings = Settings()
+    settings.ensure_directories()
+    app = Flask(__name__)
+    app.config.update(settings.to_flask_config())
+    db.init_app(app)
+
+    embedding_cache = None
+    if settings.embedding_cache_enabled:
+        embedding_cache = EmbeddingCache(
+            settings.embedding_cache_dir / "embeddings.sqlite3",
+            max_memory_entries=settings.embedding_cache_memory_entries,
+            max_rows=settings.embedding_cache_max_rows,
+        )
+    # No queries compete for the model here, so batches are as large as memory allows.
+    embedder = EmbeddingService(settings.embedding_model, cache=embedding_cache, max_batch_size=args.embed_batch_size)
+    vector_store = VectorStore(settings, embedder=embedder)
+    pipeline = PipelineService(settings, vector_store=vector_store)
+    checkpoint = IngestCheckpoint(args.checkpoint) if args.checkpoint else None
+    ingestor = BulkIngestor(
+        pipeline,
+        max_tokens=min(settings.chunk_tokens, embedder.max_input_tokens),
+        overlap_tokens=settings.chunk_overlap_tokens,
+        tokenizer=settings.embedding_model,
+        workers=args.workers,
+        batch_chunks=args.batch_chunks,
+        checkpoint=checkpoint,
+        on_progress=_report,
+    )
+
+    paths = discover_pdfs(args.source)
+    print(f"Found {len(paths)} PDF files in {args.source}", flush=True)
+    try:
+        with app.app_context():
+            prepare_database()
+            stats = ingestor.run(paths)
+    finally:
+        if checkpoint:
+            checkpoint.close()
+        embedder.close()
+    _report(stats)
+    print(f"files={stats.files} skipped={stats.skipped} elapsed={stats.elapsed:.1f}s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,42 @@
-"""WSGI entry-point used by Docker and local development."""
+"""Server entry-point used by Docker and local development.
 
-from app import create_app
+``python main.py`` serves the ASGI app under uvicorn with the worker and
+concurrency limits from :class:`Settings`. With several workers it first
+starts the shared index service, which owns the models and indexes. ``flask
+--app main`` still finds :func:`create_app` for CLI commands.
+"""
 
-app = create_app()
+import multiprocessing
+
+import uvicorn
+
+from app import create_app  # noqa: F401  (the flask CLI looks it up here)
+from app.config import Settings
+from app.services import index_service
+
+
+def main() -> None:
+    settings = Settings()
+    service = None
+    if settings.uses_index_service and settings.index_service != "external":
+        # Spawned like uvicorn's own workers, so the service inherits nothing from this process.
+        service = multiprocessing.get_context("spawn").Process(target=index_service.run, name="index-service")
+        service.start()
+    try:
+        uvicorn.run(
+            "app.asgi:create_asgi_app",
+            factory=True,
+            host=settings.host,
+            port=settings.port,
+            workers=settings.web_workers,
+            limit_concurrency=settings.web_limit_concurrency or None,
+            proxy_headers=True,
+        )
+    finally:
+        if service is not None:
+            service.terminate()
+            service.join(timeout=30)
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000)
+    main()
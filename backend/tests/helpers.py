@@ -0,0 +1,13 @@
+"""Helpers shared by several test modules."""
+
+import json
+from typing import Any, List, Tuple
+
+
+def parse_events(body: str) -> List[Tuple[str, Any]]:
+    """Split a server-sent events body into ``(event, decoded data)`` pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
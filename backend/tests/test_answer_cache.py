@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+from typing import cast
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.config import Settings
+from app.services.answer_cache import AnswerCache
+from app.services.qa_pipeline import NoContextError, QAPipeline
+from app.services.vector_store import VectorStore
+
+
+class FakeVectorStore:
+    def __init__(self) -> None:
+        self.searches = 0
+        self.matches = [{"id": "doc_chunk_0", "document_id": "doc", "content": "Context", "score": 0.9}]
+
+    def embed_query(self, query: str) -> np.ndarray:
+        vector = np.array([1.0, 0.05 * len(query.split()), 0.0], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def similarity_search(self, query, k=None, document_ids=None, query_embedding=None):
+        self.searches += 1
+        return list(self.matches)
+
+
+class AnswerCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.settings = Settings()
+        self.vector_store = FakeVectorStore()
+        self.cache = AnswerCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.99)
+        self.pipeline = QAPipeline(self.settings, cast(VectorStore, self.vector_store), answer_cache=self.cache)
+
+    def test_exact_hit_skips_retrieval_and_generation(self) -> None:
+        with patch("app.services.qa_pipeline.answer_question", return_value="Answer") as generate:
+            first = self.pipeline.ask("What is required?", top_k=3)
+            second = self.pipeline.ask("  what is REQUIRED ", top_k=3)
+
+        self.assertIsNone(first.cache)
+        self.assertEqual(second.cache, "exact")
+        self.assertEqual(second.answer, "Answer")
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(self.vector_store.searches, 1)
+        self.assertEqual(self.cache.stats()["exact_hits"], 1)
+
+    def test_semantic_hit_requires_same_chunks(self) -> None:
+        with patch("app.services.qa_pipeline.answer_question", return_value="Answer") as generate:
+            self.pipeline.ask("Which equipment is required", top_k=3)
+            similar = self.pipeline.ask("Which instruments are required", top_k=3)
+            self.vector_store.matches = [{"id": "doc_chunk_9", "document_id": "doc", "content": "Other"}]
+            different = self.pipeline.ask("Which lights are required", top_k=3)
+
+        self.assertEqual(similar.cache, "semantic")
+        self.assertIsNone(different.cache)
+        self.assertEqual(generate.call_count, 2)
+
+    def test_invalidate_document_drops_dependent_answers(self) -> None:
+        with patch("app.services.qa_pipeline.answer_question", return_value="Answer") as generate:
+            self.pipeline.ask("What is required?", document_ids=["doc"], top_k=3)
+            self.pipeline.invalidate_document("doc")
+            result = self.pipeline.ask("What is required?", document_ids=["doc"], top_k=3)
+
+        self.assertIsNone(result.cache)
+        self.assertEqual(generate.call_count, 2)
+
+    def test_expired_entries_are_not_served(self) -> None:
+        cache = AnswerCache(ttl_seconds=0)
+        cache.put(
+            "question",
+            None,
+            3,
+            answer="Answer",
+            matches=[],
+            question_embedding=None,
+            retrieval_seconds=0.1,
+            generation_seconds=1.0,
+        )
+        self.assertIsNone(cache.get_exact("question", None, 3))
+
+    def test_no_context_raises(self) -> None:
+        self.vector_store.matches = []
+        with self.assertRaises(NoContextError):
+            self.pipeline.ask("Anything?")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import cast
+from types import SimpleNamespace
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from flask import Flask
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.api import api_bp
+from app.asgi import AsyncApi
+from app.config import Settings
+from app.error_handlers import register_error_handlers
+from app.services.file_handler import FileHandler
+from app.services.llm_client import FakeLLMBackend, LLMClient
+from app.services.qa_pipeline import QAPipeline
+from app.services.vector_store import VectorStore
+from tests.helpers import parse_events
+
+ANSWER = "Fuel must last thirty minutes."
+PDF_BODY = b"%PDF-1.4\n" + b"0" * 200_000 + b"\n%%EOF\n"
+BOUNDARY = "upload-boundary"
+
+
+class FakeVectorStore:
+    def embed_query(self, query: str) -> np.ndarray:
+        return np.array([1.0, 0.0], dtype=np.float32)
+
+    def similarity_search(self, query, k=None, document_ids=None, query_embedding=None):
+        return [{"id": "doc_chunk_0", "document_id": "doc", "content": ANSWER, "score": 0.8}]
+
+
+class FakeJobQueue:
+    def __init__(self, settings: Settings) -> None:
+        self.file_handler = FileHandler(settings)
+        self.saved = []
+
+    def enqueue(self, file, replaces=None):
+        self.saved.append(self.file_handler.save_pdf(file, "upload"))
+        return SimpleNamespace(job_id="job", to_dict=lambda: {"job_id": "job"})
+
+
+def multipart(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def call(app, method: str, path: str, body: bytes = b"", headers=(), chunk_size: int = 65536):
+    """Drive one request through the ASGI app; return status, headers, body and request bytes read."""
+    chunks = [body[start : start + chunk_size] for start in range(0, len(body), chunk_size)] or [b""]
+    consumed = 0
+    response = {"status": None, "headers": {}, "body": b""}
+
+    async def receive():
+        nonlocal consumed
+        if not chunks:
+            await asyncio.sleep(3600)
+        chunk = chunks.pop(0)
+        consumed += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {key.decode().lower(): value.decode() for key, value in message["headers"]}
+        else:
+            response["body"] += message.get("body", b"")
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"], consumed
+
+
+def post_json(app, path: str, payload, headers=()):
+    return call(app, "POST", path, json.dumps(payload).encode(), [("Content-Type", "application/json"), *headers])
+
+
+class AsyncApiTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.previous_data_dir = os.environ.get("DATA_DIR")
+        os.environ["DATA_DIR"] = self.temp_dir.name
+        self.settings = Settings()
+        self.settings.ensure_directories()
+        self.settings.cors_origins = ("http://localhost:5173",)
+        # One thread each: concurrency below has to come from the event loop.
+        self.settings.cpu_threads = 1
+        self.settings.wsgi_threads = 1
+
+        flask_app = Flask(__name__)
+        self.job_queue = FakeJobQueue(self.settings)
+        flask_app.config.update(self.settings.to_flask_config())
+        flask_app.config.update(APP_SETTINGS=self.settings, JOB_QUEUE=self.job_queue)
+        flask_app.config["QA_PIPELINE"] = QAPipeline(self.settings, cast(VectorStore, FakeVectorStore()))
+        register_error_handlers(flask_app)
+        flask_app.register_blueprint(api_bp, url_prefix="/api")
+        self.app = AsyncApi(flask_app)
+
+        self.backend = FakeLLMBackend(reply=lambda prompt: ANSWER, latency=0.2)
+        self.llm = LLMClient(self.backend, max_in_flight=64)
+        client_patch = patch("app.services.qa_service.get_client", return_value=self.llm)
+        client_patch.start()
+        self.addCleanup(client_patch.stop)
+
+    def tearDown(self) -> None:
+        self.app.close()
+        if self.previous_data_dir is not None:
+            os.environ["DATA_DIR"] = self.previous_data_dir
+        else:
+            os.environ.pop("DATA_DIR", None)
+        self.temp_dir.cleanup()
+
+    def test_concurrent_questions_wait_on_the_llm_without_threads(self) -> None:
+        origin = [("Origin", "http://localhost:5173")]
+
+        async def ask_many():
+            questions = [{"question": f"How long must fuel last? {number}"} for number in range(32)]
+            return await asyncio.gather(*(post_json(self.app, "/api/qa", payload, origin) for payload in questions))
+
+        started = time.perf_counter()
+        responses = asyncio.run(ask_many())
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual({status for status, _, _, _ in responses}, {200})
+        status, headers, body, _ = responses[0]
+        self.assertEqual(json.loads(body)["answer"], ANSWER)
+        self.assertEqual(headers["access-control-allow-origin"], "http://localhost:5173")
+        self.assertIn("llm.answer;dur=", headers["server-timing"])
+        # 32 calls of 200 ms each, sharing one CPU thread.
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(len(self.backend.calls), 32)
+
+    def test_validation_and_other_routes_match_flask(self) -> None:
+        status, _, body, _ = asyncio.run(post_json(self.app, "/api/qa", {"question": " "}))
+        self.assertEqual((status, json.loads(body)), (400, {"error": "Question is required"}))
+
+        status, _, body, _ = asyncio.run(call(self.app, "GET", "/api/health"))
+        self.assertEqual((status, json.loads(body)), (200, {"status": "ok"}))
+        status, _, _, _ = asyncio.run(call(self.app, "GET", "/missing"))
+        self.assertEqual(status, 404)
+
+    def test_streamed_answer(self) -> None:
+        status, headers, body, _ = asyncio.run(post_json(self.app, "/api/qa/stream", {"question": "Fuel?"}))
+
+        self.assertEqual(status, 200)
+        self.assertTrue(headers["content-type"].startswith("text/event-stream"))
+        events = parse_events(body.decode())
+        self.assertEqual(events[0][1]["matches"][0]["id"], "doc_chunk_0")
+        self.assertEqual(events[-1], ("done", {"answer": ANSWER}))
+
+    def test_upload_streams_to_disk_and_rejects_non_pdfs_early(self) -> None:
+        content_type = [("Content-Type", f"multipart/form-data; boundary={BOUNDARY}")]
+
+        status, headers, body, _ = asyncio.run(
+            call(self.app, "POST", "/api/documents", multipart("report.pdf", PDF_BODY), content_type, 4096)
+        )
+        self.assertEqual((status, json.loads(body)), (202, {"job_id": "job"}))
+        self.assertEqual(headers["location"], "/api/jobs/job")
+        self.assertEqual(self.job_queue.saved[0].content_hash, hashlib.sha256(PDF_BODY).hexdigest())
+        self.assertEqual([path.name for path in self.settings.pdf_dir.iterdir()], ["upload_report.pdf"])
+
+        fake = multipart("fake.pdf", b"MZ" + b"\0" * 5_000_000)
+        status, _, body, consumed = asyncio.run(call(self.app, "POST", "/api/documents", fake, content_type, 4096))
+        self.assertEqual(status, 415)
+        self.assertIn("PDF", json.loads(body)["error"])
+        self.assertLess(consumed, 1_000_000)
+
+        status, _, _, _ = asyncio.run(
+            call(self.app, "POST", "/api/documents", multipart("notes.txt", PDF_BODY), content_type)
+        )
+        self.assertEqual(status, 415)
+        self.assertEqual([path.name for path in self.settings.pdf_dir.iterdir()], ["upload_report.pdf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import os
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List, cast
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.config import Settings
+from app.extensions import db
+from app.models import Document
+from app.services.bulk_ingest import BulkIngestor, IngestCheckpoint, discover_pdfs
+from app.services.document_store import create_documents
+from app.services.pipeline_service import PipelineService
+from app.services.vector_store import VectorStore
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """Build a small PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(output)
+
+
+class FakeVectorStore:
+    def __init__(self) -> None:
+        self.batches = []
+        self.deleted = []
+
+    def add_documents(self, documents) -> None:
+        self.batches.append([(document_id, list(chunks)) for document_id, chunks in documents])
+
+    def delete_document(self, document_id: str) -> None:
+        self.deleted.append(document_id)
+
+
+class BulkIngestTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.previous_data_dir = os.environ.get("DATA_DIR")
+        os.environ["DATA_DIR"] = str(Path(self.temp_dir.name) / "data")
+        self.settings = Settings()
+        self.settings.ensure_directories()
+
+        self.app = Flask(__name__)
+        self.app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{Path(self.temp_dir.name) / 'test.db'}",
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        )
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.vector_store = FakeVectorStore()
+        self.pipeline = PipelineService(self.settings, vector_store=cast(VectorStore, self.vector_store))
+
+        self.archive = Path(self.temp_dir.name) / "archive"
+        (self.archive / "nested").mkdir(parents=True)
+        (self.archive / "a.pdf").write_bytes(make_pdf(["Section one applies.", "Section two applies."]))
+        (self.archive / "nested" / "b.PDF").write_bytes(make_pdf(["Operators shall keep records."]))
+        (self.archive / "nested" / "copy-of-a.pdf").write_bytes((self.archive / "a.pdf").read_bytes())
+        (self.archive / "notes.txt").write_text("not a pdf", encoding="utf-8")
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        if self.previous_data_dir is not None:
+            os.environ["DATA_DIR"] = self.previous_data_dir
+        else:
+            os.environ.pop("DATA_DIR", None)
+        self.temp_dir.cleanup()
+
+    def ingestor(self, **kwargs) -> BulkIngestor:
+        return BulkIngestor(self.pipeline, max_tokens=64, overlap_tokens=0, **kwargs)
+
+    def test_directory_is_indexed_in_one_batch(self) -> None:
+        stats = self.ingestor().run(discover_pdfs(self.archive))
+
+        self.assertEqual((stats.files, stats.indexed, stats.duplicates, stats.failed), (3, 2, 1, 0))
+        self.assertEqual(stats.pages, 3)
+        self.assertGreater(stats.chunks_per_second, 0)
+        self.assertEqual(len(self.vector_store.batches), 1)
+        documents = Document.query.all()
+        self.assertEqual(sorted(document.original_filename for document in documents), ["a.pdf", "b.PDF"])
+        for document in documents:
+            self.assertTrue((self.settings.pdf_dir / document.stored_pdf).exists())
+            self.assertIn("indexing", document.stage_timings)
+        text = (self.settings.ocr_dir / documents[0].text_path).read_text(encoding="utf-8")
+        self.assertIn("applies", text + (self.settings.ocr_dir / documents[1].text_path).read_text(encoding="utf-8"))
+
+    def test_small_batches_flush_per_file(self) -> None:
+        self.ingestor(batch_chunks=1).run(discover_pdfs(self.archive))
+
+        self.assertEqual(len(self.vector_store.batches), 2)
+
+    def test_failed_commit_does_not_fail_later_batches(self) -> None:
+        calls = []
+
+        def failing_once(rows):
+            calls.append(rows)
+            if len(calls) == 1:
+                for _ in range(2):
+                    db.session.add(
+                        Document(
+                            document_id="dup", original_filename="x.pdf", stored_pdf="x.pdf", text_path="x.txt",
+                            chunk_count=1,
+                        )
+                    )
+                db.session.commit()
+            return create_documents(rows)
+
+        with patch("app.services.pipeline_service.create_documents", failing_once):
+            stats = self.ingestor(batch_chunks=1).run(discover_pdfs(self.archive))
+
+        self.assertEqual((stats.indexed, stats.failed), (1, 1))
+        self.assertEqual(Document.query.count(), 1)
+
+    def test_checkpoint_resumes_and_retries_failures(self) -> None:
+        broken = self.archive / "broken.pdf"
+        broken.write_bytes(b"%PDF-1.4 truncated")
+        checkpoint_path = Path(self.temp_dir.name) / "ingest.checkpoint"
+        checkpoint = IngestCheckpoint(checkpoint_path)
+        first = self.ingestor(checkpoint=checkpoint).run(discover_pdfs(self.archive))
+        checkpoint.close()
+        self.assertEqual((first.indexed, first.failed), (2, 1))
+
+        broken.write_bytes(make_pdf(["Repaired document text."]))
+        checkpoint = IngestCheckpoint(checkpoint_path)
+        second = self.ingestor(checkpoint=checkpoint).run(discover_pdfs(self.archive))
+        checkpoint.close()
+
+        self.assertEqual((second.skipped, second.indexed, second.failed), (3, 1, 0))
+        self.assertEqual(Document.query.count(), 3)
+
+    def test_process_pool_and_manifest(self) -> None:
+        manifest = self.archive / "manifest.txt"
+        manifest.write_text("# backfill\na.pdf\n\nnested/b.PDF\n", encoding="utf-8")
+
+        stats = self.ingestor(workers=1).run(discover_pdfs(manifest))
+
+        self.assertEqual((stats.files, stats.indexed), (2, 2))
+        indexed = {document_id for batch in self.vector_store.batches for document_id, _ in batch}
+        self.assertEqual(indexed, {document.document_id for document in Document.query.all()})
+
+    def test_known_content_is_not_extracted_again(self) -> None:
+        self.ingestor().run([self.archive / "a.pdf"])
+
+        stats = self.ingestor().run([self.archive / "nested" / "copy-of-a.pdf"])
+
+        self.assertEqual((stats.indexed, stats.duplicates), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
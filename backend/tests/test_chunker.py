@@ -0,0 +1,103 @@
+import sys
+import time
+from pathlib import Path
+import unittest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.chunker import Chunker, estimate_tokens
+from app.services.ocr_service import PAGE_SEPARATOR
+
+
+PAGES = [
+    "PART 91—GENERAL OPERATING AND FLIGHT RULES\n\n"
+    "§ 91.203 Civil aircraft: Certifications required.\n"
+    "No person may operate a civil aircraft unless it has an airworthiness certificate. "
+    "The certificate must be displayed at the cabin entrance.\n\n"
+    "§ 91.205 Powered civil aircraft: Instrument and equipment requirements.\n"
+    "No person may operate a powered civil U.S. registered aircraft unless the\n"
+    "instruments are in operable condition. The airspeed indicator is required.",
+    "",
+    "Visual-flight rules apply by day. An altimeter is required. A magnetic direction indicator is required.",
+]
+
+
+def word_counter(calls):
+    def count(texts):
+        calls.append(len(texts))
+        return [len(text.split()) for text in texts]
+
+    return count
+
+
+class ChunkerTestCase(unittest.TestCase):
+    def test_chunks_are_slices_within_budget(self) -> None:
+        calls = []
+        chunks = [chunk.text for chunk in Chunker(30, 0, count_tokens=word_counter(calls)).chunks(PAGES)]
+        text = PAGE_SEPARATOR.join(page for page in PAGES if page)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertIn(chunk, text)
+            self.assertLessEqual(len(chunk.split()), 30)
+        # One tokenizer call per non-empty page.
+        self.assertEqual(len(calls), 2)
+
+    def test_breaks_at_sentences_and_headings(self) -> None:
+        chunks = [chunk.text for chunk in Chunker(40, 0, count_tokens=word_counter([])).chunks(PAGES)]
+
+        self.assertTrue(any(chunk.startswith("§ 91.205") for chunk in chunks))
+        for chunk in chunks:
+            self.assertRegex(chunk, r"[.\w]$")
+            self.assertFalse(chunk.endswith("requirements."))
+
+    def test_overlap_repeats_trailing_sentences(self) -> None:
+        pages = [" ".join(f"Rule {index} applies to pilots." for index in range(20))]
+        chunks = [chunk.text for chunk in Chunker(20, 5, count_tokens=word_counter([])).chunks(pages)]
+
+        for previous, current in zip(chunks, chunks[1:]):
+            last_sentence = previous.rsplit(". ", 1)[-1]
+            self.assertTrue(current.startswith(last_sentence))
+
+    def test_long_sentence_is_split_at_words(self) -> None:
+        pages = ["word " * 95 + "end."]
+        chunks = [chunk.text for chunk in Chunker(20, 0, count_tokens=word_counter([])).chunks(pages)]
+
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(all(len(chunk.split()) <= 20 for chunk in chunks))
+
+    def test_chunks_carry_pages_and_offsets(self) -> None:
+        pages = ["Première page. Résumé des règles.", "", "第二頁。飛航規則適用。", "Last page."]
+        text = PAGE_SEPARATOR.join(page for page in pages if page)
+        encoded = text.encode("utf-8")
+
+        chunks = list(Chunker(6, 0, count_tokens=estimate_tokens).chunks(pages))
+
+        self.assertEqual(chunks[0].page_start, 1)
+        self.assertEqual(chunks[-1].page_end, 4)
+        self.assertIn(3, {chunk.page_start for chunk in chunks})
+        for chunk in chunks:
+            self.assertEqual(text[chunk.char_start : chunk.char_end], chunk.text)
+            self.assertEqual(encoded[chunk.byte_start : chunk.byte_end].decode("utf-8"), chunk.text)
+
+    def test_estimate_tokens(self) -> None:
+        self.assertEqual(estimate_tokens(["14 CFR 91.205", "飛航規則"]), [5, 4])
+
+    def test_large_text_is_linear(self) -> None:
+        page = " ".join(f"Sentence {index} states one requirement." for index in range(20000))
+        started = time.perf_counter()
+        small = sum(1 for _ in Chunker(200, 32).chunks([page]))
+        small_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        large = sum(1 for _ in Chunker(200, 32).chunks([page] * 4))
+        large_seconds = time.perf_counter() - started
+
+        self.assertGreater(large, small * 3)
+        self.assertLess(large_seconds, small_seconds * 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.api import api_bp
+from app.config import Settings
+from app.extensions import db
+from app.services import document_store
+from app.services.document_list_cache import DocumentListCache
+
+
+class DocumentListTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.previous_data_dir = os.environ.get("DATA_DIR")
+        os.environ["DATA_DIR"] = self.temp_dir.name
+        self.settings = Settings()
+
+        self.app = Flask(__name__)
+        self.app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{Path(self.temp_dir.name) / 'test.db'}",
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+            APP_SETTINGS=self.settings,
+            DOCUMENT_LIST_CACHE=DocumentListCache(),
+        )
+        db.init_app(self.app)
+        self.app.register_blueprint(api_bp, url_prefix="/api")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        document_store.ensure_documents_version()
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        if self.previous_data_dir is not None:
+            os.environ["DATA_DIR"] = self.previous_data_dir
+        else:
+            os.environ.pop("DATA_DIR", None)
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def create(name: str):
+        return document_store.create_document(
+            document_id=name,
+            original_filename=f"{name}.pdf",
+            stored_pdf=f"{name}.pdf",
+            text_path=f"{name}.txt",
+            chunk_count=1,
+            summary_preview="preview " * 40,
+        )
+
+    def test_pages_follow_the_cursor_newest_first(self) -> None:
+        for number in range(5):
+            self.create(f"doc{number}")
+
+        seen = []
+        cursor = None
+        while True:
+            response = self.client.get("/api/documents", query_string={"limit": 2, "cursor": cursor or ""})
+            self.assertEqual(response.status_code, 200)
+            payload = response.get_json()
+            self.assertEqual(payload["total"], 5)
+            seen.extend(item["document_id"] for item in payload["items"])
+            cursor = payload["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, [f"doc{number}" for number in reversed(range(5))])
+
+    def test_fields_projection_and_validation(self) -> None:
+        self.create("doc")
+
+        response = self.client.get("/api/documents", query_string={"fields": "summary_status,document_id"})
+        self.assertEqual(response.get_json()["items"], [{"document_id": "doc", "summary_status": "pending"}])
+
+        self.assertEqual(self.client.get("/api/documents?fields=password").status_code, 400)
+        self.assertEqual(self.client.get("/api/documents?cursor=not-a-cursor").status_code, 400)
+        self.assertEqual(self.client.get("/api/documents?limit=0").status_code, 400)
+
+    def test_etag_changes_with_every_write(self) -> None:
+        document = self.create("doc")
+        first = self.client.get("/api/documents")
+        etag = first.headers["ETag"]
+
+        cached = self.client.get("/api/documents", headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+
+        document_store.update_document(document, summary_status="ready")
+        changed = self.client.get("/api/documents", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.get_json()["items"][0]["summary_status"], "ready")
+
+        document_store.delete_by_document_id("doc")
+        emptied = self.client.get("/api/documents", headers={"If-None-Match": changed.headers["ETag"]})
+        self.assertEqual(emptied.get_json()["items"], [])
+
+    def test_unchanged_collection_is_served_from_cache(self) -> None:
+        self.create("doc")
+        with patch.object(document_store, "list_documents_page", wraps=document_store.list_documents_page) as query:
+            first = self.client.get("/api/documents")
+            second = self.client.get("/api/documents")
+            self.assertEqual(query.call_count, 1)
+
+            self.create("other")
+            third = self.client.get("/api/documents")
+            self.assertEqual(query.call_count, 2)
+
+        self.assertEqual(first.get_data(), second.get_data())
+        self.assertEqual(len(third.get_json()["items"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
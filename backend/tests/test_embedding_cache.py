@@ -0,0 +1,110 @@
+import sqlite3
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_service import EmbeddingService
+
+
+class FakeSentenceTransformer:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+        self.calls = []
+
+    def encode(self, texts, **_kwargs):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+
+class EmbeddingCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.cache_path = Path(self.temp_dir.name) / "embeddings.sqlite3"
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _service(self, cache: EmbeddingCache) -> EmbeddingService:
+        with patch("app.services.embedding_service._load_model", FakeSentenceTransformer):
+            return EmbeddingService("fake-model", cache=cache)
+
+    def test_only_misses_are_encoded(self) -> None:
+        cache = EmbeddingCache(self.cache_path)
+        service = self._service(cache)
+
+        service.embed_documents(["alpha", "beta"])
+        vectors = service.embed_documents(["beta", "gamma", "gamma"])
+
+        self.assertEqual(service.model.calls, [["alpha", "beta"], ["gamma"]])
+        self.assertEqual(vectors[0].tolist(), [4.0, 1.0, 0.0])
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 3)
+        cache.close()
+
+    def test_vectors_survive_restart_and_memory_eviction(self) -> None:
+        cache = EmbeddingCache(self.cache_path, max_memory_entries=1)
+        self._service(cache).embed_documents(["alpha", "beta"])
+        self.assertEqual(cache.stats()["memory_entries"], 1)
+        cache.close()
+
+        reopened = EmbeddingCache(self.cache_path, max_memory_entries=1)
+        service = self._service(reopened)
+        self.assertEqual(service.embed_query("alpha").tolist(), [5.0, 1.0, 0.0])
+        self.assertEqual(service.model.calls, [])
+        self.assertEqual(reopened.stats()["hits"], 1)
+        reopened.close()
+
+    def test_vectors_are_scoped_by_model(self) -> None:
+        cache = EmbeddingCache(self.cache_path)
+        cache.put_many("model-a", {"hash": np.ones(3, dtype=np.float32)})
+
+        self.assertEqual(cache.get_many("model-b", ["hash"]), {})
+        self.assertEqual(cache.get_many("model-a", ["hash"])["hash"].dtype, np.float32)
+        cache.close()
+
+
+    def test_least_recently_used_rows_are_pruned(self) -> None:
+        cache = EmbeddingCache(self.cache_path, max_memory_entries=0, max_rows=3)
+        vector = np.ones(3, dtype=np.float32)
+        with patch("app.services.embedding_cache.time.time", side_effect=[100, 200, 300, 400]):
+            cache.put_many("model", {"old": vector, "used": vector})
+            cache.put_many("model", {"recent": vector})
+            cache.get_many("model", ["used"])
+            cache.put_many("model", {"new": vector})
+            cache.put_many("model", {"newest": vector})
+
+        self.assertEqual(
+            sorted(cache.get_many("model", ["old", "used", "recent", "new", "newest"])), ["new", "newest", "used"]
+        )
+        self.assertEqual(cache.stats()["pruned"], 2)
+        cache.close()
+
+    def test_tables_without_last_used_are_upgraded(self) -> None:
+        connection = sqlite3.connect(str(self.cache_path))
+        connection.execute(
+            "CREATE TABLE embeddings (model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+        )
+        blob = np.ones(3, dtype=np.float32).tobytes()
+        connection.execute("INSERT INTO embeddings VALUES ('model', 'hash', ?)", (blob,))
+        connection.commit()
+        connection.close()
+
+        cache = EmbeddingCache(self.cache_path, max_memory_entries=0, max_rows=1)
+        cache.put_many("model", {"other": np.zeros(3, dtype=np.float32)})
+        self.assertEqual(list(cache.get_many("model", ["hash", "other"])), ["other"])
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import sys
+import threading
+from pathlib import Path
+import unittest
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.embedding_scheduler import PRIORITY_BULK, PRIORITY_QUERY, EmbeddingScheduler
+
+
+class RecordingEncoder:
+    def __init__(self) -> None:
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, texts):
+        self.release.wait(5)
+        self.batches.append(list(texts))
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+class EmbeddingSchedulerTestCase(unittest.TestCase):
+    def test_concurrent_queries_share_a_batch(self) -> None:
+        encoder = RecordingEncoder()
+        scheduler = EmbeddingScheduler(encoder, max_batch_size=8, max_wait_ms=200)
+        futures = [scheduler.submit(["q" * length], PRIORITY_QUERY) for length in range(1, 5)]
+
+        results = [future.result(timeout=5) for future in futures]
+        scheduler.close()
+
+        self.assertEqual(encoder.batches, [["q", "qq", "qqq", "qqqq"]])
+        self.assertEqual([result.tolist() for result in results], [[[1.0]], [[2.0]], [[3.0]], [[4.0]]])
+
+    def test_queries_jump_ahead_of_bulk_batches(self) -> None:
+        encoder = RecordingEncoder()
+        encoder.release.clear()
+        scheduler = EmbeddingScheduler(encoder, max_batch_size=2, max_wait_ms=0)
+
+        first = scheduler.submit(["warm"], PRIORITY_BULK)
+        bulk = scheduler.submit(["a", "b", "c", "d", "e", "f"], PRIORITY_BULK)
+        query = scheduler.submit(["question"], PRIORITY_QUERY)
+        encoder.release.set()
+
+        vectors = bulk.result(timeout=5)
+        query.result(timeout=5)
+        first.result(timeout=5)
+        scheduler.close()
+
+        self.assertEqual(vectors.shape, (6, 1))
+        flattened = [text for batch in encoder.batches for text in batch]
+        self.assertLess(flattened.index("question"), flattened.index("c"))
+
+    def test_encode_errors_reach_every_caller(self) -> None:
+        def failing(_texts):
+            raise RuntimeError("model unavailable")
+
+        scheduler = EmbeddingScheduler(failing, max_batch_size=4, max_wait_ms=0)
+        with self.assertRaises(RuntimeError):
+            scheduler.encode(["text"], PRIORITY_QUERY)
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
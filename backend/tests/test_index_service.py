@@ -0,0 +1,164 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.config import Settings
+from app.services.chunker import Chunk
+from app.services.embedding_service import EmbeddingService
+from app.services.index_service import (
+    IndexServer,
+    IndexServiceClient,
+    LocalIndex,
+    RemoteEmbeddingService,
+    RemoteVectorStore,
+)
+from app.services.vector_store import VectorStore
+
+
+class FakeTokenizer:
+    def __call__(self, texts, **_kwargs):
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class FakeSentenceTransformer:
+    """Bag-of-letters model that records each encode call."""
+
+    max_seq_length = 130
+
+    def __init__(self, model_name: str) -> None:
+        self.tokenizer = FakeTokenizer()
+        self.calls = []
+
+    def encode(self, texts, **_kwargs):
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), 26), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for char in text.lower():
+                if "a" <= char <= "z":
+                    vectors[row, ord(char) - ord("a")] += 1.0
+        vectors[:, 0] += 0.5
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class IndexServiceTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.previous_data_dir = os.environ.get("DATA_DIR")
+        os.environ["DATA_DIR"] = self.temp_dir.name
+        self.settings = Settings()
+        self.settings.vector_backend = "mmap"
+        self.settings.ensure_directories()
+
+        with patch("app.services.embedding_service._load_model", FakeSentenceTransformer):
+            embedder = EmbeddingService("fake-model", max_wait_ms=50)
+            embedder.model  # noqa: B018  (load it while the patch is active)
+        self.index = LocalIndex(embedder, VectorStore(self.settings, embedder=embedder), reranker=None)
+        self.server = IndexServer(self.index, self.settings.index_service_socket)
+        self.server.listen()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        self.clients = [IndexServiceClient(self.settings.index_service_socket, connect_timeout=2) for _ in range(2)]
+        self.workers = [RemoteVectorStore(client) for client in self.clients]
+
+    def tearDown(self) -> None:
+        for worker in self.workers:
+            worker.close()
+        self.server.close()
+        self.thread.join(timeout=5)
+        self.index.close()
+        if self.previous_data_dir is not None:
+            os.environ["DATA_DIR"] = self.previous_data_dir
+        else:
+            os.environ.pop("DATA_DIR", None)
+        self.temp_dir.cleanup()
+
+    def test_workers_share_one_index(self) -> None:
+        first, second = self.workers
+        first.add_document("doc", [Chunk("alpha rules", 2, 2, 0, 11, 0, 11), Chunk("bravo rules", 3, 3, 12, 23, 12, 23)])
+
+        match = second.similarity_search("alpha", k=1, mode="vector")[0]
+        self.assertEqual((match["content"], match["page_start"]), ("alpha rules", 2))
+        self.assertEqual(second.sync_document("doc", ["alpha rules", "delta rules"]), 1)
+        self.assertEqual(
+            sorted(match["content"] for match in first.similarity_search("rules", k=5, document_ids=["doc"])),
+            ["alpha rules", "delta rules"],
+        )
+
+        first.delete_document("doc")
+        self.assertEqual(second.similarity_search("alpha", k=3), [])
+        with self.assertRaisesRegex(ValueError, "without chunks"):
+            second.add_document("empty", [])
+
+        embedder = RemoteEmbeddingService(self.clients[0], "fake-model")
+        self.assertEqual(embedder.count_tokens(["two words", "three more words"]), [2, 3])
+        self.assertEqual(embedder.max_input_tokens, 128)
+
+    def test_other_workers_hear_about_writes(self) -> None:
+        changed = []
+        arrived = threading.Event()
+
+        def listener(document_id: str) -> None:
+            changed.append(document_id)
+            arrived.set()
+
+        self.workers[1].subscribe(listener)
+        time.sleep(0.2)  # let the watcher start following the change log
+        self.workers[0].add_document("doc", ["alpha rules"])
+
+        self.assertTrue(arrived.wait(5))
+        self.assertEqual(changed, ["doc"])
+
+    def test_queries_from_workers_are_encoded_in_shared_batches(self) -> None:
+        model = self.index.embedder.model
+        model.calls.clear()
+        questions = [f"question {chr(ord('a') + number)}" for number in range(16)]
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            vectors = list(pool.map(lambda pair: self.workers[pair[0] % 2].embed_query(pair[1]), enumerate(questions)))
+
+        self.assertEqual(len(vectors), 16)
+        self.assertEqual(sorted(text for call in model.calls for text in call), sorted(questions))
+        self.assertLess(len(model.calls), 8)
+
+    def test_writes_run_one_at_a_time(self) -> None:
+        store = self.index.vector_store
+        add_documents = store.add_documents
+        active = 0
+        most_active = 0
+        lock = threading.Lock()
+
+        def tracked(documents, embeddings=None):
+            nonlocal active, most_active
+            with lock:
+                active += 1
+                most_active = max(most_active, active)
+            time.sleep(0.02)
+            try:
+                add_documents(documents, embeddings)
+            finally:
+                with lock:
+                    active -= 1
+
+        with patch.object(store, "add_documents", tracked):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(lambda number: self.workers[number % 2].add_document(f"doc{number}", ["rules"]), range(8)))
+
+        self.assertEqual(most_active, 1)
+        self.assertEqual(len(self.workers[0].similarity_search("rules", k=20, mode="vector")), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import sys
+import tempfile
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.config import Settings
+from app.instrumentation import SlowRequestProfiler, register_instrumentation
+from app.services.answer_cache import AnswerCache
+from app.services.telemetry import STAGE_SECONDS, Registry, WorkerMetrics, span
+
+
+class RegistryTestCase(unittest.TestCase):
+    def test_renders_prometheus_text(self) -> None:
+        registry = Registry()
+        requests = registry.counter("demo_requests_total", "Requests.", ["path"])
+        latency = registry.histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0))
+        requests.inc(path='/a"b')
+        requests.inc(2, path='/a"b')
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+        registry.add_collector(lambda: [("demo_ready", "gauge", "Ready.", [({"component": "db"}, 1)])])
+
+        text = registry.render()
+
+        self.assertIn('demo_requests_total{path="/a\\"b"} 3', text)
+        self.assertIn('demo_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{le="1"} 2', text)
+        self.assertIn('demo_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("demo_seconds_count 3", text)
+        self.assertIn("# TYPE demo_ready gauge", text)
+        self.assertIn('demo_ready{component="db"} 1', text)
+        self.assertIs(registry.counter("demo_requests_total", "Requests.", ["path"]), requests)
+
+
+class WorkerMetricsTestCase(unittest.TestCase):
+    def test_any_worker_reports_all_workers(self) -> None:
+        registries = [Registry(), Registry()]
+        for number, registry in enumerate(registries, start=1):
+            registry.counter("demo_requests_total", "Requests.", ["path"]).inc(number, path="/a")
+            registry.histogram("demo_seconds", "Latency.", buckets=(1.0,)).observe(0.5)
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = (
+                WorkerMetrics(Path(directory), registry, worker=str(number))
+                for number, registry in enumerate(registries, start=1)
+            )
+            second.render()
+
+            text = first.render()
+
+            self.assertEqual(text.count("# TYPE demo_requests_total counter"), 1)
+            self.assertIn('demo_requests_total{worker="1",path="/a"} 1', text)
+            self.assertIn('demo_requests_total{worker="2",path="/a"} 2', text)
+            self.assertIn('demo_seconds_count{worker="2"} 1', text)
+            second.close()
+            self.assertNotIn('worker="2"', first.render())
+
+
+class RequestInstrumentationTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with patch.dict("os.environ", {"DATA_DIR": self.temp_dir.name}):
+            self.settings = Settings()
+        self.app = Flask(__name__)
+        cache = AnswerCache()
+        cache.get_semantic(np.ones(3, dtype=np.float32), frozenset({"chunk"}), None, 3)
+        self.app.config["QA_PIPELINE"] = type("Pipeline", (), {"answer_cache": cache})()
+
+        @self.app.get("/api/work")
+        def work():
+            with span("test.retrieve"):
+                pass
+            with span("test.retrieve"):
+                pass
+            with span("test.generate"):
+                pass
+            return {"ok": True}
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_server_timing_and_metrics(self) -> None:
+        register_instrumentation(self.app, self.settings)
+        client = self.app.test_client()
+        before = STAGE_SECONDS.count(stage="test.retrieve")
+
+        response = client.get("/api/work")
+
+        timing = response.headers["Server-Timing"]
+        self.assertRegex(timing, r'test\.retrieve;dur=[0-9.]+;desc="x2"')
+        self.assertRegex(timing, r"test\.generate;dur=[0-9.]+")
+        self.assertRegex(timing, r"total;dur=[0-9.]+$")
+        self.assertEqual(STAGE_SECONDS.count(stage="test.retrieve"), before + 2)
+
+        metrics = client.get("/metrics")
+        self.assertEqual(metrics.status_code, 200)
+        self.assertTrue(metrics.content_type.startswith("text/plain; version=0.0.4"))
+        body = metrics.get_data(as_text=True)
+        self.assertIn(
+            'chatyournotes_http_request_duration_seconds_count{method="GET",endpoint="/api/work",status="200"}',
+            body,
+        )
+        self.assertIn('chatyournotes_stage_duration_seconds_bucket{stage="test.generate",le="+Inf"}', body)
+        self.assertIn('chatyournotes_answer_cache_lookups_total{result="miss"} 1', body)
+
+    def test_slow_requests_leave_a_profile(self) -> None:
+        self.settings.profile_slow_ms = 0.001
+        self.settings.profile_sample_rate = 1.0
+        self.settings.profile_keep = 2
+        register_instrumentation(self.app, self.settings)
+        client = self.app.test_client()
+
+        with self.assertLogs(self.app.logger.name, level="WARNING"):
+            for _ in range(3):
+                client.get("/api/work")
+
+        self.assertEqual(len(list(self.settings.profile_dir.glob("*-GET__api_work-*.prof"))), 2)
+
+    def test_fast_requests_are_discarded(self) -> None:
+        profiler = SlowRequestProfiler(self.settings.profile_dir, slow_ms=10_000, sample_rate=1.0, keep=5)
+        profile = profiler.start()
+        self.assertIsNotNone(profile)
+        self.assertIsNone(profiler.start())
+
+        self.assertIsNone(profiler.finish(profile, 0.01, "GET /api/work"))
+        self.assertFalse(self.settings.profile_dir.exists())
+        again = profiler.start()
+        self.assertIsNotNone(again)
+        profiler.finish(again, 0.01, "GET /api/work")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta
+import io
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import cast
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.config import Settings
+from app.extensions import db
+from app.models import Document, IngestionJob
+from app.services import job_store
+from app.services.document_store import claim_summary, create_document
+from app.services.job_queue import IngestionJobQueue, QueueFullError
+from app.services.pipeline_service import PipelineService
+from app.services.vector_store import VectorStore
+
+
+_MINIMAL_PDF = b"%PDF-1.4\n1 0 obj\n<< /Type /Catalog >>\nendobj\ntrailer\n<< >>\n%%EOF\n"
+
+
+class FakeVectorStore:
+    def __init__(self) -> None:
+        self.added = []
+        self.deleted = []
+
+    def embed_documents(self, texts):
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+    def add_document(self, document_id: str, chunks, embeddings=None) -> None:
+        self.added.append((document_id, list(chunks)))
+
+    def delete_document(self, document_id: str) -> None:
+        self.deleted.append(document_id)
+
+
+class IngestionJobQueueTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.previous_data_dir = os.environ.get("DATA_DIR")
+        os.environ["DATA_DIR"] = self.temp_dir.name
+
+        self.settings = Settings()
+        self.settings.ensure_directories()
+
+        self.app = Flask(__name__)
+        self.database_path = Path(self.temp_dir.name) / "test.db"
+        self.app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{self.database_path}",
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        )
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.vector_store = FakeVectorStore()
+        self.pipeline = PipelineService(
+            self.settings,
+            vector_store=cast(VectorStore, self.vector_store),
+        )
+        self.queue = IngestionJobQueue(self.app, self.pipeline, max_workers=1, max_pending=4)
+
+    def tearDown(self) -> None:
+        self.queue.shutdown()
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+
+        if self.previous_data_dir is not None:
+            os.environ["DATA_DIR"] = self.previous_data_dir
+        else:
+            os.environ.pop("DATA_DIR", None)
+
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def _make_upload(filename: str = "example.pdf") -> FileStorage:
+        return FileStorage(stream=io.BytesIO(_MINIMAL_PDF), filename=filename, content_type="application/pdf")
+
+    def _refresh(self, job_id: str) -> IngestionJob:
+        db.session.expire_all()
+        return job_store.get_by_job_id(job_id)
+
+    def test_enqueue_runs_pipeline_in_background(self) -> None:
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
+            patch("app.services.pipeline_service.generate_summary", return_value="Summary body"), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1"]):
+            job = self.queue.enqueue(self._make_upload())
+            self.assertEqual(job.status, job_store.STATUS_QUEUED)
+            self.queue.shutdown()
+
+        stored = self._refresh(job.job_id)
+        self.assertEqual(stored.status, job_store.STATUS_SUCCEEDED)
+        self.assertIsNone(stored.stage)
+        document = Document.query.filter_by(document_id=job.document_id).first()
+        self.assertIsNotNone(document)
+        self.assertEqual(document.summary_status, "ready")
+        self.assertEqual(self.vector_store.added[0][0], job.document_id)
+
+    def test_failed_job_records_error(self) -> None:
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", side_effect=ValueError("no text")):
+            job = self.queue.enqueue(self._make_upload())
+            self.queue.shutdown()
+
+        stored = self._refresh(job.job_id)
+        self.assertEqual(stored.status, job_store.STATUS_FAILED)
+        self.assertEqual(stored.stage, "extracting")
+        self.assertEqual(stored.error, "no text")
+        self.assertFalse((self.settings.pdf_dir / job.stored_pdf).exists())
+
+    def test_concurrent_uploads_cannot_overrun_the_limit(self) -> None:
+        release, finish = threading.Event(), threading.Event()
+        stage_upload = self.pipeline.stage_upload
+        outcomes = []
+
+        def slow_stage(file, replaces=None):
+            release.wait(5)
+            return stage_upload(file, replaces=replaces)
+
+        def upload(number: int) -> None:
+            with self.app.app_context():
+                try:
+                    outcomes.append(self.queue.enqueue(self._make_upload(f"upload{number}.pdf")))
+                except QueueFullError as exc:
+                    outcomes.append(exc)
+
+        with patch.object(self.pipeline, "stage_upload", slow_stage), \
+            patch.object(self.queue, "_run", lambda _job_id: finish.wait(5)):
+            threads = [threading.Thread(target=upload, args=(number,)) for number in range(6)]
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 5
+            while len(outcomes) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            rejected_while_staging = len(outcomes)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+            self.assertEqual(self.queue.pending_count(), 4)
+            finish.set()
+
+        self.assertEqual(rejected_while_staging, 2)
+        self.assertEqual(sum(isinstance(outcome, QueueFullError) for outcome in outcomes), 2)
+
+    def _age(self, job_id: str, seconds: float) -> None:
+        IngestionJob.query.filter_by(job_id=job_id).update(
+            {"updated_at": datetime.utcnow() - timedelta(seconds=seconds)}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def test_resume_pending_requeues_interrupted_jobs(self) -> None:
+        upload = self.pipeline.stage_upload(self._make_upload("restart.pdf"))
+        job = job_store.create_job(upload)
+        self.assertTrue(job_store.claim(job.job_id))
+        self._age(job.job_id, 120)
+
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
+            patch("app.services.pipeline_service.generate_summary", return_value="Summary body"), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1"]):
+            resumed = self.queue.resume_pending()
+            self.queue.shutdown()
+
+        self.assertEqual(resumed, 1)
+        self.assertEqual(self._refresh(job.job_id).status, job_store.STATUS_SUCCEEDED)
+
+    def test_starting_worker_leaves_live_work_to_its_owner(self) -> None:
+        running = job_store.create_job(self.pipeline.stage_upload(self._make_upload("running.pdf")))
+        self.assertTrue(job_store.claim(running.job_id))
+        queued = job_store.create_job(self.pipeline.stage_upload(self._make_upload("queued.pdf")))
+        create_document(
+            document_id="summarizing", original_filename="s.pdf", stored_pdf="s.pdf", text_path="s.txt", chunk_count=1
+        )
+        self.assertTrue(claim_summary("summarizing", datetime.utcnow() - timedelta(seconds=60)))
+
+        with patch.object(self.queue, "_submit_summary") as submit_summary:
+            resumed = self.queue.resume_pending()
+            self.queue.shutdown()
+
+        self.assertEqual(resumed, 0)
+        self.assertEqual(self._refresh(running.job_id).status, job_store.STATUS_RUNNING)
+        self.assertEqual(self._refresh(queued.job_id).status, job_store.STATUS_QUEUED)
+        submit_summary.assert_not_called()
+        self.assertFalse(claim_summary("summarizing", datetime.utcnow() - timedelta(seconds=60)))
+
+
+if __name__ == "__main__":
+    unittest.main()
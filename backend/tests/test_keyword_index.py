@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.keyword_index import KeywordIndex, tokenize
+
+
+class TokenizeTestCase(unittest.TestCase):
+    def test_section_numbers_are_kept_and_split(self) -> None:
+        terms = tokenize("See 14 CFR 91.205(b)")
+        self.assertIn("91.205", terms)
+        self.assertIn("205", terms)
+        self.assertIn("cfr", terms)
+
+    def test_full_width_and_cjk_text(self) -> None:
+        terms = tokenize("ＡＢＣ 飛航規則")
+        self.assertIn("abc", terms)
+        self.assertEqual([term for term in terms if term != "abc"], ["飛航", "航規", "規則"])
+
+
+class KeywordIndexTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "keywords.sqlite3"
+        self.index = KeywordIndex(self.path)
+        self.index.upsert_chunks(
+            "doc-a",
+            ["a_0", "a_1"],
+            ["Instruments required by 14 CFR 91.205 for day VFR.", "Fuel reserves for night flight."],
+        )
+        self.index.upsert_chunks("doc-b", ["b_0"], ["Section 91.203 covers the airworthiness certificate."])
+
+    def tearDown(self) -> None:
+        self.index.close()
+        self.temp_dir.cleanup()
+
+    def test_exact_identifier_ranks_first(self) -> None:
+        results = self.index.search("what does 91.205 require", k=3)
+        self.assertEqual(results[0][0], "a_0")
+
+    def test_document_filter(self) -> None:
+        results = self.index.search("91.205 airworthiness", k=3, document_ids=["doc-b"])
+        self.assertEqual([chunk_id for chunk_id, _ in results], ["b_0"])
+
+    def test_deletes_and_reload(self) -> None:
+        self.index.delete_chunks(["a_1"])
+        self.index.delete_document("doc-b")
+        self.index.close()
+
+        self.index = KeywordIndex(self.path)
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.search("fuel", k=3), [])
+        self.assertEqual(self.index.search("91.205", k=3)[0][0], "a_0")
+
+    def test_writes_from_another_process_are_picked_up(self) -> None:
+        reloads = []
+        other = KeywordIndex(self.path, on_reload=lambda: reloads.append(True))
+        try:
+            self.index.upsert_chunks("doc-c", ["c_0"], ["Oxygen requirements above 12,500 feet."])
+            self.assertEqual(other.search("oxygen", k=3)[0][0], "c_0")
+            self.assertEqual(reloads, [True])
+
+            other.delete_document("doc-a")
+            self.assertEqual(self.index.search("vfr", k=3), [])
+            self.assertFalse(other.refresh())
+            self.assertEqual(reloads, [True])
+        finally:
+            other.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import unittest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.llm_client import FakeLLMBackend, LLMClient, LLMError, TokenBucket
+from app.services.qa_service import answer_question, stream_answer
+
+
+def client_for(backend: FakeLLMBackend, **kwargs) -> LLMClient:
+    kwargs.setdefault("backoff_base", 0.001)
+    return LLMClient(backend, **kwargs)
+
+
+class LLMClientTestCase(unittest.TestCase):
+    def test_retryable_errors_are_retried(self) -> None:
+        backend = FakeLLMBackend(reply=lambda prompt: "done", failures=[LLMError("quota", 429), TimeoutError()])
+        client = client_for(backend)
+
+        self.assertEqual(client.generate("prompt", "model"), "done")
+
+        stats = client.stats()["models"]["model"]
+        self.assertEqual(len(backend.calls), 3)
+        self.assertEqual((stats["calls"], stats["retries"], stats["failures"]), (1, 2, 0))
+        self.assertEqual((stats["prompt_tokens"], stats["output_tokens"]), (1, 1))
+
+    def test_permanent_errors_and_exhausted_retries_raise(self) -> None:
+        invalid = FakeLLMBackend(failures=[LLMError("bad request", 400)])
+        with self.assertRaises(LLMError):
+            client_for(invalid).generate("prompt", "model")
+        self.assertEqual(len(invalid.calls), 1)
+
+        overloaded = FakeLLMBackend(failures=[LLMError("unavailable", 503)] * 5)
+        client = client_for(overloaded, max_retries=2)
+        with self.assertRaises(LLMError):
+            client.generate("prompt", "model")
+        self.assertEqual(len(overloaded.calls), 3)
+        self.assertEqual(client.stats()["models"]["model"]["failures"], 1)
+
+    def test_in_flight_calls_are_capped(self) -> None:
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def reply(prompt: str) -> str:
+            with lock:
+                active.append(prompt)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(prompt)
+            return prompt
+
+        client = client_for(FakeLLMBackend(reply=reply), max_in_flight=3)
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            results = list(pool.map(lambda number: client.generate(f"p{number}", "model"), range(24)))
+
+        self.assertEqual(results, [f"p{number}" for number in range(24)])
+        self.assertEqual(max(peak), 3)
+
+    def test_token_bucket_spaces_out_bursts(self) -> None:
+        bucket = TokenBucket(rate=20, burst=2)
+        started = time.perf_counter()
+        for _ in range(6):
+            bucket.acquire()
+        elapsed = time.perf_counter() - started
+
+        self.assertGreaterEqual(elapsed, 0.18)
+        self.assertFalse(bucket.try_acquire())
+
+    def test_hedge_answers_when_the_first_call_stalls(self) -> None:
+        latencies = iter([2.0, 0.01])
+        backend = FakeLLMBackend(reply=lambda prompt: "fast", latency=lambda: next(latencies, 0.01))
+        client = client_for(backend, hedge_after=0.05)
+
+        started = time.perf_counter()
+        self.assertEqual(client.generate("prompt", "model"), "fast")
+
+        self.assertLess(time.perf_counter() - started, 1.0)
+        stats = client.stats()["models"]["model"]
+        self.assertEqual((stats["hedges"], stats["hedge_wins"]), (1, 1))
+        client.close()
+
+    def test_stream_retries_before_the_first_piece(self) -> None:
+        backend = FakeLLMBackend(reply=lambda prompt: "streamed answer", failures=[LLMError("quota", 429)])
+        client = client_for(backend)
+
+        pieces = list(client.stream("prompt", "model"))
+
+        self.assertEqual("".join(pieces), "streamed answer")
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(client.stats()["models"]["model"]["retries"], 1)
+
+    def test_qa_service_uses_the_client(self) -> None:
+        client = client_for(FakeLLMBackend(reply=lambda prompt: "  Ｒeady answer "))
+
+        self.assertEqual(answer_question("Q?", ["context"], model_name="m", client=client), "Ready answer")
+        tokens = stream_answer("Q?", ["context"], model_name="m", generate=client.stream)
+        self.assertEqual("".join(tokens), "Ready answer")
+        self.assertEqual(client.stats()["models"]["m"]["calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
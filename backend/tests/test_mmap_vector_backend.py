@@ -0,0 +1,180 @@
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+import unittest
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.mmap_vector_backend import MmapVectorBackend
+from app.services.vector_backend import DocumentWrite
+
+
+def random_vectors(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def document_write(document_id: str, vectors: np.ndarray) -> DocumentWrite:
+    ids = [f"{document_id}-{index}" for index in range(len(vectors))]
+    return DocumentWrite(
+        ids=ids,
+        documents=[f"text of {chunk_id}" for chunk_id in ids],
+        embeddings=vectors,
+        metadatas=[{"document_id": document_id, "chunk_index": index} for index in range(len(vectors))],
+        changed=range(len(vectors)),
+    )
+
+
+def brute_force(vectors: np.ndarray, ids: List[str], query: np.ndarray, k: int) -> List[str]:
+    order = np.argsort(-(vectors @ query))[:k]
+    return [ids[index] for index in order]
+
+
+class MmapVectorBackendTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.directory = Path(self.temp_dir.name)
+        self.backends: List[MmapVectorBackend] = []
+
+    def tearDown(self) -> None:
+        for backend in self.backends:
+            backend.close()
+        self.temp_dir.cleanup()
+
+    def open(self, **kwargs) -> MmapVectorBackend:
+        backend = MmapVectorBackend(self.directory, **kwargs)
+        self.backends.append(backend)
+        return backend
+
+    def fill(self, backend: MmapVectorBackend, documents: int, per_document: int):
+        vectors = random_vectors(documents * per_document)
+        ids: List[str] = []
+        for number in range(documents):
+            block = vectors[number * per_document : (number + 1) * per_document]
+            write = document_write(f"doc{number}", block)
+            backend.write_document(f"doc{number}", write)
+            ids.extend(write.ids)
+        return vectors, ids
+
+    def test_exact_search_matches_brute_force(self) -> None:
+        backend = self.open(block_rows=64)
+        vectors, ids = self.fill(backend, documents=10, per_document=50)
+        queries = random_vectors(5, seed=1)
+
+        results = backend.query(queries, k=10)
+
+        for query, hits in zip(queries, results):
+            self.assertEqual([hit.id for hit in hits], brute_force(vectors, ids, query, 10))
+        top = results[0][0]
+        self.assertEqual(top.content, f"text of {top.id}")
+        self.assertAlmostEqual(top.similarity, float(np.clip(vectors[ids.index(top.id)] @ queries[0], 0, 1)), places=5)
+
+    def test_int8_vectors_keep_ranking(self) -> None:
+        backend = self.open(dtype="int8")
+        vectors, ids = self.fill(backend, documents=4, per_document=100)
+        queries = random_vectors(10, seed=2)
+
+        overlap = 0
+        for query, hits in zip(queries, backend.query(queries, k=10)):
+            overlap += len({hit.id for hit in hits} & set(brute_force(vectors, ids, query, 10)))
+        self.assertGreaterEqual(overlap / 100, 0.9)
+        stored = backend.get_document("doc1")
+        self.assertTrue(np.allclose(stored[0].embedding, vectors[100], atol=0.02))
+
+    def test_document_filter_and_rewrite(self) -> None:
+        backend = self.open()
+        vectors, _ = self.fill(backend, documents=3, per_document=20)
+
+        hits = backend.query(vectors[:1], k=5, document_ids=["doc2"])[0]
+        self.assertTrue(all(hit.metadata["document_id"] == "doc2" for hit in hits))
+
+        backend.write_document("doc0", document_write("doc0", vectors[40:42]))
+        self.assertEqual(backend.count(), 42)
+        self.assertEqual([chunk.id for chunk in backend.get_document("doc0")], ["doc0-0", "doc0-1"])
+        self.assertEqual(backend.query(vectors[40:41], k=1)[0][0].id, "doc0-0")
+
+        backend.delete_document("doc2")
+        self.assertEqual(backend.count(), 22)
+        self.assertEqual(backend.query(vectors[:1], k=5, document_ids=["doc2"]), [[]])
+        self.assertEqual(set(backend.get_chunks(["doc1-3", "doc2-3"])), {"doc1-3"})
+
+    def test_dead_rows_are_compacted(self) -> None:
+        backend = self.open()
+        vectors = random_vectors(600)
+        for _ in range(4):
+            backend.write_document("doc", document_write("doc", vectors))
+        backend.write_document("other", document_write("other", vectors[:10]))
+
+        self.assertEqual(backend.count(), 610)
+        self.assertLess(backend._refresh().rows, 600 * 4)
+        hits = backend.query(vectors[5:6], k=1, document_ids=["doc"])[0]
+        self.assertEqual(hits[0].id, "doc-5")
+        self.assertEqual(backend.get_chunks(["other-9"])["other-9"].metadata["chunk_index"], 9)
+
+    def test_ivf_index_keeps_recall(self) -> None:
+        backend = self.open(exact_max_rows=500, nprobe=12)
+        vectors, ids = self.fill(backend, documents=20, per_document=100)
+        self.assertIsNotNone(backend._refresh().ivf)
+        queries = vectors[::97] + random_vectors(len(vectors[::97]), seed=3) * 0.1
+
+        found = 0
+        results = backend.query(queries, k=10)
+        for query, hits in zip(queries, results):
+            found += len({hit.id for hit in hits} & set(brute_force(vectors, ids, query, 10)))
+        self.assertGreaterEqual(found / (10 * len(queries)), 0.8)
+
+    def test_concurrent_ivf_builds_keep_the_live_lists(self) -> None:
+        builder = self.open(exact_max_rows=100000)
+        reader = self.open(exact_max_rows=100)
+        self.fill(builder, documents=5, per_document=100)
+        self.assertEqual(reader.count(), 500)
+
+        state = builder._refresh()
+        builder._build_ivf(state)
+        builder._build_ivf(state)
+
+        self.assertIsNotNone(reader._refresh().ivf)
+        self.assertIsNotNone(self.open()._refresh().ivf)
+        self.assertEqual(len(list(self.directory.glob("ivf-*.npy"))), 3)
+        self.assertEqual(len(reader.query(random_vectors(1, seed=4), k=3)[0]), 3)
+
+    def test_compaction_leaves_readers_a_consistent_index(self) -> None:
+        writer = self.open()
+        reader = self.open()
+        vectors = random_vectors(600)
+        writer.write_document("doc", document_write("doc", vectors))
+        self.assertEqual(reader.query(vectors[5:6], k=1)[0][0].id, "doc-5")
+
+        for _ in range(3):
+            writer.write_document("doc", document_write("doc", vectors))
+
+        self.assertLess(writer._refresh().rows, 600 * 4)
+        generation = writer._read_meta()["vectors_generation"]
+        self.assertEqual([path.name for path in self.directory.glob("vectors*")], [f"vectors-{generation}.float32"])
+        self.assertEqual(reader.query(vectors[5:6], k=1)[0][0].id, "doc-5")
+        self.assertEqual(len(reader.get_document("doc")), 600)
+
+    def test_writes_are_visible_to_other_instances(self) -> None:
+        writer = self.open()
+        reader = self.open()
+        vectors = random_vectors(20)
+        self.assertEqual(reader.count(), 0)
+
+        writer.write_document("doc", document_write("doc", vectors))
+
+        self.assertEqual(reader.count(), 20)
+        self.assertEqual(reader.query(vectors[7:8], k=1)[0][0].id, "doc-7")
+
+    def test_dtype_mismatch_is_rejected(self) -> None:
+        self.open(dtype="int8")
+        with self.assertRaises(ValueError):
+            MmapVectorBackend(self.directory, dtype="float32")
+
+
+if __name__ == "__main__":
+    unittest.main()
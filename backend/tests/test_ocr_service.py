@@ -0,0 +1,98 @@
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+import unittest
+from unittest.mock import patch
+
+from pypdf import PdfReader
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.ocr_service import ExtractionStats, OCRReader, _extract_page_range
+
+
+def make_text_pdf(pages: List[str]) -> bytes:
+    """Build a small PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", ""]
+    kids = []
+    font_ref = 3 + 2 * len(pages)
+    for index, text in enumerate(pages):
+        page_ref = 3 + 2 * index
+        kids.append(f"{page_ref} 0 R")
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_ref} 0 R >> >> /Contents {page_ref + 1} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref_offset = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        body += f"{offset:010d} 00000 n \n".encode("latin-1")
+    body += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+    return body
+
+
+class OCRReaderTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.pages = [f"Section {index} requirement text" for index in range(10)]
+        self.pdf_path = Path(self.temp_dir.name) / "sample.pdf"
+        self.pdf_path.write_bytes(make_text_pdf(self.pages))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_serial_extraction_collects_stats(self) -> None:
+        stats = ExtractionStats()
+        text = OCRReader().extract_text(self.pdf_path, stats=stats)
+
+        self.assertEqual(text, "\n\n".join(self.pages))
+        self.assertEqual(stats.page_count, 10)
+        self.assertEqual(len(stats.page_seconds), 10)
+
+    def test_parallel_pages_stream_in_order(self) -> None:
+        reader = OCRReader(workers=2, pages_per_task=3)
+        try:
+            stats = ExtractionStats()
+            pages = list(reader.iter_pages(self.pdf_path, stats=stats))
+        finally:
+            reader.shutdown()
+
+        self.assertEqual(pages, self.pages)
+        self.assertEqual(stats.page_count, 10)
+        self.assertEqual(len(stats.page_seconds), 10)
+
+    def test_worker_opens_each_pdf_once(self) -> None:
+        with patch("app.services.ocr_service.PdfReader", wraps=PdfReader) as opened:
+            texts = [
+                text
+                for start in range(0, 10, 3)
+                for text, _ in _extract_page_range(str(self.pdf_path), start, min(start + 3, 10))
+            ]
+
+        self.assertEqual(texts, self.pages)
+        self.assertEqual(opened.call_count, 1)
+
+    def test_empty_pdf_raises(self) -> None:
+        empty_path = Path(self.temp_dir.name) / "empty.pdf"
+        empty_path.write_bytes(make_text_pdf([""]))
+        with self.assertRaises(ValueError):
+            OCRReader().extract_text(empty_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,7 @@ from typing import cast
 import unittest
 from unittest.mock import patch
 
+import numpy as np
 from flask import Flask
 from werkzeug.datastructures import FileStorage
 
@@ -14,6 +15,7 @@ BACKEND_ROOT = Path(__file__).resolve().parents[1]
 if str(BACKEND_ROOT) not in sys.path:
     sys.path.insert(0, str(BACKEND_ROOT))
 
+from app.api import api_bp
 from app.config import Settings
 from app.extensions import db
 from app.models import Document
@@ -27,13 +29,30 @@ _MINIMAL_PDF = b"%PDF-1.4\n1 0 obj\n<< /Type /Catalog >>\nendobj\ntrailer\n<< >>
 class FakeVectorStore:
     def __init__(self) -> None:
         self.added = []
+        self.synced = []
         self.deleted = []
+        self.embedded = []
+        self.stored = {}
 
-    def add_document(self, document_id: str, chunks) -> None:
+    def embed_documents(self, texts):
+        self.embedded.append(list(texts))
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+    def add_document(self, document_id: str, chunks, embeddings=None) -> None:
         self.added.append((document_id, list(chunks)))
+        self.stored[document_id] = list(self.added[-1][1])
+
+    def sync_document(self, document_id: str, chunks) -> int:
+        self.synced.append((document_id, list(chunks)))
+        self.stored[document_id] = list(self.synced[-1][1])
+        return len(self.synced[-1][1])
+
+    def document_chunks(self, document_id: str):
+        return list(self.stored.get(document_id, []))
 
     def delete_document(self, document_id: str) -> None:
         self.deleted.append(document_id)
+        self.stored.pop(document_id, None)
 
 
 class PipelineServiceTestCase(unittest.TestCase):
@@ -76,17 +95,17 @@ class PipelineServiceTestCase(unittest.TestCase):
         self.temp_dir.cleanup()
 
     @staticmethod
-    def _make_upload(filename: str = "example.pdf") -> FileStorage:
-        buffer = io.BytesIO(_MINIMAL_PDF)
+    def _make_upload(filename: str = "example.pdf", content: bytes = _MINIMAL_PDF) -> FileStorage:
+        buffer = io.BytesIO(content)
         buffer.seek(0)
         return FileStorage(stream=buffer, filename=filename, content_type="application/pdf")
 
     def test_ingest_saves_files_and_metadata(self) -> None:
         upload = self._make_upload()
 
-        with patch.object(self.pipeline._ocr_reader, "extract_text", return_value="Extracted body"), \
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
             patch("app.services.pipeline_service.generate_summary", return_value="Summary body"), \
-            patch("app.services.pipeline_service.split_text", return_value=["chunk1", "chunk2"]):
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1", "chunk2"]):
             document = self.pipeline.ingest(upload)
 
         self.assertEqual(document.original_filename, "example.pdf")
@@ -102,14 +121,15 @@ class PipelineServiceTestCase(unittest.TestCase):
         self.assertTrue((self.settings.ocr_dir / stored.text_path).exists())
         self.assertTrue((self.settings.summary_dir / stored.summary_path).exists())
         self.assertEqual(document.summary_preview, "Summary body"[:500])
+        self.assertEqual(document.summary_status, "ready")
         self.assertFalse(self.vector_store.deleted)
 
     def test_remove_cleans_up_artifacts(self) -> None:
         upload = self._make_upload("to-delete.pdf")
 
-        with patch.object(self.pipeline._ocr_reader, "extract_text", return_value="Extracted body"), \
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
             patch("app.services.pipeline_service.generate_summary", return_value="Summary body"), \
-            patch("app.services.pipeline_service.split_text", return_value=["chunkA"]):
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunkA"]):
             document = self.pipeline.ingest(upload)
 
         pdf_path = self.settings.pdf_dir / document.stored_pdf
@@ -129,6 +149,140 @@ class PipelineServiceTestCase(unittest.TestCase):
         self.assertIsNone(Document.query.filter_by(document_id=document.document_id).first())
         self.assertEqual(self.vector_store.deleted, [document.document_id])
 
+    def test_identical_upload_reuses_existing_document(self) -> None:
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
+            patch("app.services.pipeline_service.generate_summary", return_value="Summary body") as summarize, \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1"]):
+            first = self.pipeline.ingest(self._make_upload("first.pdf"))
+            second = self.pipeline.ingest(self._make_upload("copy.pdf"))
+
+        self.assertEqual(second.document_id, first.document_id)
+        self.assertEqual(summarize.call_count, 1)
+        self.assertEqual(len(self.vector_store.added), 1)
+        self.assertEqual(Document.query.count(), 1)
+        self.assertEqual(sorted(path.name for path in self.settings.pdf_dir.iterdir()), [first.stored_pdf])
+
+    def test_revision_keeps_document_id_and_replaces_artifacts(self) -> None:
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
+            patch("app.services.pipeline_service.generate_summary", return_value="Summary body"), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1"]):
+            original = self.pipeline.ingest(self._make_upload("rules.pdf"))
+        old_pdf = self.settings.pdf_dir / original.stored_pdf
+        old_text = self.settings.ocr_dir / original.text_path
+
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body v2"]), \
+            patch("app.services.pipeline_service.generate_summary", return_value="Summary v2"), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1", "chunk2"]):
+            revised = self.pipeline.ingest(
+                self._make_upload("rules.pdf", _MINIMAL_PDF + b"% revision 2\n"),
+                replaces=original.document_id,
+            )
+
+        self.assertEqual(revised.document_id, original.document_id)
+        self.assertEqual(revised.chunk_count, 2)
+        self.assertEqual(revised.summary_preview, "Summary v2")
+        self.assertEqual(self.vector_store.synced, [(original.document_id, ["chunk1", "chunk2"])])
+        self.assertFalse(old_pdf.exists())
+        self.assertFalse(old_text.exists())
+        self.assertTrue((self.settings.pdf_dir / revised.stored_pdf).exists())
+        self.assertEqual(Document.query.count(), 1)
+
+    def test_failed_revision_restores_previous_chunks(self) -> None:
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
+            patch("app.services.pipeline_service.generate_summary", return_value="Summary body"), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1"]):
+            original = self.pipeline.ingest(self._make_upload("rules.pdf"))
+
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body v2"]), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1", "chunk2"]), \
+            patch("app.services.pipeline_service.update_document", side_effect=RuntimeError("database is locked")):
+            with self.assertRaises(RuntimeError):
+                self.pipeline.ingest(
+                    self._make_upload("rules.pdf", _MINIMAL_PDF + b"% revision 2\n"),
+                    replaces=original.document_id,
+                )
+
+        self.assertEqual(self.vector_store.document_chunks(original.document_id), ["chunk1"])
+        self.assertEqual(self.vector_store.deleted, [])
+        self.assertEqual(self.vector_store.synced[-1], (original.document_id, ["chunk1"]))
+
+    def test_process_indexes_before_summary(self) -> None:
+        upload = self.pipeline.stage_upload(self._make_upload())
+
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1"]), \
+            patch("app.services.pipeline_service.generate_summary") as summarize:
+            document = self.pipeline.process(upload)
+
+        summarize.assert_not_called()
+        self.assertEqual(document.summary_status, "pending")
+        self.assertIsNone(document.summary_path)
+        self.assertEqual(self.vector_store.added[0][0], document.document_id)
+        self.assertEqual(set(document.stage_timings), {"extracting", "indexing"})
+
+    def test_chunks_are_embedded_while_pages_are_read(self) -> None:
+        self.settings.embedding_max_batch_size = 2
+        events = []
+
+        def pages(*_args, **_kwargs):
+            for number in range(5):
+                events.append(f"page {number}")
+                yield f"Page {number} body"
+
+        def chunks(pages):
+            for page in pages:
+                yield page.replace("body", "chunk")
+
+        embed_documents = self.vector_store.embed_documents
+
+        def embed(texts):
+            events.append(f"embed {len(texts)}")
+            return embed_documents(texts)
+
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", side_effect=pages), \
+            patch.object(self.pipeline._chunker, "chunks", side_effect=chunks), \
+            patch.object(self.vector_store, "embed_documents", side_effect=embed):
+            document = self.pipeline.process(self.pipeline.stage_upload(self._make_upload()))
+
+        self.assertEqual(events.index("embed 2"), 2)
+        self.assertEqual(events[-1], "embed 1")
+        self.assertEqual(document.chunk_count, 5)
+        self.assertEqual(self.vector_store.added[0][1], [f"Page {number} chunk" for number in range(5)])
+
+    def test_chunk_offsets_address_stored_text(self) -> None:
+        pages = ["Première page. Les règles.", "", "第二頁。飛航規則適用於所有航空器。"]
+        upload = self.pipeline.stage_upload(self._make_upload())
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=pages):
+            document = self.pipeline.process(upload)
+
+        self.app.config["APP_SETTINGS"] = self.settings
+        self.app.register_blueprint(api_bp, url_prefix="/api")
+        client = self.app.test_client()
+        for chunk in self.vector_store.added[0][1]:
+            response = client.get(
+                f"/api/documents/{document.document_id}/text",
+                query_string={"start": chunk.byte_start, "end": chunk.byte_end},
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_data(as_text=True), chunk.text)
+        self.assertEqual(self.vector_store.added[0][1][-1].page_end, 3)
+
+        response = client.get(f"/api/documents/{document.document_id}/text", headers={"Range": "bytes=0-4"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.get_data(as_text=True), "Premi")
+
+    def test_summary_failure_keeps_document_searchable(self) -> None:
+        with patch.object(self.pipeline._ocr_reader, "iter_pages", return_value=["Extracted body"]), \
+            patch.object(self.pipeline._chunker, "chunks", return_value=["chunk1"]), \
+            patch("app.services.pipeline_service.generate_summary", side_effect=RuntimeError("quota")):
+            document = self.pipeline.ingest(self._make_upload())
+
+        self.assertEqual(document.summary_status, "failed")
+        self.assertIn("summarizing", document.stage_timings)
+        self.assertIsNotNone(Document.query.filter_by(document_id=document.document_id).first())
+        self.assertTrue((self.settings.ocr_dir / document.text_path).exists())
+        self.assertFalse(self.vector_store.deleted)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,150 @@
+import sys
+import time
+from pathlib import Path
+from typing import cast
+from unittest import mock
+import unittest
+
+import numpy as np
+from flask import Flask
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.api import api_bp
+from app.config import Settings
+from app.services.answer_cache import AnswerCache
+from app.services.qa_pipeline import NoContextError, QABatchItem, QAPipeline
+from app.services.vector_store import VectorStore
+from tests.helpers import parse_events
+
+
+class FakeVectorStore:
+    def __init__(self) -> None:
+        self.embed_calls = []
+        self.search_calls = []
+        self.searched_embeddings = []
+
+    def embed_queries(self, queries):
+        self.embed_calls.append(list(queries))
+        return np.array([[float(len(query)), 1.0] for query in queries], dtype=np.float32)
+
+    def similarity_search_many(self, queries, k=None, document_ids=None, query_embeddings=None, mode=None):
+        self.search_calls.append(list(queries))
+        self.searched_embeddings.append(np.asarray(query_embeddings))
+        return [
+            []
+            if "unknown" in query
+            else [{"id": f"doc_chunk_{index}", "document_id": "doc", "chunk_index": index, "content": query, "score": 0.9}]
+            for index, query in enumerate(queries)
+        ]
+
+
+def slow_answer(question, contexts, model_name=None):
+    time.sleep(0.05)
+    if "broken" in question:
+        raise ValueError("Answer generation returned empty text")
+    return f"Answer to {question}"
+
+
+class QABatchTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.settings = Settings()
+        self.store = FakeVectorStore()
+        self.cache = AnswerCache()
+        self.pipeline = QAPipeline(self.settings, cast(VectorStore, self.store), answer_cache=self.cache)
+        patcher = mock.patch("app.services.qa_pipeline.answer_question", side_effect=slow_answer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_embeds_and_retrieves_in_one_batch(self) -> None:
+        items = [QABatchItem(f"question {index}") for index in range(6)]
+        outcomes = dict(self.pipeline.ask_many(items, max_workers=3))
+
+        self.assertEqual(len(self.store.embed_calls), 1)
+        self.assertEqual(len(self.store.search_calls), 1)
+        self.assertEqual(outcomes[4].answer, "Answer to question 4")
+
+    def test_mixed_filters_share_one_encoder_call(self) -> None:
+        items = [
+            QABatchItem("question a"),
+            QABatchItem("longer question b", document_ids=["doc"]),
+            QABatchItem("question c", top_k=2),
+            QABatchItem("the longest question d", document_ids=["doc"]),
+        ]
+        outcomes = dict(self.pipeline.ask_many(items))
+
+        self.assertEqual(len(self.store.embed_calls), 1)
+        self.assertEqual(sorted(self.store.embed_calls[0]), sorted(item.question for item in items))
+        self.assertEqual(len(self.store.search_calls), 3)
+        for queries, embeddings in zip(self.store.search_calls, self.store.searched_embeddings):
+            self.assertEqual(embeddings[:, 0].tolist(), [float(len(query)) for query in queries])
+        self.assertEqual(outcomes[3].answer, "Answer to the longest question d")
+
+    def test_generation_runs_concurrently(self) -> None:
+        items = [QABatchItem(f"question {index}") for index in range(16)]
+        started = time.perf_counter()
+        list(self.pipeline.ask_many(items, max_workers=8))
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 16 * 0.05 / 3)
+
+    def test_errors_are_reported_per_question(self) -> None:
+        items = [QABatchItem("fine"), QABatchItem("unknown topic"), QABatchItem("broken")]
+        outcomes = dict(self.pipeline.ask_many(items))
+
+        self.assertEqual(outcomes[0].answer, "Answer to fine")
+        self.assertIsInstance(outcomes[1], NoContextError)
+        self.assertIsInstance(outcomes[2], ValueError)
+
+    def test_cached_answers_skip_retrieval(self) -> None:
+        list(self.pipeline.ask_many([QABatchItem("first")]))
+        outcomes = list(self.pipeline.ask_many([QABatchItem("first"), QABatchItem("second")]))
+
+        self.assertEqual(outcomes[0][0], 0)
+        self.assertEqual(outcomes[0][1].cache, "exact")
+        self.assertEqual(self.store.embed_calls[-1], ["second"])
+
+
+class QABatchRouteTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.app.config["APP_SETTINGS"] = Settings()
+        self.app.config["QA_PIPELINE"] = QAPipeline(self.app.config["APP_SETTINGS"], cast(VectorStore, FakeVectorStore()))
+        self.app.register_blueprint(api_bp, url_prefix="/api")
+        self.client = self.app.test_client()
+        patcher = mock.patch("app.services.qa_pipeline.answer_question", side_effect=slow_answer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_streams_one_event_per_question(self) -> None:
+        response = self.client.post(
+            "/api/qa/batch",
+            json={"questions": ["alpha", {"question": "unknown thing", "top_k": 2}]},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        events = parse_events(response.get_data(as_text=True))
+        by_index = {data["index"]: (name, data) for name, data in events[:-1]}
+        self.assertEqual(by_index[0][0], "result")
+        self.assertEqual(by_index[0][1]["answer"], "Answer to alpha")
+        self.assertEqual(by_index[1][0], "error")
+        self.assertEqual(by_index[1][1]["status"], 404)
+        self.assertEqual(events[-1], ("done", {"count": 2, "failed": 1}))
+
+    def test_rejects_invalid_payload(self) -> None:
+        self.assertEqual(self.client.post("/api/qa/batch", json={"questions": []}).status_code, 400)
+        self.assertEqual(self.client.post("/api/qa/batch", json={"questions": [{"top_k": 2}]}).status_code, 400)
+        for payload, message in (
+            ({"questions": ["a"], "document_id": ["x"]}, "document_id must be a string"),
+            ({"questions": [{"question": "a", "document_id": {"id": 1}}]}, "questions[0].document_id must be a string"),
+            ({"questions": ["a", {"question": 7}]}, "questions[1].question must be a string"),
+        ):
+            response = self.client.post("/api/qa/batch", json=payload)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()["error"], message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import sys
+import unicodedata
+from pathlib import Path
+from typing import cast
+import unittest
+
+import numpy as np
+from flask import Flask
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.api import api_bp
+from app.config import Settings
+from app.services.answer_cache import AnswerCache
+from app.services.qa_pipeline import QAPipeline
+from app.services.qa_service import StreamNormalizer
+from app.services.vector_store import VectorStore
+from tests.helpers import parse_events
+
+
+class FakeVectorStore:
+    def embed_query(self, query: str) -> np.ndarray:
+        return np.array([1.0, 0.0], dtype=np.float32)
+
+    def similarity_search(self, query, k=None, document_ids=None, query_embedding=None):
+        return [{"id": "doc_chunk_0", "document_id": "doc", "chunk_index": 0, "content": "Context", "score": 0.8}]
+
+
+def fake_generator(pieces):
+    def generate(prompt: str, model_name: str):
+        assert "Context" in prompt
+        yield from pieces
+
+    return generate
+
+
+class StreamNormalizerTestCase(unittest.TestCase):
+    def _run(self, pieces):
+        normalizer = StreamNormalizer()
+        output = "".join(normalizer.feed(piece) for piece in pieces) + normalizer.finish()
+        return output, normalizer.has_output
+
+    def test_matches_whole_text_normalization(self) -> None:
+        pieces = ["  \n", "Ｆｕｌｌ", "width cafe", "́ ", "ﬁle", " done \n "]
+        output, _ = self._run(pieces)
+        self.assertEqual(output, unicodedata.normalize("NFKC", "".join(pieces)).strip())
+
+    def test_whitespace_only_has_no_output(self) -> None:
+        output, has_output = self._run([" ", "\n\t"])
+        self.assertEqual(output, "")
+        self.assertFalse(has_output)
+
+
+class QAStreamRouteTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.settings = Settings()
+        self.app.config["APP_SETTINGS"] = self.settings
+        self.app.register_blueprint(api_bp, url_prefix="/api")
+        self.client = self.app.test_client()
+
+    def _install(self, pieces, cache=None) -> None:
+        self.app.config["QA_PIPELINE"] = QAPipeline(
+            self.settings,
+            cast(VectorStore, FakeVectorStore()),
+            answer_cache=cache,
+            generate_stream=fake_generator(pieces),
+        )
+
+    def test_streams_matches_then_tokens(self) -> None:
+        self._install([" The ", "answer", " is ", "ＯＫ. "])
+        response = self.client.post("/api/qa/stream", json={"question": "What?"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith("text/event-stream"))
+        events = parse_events(response.get_data(as_text=True))
+        self.assertEqual(events[0][0], "matches")
+        self.assertEqual(events[0][1]["matches"][0]["id"], "doc_chunk_0")
+        tokens = "".join(data["text"] for name, data in events if name == "token")
+        self.assertEqual(tokens, "The answer is OK.")
+        self.assertEqual(events[-1], ("done", {"answer": "The answer is OK."}))
+
+    def test_empty_answer_emits_error_event(self) -> None:
+        self._install(["  ", "\n"])
+        response = self.client.post("/api/qa/stream", json={"question": "What?"})
+
+        events = parse_events(response.get_data(as_text=True))
+        self.assertEqual(events[-1][0], "error")
+        self.assertIn("empty", events[-1][1]["error"])
+
+    def test_streamed_answer_is_cached(self) -> None:
+        cache = AnswerCache()
+        self._install(["Cached answer"], cache=cache)
+        self.client.post("/api/qa/stream", json={"question": "What?"}).get_data()
+        response = self.client.post("/api/qa/stream", json={"question": "what"})
+
+        events = parse_events(response.get_data(as_text=True))
+        self.assertEqual(events[0][1]["cache"], "exact")
+        self.assertEqual(events[-1], ("done", {"answer": "Cached answer"}))
+
+    def test_missing_question_is_rejected(self) -> None:
+        self._install(["unused"])
+        response = self.client.post("/api/qa/stream", json={})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
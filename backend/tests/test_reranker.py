@@ -0,0 +1,144 @@
+import sys
+import time
+from pathlib import Path
+from typing import cast
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.config import Settings
+from app.services.qa_pipeline import QAPipeline
+from app.services.reranker import ContextSelector, CrossEncoderReranker
+from app.services.vector_store import VectorStore
+
+PASSAGES = {
+    "fuel": "Each aircraft must carry enough fuel to fly to the destination and then to the alternate airport.",
+    "fuel-copy": "Each aircraft must carry enough fuel to fly to the destination and then to the alternate airport!",
+    "lights": "Position lights must be displayed from sunset to sunrise on every aircraft in operation.",
+    "records": "Operators shall keep maintenance records for at least two years after the work is performed.",
+}
+
+
+class KeywordReranker:
+    """Scores a passage by how many question words it contains."""
+
+    model_name = "keyword"
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    def score(self, pairs):
+        self.batches.append(len(pairs))
+        return np.array(
+            [sum(word in passage.lower() for word in question.lower().split()) for question, passage in pairs],
+            dtype=np.float32,
+        )
+
+
+class BrokenReranker:
+    model_name = "broken"
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def score(self, pairs):
+        self.calls += 1
+        raise OSError("model weights missing")
+
+
+def match(chunk_id: str):
+    return {"id": chunk_id, "document_id": "doc", "content": PASSAGES[chunk_id]}
+
+
+class ContextSelectorTestCase(unittest.TestCase):
+    def selector(self, reranker=None, **kwargs) -> ContextSelector:
+        return ContextSelector(cast(CrossEncoderReranker, reranker), **kwargs)
+
+    def test_reranks_and_drops_near_duplicates(self) -> None:
+        selector = self.selector(KeywordReranker())
+        candidates = [match("lights"), match("fuel"), match("records"), match("fuel-copy")]
+
+        selected = selector.select("how much fuel must aircraft carry to the alternate", candidates, top_k=3)
+
+        self.assertEqual([item["id"] for item in selected], ["fuel", "lights", "records"])
+        self.assertGreater(selected[0]["rerank_score"], selected[1]["rerank_score"])
+        self.assertEqual(selector.stats()["duplicates_dropped"], 1)
+
+    def test_context_fits_the_token_budget(self) -> None:
+        selector = self.selector(token_budget=30)
+        candidates = [match("fuel"), match("lights"), match("records")]
+
+        selected = selector.select("question", candidates, top_k=3)
+
+        self.assertEqual([item["id"] for item in selected], ["fuel"])
+        self.assertEqual(selector.stats()["over_budget_dropped"], 2)
+        tiny = self.selector(token_budget=1).select("question", candidates, top_k=3)
+        self.assertEqual([item["id"] for item in tiny], ["fuel"])
+
+    def test_batched_scoring_and_fallback(self) -> None:
+        reranker = KeywordReranker()
+        selector = self.selector(reranker)
+        rows = selector.select_many(
+            ["fuel alternate", "lights sunset"],
+            [[match("lights"), match("fuel")], [match("fuel"), match("lights")]],
+            top_k=1,
+        )
+        self.assertEqual(reranker.batches, [4])
+        self.assertEqual([[item["id"] for item in row] for row in rows], [["fuel"], ["lights"]])
+
+        broken = self.selector(BrokenReranker())
+        with self.assertLogs("app.services.reranker", level="WARNING"):
+            kept = broken.select("fuel", [match("lights"), match("fuel")], top_k=2)
+        self.assertEqual([item["id"] for item in kept], ["lights", "fuel"])
+        self.assertEqual(broken.stats()["rerank_failures"], 1)
+
+    def test_failed_reranker_is_not_retried_on_every_question(self) -> None:
+        reranker = BrokenReranker()
+        selector = self.selector(reranker, retry_seconds=60)
+        candidates = [match("lights"), match("fuel")]
+
+        with self.assertLogs("app.services.reranker", level="WARNING") as logs:
+            for _ in range(5):
+                self.assertEqual([item["id"] for item in selector.select("fuel", candidates, top_k=2)], ["lights", "fuel"])
+        self.assertEqual(reranker.calls, 1)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(selector.stats()["rerank_skipped"], 4)
+
+        with patch("app.services.reranker.time.monotonic", return_value=time.monotonic() + 61):
+            selector.select("fuel", candidates, top_k=2)
+        self.assertEqual(reranker.calls, 2)
+
+
+class FakeVectorStore:
+    def __init__(self) -> None:
+        self.requested_k = []
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return np.array([1.0, 0.0, 0.0], dtype=np.float32)
+
+    def similarity_search(self, query, k=None, document_ids=None, query_embedding=None):
+        self.requested_k.append(k)
+        return [match("lights"), match("records"), match("fuel"), match("fuel-copy")][:k]
+
+
+class RerankedPipelineTestCase(unittest.TestCase):
+    def test_pipeline_over_fetches_and_answers_from_the_selection(self) -> None:
+        vector_store = FakeVectorStore()
+        selector = ContextSelector(cast(CrossEncoderReranker, KeywordReranker()), candidates=10)
+        pipeline = QAPipeline(Settings(), cast(VectorStore, vector_store), context_selector=selector)
+
+        with patch("app.services.qa_pipeline.answer_question", return_value="Answer") as generate:
+            result = pipeline.ask("how much fuel for the alternate", top_k=2)
+
+        self.assertEqual(vector_store.requested_k, [10])
+        self.assertEqual([item["id"] for item in result.matches], ["fuel", "records"])
+        self.assertEqual(generate.call_args.args[1], [PASSAGES["fuel"], PASSAGES["records"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from flask import Flask
+from sqlalchemy import inspect
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.extensions import db
+from app.models import Document
+from app.schema import upgrade_schema
+from app.services.document_store import create_document, get_by_document_id
+
+# The documents table as the first release created it.
+BASELINE_DOCUMENTS = """
+CREATE TABLE documents (
+    id INTEGER NOT NULL PRIMARY KEY,
+    document_id VARCHAR(64) NOT NULL UNIQUE,
+    original_filename VARCHAR(255) NOT NULL,
+    stored_pdf VARCHAR(255) NOT NULL,
+    text_path VARCHAR(255) NOT NULL,
+    summary_path VARCHAR(255) NOT NULL,
+    summary_preview TEXT,
+    chunk_count INTEGER NOT NULL,
+    uploaded_at DATETIME NOT NULL
+)
+"""
+
+
+class UpgradeSchemaTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config.update(
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{Path(self.temp_dir.name) / 'notes.db'}",
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        )
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+
+    def tearDown(self) -> None:
+        db.session.remove()
+        db.engine.dispose()
+        self.context.pop()
+        self.temp_dir.cleanup()
+
+    def test_baseline_database_is_upgraded_in_place(self) -> None:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(BASELINE_DOCUMENTS)
+            connection.exec_driver_sql(
+                "INSERT INTO documents (document_id, original_filename, stored_pdf, text_path, summary_path, "
+                "chunk_count, uploaded_at) VALUES ('old', 'old.pdf', 'old.pdf', 'old.txt', 'old_summary.txt', 3, "
+                "'2024-01-01 00:00:00')"
+            )
+
+        db.create_all()
+        upgrade_schema(db.engine, db.metadata)
+        upgrade_schema(db.engine, db.metadata)
+
+        old = get_by_document_id("old")
+        self.assertEqual((old.summary_status, old.page_count, old.content_hash), ("ready", 0, None))
+        self.assertEqual(old.summary_path, "old_summary.txt")
+        create_document(
+            document_id="new", original_filename="new.pdf", stored_pdf="new.pdf", text_path="new.txt", chunk_count=1
+        )
+        self.assertEqual(Document.query.count(), 2)
+        self.assertIsNone(get_by_document_id("new").summary_path)
+        index_names = {index["name"] for index in inspect(db.engine).get_indexes("documents")}
+        self.assertIn("ix_documents_uploaded_at_id", index_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
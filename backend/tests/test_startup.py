@@ -0,0 +1,152 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.api import api_bp
+from app.services.components import FAILED, IDLE, READY, Components, Lazy
+from app.services.embedding_service import EmbeddingService
+
+
+class LazyTestCase(unittest.TestCase):
+    def test_concurrent_callers_share_one_load(self) -> None:
+        calls = []
+
+        def factory():
+            calls.append(threading.get_ident())
+            time.sleep(0.05)
+            return object()
+
+        lazy = Lazy(factory)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(lazy.get())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+        self.assertEqual(lazy.status()["state"], READY)
+        self.assertGreaterEqual(lazy.status()["load_seconds"], 0.05)
+
+    def test_failure_is_reported_and_retried(self) -> None:
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("weights missing")
+            return "model"
+
+        lazy = Lazy(factory)
+        self.assertIsNone(lazy.peek())
+        with self.assertRaises(OSError):
+            lazy.get()
+        self.assertEqual(lazy.status(), {"state": FAILED, "error": "OSError: weights missing"})
+
+        self.assertEqual(lazy.get(), "model")
+        self.assertNotIn("error", lazy.status())
+
+    def test_embedding_model_loads_on_first_use(self) -> None:
+        loaded = []
+
+        class FakeModel:
+            max_seq_length = 128
+
+            def __init__(self, name: str) -> None:
+                loaded.append(name)
+
+        with patch("app.services.embedding_service._load_model", FakeModel):
+            service = EmbeddingService("fake-model")
+        self.assertEqual(loaded, [])
+        self.assertEqual(service.model_status()["state"], IDLE)
+
+        self.assertEqual(service.max_input_tokens, 126)
+        self.assertEqual(loaded, ["fake-model"])
+        service.close()
+
+
+class ReadinessTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.components = Components()
+        self.app = Flask(__name__)
+        self.app.config["COMPONENTS"] = self.components
+        self.app.register_blueprint(api_bp, url_prefix="/api")
+        self.client = self.app.test_client()
+
+    def test_lazy_components_are_ready_without_warm_up(self) -> None:
+        model = Lazy(lambda: "model")
+        self.components.register("model", model.status, model.get)
+
+        response = self.client.get("/api/health/ready")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["components"]["model"], {"state": IDLE, "required": True})
+        self.assertEqual(self.client.get("/api/health/live").status_code, 200)
+
+    def test_warm_up_gates_readiness_on_required_components(self) -> None:
+        release = threading.Event()
+
+        def slow_model():
+            release.wait(5)
+            return "model"
+
+        def broken_sdk():
+            raise ImportError("sdk missing")
+
+        model = Lazy(slow_model)
+        sdk = Lazy(broken_sdk)
+        self.components.register("model", model.status, model.get)
+        self.components.register("sdk", sdk.status, sdk.get, required=False)
+        thread = self.components.start_warm_up()
+
+        warming = self.client.get("/api/health/ready")
+        self.assertEqual(warming.status_code, 503)
+        self.assertTrue(warming.get_json()["warming_up"])
+
+        release.set()
+        thread.join(5)
+        ready = self.client.get("/api/health/ready").get_json()
+        self.assertEqual(ready["status"], "ready")
+        self.assertEqual(ready["components"]["sdk"]["state"], FAILED)
+
+    def test_failed_required_component_is_not_ready(self) -> None:
+        def broken():
+            raise RuntimeError("no weights")
+
+        model = Lazy(broken)
+        self.components.register("model", model.status, model.get)
+        self.components.start_warm_up().join(5)
+
+        response = self.client.get("/api/health/ready")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("no weights", response.get_json()["components"]["model"]["error"])
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def test_heavy_libraries_are_not_imported_with_the_app(self) -> None:
+        script = (
+            "import sys, app; "
+            "print(','.join(m for m in ('sentence_transformers', 'torch', 'chromadb', 'google.generativeai') "
+            "if m in sys.modules))"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", script], cwd=BACKEND_ROOT, capture_output=True, text=True, check=True
+        )
+
+        self.assertEqual(completed.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.summarizer import (
+    PARTIAL_PROMPT,
+    REDUCE_PROMPT,
+    ExtractiveSummaryModel,
+    SummaryCache,
+    generate_summary,
+)
+
+
+def make_document(sections: int) -> str:
+    return "\n\n".join(
+        f"Section {index}. Operators shall keep record {index}. Additional detail follows here." for index in range(sections)
+    )
+
+
+class SummarizerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.cache = SummaryCache(Path(self.temp_dir.name))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_short_text_uses_single_call(self) -> None:
+        model = ExtractiveSummaryModel()
+        summary = generate_summary("One rule. Two rules.", model_name="local", generate=model)
+
+        self.assertEqual(summary, "One rule. Two rules.")
+        self.assertEqual(model.calls, 1)
+
+    def test_long_text_is_mapped_then_reduced(self) -> None:
+        prompts = []
+        lock = threading.Lock()
+
+        def model(prompt: str, model_name: str) -> str:
+            with lock:
+                prompts.append(prompt)
+            return ExtractiveSummaryModel(max_sentences=1)(prompt, model_name)
+
+        text = make_document(40)
+        summary = generate_summary(text, model_name="local", generate=model, max_workers=4, group_chars=800)
+
+        partial_calls = [prompt for prompt in prompts if prompt.startswith(PARTIAL_PROMPT)]
+        reduce_calls = [prompt for prompt in prompts if prompt.startswith(REDUCE_PROMPT)]
+        self.assertGreater(len(partial_calls), 3)
+        self.assertGreaterEqual(len(reduce_calls), 1)
+        self.assertTrue(summary.startswith("Section 0."))
+
+    def test_partial_summaries_are_reused_from_cache(self) -> None:
+        text = make_document(40)
+        first = ExtractiveSummaryModel()
+        generate_summary(text, model_name="local", generate=first, group_chars=800, cache=self.cache)
+
+        second = ExtractiveSummaryModel()
+        generate_summary(text, model_name="local", generate=second, group_chars=800, cache=self.cache)
+
+        self.assertLess(second.calls, first.calls)
+
+    def test_edit_at_the_start_keeps_later_groups_cached(self) -> None:
+        text = make_document(60)
+        first = ExtractiveSummaryModel()
+        generate_summary(text, model_name="local", generate=first, group_chars=800, cache=self.cache)
+
+        prompts = []
+
+        def model(prompt: str, model_name: str) -> str:
+            prompts.append(prompt)
+            return ExtractiveSummaryModel()(prompt, model_name)
+
+        edited = "Preface. These rules were amended and renumbered in full.\n\n" + text.replace("Section 0.", "Part 0.", 1)
+        generate_summary(edited, model_name="local", generate=model, group_chars=800, cache=self.cache)
+
+        partial_calls = [prompt for prompt in prompts if prompt.startswith(PARTIAL_PROMPT)]
+        self.assertGreater(first.calls, 6)
+        self.assertEqual(len(partial_calls), 1)
+        self.assertIn("Preface.", partial_calls[0])
+
+    def test_partials_run_concurrently(self) -> None:
+        def slow_model(prompt: str, model_name: str) -> str:
+            time.sleep(0.05)
+            return "Partial."
+
+        text = make_document(40)
+        started = time.perf_counter()
+        generate_summary(text, model_name="local", generate=slow_model, max_workers=8, group_chars=800)
+        parallel = time.perf_counter() - started
+
+        started = time.perf_counter()
+        generate_summary(text, model_name="local", generate=slow_model, max_workers=1, group_chars=800)
+        serial = time.perf_counter() - started
+
+        self.assertLess(parallel, serial / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
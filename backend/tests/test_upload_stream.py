@@ -0,0 +1,167 @@
+import hashlib
+import io
+import os
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+from types import SimpleNamespace
+
+from flask import Flask
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.api import api_bp
+from app.config import Settings
+from app.error_handlers import register_error_handlers
+from app.services.file_handler import FileHandler
+from app.services.upload_stream import InvalidUpload, PdfUploadStream, StreamingUploadRequest, UploadTooLarge
+
+PDF_BODY = b"%PDF-1.4\n" + b"0" * 200_000 + b"\n%%EOF\n"
+BOUNDARY = "upload-boundary"
+
+
+class CountingStream(io.BytesIO):
+    """Request body that records how many bytes the server consumed."""
+
+    def __init__(self, data: bytes) -> None:
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = super().read(size)
+        self.consumed += len(data)
+        return data
+
+
+def multipart(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+class FakeJobQueue:
+    def __init__(self, settings: Settings) -> None:
+        self.file_handler = FileHandler(settings)
+        self.saved = []
+        self.streams = []
+
+    def enqueue(self, file, replaces=None):
+        self.streams.append(file.stream)
+        self.saved.append(self.file_handler.save_pdf(file, "upload"))
+        return SimpleNamespace(job_id="job", to_dict=lambda: {"job_id": "job"})
+
+
+class PdfUploadStreamTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.directory = Path(self.temp_dir.name)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_commit_renames_and_hashes(self) -> None:
+        stream = PdfUploadStream(self.directory)
+        for offset in range(0, len(PDF_BODY), 4096):
+            stream.write(PDF_BODY[offset : offset + 4096])
+
+        digest = stream.commit(self.directory / "final.pdf")
+        stream.close()
+
+        self.assertEqual(digest, hashlib.sha256(PDF_BODY).hexdigest())
+        self.assertEqual([path.name for path in self.directory.iterdir()], ["final.pdf"])
+
+    def test_rejections_remove_the_part_file(self) -> None:
+        stream = PdfUploadStream(self.directory)
+        with self.assertRaises(InvalidUpload):
+            stream.write(b"<html>" + b" " * 2000)
+        stream.close()
+
+        limited = PdfUploadStream(self.directory, max_bytes=100)
+        limited.write(b"%PDF-1.4\n")
+        with self.assertRaises(UploadTooLarge):
+            limited.write(b"0" * 200)
+        limited.close()
+
+        short = PdfUploadStream(self.directory)
+        short.write(b"not a pdf")
+        with self.assertRaises(InvalidUpload):
+            short.commit(self.directory / "short.pdf")
+        short.close()
+
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+class StreamingUploadRequestTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.previous_data_dir = os.environ.get("DATA_DIR")
+        os.environ["DATA_DIR"] = self.temp_dir.name
+        self.settings = Settings()
+        self.settings.ensure_directories()
+        self.job_queue = FakeJobQueue(self.settings)
+
+        self.app = Flask(__name__)
+        self.app.request_class = StreamingUploadRequest
+        self.app.config.update(APP_SETTINGS=self.settings, JOB_QUEUE=self.job_queue)
+        register_error_handlers(self.app)
+        self.app.register_blueprint(api_bp, url_prefix="/api")
+        self.client = self.app.test_client()
+
+    def tearDown(self) -> None:
+        if self.previous_data_dir is not None:
+            os.environ["DATA_DIR"] = self.previous_data_dir
+        else:
+            os.environ.pop("DATA_DIR", None)
+        self.temp_dir.cleanup()
+
+    def post(self, filename: str, content: bytes):
+        body = CountingStream(multipart(filename, content))
+        response = self.client.post(
+            "/api/documents",
+            input_stream=body,
+            content_type=f"multipart/form-data; boundary={BOUNDARY}",
+            content_length=len(body.getvalue()),
+        )
+        return response, body
+
+    def test_upload_is_streamed_into_the_pdf_folder(self) -> None:
+        response, _ = self.post("report.pdf", PDF_BODY)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertIsInstance(self.job_queue.streams[0], PdfUploadStream)
+        saved = self.job_queue.saved[0]
+        self.assertEqual(saved.content_hash, hashlib.sha256(PDF_BODY).hexdigest())
+        self.assertEqual(saved.path.read_bytes(), PDF_BODY)
+        self.assertEqual([path.name for path in self.settings.pdf_dir.iterdir()], ["upload_report.pdf"])
+
+    def test_non_pdf_is_rejected_before_the_body_is_read(self) -> None:
+        response, body = self.post("fake.pdf", b"MZ" + b"\0" * 5_000_000)
+
+        self.assertEqual(response.status_code, 415)
+        self.assertIn("PDF", response.get_json()["error"])
+        self.assertLess(body.consumed, 1_000_000)
+        self.assertEqual(list(self.settings.pdf_dir.iterdir()), [])
+
+    def test_oversized_upload_is_cut_off(self) -> None:
+        self.settings.max_upload_bytes = 64 * 1024
+
+        response, body = self.post("big.pdf", b"%PDF-1.7\n" + b"0" * 5_000_000)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertLess(body.consumed, 1_000_000)
+        self.assertEqual(list(self.settings.pdf_dir.iterdir()), [])
+
+    def test_wrong_extension_is_rejected_before_any_data(self) -> None:
+        response, _ = self.post("notes.txt", PDF_BODY)
+
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.job_queue.saved, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
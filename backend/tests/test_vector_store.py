@@ -0,0 +1,166 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.config import Settings
+from app.services.chunker import Chunk
+from app.services.vector_store import VectorStore
+
+
+class FakeEmbedder:
+    """Deterministic bag-of-letters embedder that records what it encoded."""
+
+    def __init__(self) -> None:
+        self.encoded: List[str] = []
+
+    @staticmethod
+    def _vector(text: str) -> List[float]:
+        vector = [0.0] * 26
+        for char in text.lower():
+            if "a" <= char <= "z":
+                vector[ord(char) - ord("a")] += 1.0
+        vector[0] += 0.5
+        return vector
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        self.encoded.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str):
+        return self._vector(text)
+
+    def embed_queries(self, texts):
+        return [self._vector(text) for text in texts]
+
+
+class VectorStoreTestCase(unittest.TestCase):
+    backend_name = "chroma"
+
+    def setUp(self) -> None:
+        self.temp_dir = TemporaryDirectory()
+        self.previous_data_dir = os.environ.get("DATA_DIR")
+        os.environ["DATA_DIR"] = self.temp_dir.name
+        self.settings = Settings()
+        self.settings.vector_backend = self.backend_name
+        self.settings.ensure_directories()
+        self.embedder = FakeEmbedder()
+        self.store = VectorStore(self.settings, embedder=self.embedder)
+
+    def tearDown(self) -> None:
+        self.store.backend.close()
+        if self.previous_data_dir is not None:
+            os.environ["DATA_DIR"] = self.previous_data_dir
+        else:
+            os.environ.pop("DATA_DIR", None)
+        self.temp_dir.cleanup()
+
+    def test_sync_document_only_embeds_changed_chunks(self) -> None:
+        self.store.add_document("doc", ["alpha rules", "bravo rules", "charlie rules"])
+        self.embedder.encoded.clear()
+
+        reembedded = self.store.sync_document("doc", ["alpha rules", "delta rules"])
+
+        self.assertEqual(reembedded, 1)
+        self.assertEqual(self.embedder.encoded, ["delta rules"])
+        matches = self.store.similarity_search("delta", k=5, document_ids=["doc"])
+        self.assertEqual(sorted(match["content"] for match in matches), ["alpha rules", "delta rules"])
+
+    def test_sync_document_reuses_vectors_of_moved_chunks(self) -> None:
+        self.store.add_document("doc", ["alpha rules", "bravo rules"])
+        self.embedder.encoded.clear()
+
+        reembedded = self.store.sync_document("doc", ["preface", "alpha rules", "bravo rules"])
+
+        self.assertEqual(reembedded, 1)
+        self.assertEqual(self.embedder.encoded, ["preface"])
+
+    def test_matches_carry_provenance_and_follow_moves(self) -> None:
+        self.store.add_document("doc", [Chunk("alpha rules", 2, 2, 10, 21, 12, 23)])
+        match = self.store.similarity_search("alpha", k=1)[0]
+        self.assertEqual((match["page_start"], match["byte_start"], match["byte_end"]), (2, 12, 23))
+
+        self.embedder.encoded.clear()
+        self.store.sync_document("doc", [Chunk("alpha rules", 3, 3, 40, 51, 42, 53)])
+
+        self.assertEqual(self.embedder.encoded, [])
+        match = self.store.similarity_search("alpha", k=1)[0]
+        self.assertEqual((match["page_start"], match["char_start"], match["byte_start"]), (3, 40, 42))
+
+    def test_document_chunks_round_trip_through_sync(self) -> None:
+        chunks = [Chunk("alpha rules", 1, 1, 0, 11, 0, 11), Chunk("bravo rules", 2, 2, 13, 24, 13, 24)]
+        self.store.add_document("doc", chunks)
+        snapshot = self.store.document_chunks("doc")
+        self.store.sync_document("doc", [chunks[0], Chunk("delta rules", 2, 2, 13, 24, 13, 24)])
+
+        self.store.sync_document("doc", snapshot)
+
+        self.assertEqual(snapshot, chunks)
+        self.assertEqual(self.store.document_chunks("doc"), chunks)
+        self.assertEqual(self.store.document_chunks("missing"), [])
+
+    def test_normalizing_copies_only_rows_that_need_it(self) -> None:
+        unit = np.eye(3, dtype=np.float32)
+        self.assertIs(VectorStore._normalize_rows(unit), unit)
+
+        raw = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+        normalized = VectorStore._normalize_rows(raw)
+        np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+        np.testing.assert_array_equal(raw, [[3.0, 4.0], [0.0, 0.0]])
+        np.testing.assert_allclose(VectorStore._normalize_rows([[0.0, 2.0]]), [[0.0, 1.0]])
+
+    def test_watchers_hear_about_writes_from_other_processes(self) -> None:
+        other = VectorStore(self.settings, embedder=self.embedder)
+        changed = threading.Event()
+        with patch("app.services.vector_store.CHANGE_POLL_SECONDS", 0.02):
+            other.watch_other_writers(changed.set)
+            time.sleep(0.1)
+            self.store.add_document("doc", ["alpha rules"])
+            self.assertTrue(changed.wait(5))
+
+            changed.clear()
+            other.similarity_search("alpha", k=1, mode="keyword")  # now loaded, it reloads on foreign writes
+            self.store.delete_document("doc")
+            self.assertTrue(changed.wait(5))
+        self.assertEqual(other.similarity_search("alpha", k=1, mode="keyword"), [])
+        other.close()
+
+    def test_hybrid_search_finds_exact_identifier(self) -> None:
+        chunks = ["instrument requirements see section 91.205", "required instruments and equipment overview"]
+        self.store.add_document("doc", chunks)
+
+        keyword = self.store.similarity_search("91.205", k=1, mode="keyword")
+        hybrid = self.store.similarity_search("91.205", k=2, mode="hybrid")
+
+        self.assertEqual(keyword[0]["content"], chunks[0])
+        self.assertEqual(hybrid[0]["content"], chunks[0])
+        self.assertIsNotNone(hybrid[0]["keyword_score"])
+        self.assertIn("fused_score", hybrid[0])
+
+    def test_keyword_index_follows_sync_and_delete(self) -> None:
+        self.store.add_document("doc", ["alpha 91.205", "bravo 91.203"])
+        self.store.sync_document("doc", ["alpha 91.205"])
+        self.assertEqual(self.store.similarity_search("bravo", k=3, mode="keyword"), [])
+
+        self.store.delete_document("doc")
+        self.assertEqual(self.store.similarity_search("91.205", k=3, mode="keyword"), [])
+
+
+class MmapVectorStoreTestCase(VectorStoreTestCase):
+    backend_name = "mmap"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,7 +30,7 @@ export default function DocumentList({
                     <strong>{doc.original_filename}</strong>
                     <span className="time">{formatTime(doc.uploaded_at)}</span>
                   </div>
-                  <p className="summary-preview">{doc.summary_preview || "尚無摘要"}</p>
+                  <p className="summary-preview">{doc.summary_preview || summaryPlaceholder(doc.summary_status)}</p>
                   <div className="document-actions">
                     <button
                       type="button"
@@ -67,3 +67,13 @@ function formatTime(isoString) {
   }
   return date.toLocaleString();
 }
+
+function summaryPlaceholder(status) {
+  if (status === "pending") {
+    return "摘要產生中...";
+  }
+  if (status === "failed") {
+    return "摘要產生失敗";
+  }
+  return "尚無摘要";
+}
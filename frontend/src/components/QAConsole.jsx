@@ -51,6 +51,11 @@ export default function QAConsole({ selectedDocument, history, onAsk, isAsking,
                             <p className="match-content">{match.content}</p>
                             <p className="match-meta">
                               來源文件：{match.document_id ?? "未知"}｜分塊：{match.chunk_index ?? "-"}
+                              {match.page_start
+                                ? `｜頁碼：${match.page_start}${
+                                    match.page_end && match.page_end !== match.page_start ? `–${match.page_end}` : ""
+                                  }`
+                                : null}
                             </p>
                           </li>
                         ))}
@@ -1,8 +1,22 @@
 import { httpClient } from "./httpClient";
 
+const JOB_POLL_INTERVAL_MS = 1500;
+
+function delay(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
 export async function listDocuments() {
-  const response = await httpClient.get("/documents");
-  return response.data;
+  const items = [];
+  let cursor = null;
+  do {
+    const response = await httpClient.get("/documents", {
+      params: cursor ? { cursor } : undefined,
+    });
+    items.push(...(response.data.items ?? []));
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return { items, count: items.length };
 }
 
 export async function uploadDocument(file) {
@@ -12,9 +26,29 @@ export async function uploadDocument(file) {
   const response = await httpClient.post("/documents", formData, {
     headers: { "Content-Type": "multipart/form-data" },
   });
+  return waitForJob(response.data.job_id);
+}
+
+export async function getJob(jobId) {
+  const response = await httpClient.get(`/jobs/${jobId}`);
   return response.data;
 }
 
+export async function waitForJob(jobId) {
+  for (;;) {
+    const job = await getJob(jobId);
+    if (job.status === "succeeded") {
+      return job.document;
+    }
+    if (job.status === "failed") {
+      const error = new Error(job.error || "Document processing failed");
+      error.response = { data: { error: job.error } };
+      throw error;
+    }
+    await delay(JOB_POLL_INTERVAL_MS);
+  }
+}
+
 export async function deleteDocument(documentId) {
   const response = await httpClient.delete(`/documents/${documentId}`);
   return response.data;